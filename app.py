@@ -8,8 +8,39 @@ The MCP server will be available at:
     http://localhost:8000/mcp/
 """
 
+from contextlib import asynccontextmanager
+
 from starlette.responses import JSONResponse
-from unified_mcp_server import app as mcp
+from unified_mcp_server import app as mcp, cache_backend, cache_middleware, deadline_middleware
+from providers.bulkhead import bulkhead_stats
+from providers.cache import cache_stats
+from providers.circuit_breaker import circuit_stats
+from providers.cache_snapshot import CacheSnapshot
+from providers.coalescing import coalescing_stats
+from providers.connection_warmer import ConnectionWarmer
+from providers.dns_cache import dns_cache_stats
+from providers.executors import executor_stats, shutdown_executors
+from providers.hedging import hedging_stats
+from providers.indicator_state import indicator_state_stats
+from providers.intraday_bars import intraday_bar_stats
+from providers.lazy_providers import provider_stats
+from providers.market_router import market_router
+from providers.process_pool import parse_pool_stats, shutdown_parse_pool
+from providers.retry import retry_stats
+from providers.upstream_http import connection_stats
+from providers.warmup import Warmup
+
+# Connections to the hot upstream hosts, opened at boot and kept from going idle; see
+# providers/connection_warmer.py.
+connection_warmer = ConnectionWarmer.from_env()
+# Reference data the first calls would otherwise wait on; see providers/warmup.py.
+warmup = Warmup.from_env({
+    **market_router.warmup_steps(),
+    "connections": connection_warmer.warm,
+})
+# Persistent caches written at shutdown and read back at boot; see
+# providers/cache_snapshot.py. Off unless CACHE_SNAPSHOT_PATH is set.
+snapshot = CacheSnapshot.from_env()
 
 # Add health check endpoint to the MCP server
 @mcp.custom_route("/health", methods=["GET"])
@@ -18,14 +49,66 @@ async def health_check(request):
     return JSONResponse({
         "status": "healthy",
         "service": "Borsa MCP Server",
-        "version": "0.9.0"
+        "version": "0.9.0",
+        "ready": warmup.ready,
+        "warmup": warmup.status(),
+        "caches": cache_stats(),
+        "coalescing": coalescing_stats(),
+        "executors": executor_stats(),
+        "parse_pool": parse_pool_stats(),
+        "bulkheads": bulkhead_stats(),
+        "circuits": circuit_stats(),
+        "connections": connection_stats(),
+        "keepalive": connection_warmer.status(),
+        "dns": dns_cache_stats(),
+        "retries": retry_stats(),
+        "hedging": hedging_stats(),
+        "providers": provider_stats(),
+        "indicator_state": indicator_state_stats(),
+        "bar_windows": intraday_bar_stats(),
+        "tool_cache": cache_middleware.stats(),
+        "deadlines": deadline_middleware.stats(),
+        "cache_backend": cache_backend.stats() if cache_backend else None,
+        "negative_cache": market_router.miss_stats(),
+        "cache_snapshot": snapshot.status(),
     })
 
+# Readiness, apart from liveness: 503 until warmup has finished, so the load balancer
+# routes only to warm machines while /health keeps the process itself alive.
+@mcp.custom_route("/ready", methods=["GET"])
+async def readiness_check(request):
+    return JSONResponse(warmup.status(), status_code=200 if warmup.ready else 503)
+
 # Create ASGI app directly from FastMCP server
 # This avoids routing issues with nested mounts
 app = mcp.http_app()
 
+# Warm up inside the MCP app's own lifespan. Only this ASGI entry point warms: a local
+# stdio session has one user and no use for the whole KAP list up front. The snapshot
+# is restored first, so warmup finds what it restored fresh and skips the fetch.
+_mcp_lifespan = app.router.lifespan_context
+
+@asynccontextmanager
+async def _lifespan(starlette_app):
+    async with _mcp_lifespan(starlette_app):
+        snapshot.load()
+        warmup.start()
+        connection_warmer.start()
+        try:
+            yield
+        finally:
+            await connection_warmer.stop()
+            await warmup.stop()
+            snapshot.save()
+            shutdown_executors()
+            shutdown_parse_pool()
+            if cache_backend is not None:
+                await cache_backend.close()
+
+app.router.lifespan_context = _lifespan
+
 # Endpoints:
 # - /mcp/ - MCP server (Streamable HTTP transport, default FastMCP path)
 # - /health - Health check for monitoring
+# - /ready - 200 once startup warmup has finished, 503 before
 # Run with: uvicorn app:app --host 0.0.0.0 --port 8000
@@ -0,0 +1,93 @@
+"""
+Micro-benchmark: the indicator engine against the per-indicator pandas code it replaced.
+
+The second table is a whole index: `compute` once per member against
+`compute_matrix` over the members' matrix.
+
+`pandas_indicators` is the calculation the providers each carried before
+providers/indicators.py -- one rolling/ewm object per indicator, EMA12 and EMA26
+built twice for MACD -- reduced to the indicators the engine reports. Run from the
+repository root:
+
+    python -m benchmarks.indicators
+"""
+import timeit
+
+import numpy as np
+import pandas as pd
+
+from providers import indicators
+
+
+def pandas_indicators(df: pd.DataFrame) -> dict:
+    close = df["close"]
+    out = {f"sma_{n}": close.rolling(window=n).mean().iloc[-1] for n in indicators.SMA_WINDOWS}
+    out["ema_12"] = close.ewm(span=12).mean().iloc[-1]
+    out["ema_26"] = close.ewm(span=26).mean().iloc[-1]
+
+    delta = close.diff()
+    gain = (delta.where(delta > 0, 0)).rolling(window=14).mean()
+    loss = (-delta.where(delta < 0, 0)).rolling(window=14).mean()
+    out["rsi_14"] = (100 - (100 / (1 + gain / loss))).iloc[-1]
+
+    macd = close.ewm(span=12).mean() - close.ewm(span=26).mean()
+    signal = macd.ewm(span=9).mean()
+    out["macd"], out["macd_signal"] = macd.iloc[-1], signal.iloc[-1]
+
+    std_20 = close.rolling(window=20).std().iloc[-1]
+    out["bollinger_upper"] = out["sma_20"] + 2 * std_20
+    out["bollinger_lower"] = out["sma_20"] - 2 * std_20
+
+    low_14 = df["low"].rolling(window=14).min()
+    high_14 = df["high"].rolling(window=14).max()
+    k = 100 * ((close - low_14) / (high_14 - low_14))
+    out["stochastic_k"] = k.iloc[-1]
+    out["stochastic_d"] = k.rolling(window=3).mean().iloc[-1]
+
+    for n in indicators.VOLUME_WINDOWS:
+        out[f"volume_{n}"] = df["volume"].rolling(window=n).mean().iloc[-1]
+    return out
+
+
+def _frame(n: int) -> pd.DataFrame:
+    rng = np.random.default_rng(0)
+    close = 100 + np.cumsum(rng.normal(0, 1, n))
+    return pd.DataFrame({
+        "close": close,
+        "high": close + rng.uniform(0, 1, n),
+        "low": close - rng.uniform(0, 1, n),
+        "volume": rng.uniform(1e5, 1e6, n),
+    })
+
+
+def main() -> None:
+    print(f"{'bars':>6} {'pandas us':>10} {'engine us':>10} {'speedup':>8}")
+    # 6 months of daily bars, a year, and the intraday/crypto windows.
+    for n in (125, 250, 1000, 5000):
+        df = _frame(n)
+
+        def engine():
+            indicators.compute(df["close"], df["high"], df["low"], df["volume"])
+
+        runs = max(20, 20000 // n)
+        before = min(timeit.repeat(lambda: pandas_indicators(df), number=runs, repeat=5)) / runs
+        after = min(timeit.repeat(engine, number=runs, repeat=5)) / runs
+        print(f"{n:>6} {before * 1e6:>10.0f} {after * 1e6:>10.0f} {before / after:>7.1f}x")
+
+    print(f"\n{'members':>7} {'per member ms':>14} {'matrix ms':>10} {'speedup':>8}")
+    # XU030, XU100 and XUTUM over the index scan's ~285 sessions.
+    for members in (30, 100, 500):
+        frames = [_frame(285) for _ in range(members)]
+        columns = [[df[name].to_numpy() for df in frames] for name in ("close", "high", "low", "volume")]
+
+        def each():
+            for df in frames:
+                indicators.compute(df["close"], df["high"], df["low"], df["volume"])
+
+        before = min(timeit.repeat(each, number=5, repeat=5)) / 5
+        after = min(timeit.repeat(lambda: indicators.compute_matrix(*columns), number=5, repeat=5)) / 5
+        print(f"{members:>7} {before * 1e3:>14.1f} {after * 1e3:>10.1f} {before / after:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
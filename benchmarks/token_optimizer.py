@@ -0,0 +1,83 @@
+"""
+Micro-benchmark: long-history bucketing against the pandas round trip it replaced.
+
+`pandas_payload` is what get_finansal_veri did before `aggregate_ohlcv`: a
+FinansalVeriNoktasi and a dict per bar via iterrows, then TokenOptimizer building a
+DataFrame from the dicts, parsing the dates, resampling, relabelling each bucket with
+its last observation and iterrows-ing it back into dicts. `optimize_ohlc_frame` reads
+the frame's columns and builds dicts only for the buckets. Run from the repository
+root:
+
+    python -m benchmarks.token_optimizer
+"""
+import timeit
+
+import numpy as np
+import pandas as pd
+
+from models import FinansalVeriNoktasi
+from token_optimizer import TokenOptimizer
+
+_MAPPING = {"acilis": "first", "en_yuksek": "max", "en_dusuk": "min", "kapanis": "last", "hacim": "sum"}
+
+
+def pandas_payload(hist_df: pd.DataFrame, time_frame_days: int) -> list:
+    points = []
+    for idx, row in hist_df.iterrows():
+        v = FinansalVeriNoktasi(
+            tarih=idx.strftime("%Y-%m-%d"), acilis=row.get("Open"), en_yuksek=row.get("High"),
+            en_dusuk=row.get("Low"), kapanis=row.get("Close"), hacim=row.get("Volume", 0),
+        )
+        points.append({"tarih": v.tarih, "acilis": v.acilis, "en_yuksek": v.en_yuksek,
+                       "en_dusuk": v.en_dusuk, "kapanis": v.kapanis, "hacim": v.hacim})
+
+    df = pd.DataFrame(points)
+    df["tarih"] = pd.to_datetime(df["tarih"])
+    df.set_index("tarih", inplace=True)
+    freq = TokenOptimizer.get_sampling_frequency(time_frame_days)
+    resampled = df.resample(freq).agg(_MAPPING).dropna()
+    bucket_last = df.index.to_series().resample(freq).max()
+    resampled.index = [bucket_last.get(idx, idx) for idx in resampled.index]
+    result = []
+    for index, row in resampled.iterrows():
+        point = {"tarih": index.to_pydatetime()}
+        for col, value in row.items():
+            if pd.notna(value):
+                point[col] = float(value)
+        result.append(point)
+    return result
+
+
+def _frame(n: int) -> pd.DataFrame:
+    rng = np.random.default_rng(0)
+    close = 10 + np.abs(np.cumsum(rng.normal(0, 0.3, n)))
+    index = pd.bdate_range(end="2026-06-30", periods=n, tz="Europe/Istanbul") + pd.Timedelta(hours=18)
+    return pd.DataFrame({
+        "Open": close,
+        "High": close + rng.uniform(0, 0.5, n),
+        "Low": close - rng.uniform(0, 0.5, n),
+        "Close": close,
+        "Volume": rng.integers(10**5, 10**7, n),
+    }, index=index)
+
+
+def main() -> None:
+    print(f"{'period':>6} {'bars':>6} {'buckets':>8} {'pandas ms':>10} {'numpy ms':>9} {'speedup':>8}")
+    # Weekly, monthly and quarterly buckets; "max" is a listing from the early 2000s.
+    for period, n, days in (("6mo", 125, 180), ("1y", 250, 365), ("2y", 500, 730),
+                            ("5y", 1250, 1825), ("max", 5000, 3650)):
+        df = _frame(n)
+
+        def numpy_payload():
+            dates = df.index.tz_localize(None).normalize().to_pydatetime()
+            return TokenOptimizer.optimize_ohlc_frame(df, days, dates=dates)
+
+        runs = max(3, 2000 // n)
+        before = min(timeit.repeat(lambda: pandas_payload(df, days), number=runs, repeat=5)) / runs
+        after = min(timeit.repeat(numpy_payload, number=runs, repeat=5)) / runs
+        buckets = len(numpy_payload())
+        print(f"{period:>6} {n:>6} {buckets:>8} {before * 1e3:>10.2f} {after * 1e3:>9.2f} {before / after:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
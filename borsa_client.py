@@ -1,18 +1,16 @@
 """
 Main BorsaApiClient
-This class acts as an orchestrator or service layer. It initializes
-all data providers (KAP, yfinance) and delegates calls to the 
+This class acts as an orchestrator or service layer. It builds the
+data providers (KAP, yfinance) on first use and delegates calls to the
 appropriate provider.
 """
-import asyncio
-import httpx
 import logging
 from typing import List, Dict, Any, Optional
 
 # Assuming provider files are in a 'providers' directory
-from providers.kap_provider import KAPProvider
-from providers.yfinance_provider import YahooFinanceProvider
-from providers.borsapy_provider import BorsapyProvider
+from providers.lazy_providers import lazy_provider
+from providers.http_client import shared_http_client
+from providers.executors import run_blocking, run_compute
 # from providers.mynet_provider import MynetProvider # Mynet provider is now fully replaced
 from models import (
     YFinancePeriodEnum,
@@ -55,117 +53,123 @@ from models.tcmb_models import EnflasyonHesaplamaSonucu, TcmbEnflasyonSonucu
 logger = logging.getLogger(__name__)
 
 
-class LoopBoundHttpClient:
-    """An httpx.AsyncClient that follows the event loop it is used on.
-
-    BorsaApiClient is built at import time (market_router is a module-level singleton),
-    so its httpx client used to be constructed before any loop existed. httpx binds a
-    connection pool to the loop of its first request; when that loop closes, every later
-    request dies with `RuntimeError: Event loop is closed`.
-
-    Production runs one long-lived loop, so this only ever bit the test suite — except
-    for what the error *became*. The exchange providers catch their own exceptions and
-    return an empty result carrying `error_message`, and the callers only checked whether
-    the data was empty. So a dead connection reached the model as "BTCTRY has no quote",
-    which reads as "this pair does not trade". A transport failure had been laundered
-    into a false claim about the market.
-
-    One client per loop, created on first use, so the pool is always live.
-    """
-
-    def __init__(self, timeout: float = 60.0, verify: bool = False):
-        self._timeout = timeout
-        self._verify = verify
-        self._clients: Dict[Any, httpx.AsyncClient] = {}
-
-    def _client_for_current_loop(self) -> httpx.AsyncClient:
-        loop = asyncio.get_running_loop()
-        client = self._clients.get(loop)
-        if client is None or client.is_closed:
-            client = httpx.AsyncClient(timeout=self._timeout, verify=self._verify)
-            self._clients[loop] = client
-        return client
-
-    async def get(self, *args, **kwargs):
-        return await self._client_for_current_loop().get(*args, **kwargs)
+class BorsaApiClient:
+    def __init__(self, timeout: float = 60.0):
+        # The process's shared client, one httpx client per event loop underneath.
+        # Constructing one eagerly here bound the pool to whichever loop first touched
+        # it, and it died with that loop. See providers/http_client.py.
+        # SSL verification disabled to avoid certificate issues
+        self._http_client = shared_http_client(timeout=timeout, verify=False)
 
-    async def post(self, *args, **kwargs):
-        return await self._client_for_current_loop().post(*args, **kwargs)
+        # The providers are built on first use; see providers/lazy_providers.py.
 
-    async def request(self, *args, **kwargs):
-        return await self._client_for_current_loop().request(*args, **kwargs)
+    @lazy_provider
+    def kap_provider(self):
+        from providers.kap_provider import KAPProvider
+        return KAPProvider(self._http_client)
 
-    async def aclose(self) -> None:
-        for client in list(self._clients.values()):
-            await client.aclose()
-        self._clients.clear()
+    @lazy_provider
+    def yfinance_provider(self):
+        from providers.yfinance_provider import YahooFinanceProvider
+        return YahooFinanceProvider()
 
+    @lazy_provider
+    def borsapy_provider(self):
+        # For BIST stocks
+        from providers.borsapy_provider import BorsapyProvider
+        return BorsapyProvider()
 
-class BorsaApiClient:
-    def __init__(self, timeout: float = 60.0):
-        # One httpx client per event loop. Constructing it eagerly here bound the pool
-        # to whichever loop first touched it, and it died with that loop.
-        # SSL verification disabled to avoid certificate issues
-        self._http_client = LoopBoundHttpClient(timeout=timeout, verify=False)
-
-        # Initialize all data providers
-        self.kap_provider = KAPProvider(self._http_client)
-        self.yfinance_provider = YahooFinanceProvider()
-        self.borsapy_provider = BorsapyProvider()  # For BIST stocks
-        # Import MynetProvider for hybrid approach
+    @lazy_provider
+    def mynet_provider(self):
+        # MynetProvider for the hybrid approach
         from providers.mynet_provider import MynetProvider
-        self.mynet_provider = MynetProvider(self._http_client)
-        # Import TefasProvider for fund data
+        return MynetProvider(self._http_client)
+
+    @lazy_provider
+    def tefas_provider(self):
+        # TefasProvider for fund data
         from providers.tefas_provider import TefasProvider
-        self.tefas_provider = TefasProvider()
-        # Import BtcTurkProvider for crypto data
+        return TefasProvider()
+
+    @lazy_provider
+    def btcturk_provider(self):
+        # BtcTurkProvider for crypto data
         from providers.btcturk_provider import BtcTurkProvider
-        self.btcturk_provider = BtcTurkProvider(self._http_client)
-        # Import CoinbaseProvider for global crypto data
+        return BtcTurkProvider(self._http_client)
+
+    @lazy_provider
+    def coinbase_provider(self):
+        # CoinbaseProvider for global crypto data
         from providers.coinbase_provider import CoinbaseProvider
-        self.coinbase_provider = CoinbaseProvider(self._http_client)
-        # Import BorsapyFXProvider for currency and commodities data (replaces DovizcomProvider)
+        return CoinbaseProvider(self._http_client)
+
+    @lazy_provider
+    def dovizcom_provider(self):
+        # BorsapyFXProvider for currency and commodities data (replaces DovizcomProvider)
         from providers.borsapy_fx_provider import BorsapyFXProvider
-        self.dovizcom_provider = BorsapyFXProvider(self._http_client)
-        # Import BorsapyCalendarProvider for Turkish economic calendar data (replaces DovizcomCalendarProvider)
+        return BorsapyFXProvider(self._http_client)
+
+    @lazy_provider
+    def dovizcom_calendar_provider(self):
+        # BorsapyCalendarProvider for Turkish economic calendar data (replaces DovizcomCalendarProvider)
         from providers.borsapy_calendar_provider import BorsapyCalendarProvider
-        self.dovizcom_calendar_provider = BorsapyCalendarProvider()
-        # Import TcmbProvider for Turkish inflation data
+        return BorsapyCalendarProvider()
+
+    @lazy_provider
+    def tcmb_provider(self):
+        # TcmbProvider for Turkish inflation data
         from providers.tcmb_provider import TcmbProvider
-        self.tcmb_provider = TcmbProvider(self._http_client)
-        # Import BorsapyBondProvider for bond yields (replaces DovizcomTahvilProvider)
+        return TcmbProvider(self._http_client)
+
+    @lazy_provider
+    def tahvil_provider(self):
+        # BorsapyBondProvider for bond yields (replaces DovizcomTahvilProvider)
         from providers.borsapy_bond_provider import BorsapyBondProvider
-        self.tahvil_provider = BorsapyBondProvider()
-        # Import WorldBankProvider for GDP growth data
+        return BorsapyBondProvider()
+
+    @lazy_provider
+    def worldbank_provider(self):
+        # WorldBankProvider for GDP growth data
         from providers.worldbank_provider import WorldBankProvider
-        self.worldbank_provider = WorldBankProvider(self._http_client)
-        # Import BuffettAnalyzerProvider for value investing calculations
+        return WorldBankProvider(self._http_client)
+
+    @lazy_provider
+    def buffett_provider(self):
+        # BuffettAnalyzerProvider for value investing calculations
         from providers.buffett_analyzer_provider import BuffettAnalyzerProvider
-        self.buffett_provider = BuffettAnalyzerProvider(
+        return BuffettAnalyzerProvider(
             tahvil_provider=self.tahvil_provider,
             tcmb_provider=self.tcmb_provider,
             worldbank_provider=self.worldbank_provider,
             yfinance_provider=self.yfinance_provider
         )
 
-        # Import İş Yatırım Provider for financial statements
+    @lazy_provider
+    def isyatirim_provider(self):
+        # İş Yatırım Provider for financial statements
         from providers.isyatirim_provider import IsYatirimProvider
-        self.isyatirim_provider = IsYatirimProvider()
+        return IsYatirimProvider()
 
-        # Import FinancialRatiosProvider for financial ratio calculations
+    @lazy_provider
+    def financial_ratios_provider(self):
+        # FinancialRatiosProvider for financial ratio calculations
         # Pass self (BorsaClient) so it uses İş Yatırım integration
         from providers.financial_ratios_provider import FinancialRatiosProvider
-        self.financial_ratios_provider = FinancialRatiosProvider(
+        return FinancialRatiosProvider(
             data_provider=self  # Use BorsaClient which has İş Yatırım integration
         )
 
-        # Import YFScreenProvider for US securities screening
+    @lazy_provider
+    def yfscreen_provider(self):
+        # YFScreenProvider for US securities screening
         from providers.yfscreen_provider import YFScreenProvider
-        self.yfscreen_provider = YFScreenProvider()
+        return YFScreenProvider()
 
-        # Import BorsapyScannerProvider for BIST technical scanning
+    @lazy_provider
+    def scanner_provider(self):
+        # BorsapyScannerProvider for BIST technical scanning
         from providers.borsapy_scanner_provider import BorsapyScannerProvider
-        self.scanner_provider = BorsapyScannerProvider()
+        return BorsapyScannerProvider()
 
     async def close(self):
         await self._http_client.aclose()
@@ -511,9 +515,25 @@ class BorsaApiClient:
         """Delegates earnings calendar fetching to BorsapyProvider for BIST stocks."""
         return await self.borsapy_provider.get_kazanc_takvimi(ticker_kodu)
 
-    async def get_teknik_analiz_yfinance(self, ticker_kodu: str) -> Dict[str, Any]:
-        """Delegates technical analysis to BorsapyProvider for BIST stocks."""
-        return self.borsapy_provider.get_teknik_analiz(ticker_kodu)
+    async def get_teknik_analiz_yfinance(self, ticker_kodu: str, timeframe: str = "1d") -> Dict[str, Any]:
+        """Delegates technical analysis to BorsapyProvider for BIST stocks.
+
+        The `timeframe` bars come from the bar window cache over the retried, hedged
+        path; the indicators are computed from them in the compute pool, not as a
+        borsapy call.
+        """
+        try:
+            hist = await self.borsapy_provider.fetch_bars(ticker_kodu, timeframe)
+        except Exception as e:
+            logger.exception(f"Error performing technical analysis for {ticker_kodu}")
+            return {"error": str(e)}
+        return await run_compute(
+            self.borsapy_provider.get_teknik_analiz, ticker_kodu, hist, timeframe
+        )
+
+    async def get_bist_daily_bars(self, ticker_listesi: List[str]) -> Dict[str, Any]:
+        """Delegates a bulk daily-bar read (an index's members) to BorsapyProvider."""
+        return await self.borsapy_provider.fetch_daily_bars(ticker_listesi)
 
     async def get_pivot_points(self, ticker_kodu: str) -> Dict[str, Any]:
         """Delegates pivot points calculation to BorsapyProvider for BIST stocks."""
@@ -521,7 +541,9 @@ class BorsaApiClient:
 
     async def get_sektor_karsilastirmasi_yfinance(self, ticker_listesi: List[str]) -> Dict[str, Any]:
         """Delegates sector analysis to BorsapyProvider for BIST stocks."""
-        return self.borsapy_provider.get_sektor_karsilastirmasi(ticker_listesi)
+        return await run_blocking(
+            "borsapy", self.borsapy_provider.get_sektor_karsilastirmasi, ticker_listesi
+        )
         
     # --- Mynet Provider Methods (Permanently Disabled as per migration to yfinance) ---
     async def get_hisse_detayi(self, ticker_kodu: str) -> Dict[str, Any]:
@@ -645,7 +667,9 @@ class BorsaApiClient:
     async def get_fund_detail(self, fund_code: str, include_price_history: bool = False) -> FonDetayBilgisi:
         """Get detailed information about a specific fund."""
         try:
-            result = self.tefas_provider.get_fund_detail(fund_code, include_price_history)
+            result = await run_blocking(
+                "tefas", self.tefas_provider.get_fund_detail, fund_code, include_price_history
+            )
             return FonDetayBilgisi(**result)
         except Exception as e:
             logger.exception(f"Error getting fund detail for {fund_code}")
@@ -668,7 +692,9 @@ class BorsaApiClient:
     async def get_fund_performance(self, fund_code: str, start_date: str = None, end_date: str = None) -> FonPerformansSonucu:
         """Get historical performance data for a fund."""
         try:
-            result = self.tefas_provider.get_fund_performance(fund_code, start_date, end_date)
+            result = await run_blocking(
+                "tefas", self.tefas_provider.get_fund_performance, fund_code, start_date, end_date
+            )
             return FonPerformansSonucu(**result)
         except Exception as e:
             logger.exception(f"Error getting fund performance for {fund_code}")
@@ -684,7 +710,7 @@ class BorsaApiClient:
     async def compare_funds(self, fund_codes: List[str]) -> FonKarsilastirmaSonucu:
         """Compare multiple funds side by side."""
         try:
-            result = self.tefas_provider.compare_funds(fund_codes)
+            result = await run_blocking("tefas", self.tefas_provider.compare_funds, fund_codes)
             return FonKarsilastirmaSonucu(**result)
         except Exception as e:
             logger.exception("Error comparing funds")
@@ -699,11 +725,8 @@ class BorsaApiClient:
     async def screen_funds(self, criteria: FonTaramaKriterleri) -> FonTaramaSonucu:
         """Screen funds based on various criteria."""
         try:
-            loop = asyncio.get_event_loop()
-            result = await loop.run_in_executor(
-                None,
-                self.tefas_provider.screen_funds,
-                criteria.dict(exclude_none=True)
+            result = await run_blocking(
+                "tefas", self.tefas_provider.screen_funds, criteria.dict(exclude_none=True)
             )
             return FonTaramaSonucu(**result)
         except Exception as e:
@@ -724,9 +747,8 @@ class BorsaApiClient:
         Uses the same endpoint as TEFAS website's fund comparison page.
         """
         try:
-            loop = asyncio.get_event_loop()
-            result = await loop.run_in_executor(
-                None,
+            result = await run_blocking(
+                "tefas",
                 lambda: self.tefas_provider.compare_funds_advanced(
                     fund_codes=fund_codes,
                     fund_type=fund_type,
@@ -1372,9 +1394,17 @@ Detaylı mevzuat için SPK resmi web sitesini ziyaret edin.
         result["ticker"] = ticker
         return result
 
-    async def get_us_technical_analysis(self, ticker: str) -> Dict[str, Any]:
-        """Get US stock technical analysis with indicators."""
-        result = self.yfinance_provider.get_teknik_analiz(ticker, market="US")
+    async def get_us_technical_analysis(self, ticker: str, timeframe: str = "1d") -> Dict[str, Any]:
+        """Get US stock technical analysis with indicators, on `timeframe` bars."""
+        try:
+            hist = await self.yfinance_provider.fetch_bars(ticker, timeframe, market="US")
+        except Exception as e:
+            logger.exception(f"Error performing US technical analysis for {ticker}")
+            return {"error_message": str(e), "ticker": ticker}
+        result = await run_blocking(
+            "yahoo", self.yfinance_provider.get_teknik_analiz, ticker,
+            market="US", timeframe=timeframe, hist=hist,
+        )
         if "error" in result:
             return {"error_message": result.get("error"), "ticker": ticker}
 
@@ -1878,10 +1908,9 @@ Detaylı mevzuat için SPK resmi web sitesini ziyaret edin.
         Returns:
             Dict with company data, sector summaries, and overall market stats
         """
-        # Use run_in_executor for synchronous Yahoo Finance call
-        loop = asyncio.get_event_loop()
-        result = await loop.run_in_executor(
-            None,
+        # Synchronous Yahoo Finance call, run in the Yahoo pool
+        result = await run_blocking(
+            "yahoo",
             lambda: self.yfinance_provider.get_sektor_karsilastirmasi(tickers, market="US")
         )
 
@@ -1905,12 +1934,8 @@ Detaylı mevzuat için SPK resmi web sitesini ziyaret edin.
         Returns:
             Dict with matching indices including ticker, name, description, category
         """
-        # Synchronous method, use run_in_executor
-        loop = asyncio.get_event_loop()
-        result = await loop.run_in_executor(
-            None,
-            lambda: self.yfinance_provider.search_us_indices(query)
-        )
+        # Synchronous method, run in the Yahoo pool
+        result = await run_blocking("yahoo", self.yfinance_provider.search_us_indices, query)
 
         if result.get('error'):
             return {"error_message": result.get('error'), **result}
@@ -1927,12 +1952,8 @@ Detaylı mevzuat için SPK resmi web sitesini ziyaret edin.
         Returns:
             Dict with index info, current price, YTD return, 1Y return, etc.
         """
-        # Synchronous method, use run_in_executor
-        loop = asyncio.get_event_loop()
-        result = await loop.run_in_executor(
-            None,
-            lambda: self.yfinance_provider.get_us_index_info(index_ticker)
-        )
+        # Synchronous method, run in the Yahoo pool
+        result = await run_blocking("yahoo", self.yfinance_provider.get_us_index_info, index_ticker)
 
         if result.get('error'):
             return {"error_message": result.get('error'), **result}
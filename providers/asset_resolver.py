@@ -59,6 +59,10 @@ class AssetResolver:
             self._fund_codes = await self._load_fund_codes()
             self._loaded = True
 
+    async def warm(self) -> None:
+        """Load both universes now rather than on the first resolve()."""
+        await self._ensure_loaded()
+
     async def _load_bist_tickers(self) -> Set[str]:
         """The BIST ticker universe. Raises rather than returning an empty set.
 
@@ -0,0 +1,377 @@
+"""
+A persistent, incremental store of daily OHLCV bars.
+
+Every history request used to go upstream for its whole window, every time. A
+compare_assets call prices two endpoints per asset through _canonical_window, so
+"GARAN vs THYAO since January" refetched the same January bars on every call, over a
+TradingView websocket that drops half its connections. A closed trading day's bar
+never changes; only the window that has not been seen before needs fetching.
+
+BarStore keeps the bars it has seen, per (source, symbol, interval, adjust), together
+with the date ranges it has fully covered. A request reads what is covered and fetches
+only the gaps. Three rules keep the stored series honest:
+
+- Coverage stops at the market's last closed session (ttl_policy), and the days
+  after it the market does not trade. Today's bar is still forming until the close,
+  so the tail of a window that runs to today is refetched until then -- and is
+  final, not refetched all night or all weekend, after it.
+- An empty fetch records no coverage. yfinance answers some failures with an empty
+  frame; recording that would make a hole permanent.
+- A split revises an adjusted series backwards. Each gap fetch is widened to overlap
+  one stored bar, and if that bar's close has moved the whole series is dropped and
+  refetched rather than stitching two adjustment bases together.
+
+The store is stdlib sqlite3, not database.py: that module is SQLAlchemy, which is not
+a dependency of this package, and its DATABASE_URL is a shared Postgres on Fly. Set
+BAR_STORE_PATH to a file to keep bars across restarts; without it each store lives in
+memory for the life of its provider, which still spares the repeat fetches.
+
+Either way the store holds at most BAR_STORE_MAX_SERIES series. It had no bound at
+all -- every (symbol, interval) window ever asked for stayed in process memory for
+good -- so the series read least recently is dropped, bars and coverage, once a new
+one would exceed it, as every other cache here evicts at its max-entries.
+
+    BAR_STORE_MAX_SERIES=1024      # series kept per store; an index scan of XUTUM is ~500
+"""
+import logging
+import os
+import sqlite3
+import threading
+from collections import OrderedDict
+from datetime import date, timedelta
+from typing import Awaitable, Callable, Generator, List, Optional, Tuple
+
+import pandas as pd
+
+from providers.ttl_policy import MarketSession, session_for
+
+logger = logging.getLogger(__name__)
+
+BAR_STORE_PATH_ENV = "BAR_STORE_PATH"
+DEFAULT_MAX_SERIES = 1024
+
+# A split moves every adjusted close before it by the split ratio -- 50% for BIMAS's
+# 100% bonus issue. Anything past half a percent on a bar that was already closed
+# when it was stored is a revision, not rounding.
+REVISION_TOLERANCE = 0.005
+
+_COLUMNS = ("Open", "High", "Low", "Close", "Volume")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS bars (
+    source TEXT NOT NULL,
+    symbol TEXT NOT NULL,
+    interval TEXT NOT NULL,
+    adjust INTEGER NOT NULL,
+    date TEXT NOT NULL,
+    open REAL, high REAL, low REAL, close REAL, volume REAL,
+    PRIMARY KEY (source, symbol, interval, adjust, date)
+);
+CREATE TABLE IF NOT EXISTS coverage (
+    source TEXT NOT NULL,
+    symbol TEXT NOT NULL,
+    interval TEXT NOT NULL,
+    adjust INTEGER NOT NULL,
+    start TEXT NOT NULL,
+    end TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS coverage_key ON coverage (source, symbol, interval, adjust);
+"""
+
+SeriesKey = Tuple[str, str, str, int]
+DateRange = Tuple[date, date]
+
+
+def _merge_ranges(ranges: List[DateRange]) -> List[DateRange]:
+    """Merge overlapping or adjacent inclusive date ranges."""
+    merged: List[DateRange] = []
+    for start, end in sorted(ranges):
+        if merged and start <= merged[-1][1] + timedelta(days=1):
+            merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+        else:
+            merged.append((start, end))
+    return merged
+
+
+def _subtract_ranges(start: date, end: date, covered: List[DateRange]) -> List[DateRange]:
+    """The parts of [start, end] that no covered range touches."""
+    gaps: List[DateRange] = []
+    cursor = start
+    for c_start, c_end in covered:
+        if c_end < cursor:
+            continue
+        if c_start > end:
+            break
+        if c_start > cursor:
+            gaps.append((cursor, c_start - timedelta(days=1)))
+        cursor = max(cursor, c_end + timedelta(days=1))
+        if cursor > end:
+            break
+    if cursor <= end:
+        gaps.append((cursor, end))
+    return gaps
+
+
+def max_series_from_env() -> int:
+    raw = os.getenv("BAR_STORE_MAX_SERIES", "").strip()
+    if not raw:
+        return DEFAULT_MAX_SERIES
+    try:
+        return max(1, int(raw))
+    except ValueError:
+        logger.warning(f"BAR_STORE_MAX_SERIES '{raw}' is not a number; using {DEFAULT_MAX_SERIES}")
+        return DEFAULT_MAX_SERIES
+
+
+def _final_through(session: MarketSession) -> date:
+    """The last day no more bars can arrive for: the last closed session, and after
+    it any day up to today the market does not trade.
+
+    Stopping at the last close left a weekend or a holiday after it uncovered for
+    good, so every read over it refetched Friday's bar and the empty days -- an
+    index scan, once per member per call, all weekend.
+    """
+    final = session.last_closed_date()
+    today = session.today()
+    while final < today and not session.is_trading_day(final + timedelta(days=1)):
+        final += timedelta(days=1)
+    return final
+
+
+class BarStore:
+    """Daily bars plus the date ranges they are known to cover completely."""
+
+    def __init__(self, path: str = ":memory:", max_series: Optional[int] = None):
+        self.path = path
+        self.max_series = max_series or max_series_from_env()
+        # Providers call in from executor threads as well as from the event loop.
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._lock = threading.Lock()
+        with self._lock, self._conn:
+            self._conn.executescript(_SCHEMA)
+            # A file store reopened after a restart: its series count towards the
+            # bound, in no particular order.
+            stored = self._conn.execute(
+                "SELECT DISTINCT source, symbol, interval, adjust FROM coverage"
+            ).fetchall()
+        self._recent: "OrderedDict[SeriesKey, None]" = OrderedDict(
+            (tuple(row), None) for row in stored
+        )
+
+        self.fetches = 0
+        self.bars_fetched = 0
+        self.bars_served = 0
+        self.revisions = 0
+        self.evictions = 0
+
+    @classmethod
+    def from_env(cls) -> "BarStore":
+        path = os.getenv(BAR_STORE_PATH_ENV, "").strip()
+        if not path:
+            return cls()
+        try:
+            directory = os.path.dirname(os.path.abspath(path))
+            os.makedirs(directory, exist_ok=True)
+            return cls(path)
+        except (OSError, sqlite3.Error) as e:
+            # A bad path must not take history down with it.
+            logger.warning(f"Bar store at {path} unavailable ({e}); keeping bars in memory")
+            return cls()
+
+    def _touch(self, key: SeriesKey) -> None:
+        """Mark `key` as just read, and drop the least recently read series past the bound."""
+        with self._lock:
+            self._recent[key] = None
+            self._recent.move_to_end(key)
+            victims = []
+            while len(self._recent) > self.max_series:
+                victims.append(self._recent.popitem(last=False)[0])
+        for victim in victims:
+            self.invalidate(victim)
+            self.evictions += 1
+
+    # --- coverage -------------------------------------------------------------
+
+    def covered_ranges(self, key: SeriesKey) -> List[DateRange]:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT start, end FROM coverage "
+                "WHERE source=? AND symbol=? AND interval=? AND adjust=?",
+                key,
+            ).fetchall()
+        return _merge_ranges(
+            [(date.fromisoformat(s), date.fromisoformat(e)) for s, e in rows]
+        )
+
+    def missing_ranges(self, key: SeriesKey, start: date, end: date) -> List[DateRange]:
+        return _subtract_ranges(start, end, self.covered_ranges(key))
+
+    def _add_coverage(self, key: SeriesKey, start: date, end: date) -> None:
+        merged = _merge_ranges(self.covered_ranges(key) + [(start, end)])
+        with self._lock, self._conn:
+            self._conn.execute(
+                "DELETE FROM coverage WHERE source=? AND symbol=? AND interval=? AND adjust=?",
+                key,
+            )
+            self._conn.executemany(
+                "INSERT INTO coverage VALUES (?, ?, ?, ?, ?, ?)",
+                [(*key, s.isoformat(), e.isoformat()) for s, e in merged],
+            )
+
+    def invalidate(self, key: SeriesKey) -> None:
+        with self._lock, self._conn:
+            for table in ("bars", "coverage"):
+                self._conn.execute(
+                    f"DELETE FROM {table} "
+                    "WHERE source=? AND symbol=? AND interval=? AND adjust=?",
+                    key,
+                )
+
+    # --- bars -----------------------------------------------------------------
+
+    def _write(self, key: SeriesKey, frame: pd.DataFrame) -> None:
+        rows = [
+            (*key, idx.strftime("%Y-%m-%d"),
+             *(None if pd.isna(row[c]) else float(row[c]) for c in _COLUMNS))
+            for idx, row in frame.iterrows()
+        ]
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO bars VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", rows
+            )
+
+    def _read(self, key: SeriesKey, start: date, end: date) -> List[tuple]:
+        with self._lock:
+            return self._conn.execute(
+                "SELECT date, open, high, low, close, volume FROM bars "
+                "WHERE source=? AND symbol=? AND interval=? AND adjust=? "
+                "AND date >= ? AND date <= ? ORDER BY date",
+                (*key, start.isoformat(), end.isoformat()),
+            ).fetchall()
+
+    def _nearest_stored(self, key: SeriesKey, start: date, end: date) -> Optional[date]:
+        """The stored bar closest to [start, end] from outside it, if any."""
+        with self._lock:
+            before = self._conn.execute(
+                "SELECT MAX(date) FROM bars "
+                "WHERE source=? AND symbol=? AND interval=? AND adjust=? AND date < ?",
+                (*key, start.isoformat()),
+            ).fetchone()[0]
+            after = self._conn.execute(
+                "SELECT MIN(date) FROM bars "
+                "WHERE source=? AND symbol=? AND interval=? AND adjust=? AND date > ?",
+                (*key, end.isoformat()),
+            ).fetchone()[0]
+        candidates = []
+        if before:
+            candidates.append(date.fromisoformat(before))
+        if after:
+            candidates.append(date.fromisoformat(after))
+        if not candidates:
+            return None
+        return min(candidates, key=lambda d: min(abs((d - start).days), abs((d - end).days)))
+
+    def _is_revised(self, key: SeriesKey, anchor: date, frame: pd.DataFrame) -> bool:
+        stored = self._read(key, anchor, anchor)
+        if not stored or stored[0][4] is None:
+            return False
+        fetched = frame[[idx.strftime("%Y-%m-%d") == anchor.isoformat() for idx in frame.index]]
+        if fetched.empty or pd.isna(fetched["Close"].iloc[0]):
+            return False
+        old, new = stored[0][4], float(fetched["Close"].iloc[0])
+        return old != 0 and abs(new - old) / abs(old) > REVISION_TOLERANCE
+
+    def _frame(self, rows: List[tuple], tz: str) -> pd.DataFrame:
+        index = pd.DatetimeIndex(
+            pd.to_datetime([r[0] for r in rows]), name="Date"
+        ).tz_localize(tz)
+        return pd.DataFrame([r[1:] for r in rows], index=index, columns=list(_COLUMNS))
+
+    # --- the read-through -----------------------------------------------------
+
+    def history(
+        self,
+        key: SeriesKey,
+        start: date,
+        end: date,
+        fetch: Callable[[date, date], pd.DataFrame],
+        market: str,
+    ) -> pd.DataFrame:
+        """Bars for the inclusive window [start, end], fetching only what is missing.
+
+        `fetch(start, end)` must return the upstream frame for that inclusive window,
+        indexed by date, with Open/High/Low/Close/Volume columns. `market` names the
+        session (see ttl_policy): it decides which bars are final, and its zone is the
+        one the returned index is localized to, so downstream formatting is unchanged.
+        """
+        steps = self._read_through(key, start, end, market)
+        try:
+            window = next(steps)
+            while True:
+                window = steps.send(fetch(*window))
+        except StopIteration as done:
+            return done.value
+
+    async def ahistory(
+        self,
+        key: SeriesKey,
+        start: date,
+        end: date,
+        fetch: Callable[[date, date], Awaitable[pd.DataFrame]],
+        market: str,
+    ) -> pd.DataFrame:
+        """history() for an async `fetch`, so a retrying fetch can back off without
+        holding a thread."""
+        steps = self._read_through(key, start, end, market)
+        try:
+            window = next(steps)
+            while True:
+                window = steps.send(await fetch(*window))
+        except StopIteration as done:
+            return done.value
+
+    def _read_through(
+        self, key: SeriesKey, start: date, end: date, market: str
+    ) -> Generator[DateRange, Optional[pd.DataFrame], pd.DataFrame]:
+        """The read-through itself: yields each window to fetch, is sent its frame."""
+        session = session_for(market)
+        last_final = _final_through(session)
+        self._touch(key)
+
+        for gap_start, gap_end in self.missing_ranges(key, start, end):
+            anchor = self._nearest_stored(key, gap_start, gap_end)
+            fetch_start = min(gap_start, anchor) if anchor else gap_start
+            fetch_end = max(gap_end, anchor) if anchor else gap_end
+
+            frame = yield fetch_start, fetch_end
+            self.fetches += 1
+            if frame is None or frame.empty:
+                continue
+
+            if anchor and self._is_revised(key, anchor, frame):
+                logger.info(
+                    f"Bar store: {key[1]} ({key[0]}) was revised upstream around "
+                    f"{anchor}; refetching {start}..{end}"
+                )
+                self.revisions += 1
+                self.invalidate(key)
+                frame = yield start, end
+                self.fetches += 1
+                if frame is None or frame.empty:
+                    return pd.DataFrame(columns=list(_COLUMNS))
+                self._write(key, frame)
+                self.bars_fetched += len(frame)
+                if start <= last_final:
+                    self._add_coverage(key, start, min(end, last_final))
+                break
+
+            self._write(key, frame)
+            self.bars_fetched += len(frame)
+            if gap_start <= last_final:
+                self._add_coverage(key, gap_start, min(gap_end, last_final))
+
+        rows = self._read(key, start, end)
+        self.bars_served += len(rows)
+        if not rows:
+            return pd.DataFrame(columns=list(_COLUMNS))
+        return self._frame(rows, session.tz)
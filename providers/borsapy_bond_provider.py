@@ -8,6 +8,8 @@ from typing import Dict, Any, Optional, List
 
 import borsapy as bp
 
+from providers.executors import blocking
+
 logger = logging.getLogger(__name__)
 
 
@@ -28,7 +30,8 @@ class BorsapyBondProvider:
         """Initialize bond provider."""
         logger.info("Initialized Borsapy Bond Provider")
 
-    async def get_tahvil_faizleri(self) -> Dict[str, Any]:
+    @blocking("borsapy")
+    def get_tahvil_faizleri(self) -> Dict[str, Any]:
         """
         Fetch current Turkish government bond yields for all maturities.
 
@@ -102,7 +105,8 @@ class BorsapyBondProvider:
                 'kaynak_url': 'borsapy (doviz.com)'
             }
 
-    async def get_10y_tahvil_faizi(self) -> Optional[float]:
+    @blocking("borsapy")
+    def get_10y_tahvil_faizi(self) -> Optional[float]:
         """
         Get current 10-year Turkish government bond yield as decimal.
 
@@ -14,12 +14,13 @@ from typing import List, Dict, Optional
 from datetime import datetime
 
 import borsapy as bp
-import httpx
 from bs4 import BeautifulSoup
 
 from models import (
     EkonomikTakvimSonucu, EkonomikOlay, EkonomikOlayDetayi
 )
+from providers.http_client import shared_http_client
+from providers.executors import run_blocking
 
 logger = logging.getLogger(__name__)
 
@@ -143,10 +144,11 @@ class BorsapyCalendarProvider:
                 "(KHTML, like Gecko) Chrome/137.0.0.0 Safari/537.36"
             )
         }
-        async with httpx.AsyncClient(timeout=20.0, follow_redirects=True) as client:
-            resp = await client.get(DOVIZ_CALENDAR_URL, headers=headers)
-            resp.raise_for_status()
-            html = resp.text
+        resp = await shared_http_client().get(
+            DOVIZ_CALENDAR_URL, headers=headers, timeout=20.0, follow_redirects=True
+        )
+        resp.raise_for_status()
+        html = resp.text
 
         def parse() -> List[Dict]:
             soup = BeautifulSoup(html, "html.parser")
@@ -259,7 +261,9 @@ class BorsapyCalendarProvider:
             for country_code in countries:
                 try:
                     # Get events from borsapy
-                    df = cal.events(
+                    df = await run_blocking(
+                        "borsapy",
+                        cal.events,
                         period=period,
                         country=country_code,
                         importance=importance_filter
@@ -9,7 +9,6 @@ API key (free) is required for time-series data fetching but NOT for catalog
 browsing, search, dashboards, or series metadata. Configure via EVDS_API_KEY
 environment variable; borsapy auto-detects it.
 """
-import asyncio
 import logging
 import os
 from typing import Any, Dict, List, Optional
@@ -17,6 +16,8 @@ from typing import Any, Dict, List, Optional
 import borsapy as bp
 import pandas as pd
 
+from providers.executors import run_blocking
+
 logger = logging.getLogger(__name__)
 
 
@@ -50,9 +51,8 @@ class BorsapyEVDSProvider:
         return self._evds
 
     async def _run_sync(self, fn, *args, **kwargs):
-        """Run a sync borsapy call in a thread executor to avoid blocking the event loop."""
-        loop = asyncio.get_event_loop()
-        return await loop.run_in_executor(None, lambda: fn(*args, **kwargs))
+        """Run a sync borsapy call in the EVDS pool to avoid blocking the event loop."""
+        return await run_blocking("evds", fn, *args, **kwargs)
 
     @staticmethod
     def _df_to_records(df) -> List[Dict[str, Any]]:
@@ -3,7 +3,6 @@ Borsapy FX Provider
 Primary provider for currency, precious metals, and commodity data via borsapy library.
 Includes legacy fallback for assets not available in borsapy (WTI, diesel, gasoline, lpg).
 """
-import asyncio
 import logging
 import httpx
 from typing import Optional
@@ -16,6 +15,7 @@ from models import (
 )
 from .dovizcom_legacy_provider import DovizcomProvider as LegacyProvider
 from .canonical_series import resolve_fx_asset
+from .executors import run_blocking
 
 logger = logging.getLogger(__name__)
 
@@ -119,8 +119,7 @@ class BorsapyFXProvider:
     @staticmethod
     async def _run_sync(fn, *args, **kwargs):
         """Run a blocking borsapy call off the event loop so it doesn't stall the server."""
-        loop = asyncio.get_event_loop()
-        return await loop.run_in_executor(None, lambda: fn(*args, **kwargs))
+        return await run_blocking("borsapy", fn, *args, **kwargs)
 
     async def get_asset_current(self, asset: str) -> DovizcomGuncelSonucu:
         """
@@ -11,8 +11,18 @@ import pandas as pd
 import datetime
 import asyncio
 
+from providers.bar_store import BarStore
+from providers.bulkhead import bounded_gather
+from providers.cache import CacheNamespace, stale_warning
+from providers.executors import blocking, run_blocking, run_compute
+from providers.hedging import hedged
+from providers.indicator_state import IndicatorStore
+from providers.intraday_bars import BORSAPY_TIMEFRAMES, IntradayBarCache
+from providers.retry import call_with_retry
+from providers.negative_cache import WINDOW, classify_miss
+from providers.ttl_policy import DataKind, session_for, ttl_for
 from models import (
-    FinansalVeriNoktasi, YFinancePeriodEnum, SirketProfiliYFinance,
+    YFinancePeriodEnum, SirketProfiliYFinance,
     AnalistFiyatHedefi, TavsiyeOzeti,
     Temettu, HisseBolunmesi, KurumsalAksiyon, HizliBilgi,
     KazancTarihi, KazancTakvimi, KazancBuyumeVerileri
@@ -31,12 +41,22 @@ SUPPORTED_PERIODS = {
 
 DEFAULT_PERIOD = "1mo"
 
+# Statements come from İş Yatırım's MaliTablo endpoint, which takes seconds and now and
+# then times out. An expired table is served while it refetches, up to this age.
+STATEMENTS_MAX_STALE = 24 * 60 * 60
+
 
 class BorsapyProvider:
     """Provider for BIST stock data using borsapy library."""
 
     def __init__(self):
-        pass
+        self._bars = BarStore.from_env()
+        self._indicators = IndicatorStore("borsapy")
+        self._windows = IntradayBarCache("borsapy")
+        self._statements = CacheNamespace(
+            "borsapy.statements", ttl=ttl_for("bist", DataKind.STATEMENTS), max_entries=512,
+            shared=True, persist=True,
+        )
 
     def _get_ticker(self, ticker_kodu: str) -> bp.Ticker:
         """Returns a borsapy Ticker object (no suffix needed for BIST)."""
@@ -95,7 +115,8 @@ class BorsapyProvider:
     # COMPANY INFO METHODS
     # =========================================================================
 
-    async def get_sirket_bilgileri(self, ticker_kodu: str) -> Dict[str, Any]:
+    @blocking("borsapy")
+    def get_sirket_bilgileri(self, ticker_kodu: str) -> Dict[str, Any]:
         """Fetches company profile information from borsapy."""
         try:
             ticker = self._get_ticker(ticker_kodu)
@@ -133,7 +154,8 @@ class BorsapyProvider:
                 return val
         return default
 
-    async def get_hizli_bilgi(self, ticker_kodu: str) -> Dict[str, Any]:
+    @blocking("borsapy")
+    def get_hizli_bilgi(self, ticker_kodu: str) -> Dict[str, Any]:
         """Fetches fast info (quick metrics) from borsapy."""
         try:
             ticker = self._get_ticker(ticker_kodu)
@@ -173,31 +195,84 @@ class BorsapyProvider:
 
     # borsapy reaches BIST over a TradingView websocket that drops roughly half the
     # time with "No data received for BIST:<TICKER>". Nothing retried anywhere, so one
-    # transient failure became a hard error for the caller.
-    _HISTORY_ATTEMPTS = 3
-    _HISTORY_BACKOFF_SECONDS = 0.5
+    # transient failure became a hard error for the caller. The attempts, backoff and
+    # budget are the "borsapy" policy in providers/retry.py; with HEDGED_UPSTREAMS
+    # including borsapy, a slow attempt is also hedged (providers/hedging.py).
 
-    def _history_with_retry(self, ticker, ticker_kodu: str, **kwargs):
+    async def _history_with_retry(self, ticker, ticker_kodu: str, **kwargs):
         """ticker.history(), retried through a flaky websocket.
 
         A persistent failure still raises — this retries a transport drop, it does not
-        paper over a ticker that genuinely has no data.
+        paper over a ticker that genuinely has no data. An unknown symbol is raised at
+        once: retrying it only made a guessed ticker three round trips slower. Each
+        attempt runs in the borsapy pool; the backoff between them holds no thread.
         """
-        import time
+        return await call_with_retry(
+            "borsapy",
+            lambda: hedged("borsapy", lambda: run_blocking("borsapy", ticker.history, **kwargs)),
+            label=f"BIST history for {ticker_kodu}",
+        )
 
-        last_error = None
-        for attempt in range(1, self._HISTORY_ATTEMPTS + 1):
-            try:
-                return ticker.history(**kwargs)
-            except Exception as exc:
-                last_error = exc
-                if attempt < self._HISTORY_ATTEMPTS:
-                    logger.warning(
-                        f"BIST history attempt {attempt}/{self._HISTORY_ATTEMPTS} "
-                        f"failed for {ticker_kodu}: {exc}. Retrying."
-                    )
-                    time.sleep(self._HISTORY_BACKOFF_SECONDS * attempt)
-        raise last_error
+    async def fetch_bars(self, ticker_kodu: str, timeframe: str = "1d") -> pd.DataFrame:
+        """Unadjusted bars at `timeframe` for technical analysis, oldest first.
+
+        The window comes from the bar window cache (providers/intraday_bars.py); when
+        it has expired only its tail is fetched, through the retried, hedged path.
+        """
+        spec = BORSAPY_TIMEFRAMES[timeframe]
+        ticker = self._get_ticker(ticker_kodu)
+
+        async def fetch(period: str) -> pd.DataFrame:
+            return await self._history_with_retry(
+                ticker, ticker_kodu, period=period, interval=spec.interval, adjust=False,
+            )
+
+        return await self._windows.window(
+            (ticker_kodu.upper().strip(), spec.interval), "bist", spec, fetch
+        )
+
+    # An index scan reads this many calendar days of daily bars per member: SMA200
+    # needs 200 sessions, about 290 days with BIST's holidays.
+    INDEX_SCAN_DAYS = 420
+
+    async def fetch_daily_bars(
+        self, tickers: List[str], days: int = INDEX_SCAN_DAYS
+    ) -> Dict[str, Any]:
+        """Unadjusted daily bars of many tickers over the last `days`.
+
+        Each ticker is a read-through of the bar store, so a second scan of the same
+        index fetches only the bars that are not final yet; at most FANOUT_LIMIT
+        tickers are fetched at a time. Returns {"bars": {ticker: frame}, "failed":
+        {ticker: error}}; one member failing does not fail the others.
+        """
+        # The Istanbul day, not the host's: on a UTC host the two differ from 21:00.
+        end = session_for("bist").today()
+        start = end - datetime.timedelta(days=days)
+
+        async def one(ticker_kodu: str) -> pd.DataFrame:
+            ticker = self._get_ticker(ticker_kodu)
+
+            async def fetch(start: datetime.date, end: datetime.date):
+                return await self._history_with_retry(
+                    ticker, ticker_kodu,
+                    start=start.isoformat(), end=end.isoformat(), adjust=False,
+                )
+
+            return await self._bars.ahistory(
+                ("borsapy", ticker_kodu.upper().strip(), "1d", 0), start, end, fetch,
+                market="bist",
+            )
+
+        frames = await bounded_gather((one(t) for t in tickers), return_exceptions=True)
+        bars, failed = {}, {}
+        for ticker_kodu, frame in zip(tickers, frames):
+            if isinstance(frame, BaseException):
+                failed[ticker_kodu] = str(frame) or type(frame).__name__
+            elif frame is None or frame.empty:
+                failed[ticker_kodu] = "no bars"
+            else:
+                bars[ticker_kodu] = frame
+        return {"bars": bars, "failed": failed}
 
     async def get_finansal_veri(
         self,
@@ -209,86 +284,93 @@ class BorsapyProvider:
     ) -> Dict[str, Any]:
         """Fetches historical OHLCV data from borsapy."""
         try:
-            from token_optimizer import TokenOptimizer
-
             ticker = self._get_ticker(ticker_kodu)
 
             # Determine which mode to use: date range or period
-            if start_date or end_date:
-                # Date range mode
-                hist_df = self._history_with_retry(
+            if start_date and end_date:
+                # A closed window: serve what the bar store already holds and fetch
+                # only the gaps. borsapy's `end` is inclusive, as the store's is.
+                async def fetch(start: datetime.date, end: datetime.date):
+                    return await self._history_with_retry(
+                        ticker, ticker_kodu,
+                        start=start.isoformat(), end=end.isoformat(), adjust=adjust,
+                    )
+
+                hist_df = await self._bars.ahistory(
+                    ("borsapy", ticker_kodu.upper().strip(), "1d", int(bool(adjust))),
+                    datetime.date.fromisoformat(start_date),
+                    datetime.date.fromisoformat(end_date),
+                    fetch,
+                    market="bist",
+                )
+                start_dt = datetime.datetime.strptime(start_date, "%Y-%m-%d")
+                end_dt = datetime.datetime.strptime(end_date, "%Y-%m-%d")
+                time_frame_days = (end_dt - start_dt).days
+            elif start_date or end_date:
+                # Open-ended date range: straight to upstream
+                hist_df = await self._history_with_retry(
                     ticker, ticker_kodu,
                     start=start_date, end=end_date, adjust=adjust,
                 )
 
                 # Calculate time frame for optimization
-                if start_date and end_date:
-                    start_dt = datetime.datetime.strptime(start_date, "%Y-%m-%d")
-                    end_dt = datetime.datetime.strptime(end_date, "%Y-%m-%d")
-                    time_frame_days = (end_dt - start_dt).days
-                elif start_date:
+                if start_date:
                     start_dt = datetime.datetime.strptime(start_date, "%Y-%m-%d")
                     time_frame_days = (datetime.datetime.now() - start_dt).days
-                elif end_date:
-                    time_frame_days = 30  # Default assumption
                 else:
-                    time_frame_days = 30
+                    time_frame_days = 30  # Default assumption
             else:
                 # Period mode
                 borsapy_period = self._normalize_period(period)
-                hist_df = self._history_with_retry(
+                hist_df = await self._history_with_retry(
                     ticker, ticker_kodu,
                     period=borsapy_period, adjust=adjust,
                 )
                 time_frame_days = SUPPORTED_PERIODS[borsapy_period]
 
             if hist_df is None or hist_df.empty:
-                return {"error": f"No data found for {ticker_kodu}"}
-
-            # Convert to list of FinansalVeriNoktasi
-            veri_noktalari = []
-            for idx, row in hist_df.iterrows():
-                # Handle index as date
-                if hasattr(idx, 'strftime'):
-                    tarih = idx.strftime('%Y-%m-%d')
-                else:
-                    tarih = str(idx)
-
-                nokta = FinansalVeriNoktasi(
-                    tarih=tarih,
-                    acilis=row.get('Open'),
-                    en_yuksek=row.get('High'),
-                    en_dusuk=row.get('Low'),
-                    kapanis=row.get('Close'),
-                    hacim=row.get('Volume', 0)
-                )
-                veri_noktalari.append(nokta)
-
-            # Apply token optimization for long time frames (static method)
-            optimized_data = TokenOptimizer.optimize_ohlc_data(
-                [{"tarih": v.tarih, "acilis": v.acilis, "en_yuksek": v.en_yuksek,
-                  "en_dusuk": v.en_dusuk, "kapanis": v.kapanis, "hacim": v.hacim}
-                 for v in veri_noktalari],
-                time_frame_days
-            )
-
-            # Format period for response
-            if period:
-                period_str = period.value if hasattr(period, 'value') else str(period)
-            else:
-                period_str = f"{start_date} - {end_date}"
+                return {"error": f"No data found for {ticker_kodu}", "miss": WINDOW}
 
-            return {
-                "ticker_kodu": ticker_kodu,
-                "zaman_araligi": period_str,
-                "data": optimized_data,
-                "toplam_veri": len(optimized_data),
-                "ham_veri_sayisi": len(veri_noktalari),
-                "optimizasyon_uygulandı": len(optimized_data) < len(veri_noktalari)
-            }
+            # The frame is already downloaded: formatting it is no borsapy call.
+            return await run_compute(
+                self._history_payload,
+                ticker_kodu, hist_df, time_frame_days, period, start_date, end_date,
+            )
         except Exception as e:
             logger.exception(f"Error fetching historical data from borsapy for {ticker_kodu}")
-            return {"error": str(e)}
+            return {"error": str(e), "miss": classify_miss(e)}
+
+    def _history_payload(
+        self, ticker_kodu: str, hist_df: pd.DataFrame, time_frame_days: int,
+        period, start_date: Optional[str], end_date: Optional[str],
+    ) -> Dict[str, Any]:
+        """The get_finansal_veri response for a fetched frame."""
+        from token_optimizer import TokenOptimizer
+
+        # Straight from the frame's columns: a FinansalVeriNoktasi and a dict per raw
+        # bar (iterrows) made 5y and max histories pay for rows that were then
+        # folded into a few dozen buckets. Bars are dated by their Istanbul day.
+        days = pd.DatetimeIndex(hist_df.index)
+        if days.tz is not None:
+            days = days.tz_localize(None)
+        optimized_data = TokenOptimizer.optimize_ohlc_frame(
+            hist_df, time_frame_days, dates=days.normalize().to_pydatetime(),
+        )
+
+        # Format period for response
+        if period:
+            period_str = period.value if hasattr(period, 'value') else str(period)
+        else:
+            period_str = f"{start_date} - {end_date}"
+
+        return {
+            "ticker_kodu": ticker_kodu,
+            "zaman_araligi": period_str,
+            "data": optimized_data,
+            "toplam_veri": len(optimized_data),
+            "ham_veri_sayisi": len(hist_df),
+            "optimizasyon_uygulandı": len(optimized_data) < len(hist_df)
+        }
 
     # =========================================================================
     # FINANCIAL STATEMENT METHODS (Fallback for İş Yatırım)
@@ -327,12 +409,34 @@ class BorsapyProvider:
                 logger.debug(f"{ticker_kodu} failed with XI_29, trying UFRS")
                 continue
 
+    async def _get_statement(
+        self, ticker_kodu: str, period_type: str, statement_type: str, last_n: Optional[int]
+    ) -> Dict[str, Any]:
+        """One statement as {"tablo": [...]}, with a warning when served past its TTL."""
+        ticker = ticker_kodu.upper().strip()
+
+        async def load():
+            data = await run_blocking(
+                "isyatirim", self._get_financial_data, ticker, period_type, statement_type, last_n
+            )
+            return self._financial_statement_to_dict_list(data)
+
+        records, age = await self._statements.get_or_revalidate(
+            (ticker, period_type, statement_type, last_n),
+            load,
+            max_stale=STATEMENTS_MAX_STALE,
+            ttl=ttl_for("bist", DataKind.STATEMENTS),
+            cache_if=bool,
+        )
+        result = {"tablo": [dict(row) for row in records]}
+        if age is not None:
+            result["warnings"] = [stale_warning(f"{statement_type} for {ticker}", age)]
+        return result
+
     async def get_bilanco(self, ticker_kodu: str, period_type: str, last_n: Optional[int] = None) -> Dict[str, Any]:
         """Fetches balance sheet from borsapy. Tries XI_29 then UFRS for banks."""
         try:
-            data = self._get_financial_data(ticker_kodu, period_type, 'balance_sheet', last_n)
-            records = self._financial_statement_to_dict_list(data)
-            return {"tablo": records}
+            return await self._get_statement(ticker_kodu, period_type, 'balance_sheet', last_n)
         except Exception as e:
             logger.exception(f"Error fetching balance sheet from borsapy for {ticker_kodu}")
             return {"error": str(e)}
@@ -340,9 +444,7 @@ class BorsapyProvider:
     async def get_kar_zarar(self, ticker_kodu: str, period_type: str, last_n: Optional[int] = None) -> Dict[str, Any]:
         """Fetches income statement from borsapy. Tries XI_29 then UFRS for banks."""
         try:
-            data = self._get_financial_data(ticker_kodu, period_type, 'income_stmt', last_n)
-            records = self._financial_statement_to_dict_list(data)
-            return {"tablo": records}
+            return await self._get_statement(ticker_kodu, period_type, 'income_stmt', last_n)
         except Exception as e:
             logger.exception(f"Error fetching income statement from borsapy for {ticker_kodu}")
             return {"error": str(e)}
@@ -350,9 +452,7 @@ class BorsapyProvider:
     async def get_nakit_akisi(self, ticker_kodu: str, period_type: str, last_n: Optional[int] = None) -> Dict[str, Any]:
         """Fetches cash flow statement from borsapy. Tries XI_29 then UFRS for banks."""
         try:
-            data = self._get_financial_data(ticker_kodu, period_type, 'cashflow', last_n)
-            records = self._financial_statement_to_dict_list(data)
-            return {"tablo": records}
+            return await self._get_statement(ticker_kodu, period_type, 'cashflow', last_n)
         except Exception as e:
             logger.exception(f"Error fetching cash flow from borsapy for {ticker_kodu}")
             return {"error": str(e)}
@@ -361,7 +461,8 @@ class BorsapyProvider:
     # ANALYST DATA METHODS
     # =========================================================================
 
-    async def get_analist_verileri(self, ticker_kodu: str) -> Dict[str, Any]:
+    @blocking("borsapy")
+    def get_analist_verileri(self, ticker_kodu: str) -> Dict[str, Any]:
         """Fetches analyst recommendations and price targets from borsapy."""
         try:
             ticker = self._get_ticker(ticker_kodu)
@@ -412,7 +513,8 @@ class BorsapyProvider:
     # DIVIDEND & CORPORATE ACTIONS METHODS
     # =========================================================================
 
-    async def get_temettu_ve_aksiyonlar(self, ticker_kodu: str) -> Dict[str, Any]:
+    @blocking("borsapy")
+    def get_temettu_ve_aksiyonlar(self, ticker_kodu: str) -> Dict[str, Any]:
         """Fetches dividends and corporate actions from borsapy."""
         try:
             ticker = self._get_ticker(ticker_kodu)
@@ -531,7 +633,8 @@ class BorsapyProvider:
     # EARNINGS CALENDAR METHODS
     # =========================================================================
 
-    async def get_kazanc_takvimi(self, ticker_kodu: str) -> Dict[str, Any]:
+    @blocking("borsapy")
+    def get_kazanc_takvimi(self, ticker_kodu: str) -> Dict[str, Any]:
         """Fetches earnings calendar from borsapy."""
         try:
             ticker = self._get_ticker(ticker_kodu)
@@ -582,57 +685,30 @@ class BorsapyProvider:
     # TECHNICAL ANALYSIS METHODS
     # =========================================================================
 
-    def get_teknik_analiz(self, ticker_kodu: str) -> Dict[str, Any]:
-        """Performs technical analysis using borsapy historical data."""
+    def get_teknik_analiz(
+        self, ticker_kodu: str, hist: Optional[pd.DataFrame] = None, timeframe: str = "1d"
+    ) -> Dict[str, Any]:
+        """Performs technical analysis using borsapy historical data.
+
+        `hist` is the `timeframe` bars when the caller already fetched them through
+        fetch_bars(); without it they are fetched here, unhedged and uncached.
+        """
         try:
-            ticker = self._get_ticker(ticker_kodu)
-            hist = ticker.history(period="6ay", adjust=False)  # 6 months of data
+            if hist is None:
+                spec = BORSAPY_TIMEFRAMES[timeframe]
+                ticker = self._get_ticker(ticker_kodu)
+                hist = ticker.history(period=spec.period, interval=spec.interval, adjust=False)
 
             if hist is None or hist.empty:
                 return {"error": f"No historical data for {ticker_kodu}"}
 
-            # Calculate technical indicators
-            close = hist['Close']
-
-            # Current price
-            current_price = close.iloc[-1] if len(close) > 0 else None
-
-            # Moving averages
-            sma_20 = close.rolling(window=20).mean().iloc[-1] if len(close) >= 20 else None
-            sma_50 = close.rolling(window=50).mean().iloc[-1] if len(close) >= 50 else None
-            sma_200 = close.rolling(window=200).mean().iloc[-1] if len(close) >= 200 else None
-            ema_12 = close.ewm(span=12, adjust=False).mean().iloc[-1] if len(close) >= 12 else None
-            ema_26 = close.ewm(span=26, adjust=False).mean().iloc[-1] if len(close) >= 26 else None
-
-            # RSI (14-period)
-            rsi_14 = None
-            if len(close) >= 15:
-                delta = close.diff()
-                gain = (delta.where(delta > 0, 0)).rolling(window=14).mean()
-                loss = (-delta.where(delta < 0, 0)).rolling(window=14).mean()
-                rs = gain / loss
-                rsi = 100 - (100 / (1 + rs))
-                rsi_14 = rsi.iloc[-1] if not pd.isna(rsi.iloc[-1]) else None
-
-            # MACD
-            macd = None
-            macd_signal = None
-            macd_histogram = None
-            if ema_12 is not None and ema_26 is not None:
-                macd_line = close.ewm(span=12, adjust=False).mean() - close.ewm(span=26, adjust=False).mean()
-                signal_line = macd_line.ewm(span=9, adjust=False).mean()
-                macd = macd_line.iloc[-1]
-                macd_signal = signal_line.iloc[-1]
-                macd_histogram = macd - macd_signal
-
-            # Bollinger Bands (20-period, 2 std dev)
-            bollinger_orta = sma_20
-            bollinger_ust = None
-            bollinger_alt = None
-            if len(close) >= 20:
-                std_20 = close.rolling(window=20).std().iloc[-1]
-                bollinger_ust = sma_20 + (2 * std_20) if sma_20 else None
-                bollinger_alt = sma_20 - (2 * std_20) if sma_20 else None
+            ind = self._indicators.compute(
+                (ticker_kodu, timeframe), hist.index, hist['Close'], hist.get('High'), hist.get('Low')
+            )
+            current_price = ind.close
+            sma_20, sma_50, sma_200 = ind.sma[20], ind.sma[50], ind.sma[200]
+            rsi_14 = ind.rsi_14
+            macd, macd_signal, macd_histogram = ind.macd, ind.macd_signal, ind.macd_histogram
 
             # Trend analysis
             trend = "yatay"
@@ -677,16 +753,16 @@ class BorsapyProvider:
                     "macd": macd,
                     "macd_signal": macd_signal,
                     "macd_histogram": macd_histogram,
-                    "bollinger_ust": bollinger_ust,
-                    "bollinger_orta": bollinger_orta,
-                    "bollinger_alt": bollinger_alt
+                    "bollinger_ust": ind.bollinger_upper,
+                    "bollinger_orta": ind.bollinger_middle,
+                    "bollinger_alt": ind.bollinger_lower
                 },
                 "hareketli_ortalamalar": {
                     "sma_20": sma_20,
                     "sma_50": sma_50,
                     "sma_200": sma_200,
-                    "ema_12": ema_12,
-                    "ema_26": ema_26
+                    "ema_12": ind.ema_12,
+                    "ema_26": ind.ema_26
                 },
                 "trend_analizi": {
                     "kisa_vadeli_trend": trend,
@@ -700,7 +776,8 @@ class BorsapyProvider:
             logger.exception(f"Error performing technical analysis for {ticker_kodu}")
             return {"error": str(e)}
 
-    async def get_pivot_points(self, ticker_kodu: str) -> Dict[str, Any]:
+    @blocking("borsapy")
+    def get_pivot_points(self, ticker_kodu: str) -> Dict[str, Any]:
         """Calculates daily pivot points using borsapy historical data."""
         try:
             ticker = self._get_ticker(ticker_kodu)
@@ -878,7 +955,8 @@ class BorsapyProvider:
     # MULTI-TICKER METHODS
     # =========================================================================
 
-    async def get_hizli_bilgi_multi(self, ticker_kodlari: List[str]) -> Dict[str, Any]:
+    @blocking("borsapy")
+    def get_hizli_bilgi_multi(self, ticker_kodlari: List[str]) -> Dict[str, Any]:
         """Fetches fast info for multiple tickers using bp.Tickers."""
         try:
             if not ticker_kodlari:
@@ -1223,8 +1301,7 @@ class BorsapyProvider:
             limit = min(limit, 250)
 
             # Run screening in executor (borsapy Screener.run() is synchronous)
-            loop = asyncio.get_event_loop()
-            data = await loop.run_in_executor(None, screener.run)
+            data = await run_blocking("borsapy", screener.run)
 
             # Process results
             total_results = len(data) if data is not None and not data.empty else 0
@@ -2,7 +2,6 @@
 BIST Technical Scanner Provider using borsapy TradingView Scanner API.
 Provides technical indicator-based stock scanning for BIST indices.
 """
-import asyncio
 import logging
 import re
 from datetime import datetime
@@ -14,6 +13,8 @@ from models.scanner_models import (
     TaramaPresetInfo,
     TaramaYardimSonucu,
 )
+from providers.http_client import shared_http_client
+from providers.executors import run_blocking
 
 logger = logging.getLogger(__name__)
 
@@ -284,6 +285,10 @@ class BorsapyScannerProvider:
         """Initialize the scanner provider."""
         self._valid_fields_cache: Optional[Set[str]] = None
 
+    def warm(self) -> int:
+        """Build the valid-field set ahead of the first scan; returns its size."""
+        return len(self._get_all_valid_fields())
+
     def _get_all_valid_fields(self) -> Set[str]:
         """Get flat set of all valid TradingView fields for BIST."""
         if self._valid_fields_cache is not None:
@@ -447,11 +452,7 @@ class BorsapyScannerProvider:
                 )
 
             # Execute scan using borsapy
-            loop = asyncio.get_event_loop()
-            df = await loop.run_in_executor(
-                None,
-                lambda: bp.scan(index_upper, condition, interval=interval)
-            )
+            df = await run_blocking("borsapy", bp.scan, index_upper, condition, interval=interval)
 
             # Convert DataFrame to list of TaramaSonucu
             results = []
@@ -677,7 +678,6 @@ Ornekler:
         - eps_diluted_ttm: Diluted EPS (TTM)
         - eps_forecast_next_fq: EPS forecast for next quarter
         """
-        import httpx
         from datetime import datetime as dt
 
         try:
@@ -704,10 +704,11 @@ Ornekler:
                 "range": [0, 1]
             }
 
-            async with httpx.AsyncClient(timeout=10.0) as client:
-                response = await client.post(url, json=payload, headers=headers)
-                response.raise_for_status()
-                data = response.json()
+            response = await shared_http_client().post(
+                url, json=payload, headers=headers, timeout=10.0
+            )
+            response.raise_for_status()
+            data = response.json()
 
             if not data.get("data"):
                 logger.warning(f"No earnings data from TradingView for {symbol}")
@@ -17,6 +17,8 @@ from models import (
     KriptoHareketliOrtalama, KriptoTeknikIndiktorler, KriptoHacimAnalizi,
     KriptoFiyatAnalizi, KriptoTrendAnalizi
 )
+from providers.cache import CacheNamespace
+from providers.indicator_state import IndicatorStore
 
 logger = logging.getLogger(__name__)
 
@@ -27,8 +29,10 @@ class BtcTurkProvider:
     
     def __init__(self, client: httpx.AsyncClient):
         self._http_client = client
-        self._exchange_info_cache: Optional[Dict] = None
-        self._last_exchange_info_fetch: float = 0
+        self._exchange_info_cache = CacheNamespace(
+            "btcturk.exchange_info", ttl=self.CACHE_DURATION, max_entries=1
+        )
+        self._indicators = IndicatorStore("btcturk")
     
     def _convert_resolution_to_minutes(self, resolution: str) -> int:
         """Convert resolution string to minutes for Graph API."""
@@ -145,15 +149,9 @@ class BtcTurkProvider:
         Get detailed information about all trading pairs and currencies on BtcTurk.
         """
         try:
-            # Check cache
-            current_time = time.time()
-            if (self._exchange_info_cache and 
-                (current_time - self._last_exchange_info_fetch) < self.CACHE_DURATION):
-                data = self._exchange_info_cache
-            else:
-                data = await self._make_request("/server/exchangeInfo")
-                self._exchange_info_cache = data
-                self._last_exchange_info_fetch = current_time
+            data = await self._exchange_info_cache.get_or_load(
+                "all", lambda: self._make_request("/server/exchangeInfo")
+            )
             
             # Parse trading pairs
             trading_pairs = []
@@ -749,89 +747,41 @@ class BtcTurkProvider:
                 dusuk_200period_uzaklik=float((current_price - low_200period) / low_200period * 100)
             )
             
-            # Moving Averages
-            sma_5 = df['close'].rolling(window=5).mean().iloc[-1] if len(df) >= 5 else None
-            sma_10 = df['close'].rolling(window=10).mean().iloc[-1] if len(df) >= 10 else None
-            sma_20 = df['close'].rolling(window=20).mean().iloc[-1] if len(df) >= 20 else None
-            sma_50 = df['close'].rolling(window=50).mean().iloc[-1] if len(df) >= 50 else None
-            sma_200 = df['close'].rolling(window=200).mean().iloc[-1] if len(df) >= 200 else None
-            
-            # Exponential Moving Averages
-            ema_12 = df['close'].ewm(span=12).mean().iloc[-1] if len(df) >= 12 else None
-            ema_26 = df['close'].ewm(span=26).mean().iloc[-1] if len(df) >= 26 else None
-            
+            ind = self._indicators.compute(
+                (symbol_upper, resolution), df['timestamp'],
+                df['close'], df['high'], df['low'], df['volume'],
+            )
+            sma_5, sma_10, sma_20, sma_50, sma_200 = (
+                ind.sma[5], ind.sma[10], ind.sma[20], ind.sma[50], ind.sma[200]
+            )
+            rsi_14, macd, macd_signal = ind.rsi_14, ind.macd, ind.macd_signal
+
             result.hareketli_ortalamalar = KriptoHareketliOrtalama(
-                sma_5=float(sma_5) if sma_5 is not None and not pd.isna(sma_5) else None,
-                sma_10=float(sma_10) if sma_10 is not None and not pd.isna(sma_10) else None,
-                sma_20=float(sma_20) if sma_20 is not None and not pd.isna(sma_20) else None,
-                sma_50=float(sma_50) if sma_50 is not None and not pd.isna(sma_50) else None,
-                sma_200=float(sma_200) if sma_200 is not None and not pd.isna(sma_200) else None,
-                ema_12=float(ema_12) if ema_12 is not None and not pd.isna(ema_12) else None,
-                ema_26=float(ema_26) if ema_26 is not None and not pd.isna(ema_26) else None
+                sma_5=sma_5,
+                sma_10=sma_10,
+                sma_20=sma_20,
+                sma_50=sma_50,
+                sma_200=sma_200,
+                ema_12=ind.ema_12,
+                ema_26=ind.ema_26
             )
-            
-            # Technical Indicators
-            
-            # RSI calculation
-            rsi_14 = None
-            if len(df) >= 14:
-                delta = df['close'].diff()
-                gain = (delta.where(delta > 0, 0)).rolling(window=14).mean()
-                loss = (-delta.where(delta < 0, 0)).rolling(window=14).mean()
-                rs = gain / loss
-                rsi = 100 - (100 / (1 + rs))
-                rsi_14 = rsi.iloc[-1]
-            
-            # MACD calculation
-            macd = None
-            macd_signal = None
-            macd_histogram = None
-            if ema_12 is not None and ema_26 is not None:
-                macd = ema_12 - ema_26
-                # Calculate MACD signal line (9-period EMA of MACD)
-                macd_series = df['close'].ewm(span=12).mean() - df['close'].ewm(span=26).mean()
-                macd_signal_series = macd_series.ewm(span=9).mean()
-                macd_signal = macd_signal_series.iloc[-1] if not pd.isna(macd_signal_series.iloc[-1]) else None
-                macd_histogram = float(macd - macd_signal) if macd_signal is not None else None
-                macd = float(macd)
-                macd_signal = float(macd_signal) if macd_signal is not None else None
-            
-            # Bollinger Bands
-            bollinger_upper = None
-            bollinger_middle = None
-            bollinger_lower = None
-            if sma_20 is not None and len(df) >= 20:
-                std_20 = df['close'].rolling(window=20).std().iloc[-1]
-                bollinger_middle = sma_20
-                bollinger_upper = sma_20 + (2 * std_20)
-                bollinger_lower = sma_20 - (2 * std_20)
-            
-            # Stochastic Oscillator
-            stochastic_k = None
-            stochastic_d = None
-            if len(df) >= 14:
-                low_14 = df['low'].rolling(window=14).min()
-                high_14 = df['high'].rolling(window=14).max()
-                k_percent = 100 * ((df['close'] - low_14) / (high_14 - low_14))
-                stochastic_k = k_percent.iloc[-1] if not pd.isna(k_percent.iloc[-1]) else None
-                stochastic_d = k_percent.rolling(window=3).mean().iloc[-1] if len(k_percent) >= 3 else None
-            
+
             result.teknik_indiktorler = KriptoTeknikIndiktorler(
-                rsi_14=float(rsi_14) if rsi_14 is not None and not pd.isna(rsi_14) else None,
+                rsi_14=rsi_14,
                 macd=macd,
                 macd_signal=macd_signal,
-                macd_histogram=macd_histogram,
-                bollinger_upper=float(bollinger_upper) if bollinger_upper is not None and not pd.isna(bollinger_upper) else None,
-                bollinger_middle=float(bollinger_middle) if bollinger_middle is not None and not pd.isna(bollinger_middle) else None,
-                bollinger_lower=float(bollinger_lower) if bollinger_lower is not None and not pd.isna(bollinger_lower) else None,
-                stochastic_k=float(stochastic_k) if stochastic_k is not None and not pd.isna(stochastic_k) else None,
-                stochastic_d=float(stochastic_d) if stochastic_d is not None and not pd.isna(stochastic_d) else None
+                macd_histogram=ind.macd_histogram,
+                bollinger_upper=ind.bollinger_upper,
+                bollinger_middle=ind.bollinger_middle,
+                bollinger_lower=ind.bollinger_lower,
+                stochastic_k=ind.stochastic_k,
+                stochastic_d=ind.stochastic_d
             )
-            
+
             # Volume Analysis
             current_volume = float(df['volume'].iloc[-1])
-            avg_volume_10 = float(df['volume'].rolling(window=10).mean().iloc[-1]) if len(df) >= 10 else None
-            avg_volume_30 = float(df['volume'].rolling(window=30).mean().iloc[-1]) if len(df) >= 30 else None
+            avg_volume_10 = ind.volume_avg[10]
+            avg_volume_30 = ind.volume_avg[30]
             volume_ratio = current_volume / avg_volume_10 if avg_volume_10 and avg_volume_10 > 0 else None
             
             volume_trend = "normal"
@@ -16,6 +16,8 @@ All calculations use dynamic parameters from:
 import logging
 from typing import Dict, Any, List, Optional
 
+from providers.executors import run_blocking
+
 logger = logging.getLogger(__name__)
 
 class BuffettAnalyzerProvider:
@@ -199,7 +201,7 @@ class BuffettAnalyzerProvider:
                         try:
                             import yfinance as yf
                             tnx = yf.Ticker("^TNX")
-                            hist = tnx.history(period="1d")
+                            hist = await run_blocking("yahoo", tnx.history, period="1d")
                             if not hist.empty:
                                 # ^TNX returns yield as percentage (e.g., 4.5 means 4.5%)
                                 nominal_rate = hist['Close'].iloc[-1] / 100
@@ -0,0 +1,265 @@
+"""
+Bulkheads: a concurrency limit and a bounded queue per upstream.
+
+The only concurrency control we had was an `asyncio.Semaphore(8)` inside the
+screen_funds tool. Every other fan-out -- `_fan_out_multi`, `get_fx_data`, the
+`_bist_sector_peers` gather over eleven sector indices -- started all of its calls at
+once, and nothing limited how many calls one upstream had in flight across requests.
+A 50-symbol multi-ticker request put 50 concurrent requests on TradingView; a burst of
+fund screens tripped TEFAS's rate limit and then every other TEFAS tool call failed
+with it; a stalled Yahoo held as many connections as callers kept arriving.
+
+Each upstream now has a Bulkhead: at most `max_concurrent` calls run, up to
+`max_queue` more wait their turn in FIFO order, and anything beyond that is refused
+at once with BulkheadFullError rather than queued behind a backlog it cannot clear.
+Wait time, queue depth and rejections are counted per upstream (`bulkhead_stats()`,
+on /health).
+
+Every provider call goes through one:
+
+- `run_blocking(upstream, ...)` (providers/executors.py) takes the upstream's
+  bulkhead before it hands the call to the thread pool -- borsapy/TradingView, TEFAS,
+  Yahoo, EVDS, and İş Yatırım's statements;
+- the shared httpx clients (providers/http_client.py), built on UpstreamTransport
+  (providers/upstream_http.py), take the bulkhead of the request's host
+  (`upstream_for_host`): KAP, Mynet, BtcTurk, Coinbase, doviz.com, TCMB, İş
+  Yatırım, Takasbank, FRED and the scanner's TradingView calls.
+
+A slot is held for as long as the upstream is actually busy with the call. The
+pooled paths used to release it in `async with` when the awaiting coroutine ended --
+and a deadline's wait_for ends it while the pool thread is still running the request.
+After a few deadline hits the bulkhead no longer bounded the threads at work, and new
+calls queued without bound in the executor behind them. `release_when_done` ties the
+slot to the executor's future instead.
+
+The bulkheads bound an upstream across all requests; `bounded_gather` bounds one
+request's fan-out, so a single 100-symbol call neither fills an upstream's queue by
+itself nor gets half its symbols refused.
+
+Limits, per upstream, without a deploy (concurrency, optionally /queue):
+
+    BULKHEADS="tefas=4/32,yahoo=12"
+"""
+import asyncio
+import logging
+import os
+import time
+from collections import deque
+from concurrent.futures import Future
+from typing import Any, Awaitable, Dict, Iterable, List, Tuple
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_LIMITS: Tuple[int, int] = (8, 64)
+
+# (max_concurrent, max_queue). The pooled upstreams match their UPSTREAM_WORKERS so a
+# call that gets a slot also gets a thread; the HTTP ones are sized to what each site
+# tolerates from one IP before it starts answering 429 or timing out.
+UPSTREAM_LIMITS: Dict[str, Tuple[int, int]] = {
+    "borsapy": (16, 256),
+    "yahoo": (8, 128),
+    "tefas": (6, 256),
+    "isyatirim": (4, 64),
+    "evds": (4, 32),
+    "kap": (4, 64),
+    "mynet": (4, 64),
+    "btcturk": (8, 64),
+    "coinbase": (8, 64),
+    "dovizcom": (8, 64),
+    "tcmb": (4, 32),
+    "fred": (2, 16),
+}
+
+# Registrable domain -> upstream. Hosts not listed share the "other" bulkhead.
+UPSTREAM_HOSTS: Dict[str, str] = {
+    "evds2.tcmb.gov.tr": "evds",
+    "evds3.tcmb.gov.tr": "evds",
+    "tcmb.gov.tr": "tcmb",
+    "kap.org.tr": "kap",
+    "mynet.com": "mynet",
+    "btcturk.com": "btcturk",
+    "coinbase.com": "coinbase",
+    "isyatirim.com.tr": "isyatirim",
+    "tefas.gov.tr": "tefas",
+    "takasbank.com.tr": "tefas",
+    "doviz.com": "dovizcom",
+    "canlidoviz.com": "dovizcom",
+    "tradingview.com": "borsapy",
+    "stlouisfed.org": "fred",
+    "yahoo.com": "yahoo",
+}
+
+# Per-call cap for one request's fan-out.
+FANOUT_LIMIT = 8
+
+
+class BulkheadFullError(RuntimeError):
+    """An upstream's bulkhead has every slot busy and its queue full."""
+
+
+def _configured_limits() -> Dict[str, Tuple[int, int]]:
+    limits = dict(UPSTREAM_LIMITS)
+    for item in os.getenv("BULKHEADS", "").split(","):
+        name, _, raw = item.partition("=")
+        name = name.strip()
+        if not name:
+            continue
+        concurrency, _, queue = raw.partition("/")
+        try:
+            default_queue = limits.get(name, DEFAULT_LIMITS)[1]
+            limits[name] = (
+                max(1, int(concurrency)),
+                max(0, int(queue)) if queue.strip() else default_queue,
+            )
+        except ValueError:
+            logger.warning(f"BULKHEADS: ignoring '{item.strip()}'")
+    return limits
+
+
+def upstream_for_host(host: str) -> str:
+    """The upstream a hostname belongs to, by its longest matching domain suffix."""
+    host = (host or "").lower().rstrip(".")
+    while host:
+        upstream = UPSTREAM_HOSTS.get(host)
+        if upstream:
+            return upstream
+        _, _, host = host.partition(".")
+    return "other"
+
+
+class Bulkhead:
+    """At most `max_concurrent` calls in flight, `max_queue` waiting, the rest refused.
+
+    Not tied to an event loop the way asyncio.Semaphore is: the registry outlives the
+    loops the test suite creates and closes, as BorsaApiClient's client does.
+    """
+
+    def __init__(self, name: str, max_concurrent: int, max_queue: int):
+        self.name = name
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self._waiters: deque = deque()
+
+        self.active = 0
+        self.max_active = 0
+        self.max_queued = 0
+        self.acquired = 0
+        self.rejected = 0
+        self.cancelled = 0
+        self._wait_total = 0.0
+        self.max_wait = 0.0
+
+    @property
+    def queued(self) -> int:
+        return len(self._waiters)
+
+    async def acquire(self) -> None:
+        started = time.monotonic()
+        if self.active < self.max_concurrent and not self._waiters:
+            self.active += 1
+        elif len(self._waiters) >= self.max_queue:
+            self.rejected += 1
+            raise BulkheadFullError(
+                f"Upstream '{self.name}' is saturated (bulkhead full: {self.active} calls "
+                f"in flight, {len(self._waiters)} queued)"
+            )
+        else:
+            waiter = asyncio.get_running_loop().create_future()
+            self._waiters.append(waiter)
+            self.max_queued = max(self.max_queued, len(self._waiters))
+            try:
+                # release() hands its slot straight to us: `active` is not decremented.
+                await waiter
+            except asyncio.CancelledError:
+                if waiter in self._waiters:
+                    self._waiters.remove(waiter)
+                elif waiter.done() and not waiter.cancelled():
+                    self.release()    # handed a slot just as we gave up: pass it on
+                self.cancelled += 1
+                raise
+        waited = time.monotonic() - started
+        self.acquired += 1
+        self.max_active = max(self.max_active, self.active)
+        self._wait_total += waited
+        self.max_wait = max(self.max_wait, waited)
+
+    def release(self) -> None:
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if waiter.done():
+                continue
+            try:
+                waiter.set_result(None)
+                return
+            except RuntimeError:
+                continue    # its loop is gone
+        self.active -= 1
+
+    def release_when_done(self, future: Future) -> None:
+        """Release the slot once `future` -- a pool's, maybe still running -- is done.
+
+        Called on the loop that acquired the slot; the release is handed back to it
+        from whichever thread finishes the future.
+        """
+        loop = asyncio.get_running_loop()
+
+        def done(_: Future) -> None:
+            try:
+                loop.call_soon_threadsafe(self.release)
+            except RuntimeError:
+                self.release()    # its loop is gone: nobody is waiting on it
+
+        future.add_done_callback(done)
+
+    async def __aenter__(self) -> "Bulkhead":
+        await self.acquire()
+        return self
+
+    async def __aexit__(self, *exc) -> None:
+        self.release()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "max_concurrent": self.max_concurrent,
+            "max_queue": self.max_queue,
+            "active": self.active,
+            "queued": self.queued,
+            "max_active": self.max_active,
+            "max_queued": self.max_queued,
+            "acquired": self.acquired,
+            "rejected": self.rejected,
+            "cancelled": self.cancelled,
+            "avg_wait_ms": round(1000 * self._wait_total / self.acquired, 1) if self.acquired else None,
+            "max_wait_ms": round(1000 * self.max_wait, 1),
+        }
+
+
+_bulkheads: Dict[str, Bulkhead] = {}
+
+
+def bulkhead(name: str) -> Bulkhead:
+    """The bulkhead for `name`, created on first use."""
+    limiter = _bulkheads.get(name)
+    if limiter is None:
+        max_concurrent, max_queue = _configured_limits().get(name, DEFAULT_LIMITS)
+        limiter = _bulkheads[name] = Bulkhead(name, max_concurrent, max_queue)
+    return limiter
+
+
+def bulkhead_stats() -> Dict[str, Dict[str, Any]]:
+    return {name: limiter.stats() for name, limiter in sorted(_bulkheads.items())}
+
+
+async def bounded_gather(
+    aws: Iterable[Awaitable[Any]],
+    limit: int = FANOUT_LIMIT,
+    return_exceptions: bool = False,
+) -> List[Any]:
+    """asyncio.gather with at most `limit` of the awaitables running at once."""
+    gate = asyncio.Semaphore(limit)
+
+    async def gated(aw: Awaitable[Any]) -> Any:
+        async with gate:
+            return await aw
+
+    return await asyncio.gather(*(gated(aw) for aw in aws), return_exceptions=return_exceptions)
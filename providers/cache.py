@@ -0,0 +1,417 @@
+"""
+One cache layer for every provider.
+
+Each provider used to roll its own: an unbounded dict of (data, timestamp) pairs in
+IsYatirimProvider, a bare attribute plus a fetch time in KAP, TEFAS, BtcTurk and
+Coinbase, and a sector-membership map in MarketRouter that never expired at all. None
+of them bounded memory, and only FredCpiProvider coalesced concurrent misses -- so a
+cold key under load sent N identical requests upstream, and every distinct key stayed
+resident for the life of the process.
+
+A CacheNamespace is a bounded LRU with its own TTL, single-flight loading and
+hit/miss/eviction counters. Each provider instance owns its namespaces rather than
+sharing one process-wide store: the test suite builds providers over mocked clients,
+and a shared store would serve one test's data to the next. Every namespace registers
+itself by name, so `cache_stats()` still reports the whole process in one place.
+
+For the slow upstreams -- İş Yatırım statements, TEFAS fund info, the KAP company
+Excel -- `get_or_revalidate` serves an expired entry at once and refreshes it in the
+background, so the caller who happens to arrive after the TTL no longer pays for a
+multi-second refetch. `max_stale` bounds how old a value may be and still be served.
+
+Namespaces created with `shared=True` also read and write a shared backend -- Redis
+across replicas, see providers/cache_backend.py -- on a local miss, once one has been
+installed with `set_shared_backend`. Without one they behave exactly as before.
+Namespaces created with `persist=True` hold reference data worth keeping across a
+restart; providers/cache_snapshot.py writes them to disk at shutdown and reads them
+back at boot.
+
+The LRU itself is guarded by a lock. The namespaces were only ever touched from the
+event loop until the indicator states (providers/indicator_state.py), which are read
+and written from the providers' pool threads; an OrderedDict reordered from two
+threads at once -- or dumped by the snapshot while a thread moves an entry -- can
+lose entries or fail mid-iteration.
+"""
+import asyncio
+import logging
+import threading
+import time
+import weakref
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Dict, Hashable, List, Optional, Tuple
+
+from providers.deadline import no_deadline, within_deadline
+
+logger = logging.getLogger(__name__)
+
+_MISSING = object()
+
+DEFAULT_MAX_ENTRIES = 256
+
+
+@dataclass
+class CacheEntry:
+    value: Any
+    stored_at: float
+    expires_at: float
+
+    def is_fresh(self, now: float) -> bool:
+        return now < self.expires_at
+
+
+class CacheNamespace:
+    """A bounded, TTL'd LRU with single-flight loading.
+
+    Expired entries are not dropped on read. `get` treats them as misses, but they
+    stay resident until overwritten or evicted, so `get_stale` can still hand back
+    the last good value when a refresh fails -- the KAP company list has always
+    degraded that way, and an empty list would tell the caller BIST has no companies.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        ttl: float,
+        max_entries: int = DEFAULT_MAX_ENTRIES,
+        shared: bool = False,
+        persist: bool = False,
+    ):
+        if max_entries < 1:
+            raise ValueError(f"max_entries must be at least 1, got {max_entries}")
+        self.name = name
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.shared = shared
+        self.persist = persist
+        self._entries: "OrderedDict[Hashable, CacheEntry]" = OrderedDict()
+        self._lock = threading.RLock()
+        self._inflight: Dict[Hashable, asyncio.Future] = {}
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.loads = 0
+        self.load_errors = 0
+        self.coalesced = 0
+        self.stale_served = 0
+        self.refreshes = 0
+        self.shared_hits = 0
+        self.restored = 0
+
+        # One background refresh per key. Also the strong reference the task needs:
+        # the loop only keeps weak ones.
+        self._refreshing: Dict[Hashable, asyncio.Task] = {}
+
+        _register(self)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, key: Hashable) -> bool:
+        with self._lock:
+            entry = self._entries.get(key)
+        return entry is not None and entry.is_fresh(time.time())
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """The fresh value for `key`, or `default`. Counts a hit or a miss."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or not entry.is_fresh(time.time()):
+                self.misses += 1
+                return default
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry.value
+
+    def get_stale(self, key: Hashable, default: Any = None) -> Any:
+        """The last stored value for `key`, fresh or not. Does not touch counters."""
+        with self._lock:
+            entry = self._entries.get(key)
+        return default if entry is None else entry.value
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None) -> CacheEntry:
+        now = time.time()
+        entry = CacheEntry(
+            value=value,
+            stored_at=now,
+            expires_at=now + (self.ttl if ttl is None else ttl),
+        )
+        self._put(key, entry)
+        return entry
+
+    def _put(self, key: Hashable, entry: CacheEntry) -> None:
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                evicted, _ = self._entries.popitem(last=False)
+                self.evictions += 1
+                logger.debug(f"Cache {self.name}: evicted {evicted!r}")
+
+    def invalidate(self, key: Any = _MISSING) -> None:
+        """Drop one key, or every key when called without one."""
+        with self._lock:
+            if key is _MISSING:
+                self._entries.clear()
+            else:
+                self._entries.pop(key, None)
+
+    def dump(self) -> List[Tuple[Hashable, CacheEntry]]:
+        """Every entry, expired ones included, least recently used first."""
+        with self._lock:
+            return list(self._entries.items())
+
+    def restore(self, entries: List[Tuple[Hashable, CacheEntry]], max_age: float) -> int:
+        """Put back dumped entries with their original timestamps.
+
+        An entry that expired more than `max_age` seconds ago is dropped; a younger
+        expired one is kept for `get_stale` and `get_or_revalidate`, just as it would
+        have been had the process never restarted. An entry already loaded since boot
+        is newer than the snapshot and wins.
+        """
+        now = time.time()
+        with self._lock:
+            kept = [
+                (key, entry) for key, entry in entries
+                if key not in self._entries and now - entry.expires_at <= max_age
+            ]
+            # Older than anything loaded since boot, so first in line for eviction.
+            merged: "OrderedDict[Hashable, CacheEntry]" = OrderedDict(kept)
+            merged.update(self._entries)
+            while len(merged) > self.max_entries:
+                merged.popitem(last=False)
+            self._entries = merged
+        restored = sum(1 for key, _ in kept if key in merged)
+        self.restored += restored
+        return restored
+
+    async def get_or_load(
+        self,
+        key: Hashable,
+        loader: Callable[[], Awaitable[Any]],
+        ttl: Optional[float] = None,
+        cache_if: Optional[Callable[[Any], bool]] = None,
+    ) -> Any:
+        """Return the cached value, or run `loader` once for every concurrent caller.
+
+        `cache_if` decides whether a loaded value is worth keeping; by default anything
+        but None is. Providers that report failure as a value -- `{"error": ...}` --
+        pass a predicate so a failure is never served back as data for the whole TTL.
+        A loader that raises caches nothing, and every waiter sees the exception.
+
+        A shared namespace asks the shared backend before running `loader`, and keeps
+        the entry's original timestamps, so a value another replica loaded an hour ago
+        expires here when it expires there.
+
+        The load ran under the deadline of whichever caller started it: a waiter with
+        30 seconds left got the 0.1-second leader's DeadlineExceededError. It now runs
+        with no deadline, and each caller -- leader included -- stops waiting when its
+        own deadline passes, leaving the load to finish for the rest and the cache.
+        """
+        while True:
+            value = self.get(key, _MISSING)
+            if value is not _MISSING:
+                return value
+
+            loop = asyncio.get_running_loop()
+            pending = self._inflight.get(key)
+            if pending is None or pending.done() or pending.get_loop() is not loop:
+                break
+
+            self.coalesced += 1
+            try:
+                return await within_deadline(asyncio.shield(pending), f"{self.name} load")
+            except asyncio.CancelledError:
+                # The load was cancelled, not us: go round and lead a new one.
+                task = asyncio.current_task()
+                if pending.cancelled() and not (task and task.cancelling()):
+                    continue
+                raise
+
+        # The load is everyone's, not the first caller's: it runs as its own task with
+        # no deadline, and each caller waits on it only as long as its own allows.
+        with no_deadline():
+            load = loop.create_task(self._load(key, loader, ttl, cache_if))
+        load.add_done_callback(_retrieve)
+        self._inflight[key] = load
+        return await within_deadline(asyncio.shield(load), f"{self.name} load")
+
+    async def _load(self, key, loader, ttl, cache_if) -> Any:
+        try:
+            entry = await self._shared_load(key)
+            if entry is not None:
+                self.shared_hits += 1
+                self._put(key, entry)
+                return entry.value
+            self.loads += 1
+            value = await loader()
+        except asyncio.CancelledError:
+            raise
+        except BaseException:
+            self.load_errors += 1
+            raise
+        finally:
+            if self._inflight.get(key) is asyncio.current_task():
+                del self._inflight[key]
+        keep = cache_if(value) if cache_if is not None else value is not None
+        entry = self.set(key, value, ttl) if keep else None
+        if entry is not None:
+            await self._shared_store(key, entry)
+        return value
+
+    async def get_or_revalidate(
+        self,
+        key: Hashable,
+        loader: Callable[[], Awaitable[Any]],
+        max_stale: float,
+        ttl: Optional[float] = None,
+        cache_if: Optional[Callable[[Any], bool]] = None,
+    ) -> Tuple[Any, Optional[float]]:
+        """Like `get_or_load`, but an expired entry is served while it reloads.
+
+        Returns `(value, age)`. `age` is None for a fresh or just-loaded value, and the
+        seconds since the value was stored when an expired one is served; the caller
+        turns that into a warning, so nobody mistakes yesterday's NAV for today's. The
+        refresh runs as a background task through the single-flight path, so a burst of
+        callers on one expired key starts one refetch. An entry that expired more than
+        `max_stale` seconds ago is not served at all: the caller waits for the load, as
+        on a plain miss. A failed refresh keeps nothing and the stale value stays
+        servable until that bound.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            now = time.time()
+            serve = (
+                entry is not None and not entry.is_fresh(now)
+                and now - entry.expires_at <= max_stale
+            )
+            if serve:
+                self._entries.move_to_end(key)
+        if serve:
+            self.stale_served += 1
+            self._refresh(key, loader, ttl, cache_if)
+            return entry.value, now - entry.stored_at
+        return await self.get_or_load(key, loader, ttl=ttl, cache_if=cache_if), None
+
+    def _shared_key(self, key: Hashable) -> str:
+        return f"ns:{self.name}:{key!r}"
+
+    async def _shared_load(self, key: Hashable) -> Optional[CacheEntry]:
+        backend = _shared_backend if self.shared else None
+        if backend is None:
+            return None
+        stored = await backend.load(self._shared_key(key))
+        if not isinstance(stored, CacheEntry) or not stored.is_fresh(time.time()):
+            return None
+        return stored
+
+    async def _shared_store(self, key: Hashable, entry: CacheEntry) -> None:
+        backend = _shared_backend if self.shared else None
+        if backend is not None:
+            await backend.store(self._shared_key(key), entry, entry.expires_at - time.time())
+
+    def _refresh(self, key, loader, ttl, cache_if) -> None:
+        busy = self._refreshing.get(key) or self._inflight.get(key)
+        if busy is not None and not busy.done():
+            return
+        self.refreshes += 1
+        # Not bounded by the deadline of the caller that happened to find it stale.
+        with no_deadline():
+            task = asyncio.get_running_loop().create_task(
+                self.get_or_load(key, loader, ttl=ttl, cache_if=cache_if)
+            )
+        self._refreshing[key] = task
+
+        def done(task: asyncio.Task) -> None:
+            if self._refreshing.get(key) is task:
+                del self._refreshing[key]
+            if not task.cancelled() and task.exception() is not None:
+                logger.warning(
+                    f"Cache {self.name}: background refresh of {key!r} failed: "
+                    f"{task.exception()}"
+                )
+
+        task.add_done_callback(done)
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "ttl_seconds": self.ttl,
+            "size": len(self._entries),
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else None,
+            "evictions": self.evictions,
+            "loads": self.loads,
+            "load_errors": self.load_errors,
+            "coalesced": self.coalesced,
+            "stale_served": self.stale_served,
+            "refreshes": self.refreshes,
+            **({"shared_hits": self.shared_hits} if self.shared else {}),
+            **({"restored": self.restored} if self.persist else {}),
+        }
+
+
+# Weak, so a provider that is dropped takes its namespace with it. A later namespace
+# under the same name replaces the earlier one; production builds one of each.
+_namespaces: "weakref.WeakValueDictionary[str, CacheNamespace]" = weakref.WeakValueDictionary()
+
+
+# Called with every namespace as it is created; the cache snapshot uses this to
+# restore providers that are built after boot.
+_register_hooks: List[Callable[[CacheNamespace], None]] = []
+
+
+def _retrieve(load: asyncio.Future) -> None:
+    """Mark a shared load's exception as seen; every caller may have given up on it."""
+    if not load.cancelled():
+        load.exception()
+
+
+def _register(namespace: CacheNamespace) -> None:
+    _namespaces[namespace.name] = namespace
+    for hook in _register_hooks:
+        hook(namespace)
+
+
+def on_register(hook: Callable[[CacheNamespace], None]) -> None:
+    if hook not in _register_hooks:
+        _register_hooks.append(hook)
+
+
+# The second tier every `shared=True` namespace uses; None keeps caching in-process.
+_shared_backend = None
+
+
+def set_shared_backend(backend) -> None:
+    """Install (or, with None, remove) the backend shared namespaces read and write."""
+    global _shared_backend
+    _shared_backend = backend
+
+
+def shared_backend():
+    return _shared_backend
+
+
+def persistent_namespaces() -> List[CacheNamespace]:
+    """The live namespaces created with `persist=True`, by name."""
+    return [ns for _, ns in sorted(_namespaces.items(), key=lambda item: item[0]) if ns.persist]
+
+
+def stale_warning(subject: str, age: float) -> str:
+    """The note that goes with a value `get_or_revalidate` served past its TTL."""
+    if age >= 2 * 60 * 60:
+        held = f"{age / 3600:.0f}h"
+    elif age >= 120:
+        held = f"{age / 60:.0f}min"
+    else:
+        held = f"{age:.0f}s"
+    return f"{subject} is from cache, {held} old; a refresh is in progress."
+
+
+def cache_stats() -> Dict[str, Dict[str, Any]]:
+    """Counters for every live namespace, keyed by name."""
+    live = sorted(_namespaces.items(), key=lambda item: item[0])
+    return {name: namespace.stats() for name, namespace in live}
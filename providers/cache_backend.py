@@ -0,0 +1,366 @@
+"""
+Shared cache backends: one cache behind every worker and every replica.
+
+A CacheNamespace lives in one process. With several uvicorn workers, or several Fly
+machines behind the load balancer, each of them warmed its own copy of the KAP list,
+the İş Yatırım statements and the fund info, and each paid its own upstream round
+trips for them -- an LLM that asked twice, landing on two machines, fetched twice.
+The tool response cache had the same blind spot.
+
+A CacheBackend is a second, shared tier. Namespaces created with `shared=True` look
+there on a local miss before calling their loader, and write what they load back to
+it; ToolResponseCache takes one through BackendStore. The local LRU stays in front,
+so a hit never leaves the process. Three implementations:
+
+- RedisBackend: anything that speaks the Redis protocol (Redis, Valkey, Upstash,
+  KeyDB). `redis` is an optional dependency, imported only when one is configured.
+- InProcessBackend: a plain dict with expiry, for a single process.
+- `fake://`: RedisBackend over fakeredis, for tests and local runs.
+
+The backend is a cache and never a source of truth: a timeout, an outage or a payload
+it cannot decode is logged, counted and treated as a miss. Payloads go through Codec,
+a compact binary format -- pickle protocol 5, zlib above a size threshold, and an
+HMAC-SHA256 signature when CACHE_BACKEND_SECRET is set. The values held here are
+tuples, dates, statement rows and pydantic models, which JSON or msgpack would
+not hand back as the same types; the signature is what makes unpickling something
+read over the network safe. A Redis URL without CACHE_BACKEND_SECRET used to log a
+warning and go on unpickling whatever the server handed back -- anyone who could
+write to that Redis could run code here -- so it is now refused: RedisBackend will
+not connect to a URL without a secret, and backend_from_env caches locally instead.
+
+    CACHE_BACKEND_URL=redis://cache.internal:6379/0   # or memory://, fake://
+    CACHE_BACKEND_SECRET=...                          # shared by every replica
+    CACHE_BACKEND_PREFIX=borsa-mcp:                   # key prefix in Redis
+"""
+import hashlib
+import hmac
+import logging
+import os
+import pickle
+import time
+import zlib
+from datetime import datetime, timezone
+from typing import Any, Dict, Optional, Tuple
+
+from key_value.aio.stores.base import BaseStore
+from key_value.shared.utils.managed_entry import ManagedEntry
+
+logger = logging.getLogger(__name__)
+
+MISSING = object()
+
+DEFAULT_PREFIX = "borsa-mcp:"
+DEFAULT_TIMEOUT = 0.5
+
+
+class CodecError(ValueError):
+    """A payload that is not ours, is from another codec version, or fails its signature."""
+
+
+class Codec:
+    """pickle + zlib + optional HMAC, behind a four-byte header.
+
+    Layout: b"BM", version, flags, then the 32-byte signature if FLAG_SIGNED, then the
+    body. The version lets a deploy change the format without reading the old one as
+    garbage: a mismatch is a miss, and the entry is simply loaded again.
+    """
+
+    MAGIC = b"BM"
+    VERSION = 1
+    FLAG_ZLIB = 0x01
+    FLAG_SIGNED = 0x02
+    DIGEST_SIZE = 32
+
+    def __init__(
+        self,
+        secret: Optional[bytes] = None,
+        compress_above: int = 1024,
+        level: int = 6,
+    ):
+        self.secret = secret.encode() if isinstance(secret, str) else secret
+        self.compress_above = compress_above
+        self.level = level
+
+    def encode(self, value: Any) -> bytes:
+        body = pickle.dumps(value, protocol=5)
+        flags = 0
+        if len(body) > self.compress_above:
+            packed = zlib.compress(body, self.level)
+            if len(packed) < len(body):
+                body, flags = packed, flags | self.FLAG_ZLIB
+        signature = b""
+        if self.secret:
+            flags |= self.FLAG_SIGNED
+            signature = hmac.new(self.secret, body, hashlib.sha256).digest()
+        return self.MAGIC + bytes((self.VERSION, flags)) + signature + body
+
+    def decode(self, payload: bytes) -> Any:
+        if len(payload) < 4 or payload[:2] != self.MAGIC:
+            raise CodecError("not a cache payload")
+        version, flags = payload[2], payload[3]
+        if version != self.VERSION:
+            raise CodecError(f"codec version {version}, expected {self.VERSION}")
+
+        body = payload[4:]
+        if self.secret:
+            # Unsigned payloads are refused outright once a secret is set: accepting
+            # them would let anyone who can write to the store skip the check.
+            if not flags & self.FLAG_SIGNED:
+                raise CodecError("unsigned payload")
+            signature, body = body[:self.DIGEST_SIZE], body[self.DIGEST_SIZE:]
+            expected = hmac.new(self.secret, body, hashlib.sha256).digest()
+            if not hmac.compare_digest(signature, expected):
+                raise CodecError("bad signature")
+        elif flags & self.FLAG_SIGNED:
+            body = body[self.DIGEST_SIZE:]
+
+        if flags & self.FLAG_ZLIB:
+            try:
+                body = zlib.decompress(body)
+            except zlib.error as e:
+                raise CodecError(f"corrupt payload: {e}") from e
+        try:
+            return pickle.loads(body)
+        except Exception as e:
+            raise CodecError(f"undecodable payload: {e}") from e
+
+
+class CacheBackend:
+    """A shared byte store with expiry, and the codec that fills it.
+
+    Subclasses implement `_get`, `_set` and `_delete` over bytes. `load` and `store`
+    are what callers use: they encode, decode and swallow failures, so a cache that is
+    down costs a log line and a miss, never a failed tool call.
+    """
+
+    kind = "base"
+
+    def __init__(self, codec: Optional[Codec] = None):
+        self.codec = codec or Codec()
+        self.hits = 0
+        self.misses = 0
+        self.writes = 0
+        self.errors = 0
+        self.rejected = 0
+
+    async def _get(self, key: str) -> Optional[bytes]:
+        raise NotImplementedError
+
+    async def _set(self, key: str, payload: bytes, ttl: Optional[float]) -> None:
+        raise NotImplementedError
+
+    async def _delete(self, key: str) -> bool:
+        raise NotImplementedError
+
+    async def load(self, key: str) -> Any:
+        """The value stored under `key`, or MISSING."""
+        try:
+            payload = await self._get(key)
+        except Exception as e:
+            self.errors += 1
+            logger.warning(f"Cache backend {self.kind}: get {key!r} failed: {e}")
+            return MISSING
+        if payload is None:
+            self.misses += 1
+            return MISSING
+        try:
+            value = self.codec.decode(payload)
+        except CodecError as e:
+            self.rejected += 1
+            logger.warning(f"Cache backend {self.kind}: ignoring {key!r}: {e}")
+            return MISSING
+        self.hits += 1
+        return value
+
+    async def store(self, key: str, value: Any, ttl: Optional[float]) -> bool:
+        """Write `value` for `ttl` seconds (None: until evicted). False if it failed."""
+        if ttl is not None and ttl <= 0:
+            return False
+        try:
+            await self._set(key, self.codec.encode(value), ttl)
+        except Exception as e:
+            self.errors += 1
+            logger.warning(f"Cache backend {self.kind}: set {key!r} failed: {e}")
+            return False
+        self.writes += 1
+        return True
+
+    async def delete(self, key: str) -> bool:
+        try:
+            return await self._delete(key)
+        except Exception as e:
+            self.errors += 1
+            logger.warning(f"Cache backend {self.kind}: delete {key!r} failed: {e}")
+            return False
+
+    async def close(self) -> None:
+        pass
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "kind": self.kind,
+            "signed": bool(self.codec.secret),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else None,
+            "writes": self.writes,
+            "errors": self.errors,
+            "rejected": self.rejected,
+        }
+
+
+class InProcessBackend(CacheBackend):
+    """Encoded payloads in a dict. Shared by every namespace in this process only."""
+
+    kind = "memory"
+
+    def __init__(self, codec: Optional[Codec] = None):
+        super().__init__(codec)
+        self._data: Dict[str, Tuple[bytes, Optional[float]]] = {}
+
+    async def _get(self, key: str) -> Optional[bytes]:
+        item = self._data.get(key)
+        if item is None:
+            return None
+        payload, expires_at = item
+        if expires_at is not None and time.time() >= expires_at:
+            del self._data[key]
+            return None
+        return payload
+
+    async def _set(self, key: str, payload: bytes, ttl: Optional[float]) -> None:
+        self._data[key] = (payload, None if ttl is None else time.time() + ttl)
+
+    async def _delete(self, key: str) -> bool:
+        return self._data.pop(key, None) is not None
+
+    def stats(self) -> Dict[str, Any]:
+        return {**super().stats(), "size": len(self._data)}
+
+
+class RedisBackend(CacheBackend):
+    """Any Redis-protocol server, through redis.asyncio (or a client passed in)."""
+
+    kind = "redis"
+
+    def __init__(
+        self,
+        url: Optional[str] = None,
+        *,
+        client: Any = None,
+        prefix: str = DEFAULT_PREFIX,
+        codec: Optional[Codec] = None,
+        timeout: float = DEFAULT_TIMEOUT,
+    ):
+        super().__init__(codec)
+        if client is None:
+            if not url:
+                raise ValueError("RedisBackend needs a url or a client")
+            if not self.codec.secret:
+                raise ValueError(
+                    "RedisBackend needs a Codec with a secret: unsigned payloads read "
+                    "over the network are never unpickled"
+                )
+            try:
+                from redis import asyncio as aioredis
+            except ImportError as e:
+                raise ImportError(
+                    "CACHE_BACKEND_URL points at Redis but the redis package is not "
+                    "installed: pip install 'borsa-mcp[redis]'"
+                ) from e
+            # A short timeout: a slow cache must cost less than the upstream it saves.
+            client = aioredis.from_url(
+                url, socket_timeout=timeout, socket_connect_timeout=timeout,
+            )
+        self.client = client
+        self.prefix = prefix
+
+    async def _get(self, key: str) -> Optional[bytes]:
+        return await self.client.get(self.prefix + key)
+
+    async def _set(self, key: str, payload: bytes, ttl: Optional[float]) -> None:
+        px = None if ttl is None else max(1, int(ttl * 1000))
+        await self.client.set(self.prefix + key, payload, px=px)
+
+    async def _delete(self, key: str) -> bool:
+        return bool(await self.client.delete(self.prefix + key))
+
+    async def close(self) -> None:
+        await self.client.aclose()
+
+
+def backend_from_env() -> Optional[CacheBackend]:
+    """The backend CACHE_BACKEND_URL names, or None for process-local caching only."""
+    url = os.getenv("CACHE_BACKEND_URL", "").strip()
+    if not url:
+        return None
+    codec = Codec(secret=os.getenv("CACHE_BACKEND_SECRET") or None)
+    prefix = os.getenv("CACHE_BACKEND_PREFIX", DEFAULT_PREFIX)
+    scheme = url.split("://", 1)[0].lower()
+
+    if scheme == "memory":
+        return InProcessBackend(codec)
+    if scheme == "fake":
+        import fakeredis
+        return RedisBackend(client=fakeredis.aioredis.FakeRedis(), prefix=prefix, codec=codec)
+    if scheme in ("redis", "rediss", "unix"):
+        if not codec.secret:
+            logger.error(
+                "CACHE_BACKEND_URL is set without CACHE_BACKEND_SECRET: unsigned payloads "
+                "would let anyone who can write to that Redis run code here; caching locally"
+            )
+            return None
+        return RedisBackend(url, prefix=prefix, codec=codec)
+
+    logger.warning(f"CACHE_BACKEND_URL scheme '{scheme}' is not supported; caching locally")
+    return None
+
+
+def _from_timestamp(value: Optional[float]) -> Optional[datetime]:
+    return None if value is None else datetime.fromtimestamp(value, tz=timezone.utc)
+
+
+class BackendStore(BaseStore):
+    """A py-key-value store over a CacheBackend, for ToolResponseCache's `cache_storage`.
+
+    FastMCP's response cache writes ManagedEntry objects into a key-value store; this
+    one keeps them in the shared backend, so a tool result cached on one replica is a
+    hit on the next.
+    """
+
+    def __init__(self, backend: CacheBackend, namespace: str = "tool", **kwargs):
+        self.backend = backend
+        self.namespace = namespace
+        super().__init__(stable_api=True, **kwargs)
+
+    def _key(self, collection: str, key: str) -> str:
+        return f"{self.namespace}:{collection}:{key}"
+
+    async def _get_managed_entry(self, *, collection: str, key: str) -> Optional[ManagedEntry]:
+        stored = await self.backend.load(self._key(collection, key))
+        if stored is MISSING:
+            return None
+        value, created_at, expires_at = stored
+        return ManagedEntry(
+            value=value,
+            created_at=_from_timestamp(created_at),
+            expires_at=_from_timestamp(expires_at),
+        )
+
+    async def _put_managed_entry(
+        self, *, collection: str, key: str, managed_entry: ManagedEntry
+    ) -> None:
+        created_at, expires_at = managed_entry.created_at, managed_entry.expires_at
+        await self.backend.store(
+            self._key(collection, key),
+            (
+                dict(managed_entry.value),
+                created_at.timestamp() if created_at else None,
+                expires_at.timestamp() if expires_at else None,
+            ),
+            managed_entry.ttl,
+        )
+
+    async def _delete_managed_entry(self, *, key: str, collection: str) -> bool:
+        return await self.backend.delete(self._key(collection, key))
@@ -0,0 +1,184 @@
+"""
+Cache snapshots: keep the warmed reference data across a restart.
+
+Fly recycles machines and every deploy replaces them, and each new process started
+cold: the İş Yatırım and borsapy statements, the fund info and NAV series, the KAP
+company list, the sector memberships and the FRED series were all fetched again, by
+every machine at once. Redeploys showed up upstream as a spike of exactly the traffic
+the caches exist to avoid.
+
+At a graceful shutdown CacheSnapshot writes every namespace created with
+`persist=True` to one local file, and at boot it puts the entries back with their
+original timestamps -- so a statement cached an hour before the deploy expires an hour
+sooner after it, not a full TTL later. Entries that expired longer ago than
+CACHE_SNAPSHOT_MAX_AGE are left out; younger expired ones come back too, because
+`get_or_revalidate` may still serve them, with a warning, while it refreshes. A
+namespace whose provider is only built later, on first use, is restored when it is
+created; one that is never built this time is carried over to the next snapshot. Quotes
+and other seconds-fresh namespaces are not persisted: they would be stale by the time
+the new process listened.
+
+The file goes through the same Codec as the shared cache backend, signed when
+CACHE_BACKEND_SECRET is set; it is written to a temporary file and renamed, so a crash
+mid-write leaves the previous snapshot intact. A missing, corrupt or foreign file means
+a cold start, as before, never a failed boot.
+
+    CACHE_SNAPSHOT_PATH=/data/cache-snapshot.bin   # unset: no snapshots
+    CACHE_SNAPSHOT_MAX_AGE=604800                  # seconds past expiry still restored
+"""
+import logging
+import os
+import tempfile
+import time
+from typing import Any, Dict, Iterable, Optional
+
+from providers.cache import CacheNamespace, on_register, persistent_namespaces
+from providers.cache_backend import Codec, CodecError
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_PATH_ENV = "CACHE_SNAPSHOT_PATH"
+SNAPSHOT_MAX_AGE_ENV = "CACHE_SNAPSHOT_MAX_AGE"
+
+# The longest any namespace serves stale (the KAP list, see kap_provider).
+DEFAULT_MAX_AGE = 7 * 24 * 60 * 60
+
+
+class CacheSnapshot:
+    """Saves persistent namespaces to a file and restores them from it."""
+
+    def __init__(
+        self,
+        path: Optional[str],
+        max_age: float = DEFAULT_MAX_AGE,
+        codec: Optional[Codec] = None,
+    ):
+        self.path = path
+        self.max_age = max_age
+        self.codec = codec or Codec()
+        self.restored: Dict[str, int] = {}
+        self.saved: Dict[str, int] = {}
+        # Sections read at boot for namespaces that do not exist yet.
+        self._pending: Dict[str, bytes] = {}
+        self.error: Optional[str] = None
+
+    @classmethod
+    def from_env(cls) -> "CacheSnapshot":
+        path = os.getenv(SNAPSHOT_PATH_ENV, "").strip() or None
+        max_age = DEFAULT_MAX_AGE
+        raw = os.getenv(SNAPSHOT_MAX_AGE_ENV, "").strip()
+        if raw:
+            try:
+                max_age = float(raw)
+            except ValueError:
+                logger.warning(f"{SNAPSHOT_MAX_AGE_ENV} '{raw}' is not a number; using {max_age}s")
+        codec = Codec(secret=os.getenv("CACHE_BACKEND_SECRET") or None)
+        return cls(path, max_age=max_age, codec=codec)
+
+    @property
+    def enabled(self) -> bool:
+        return self.path is not None
+
+    def save(self, namespaces: Optional[Iterable[CacheNamespace]] = None) -> int:
+        """Write the namespaces to the snapshot file. Returns the entries written."""
+        if not self.enabled:
+            return 0
+        namespaces = persistent_namespaces() if namespaces is None else list(namespaces)
+
+        # Encoded one namespace at a time: a value that will not pickle costs its own
+        # namespace, not the whole snapshot.
+        sections: Dict[str, bytes] = dict(self._pending)
+        counts: Dict[str, int] = {}
+        for namespace in namespaces:
+            entries = namespace.dump()
+            if not entries:
+                continue
+            try:
+                sections[namespace.name] = self.codec.encode(entries)
+            except Exception as e:
+                logger.warning(f"Cache snapshot: skipping {namespace.name}: {e}")
+                continue
+            counts[namespace.name] = len(entries)
+
+        payload = self.codec.encode({"written_at": time.time(), "namespaces": sections})
+        try:
+            directory = os.path.dirname(os.path.abspath(self.path))
+            os.makedirs(directory, exist_ok=True)
+            fd, temporary = tempfile.mkstemp(dir=directory, prefix=".cache-snapshot-")
+            try:
+                with os.fdopen(fd, "wb") as f:
+                    f.write(payload)
+                os.replace(temporary, self.path)
+            except BaseException:
+                os.unlink(temporary)
+                raise
+        except OSError as e:
+            self.error = f"save: {e}"
+            logger.warning(f"Cache snapshot: could not write {self.path}: {e}")
+            return 0
+
+        self.saved = counts
+        total = sum(counts.values())
+        logger.info(f"Cache snapshot: saved {total} entries to {self.path} ({len(payload)} bytes)")
+        return total
+
+    def load(self, namespaces: Optional[Iterable[CacheNamespace]] = None) -> int:
+        """Restore the snapshot into the live namespaces. Returns the entries restored."""
+        if not self.enabled:
+            return 0
+        try:
+            with open(self.path, "rb") as f:
+                payload = f.read()
+        except FileNotFoundError:
+            logger.info(f"Cache snapshot: none at {self.path}; starting cold")
+            return 0
+        except OSError as e:
+            self.error = f"load: {e}"
+            logger.warning(f"Cache snapshot: could not read {self.path}: {e}")
+            return 0
+
+        try:
+            snapshot = self.codec.decode(payload)
+            sections = snapshot["namespaces"]
+        except (CodecError, KeyError, TypeError) as e:
+            self.error = f"load: {e}"
+            logger.warning(f"Cache snapshot: ignoring {self.path}: {e}")
+            return 0
+
+        live = {
+            ns.name: ns
+            for ns in (persistent_namespaces() if namespaces is None else namespaces)
+        }
+        for name, section in sections.items():
+            if name in live:
+                self._restore(live[name], section)
+            else:
+                self._pending[name] = section
+        if self._pending:
+            on_register(self._adopt)
+
+        total = sum(self.restored.values())
+        age = time.time() - snapshot.get("written_at", time.time())
+        logger.info(f"Cache snapshot: restored {total} entries, written {age:.0f}s ago")
+        return total
+
+    def _restore(self, namespace: CacheNamespace, section: bytes) -> None:
+        try:
+            entries = self.codec.decode(section)
+        except CodecError as e:
+            logger.warning(f"Cache snapshot: skipping {namespace.name}: {e}")
+            return
+        self.restored[namespace.name] = namespace.restore(entries, self.max_age)
+
+    def _adopt(self, namespace: CacheNamespace) -> None:
+        section = self._pending.pop(namespace.name, None) if namespace.persist else None
+        if section is not None:
+            self._restore(namespace, section)
+
+    def status(self) -> Dict[str, Any]:
+        status: Dict[str, Any] = {"enabled": self.enabled}
+        if self.enabled:
+            status.update(path=self.path, restored=self.restored, saved=self.saved)
+        if self.error:
+            status["error"] = self.error
+        return status
@@ -0,0 +1,310 @@
+"""
+Circuit breakers: stop calling an upstream that is down, and find out when it is back.
+
+When İş Yatırım or TEFAS went down, nothing noticed. Every request still waited out
+its full timeout -- 10 seconds per financial group in _fetch_all_statements, so a
+bank's statements took 30 seconds to fail, and 60 on BorsaApiClient's shared client --
+and while it waited it held a bulkhead slot, a pool thread and the MCP session. The
+callers piled up behind an upstream that was never going to answer, and the slots
+they held were slots the healthy upstreams could not use.
+
+Each upstream has a CircuitBreaker in front of its bulkhead, in `run_blocking` and in
+UpstreamTransport:
+
+- closed: calls go through. The outcome of the last WINDOW calls is kept; once at
+  least CIRCUIT_MIN_CALLS have run and CIRCUIT_FAILURE_RATE of them failed, it opens.
+- open: calls fail at once with CircuitOpenError, which classify_tool_error turns
+  into a ToolError telling the model the source is paused and when to try again.
+- half-open: after CIRCUIT_OPEN_SECONDS one probe call is let through. Success closes
+  the circuit; failure opens it again for twice as long, up to MAX_OPEN_SECONDS.
+
+A failure is what says the upstream, not the request, is the problem: the errors a
+retry could fix (retry.is_retryable -- transport errors, timeouts, 429 and 5xx), and
+429/5xx responses on the HTTP path. An unknown ticker is a healthy upstream answering.
+A full bulkhead, a call's deadline running out or a cancelled call counts neither
+way.
+
+A retried call is one outcome, not one per attempt. Every attempt used to be
+recorded, and borsapy's websocket drops about half of its attempts in normal
+operation -- each one retryable, so each one a failure -- which tripped the borsapy
+breaker after some ten history calls and refused every borsapy call, quotes and
+screener included, for the next 30 seconds and more. Inside call_with_retry
+(`retried_call`) an attempt's retryable failure is held back: it is recorded once,
+when the call gives up, and dropped if a later attempt recovers. A probe attempt is
+still recorded at once. borsapy's threshold (UPSTREAM_FAILURE_RATES) also sits well
+above its normal drop rate, so only an outage opens it.
+
+State and counters per upstream are on /health (`circuit_stats()`).
+
+    CIRCUIT_FAILURE_RATE="0.5,borsapy=0.75"   # default, and per upstream
+    CIRCUIT_MIN_CALLS=10
+    CIRCUIT_OPEN_SECONDS=30
+"""
+import contextlib
+import contextvars
+import logging
+import os
+import time
+from collections import deque
+from typing import Any, Dict, Iterator, Optional
+
+from providers.bulkhead import BulkheadFullError
+from providers.deadline import DeadlineExceededError
+
+logger = logging.getLogger(__name__)
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+WINDOW = 20
+DEFAULT_FAILURE_RATE = 0.5
+DEFAULT_MIN_CALLS = 10
+DEFAULT_OPEN_SECONDS = 30.0
+MAX_OPEN_SECONDS = 300.0
+
+FAILURE_STATUS = {429, 500, 502, 503, 504}
+
+# Upstreams whose normal failure rate is near the default threshold. borsapy's
+# TradingView websocket drops about half its attempts on a good day.
+UPSTREAM_FAILURE_RATES: Dict[str, float] = {
+    "borsapy": 0.75,
+}
+
+
+class CircuitOpenError(RuntimeError):
+    """The upstream's circuit is open: the call was not attempted."""
+
+
+def _env_float(name: str, default: float) -> float:
+    raw = os.getenv(name, "").strip()
+    if not raw:
+        return default
+    try:
+        return float(raw)
+    except ValueError:
+        logger.warning(f"{name} '{raw}' is not a number; using {default}")
+        return default
+
+
+def _failure_rate_for(name: str) -> float:
+    """CIRCUIT_FAILURE_RATE: a bare number sets the default, `name=rate` one upstream."""
+    default, rates = DEFAULT_FAILURE_RATE, dict(UPSTREAM_FAILURE_RATES)
+    for item in os.getenv("CIRCUIT_FAILURE_RATE", "").split(","):
+        upstream, sep, raw = item.rpartition("=")
+        upstream, raw = upstream.strip(), raw.strip()
+        if not raw:
+            continue
+        try:
+            rate = float(raw)
+        except ValueError:
+            logger.warning(f"CIRCUIT_FAILURE_RATE: ignoring '{item.strip()}'")
+            continue
+        if sep and upstream:
+            rates[upstream] = rate
+        else:
+            default = rate
+    return rates.get(name, default)
+
+
+class _RetryScope:
+    """The failure an attempt of a retried call is holding back, if any."""
+
+    __slots__ = ("pending",)
+
+    def __init__(self):
+        self.pending: Optional["CircuitBreaker"] = None
+
+
+_retry_scope: contextvars.ContextVar[Optional[_RetryScope]] = contextvars.ContextVar(
+    "circuit_retry_scope", default=None
+)
+
+
+@contextlib.contextmanager
+def retried_call() -> Iterator[None]:
+    """Make every attempt in the `with` body one call, as far as the breakers go.
+
+    A retryable failure of an attempt is not recorded when it happens; if the body
+    raises it is recorded once, and if a later attempt succeeds it is dropped.
+    """
+    scope = _RetryScope()
+    token = _retry_scope.set(scope)
+    try:
+        yield
+    except Exception:
+        if scope.pending is not None:
+            scope.pending.record(probe=False, failed=True)
+        raise
+    finally:
+        _retry_scope.reset(token)
+
+
+def is_failure(error: BaseException) -> bool:
+    """Whether an error counts against the upstream's health."""
+    # Imported here: retry.py classifies CircuitOpenError, so it imports this module.
+    from providers.retry import is_retryable
+
+    return isinstance(error, Exception) and is_retryable(error)
+
+
+class CallOutcome:
+    """What the body of `CircuitBreaker.guard` found out about the upstream."""
+
+    __slots__ = ("failed",)
+
+    def __init__(self):
+        self.failed = False
+
+
+class CircuitBreaker:
+    """Closed, open or half-open, from the failure rate of an upstream's recent calls."""
+
+    def __init__(
+        self,
+        name: str,
+        failure_rate: float = DEFAULT_FAILURE_RATE,
+        min_calls: int = DEFAULT_MIN_CALLS,
+        open_seconds: float = DEFAULT_OPEN_SECONDS,
+        window: int = WINDOW,
+    ):
+        self.name = name
+        self.failure_rate = failure_rate
+        self.min_calls = min_calls
+        self.open_seconds = open_seconds
+        self.state = CLOSED
+        self._outcomes: deque = deque(maxlen=max(window, min_calls))    # True: failed
+        self._open_for = open_seconds
+        self._opened_at = 0.0
+        self._probing = False
+
+        self.successes = 0
+        self.failures = 0
+        self.rejected = 0
+        self.opened = 0
+
+    @classmethod
+    def from_env(cls, name: str) -> "CircuitBreaker":
+        return cls(
+            name,
+            failure_rate=_failure_rate_for(name),
+            min_calls=max(1, int(_env_float("CIRCUIT_MIN_CALLS", DEFAULT_MIN_CALLS))),
+            open_seconds=_env_float("CIRCUIT_OPEN_SECONDS", DEFAULT_OPEN_SECONDS),
+        )
+
+    def _retry_in(self) -> float:
+        return max(0.0, self._opened_at + self._open_for - time.monotonic())
+
+    def allow(self) -> bool:
+        """Admit a call or raise CircuitOpenError. True when the call is the probe."""
+        if self.state == OPEN and self._retry_in() == 0:
+            self.state = HALF_OPEN
+            self._probing = False
+        if self.state == CLOSED:
+            return False
+        if self.state == HALF_OPEN and not self._probing:
+            self._probing = True
+            return True
+        self.rejected += 1
+        raise CircuitOpenError(
+            f"Upstream '{self.name}' is unavailable (circuit open after repeated "
+            f"failures); next attempt in {max(1, round(self._retry_in()))}s"
+        )
+
+    def record(self, probe: bool, failed: bool) -> None:
+        if failed:
+            self.failures += 1
+        else:
+            self.successes += 1
+
+        if probe:
+            self._probing = False
+            if failed:
+                self._trip(min(self._open_for * 2, MAX_OPEN_SECONDS))
+            else:
+                logger.info(f"Circuit {self.name}: probe succeeded; closing")
+                self.state = CLOSED
+                self._outcomes.clear()
+                self._open_for = self.open_seconds
+            return
+
+        # Calls that started before the circuit opened still finish; they no longer
+        # decide anything.
+        if self.state != CLOSED:
+            return
+        self._outcomes.append(failed)
+        if len(self._outcomes) >= self.min_calls:
+            rate = sum(self._outcomes) / len(self._outcomes)
+            if rate >= self.failure_rate:
+                self._trip(self.open_seconds)
+
+    def release(self, probe: bool) -> None:
+        """A call that ended without saying anything about the upstream."""
+        if probe:
+            self._probing = False
+
+    def _trip(self, open_for: float) -> None:
+        logger.warning(f"Circuit {self.name}: opening for {open_for:.0f}s")
+        self.state = OPEN
+        self._open_for = open_for
+        self._opened_at = time.monotonic()
+        self.opened += 1
+
+    @contextlib.contextmanager
+    def guard(self) -> Iterator["CallOutcome"]:
+        """Admit, run and record one call made in the `with` body.
+
+        An exception out of the body is classified with `is_failure`; a body that
+        returns normally is a success unless it set `outcome.failed`.
+        """
+        probe = self.allow()
+        outcome = CallOutcome()
+        try:
+            yield outcome
+        except (BulkheadFullError, DeadlineExceededError):
+            self.release(probe)
+            raise
+        except Exception as exc:
+            failed = is_failure(exc)
+            scope = _retry_scope.get()
+            if failed and not probe and scope is not None:
+                # An attempt of a retried call: the retry may yet recover it.
+                scope.pending = self
+            else:
+                self.record(probe, failed=failed)
+            raise
+        except BaseException:
+            self.release(probe)
+            raise
+        self.record(probe, failed=outcome.failed)
+
+    def stats(self) -> Dict[str, Any]:
+        if self.state == OPEN and self._retry_in() == 0:
+            state = HALF_OPEN    # the next call will be the probe
+        else:
+            state = self.state
+        recent = len(self._outcomes)
+        return {
+            "state": state,
+            "recent_failure_rate": round(sum(self._outcomes) / recent, 2) if recent else None,
+            "retry_in_s": round(self._retry_in(), 1) if state == OPEN else None,
+            "opened": self.opened,
+            "rejected": self.rejected,
+            "successes": self.successes,
+            "failures": self.failures,
+        }
+
+
+_circuits: Dict[str, CircuitBreaker] = {}
+
+
+def circuit(name: str) -> CircuitBreaker:
+    """The breaker for `name`, created on first use."""
+    breaker = _circuits.get(name)
+    if breaker is None:
+        breaker = _circuits[name] = CircuitBreaker.from_env(name)
+    return breaker
+
+
+def circuit_stats() -> Dict[str, Dict[str, Any]]:
+    return {name: breaker.stats() for name, breaker in sorted(_circuits.items())}
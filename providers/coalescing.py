@@ -0,0 +1,186 @@
+"""
+Request coalescing for identical in-flight router calls.
+
+Popular BIST names are asked for in bursts: a dozen MCP sessions open on THYAO when
+it moves, and every `get_quote("THYAO", "bist")` used to make its own borsapy round
+trip -- the same websocket handshake, the same answer, a dozen times within the same
+second. Caching cannot absorb that on a cold key, because every caller misses before
+the first one has finished.
+
+A Coalescer lets concurrent identical calls share one upstream future. The first
+caller leads; everyone arriving while it runs waits on its result. Nothing is kept
+once the call completes -- freshness stays the cache layer's business -- so a
+coalesced result is never older than the call it shared.
+
+Callers decorate a router method with `@coalesced`. The key is the method name and
+its arguments after defaults are applied and enums reduced to their values, so
+`get_quote("THYAO", MarketType.BIST)` and `get_quote(symbol="THYAO",
+market="bist")` share a call.
+"""
+import asyncio
+import copy
+import functools
+import inspect
+import logging
+import weakref
+from enum import Enum
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional
+
+from providers.deadline import no_deadline, within_deadline
+
+logger = logging.getLogger(__name__)
+
+
+class _Unhashable(Exception):
+    pass
+
+
+def _normalize(value: Any) -> Hashable:
+    """Reduce an argument to a hashable key component, or raise _Unhashable."""
+    if isinstance(value, Enum):
+        return value.value
+    if isinstance(value, str):
+        return value.strip()
+    if isinstance(value, (list, tuple)):
+        return tuple(_normalize(v) for v in value)
+    if isinstance(value, dict):
+        return tuple(sorted((str(k), _normalize(v)) for k, v in value.items()))
+    try:
+        hash(value)
+    except TypeError:
+        raise _Unhashable() from None
+    return value
+
+
+class Coalescer:
+    """Shares one in-flight call among every concurrent caller with the same key."""
+
+    def __init__(self, name: str):
+        self.name = name
+        self._inflight: Dict[Hashable, asyncio.Future] = {}
+        self._waiters: Dict[Hashable, int] = {}
+        self._operations: Dict[str, Dict[str, int]] = {}
+        _register(self)
+
+    def _counters(self, operation: str) -> Dict[str, int]:
+        return self._operations.setdefault(
+            operation, {"calls": 0, "shared_calls": 0, "waiters_saved": 0, "max_waiters": 0}
+        )
+
+    async def run(
+        self,
+        operation: str,
+        key: Hashable,
+        factory: Callable[[], Awaitable[Any]],
+    ) -> Any:
+        """Run `factory()` once for every concurrent caller of `(operation, key)`.
+
+        Waiters get a deep copy of the leader's result: the server decorates results
+        in place (warnings appended, fields shaped), and one caller's decoration must
+        not leak into another's response. An exception reaches every waiter.
+
+        The call runs with no deadline, not the leader's: a waiter with time to spare
+        got the leader's DeadlineExceededError. Each caller stops waiting when its own
+        deadline passes.
+        """
+        full_key = (operation, key)
+        counters = self._counters(operation)
+        loop = asyncio.get_running_loop()
+
+        while True:
+            pending = self._inflight.get(full_key)
+            if pending is None or pending.done() or pending.get_loop() is not loop:
+                break
+            self._waiters[full_key] += 1
+            try:
+                return copy.deepcopy(
+                    await within_deadline(asyncio.shield(pending), f"shared {operation}")
+                )
+            except asyncio.CancelledError:
+                # The shared call was cancelled, not us: go round and lead a new one.
+                task = asyncio.current_task()
+                if pending.cancelled() and not (task and task.cancelling()):
+                    continue
+                raise
+
+        # The call is shared, so it runs as its own task free of the leader's deadline;
+        # every caller, the leader too, waits on it under its own.
+        with no_deadline():
+            call = loop.create_task(self._call(operation, full_key, factory))
+        call.add_done_callback(_retrieve)
+        self._inflight[full_key] = call
+        self._waiters[full_key] = 0
+        counters["calls"] += 1
+        return await within_deadline(asyncio.shield(call), f"shared {operation}")
+
+    async def _call(self, operation: str, full_key: Hashable, factory) -> Any:
+        try:
+            return await factory()
+        finally:
+            counters = self._counters(operation)
+            waiters = self._waiters.pop(full_key, 0)
+            if self._inflight.get(full_key) is asyncio.current_task():
+                del self._inflight[full_key]
+            if waiters:
+                counters["shared_calls"] += 1
+                counters["waiters_saved"] += waiters
+                counters["max_waiters"] = max(counters["max_waiters"], waiters)
+                logger.info(
+                    f"Coalesced {operation}{full_key[1]}: one upstream call served "
+                    f"{waiters + 1} callers ({waiters} saved)"
+                )
+
+    def stats(self) -> Dict[str, Any]:
+        operations = {name: dict(c) for name, c in sorted(self._operations.items())}
+        return {
+            "in_flight": len(self._inflight),
+            "calls": sum(c["calls"] for c in operations.values()),
+            "waiters_saved": sum(c["waiters_saved"] for c in operations.values()),
+            "operations": operations,
+        }
+
+
+def _retrieve(call: asyncio.Future) -> None:
+    """Mark a shared call's exception as seen; every caller may have given up on it."""
+    if not call.cancelled():
+        call.exception()
+
+
+def coalesced(method: Callable[..., Awaitable[Any]]) -> Callable[..., Awaitable[Any]]:
+    """Coalesce concurrent identical calls to an async method through `self._coalescer`.
+
+    Calls whose arguments cannot be reduced to a key run uncoalesced rather than fail.
+    """
+    signature = inspect.signature(method)
+
+    @functools.wraps(method)
+    async def wrapper(self, *args, **kwargs):
+        coalescer: Optional[Coalescer] = getattr(self, "_coalescer", None)
+        if coalescer is None:
+            return await method(self, *args, **kwargs)
+        try:
+            bound = signature.bind(self, *args, **kwargs)
+            bound.apply_defaults()
+            key = tuple(
+                _normalize(value) for name, value in list(bound.arguments.items())[1:]
+            )
+        except (TypeError, _Unhashable):
+            return await method(self, *args, **kwargs)
+        return await coalescer.run(
+            method.__name__, key, lambda: method(self, *args, **kwargs)
+        )
+
+    return wrapper
+
+
+_coalescers: "weakref.WeakValueDictionary[str, Coalescer]" = weakref.WeakValueDictionary()
+
+
+def _register(coalescer: Coalescer) -> None:
+    _coalescers[coalescer.name] = coalescer
+
+
+def coalescing_stats() -> Dict[str, Dict[str, Any]]:
+    """Counters for every live coalescer, keyed by name."""
+    live = sorted(_coalescers.items(), key=lambda item: item[0])
+    return {name: coalescer.stats() for name, coalescer in live}
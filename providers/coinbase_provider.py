@@ -5,7 +5,6 @@ Coinbase API, including fetching global cryptocurrency market data.
 """
 import httpx
 import logging
-import time
 from typing import Optional, Dict, Any
 from models import (
     CoinbaseExchangeInfoSonucu, CoinbaseTickerSonucu, CoinbaseOrderbookSonucu,
@@ -15,6 +14,8 @@ from models import (
     CoinbaseHareketliOrtalama, CoinbaseTeknikIndiktorler, CoinbaseHacimAnalizi,
     CoinbaseFiyatAnalizi, CoinbaseTrendAnalizi
 )
+from providers.cache import CacheNamespace
+from providers.indicator_state import IndicatorStore
 
 logger = logging.getLogger(__name__)
 
@@ -25,8 +26,10 @@ class CoinbaseProvider:
     
     def __init__(self, client: httpx.AsyncClient):
         self._http_client = client
-        self._exchange_info_cache: Optional[Dict] = None
-        self._last_exchange_info_fetch: float = 0
+        self._exchange_info_cache = CacheNamespace(
+            "coinbase.exchange_info", ttl=self.CACHE_DURATION, max_entries=1
+        )
+        self._indicators = IndicatorStore("coinbase")
     
     async def _make_request(self, base_url: str, endpoint: str, params: Dict[str, Any] = None) -> Dict[str, Any]:
         """Make HTTP request to Coinbase API with error handling."""
@@ -55,37 +58,30 @@ class CoinbaseProvider:
             logger.error(f"Error making request to {endpoint}: {e}")
             raise
     
+    async def _fetch_exchange_info(self) -> Dict[str, Any]:
+        """Products (trading pairs) and currencies, as Coinbase serves them."""
+        products_response = await self._make_request(
+            self.ADVANCED_TRADE_BASE_URL, "/market/products"
+        )
+        currencies_response = await self._make_request(
+            self.APP_BASE_URL, "/currencies"
+        )
+        return {
+            'products': products_response.get('products', []),
+            'currencies': currencies_response.get('data', []),
+        }
+
     async def get_exchange_info(self) -> CoinbaseExchangeInfoSonucu:
         """
         Get detailed information about all trading pairs and currencies on Coinbase.
         """
         try:
-            # Check cache
-            current_time = time.time()
-            if (self._exchange_info_cache and 
-                (current_time - self._last_exchange_info_fetch) < self.CACHE_DURATION):
-                products_data = self._exchange_info_cache.get('products', [])
-                currencies_data = self._exchange_info_cache.get('currencies', [])
-            else:
-                # Fetch products (trading pairs)
-                products_response = await self._make_request(
-                    self.ADVANCED_TRADE_BASE_URL, "/market/products"
-                )
-                products_data = products_response.get('products', [])
-                
-                # Fetch currencies
-                currencies_response = await self._make_request(
-                    self.APP_BASE_URL, "/currencies"
-                )
-                currencies_data = currencies_response.get('data', [])
-                
-                # Cache the data
-                self._exchange_info_cache = {
-                    'products': products_data,
-                    'currencies': currencies_data
-                }
-                self._last_exchange_info_fetch = current_time
-            
+            cached = await self._exchange_info_cache.get_or_load(
+                "all", self._fetch_exchange_info
+            )
+            products_data = cached.get('products', [])
+            currencies_data = cached.get('currencies', [])
+
             # Parse trading pairs
             trading_pairs = []
             for product in products_data:
@@ -481,98 +477,79 @@ class CoinbaseProvider:
                 )
             
             # === TECHNICAL INDICATOR CALCULATIONS ===
-            
-            # Moving Averages
-            df['sma_20'] = df['close'].rolling(window=20).mean()
-            df['sma_50'] = df['close'].rolling(window=50).mean()
-            df['sma_100'] = df['close'].rolling(window=100).mean()
-            df['sma_200'] = df['close'].rolling(window=200).mean()
-            df['ema_12'] = df['close'].ewm(span=12).mean()
-            df['ema_26'] = df['close'].ewm(span=26).mean()
-            
-            # RSI (14-period)
-            delta = df['close'].diff()
-            gain = (delta.where(delta > 0, 0)).rolling(window=14).mean()
-            loss = (-delta.where(delta < 0, 0)).rolling(window=14).mean()
-            rs = gain / loss
-            df['rsi'] = 100 - (100 / (1 + rs))
-            
-            # MACD
-            df['macd'] = df['ema_12'] - df['ema_26']
-            df['macd_signal'] = df['macd'].ewm(span=9).mean()
-            df['macd_histogram'] = df['macd'] - df['macd_signal']
-            
-            # Bollinger Bands
-            df['bb_middle'] = df['close'].rolling(window=20).mean()
-            bb_std = df['close'].rolling(window=20).std()
-            df['bb_upper'] = df['bb_middle'] + (bb_std * 2)
-            df['bb_lower'] = df['bb_middle'] - (bb_std * 2)
-            
-            # Get latest values
+
+            ind = self._indicators.compute(
+                (product_id, granularity), df['timestamp'],
+                df['close'], df['high'], df['low'], df['volume'],
+            )
+            close, previous_close = ind.close, ind.previous_close
+            sma_20, sma_50 = ind.sma[20], ind.sma[50]
+            rsi = ind.rsi_14
+            bb_upper, bb_lower = ind.bollinger_upper, ind.bollinger_lower
             latest = df.iloc[-1]
-            previous = df.iloc[-2] if len(df) > 1 else latest
-            
+
             # === ANALYSIS COMPONENTS ===
             
             # Moving Averages Analysis
             hareketli_ortalamalar = CoinbaseHareketliOrtalama(
-                sma_20=float(latest['sma_20']) if pd.notna(latest['sma_20']) else None,
-                sma_50=float(latest['sma_50']) if pd.notna(latest['sma_50']) else None,
-                sma_100=float(latest['sma_100']) if pd.notna(latest['sma_100']) else None,
-                sma_200=float(latest['sma_200']) if pd.notna(latest['sma_200']) else None,
-                ema_12=float(latest['ema_12']) if pd.notna(latest['ema_12']) else None,
-                ema_26=float(latest['ema_26']) if pd.notna(latest['ema_26']) else None
+                sma_5=ind.sma[5],
+                sma_10=ind.sma[10],
+                sma_20=sma_20,
+                sma_50=sma_50,
+                sma_200=ind.sma[200],
+                ema_12=ind.ema_12,
+                ema_26=ind.ema_26
             )
             
             # Technical Indicators
             teknik_indiktorler = CoinbaseTeknikIndiktorler(
-                rsi_14=float(latest['rsi']) if pd.notna(latest['rsi']) else None,
-                macd=float(latest['macd']) if pd.notna(latest['macd']) else None,
-                macd_signal=float(latest['macd_signal']) if pd.notna(latest['macd_signal']) else None,
-                macd_histogram=float(latest['macd_histogram']) if pd.notna(latest['macd_histogram']) else None,
-                bollinger_ust=float(latest['bb_upper']) if pd.notna(latest['bb_upper']) else None,
-                bollinger_orta=float(latest['bb_middle']) if pd.notna(latest['bb_middle']) else None,
-                bollinger_alt=float(latest['bb_lower']) if pd.notna(latest['bb_lower']) else None
+                rsi_14=rsi,
+                macd=ind.macd,
+                macd_signal=ind.macd_signal,
+                macd_histogram=ind.macd_histogram,
+                bollinger_upper=bb_upper,
+                bollinger_middle=ind.bollinger_middle,
+                bollinger_lower=bb_lower
             )
             
             # Volume Analysis
-            volume_ma = df['volume'].rolling(window=20).mean().iloc[-1]
+            volume_ma = ind.volume_avg[20]
             current_volume = latest['volume']
-            volume_ratio = current_volume / volume_ma if volume_ma > 0 else 1.0
+            volume_ratio = current_volume / volume_ma if volume_ma else 1.0
             
             hacim_analizi = CoinbaseHacimAnalizi(
                 guncel_hacim=float(current_volume),
-                ortalama_hacim=float(volume_ma) if pd.notna(volume_ma) else None,
+                ortalama_hacim=volume_ma,
                 hacim_orani=float(volume_ratio),
                 hacim_trendi="yuksek" if volume_ratio > 2.0 else "normal" if volume_ratio > 0.3 else "dusuk"
             )
             
             # Price Analysis
-            price_change = ((latest['close'] - previous['close']) / previous['close']) * 100
+            price_change = ((close - previous_close) / previous_close) * 100
             high_24h = df['high'].tail(24).max() if len(df) >= 24 else latest['high']
             low_24h = df['low'].tail(24).min() if len(df) >= 24 else latest['low']
             
             fiyat_analizi = CoinbaseFiyatAnalizi(
-                guncel_fiyat=float(latest['close']),
+                guncel_fiyat=close,
                 yuksek_24h=float(high_24h),
                 dusuk_24h=float(low_24h),
                 degisim_yuzdesi=float(price_change),
-                destek_seviyesi=float(latest['bb_lower']) if pd.notna(latest['bb_lower']) else None,
-                direnc_seviyesi=float(latest['bb_upper']) if pd.notna(latest['bb_upper']) else None
+                destek_seviyesi=bb_lower,
+                direnc_seviyesi=bb_upper
             )
             
             # Trend Analysis
-            price_vs_sma20 = "yukari" if pd.notna(latest['sma_20']) and latest['close'] > latest['sma_20'] else "asagi" if pd.notna(latest['sma_20']) else "bilinmiyor"
-            price_vs_sma50 = "yukari" if pd.notna(latest['sma_50']) and latest['close'] > latest['sma_50'] else "asagi" if pd.notna(latest['sma_50']) else "bilinmiyor"
-            sma20_vs_sma50 = "yukari" if pd.notna(latest['sma_20']) and pd.notna(latest['sma_50']) and latest['sma_20'] > latest['sma_50'] else "asagi" if pd.notna(latest['sma_20']) and pd.notna(latest['sma_50']) else "bilinmiyor"
+            price_vs_sma20 = "yukari" if sma_20 is not None and close > sma_20 else "asagi" if sma_20 is not None else "bilinmiyor"
+            price_vs_sma50 = "yukari" if sma_50 is not None and close > sma_50 else "asagi" if sma_50 is not None else "bilinmiyor"
+            sma20_vs_sma50 = "yukari" if sma_20 is not None and sma_50 is not None and sma_20 > sma_50 else "asagi" if sma_20 is not None and sma_50 is not None else "bilinmiyor"
             
             # Determine overall trends
-            if pd.notna(latest['rsi']) and pd.notna(latest['sma_20']):
-                kisa_vadeli = "yukselis" if price_vs_sma20 == "yukari" and latest['rsi'] < 80 else "dususlus" if price_vs_sma20 == "asagi" and latest['rsi'] > 20 else "yana"
+            if rsi is not None and sma_20 is not None:
+                kisa_vadeli = "yukselis" if price_vs_sma20 == "yukari" and rsi < 80 else "dususlus" if price_vs_sma20 == "asagi" and rsi > 20 else "yana"
             else:
                 kisa_vadeli = "bilinmiyor"
                 
-            if pd.notna(latest['sma_20']) and pd.notna(latest['sma_50']):
+            if sma_20 is not None and sma_50 is not None:
                 uzun_vadeli = "yukselis" if sma20_vs_sma50 == "yukari" and price_vs_sma50 == "yukari" else "dususlus" if sma20_vs_sma50 == "asagi" and price_vs_sma50 == "asagi" else "yana"
             else:
                 uzun_vadeli = "bilinmiyor"
@@ -589,36 +566,36 @@ class CoinbaseProvider:
             signals = []
             
             # RSI signals (crypto-optimized thresholds: 25/75 vs stock 30/70)
-            if pd.notna(latest['rsi']):
-                if latest['rsi'] <= 25:
+            if rsi is not None:
+                if rsi <= 25:
                     signals.append(("RSI Oversold", 2))  # Strong buy
-                elif latest['rsi'] <= 35:
+                elif rsi <= 35:
                     signals.append(("RSI Low", 1))  # Buy
-                elif latest['rsi'] >= 75:
+                elif rsi >= 75:
                     signals.append(("RSI Overbought", -2))  # Strong sell
-                elif latest['rsi'] >= 65:
+                elif rsi >= 65:
                     signals.append(("RSI High", -1))  # Sell
             
             # MACD signals
-            if (pd.notna(latest['macd']) and pd.notna(latest['macd_signal']) and 
-                pd.notna(previous['macd']) and pd.notna(previous['macd_signal'])):
-                if latest['macd'] > latest['macd_signal'] and previous['macd'] <= previous['macd_signal']:
+            if (ind.macd is not None and ind.macd_signal is not None and
+                ind.previous_macd is not None and ind.previous_macd_signal is not None):
+                if ind.macd > ind.macd_signal and ind.previous_macd <= ind.previous_macd_signal:
                     signals.append(("MACD Bullish Cross", 1))
-                elif latest['macd'] < latest['macd_signal'] and previous['macd'] >= previous['macd_signal']:
+                elif ind.macd < ind.macd_signal and ind.previous_macd >= ind.previous_macd_signal:
                     signals.append(("MACD Bearish Cross", -1))
             
             # Moving average signals
-            if (pd.notna(latest['sma_20']) and pd.notna(latest['sma_50'])):
-                if latest['close'] > latest['sma_20'] and latest['sma_20'] > latest['sma_50']:
+            if sma_20 is not None and sma_50 is not None:
+                if close > sma_20 and sma_20 > sma_50:
                     signals.append(("MA Alignment Bullish", 1))
-                elif latest['close'] < latest['sma_20'] and latest['sma_20'] < latest['sma_50']:
+                elif close < sma_20 and sma_20 < sma_50:
                     signals.append(("MA Alignment Bearish", -1))
             
             # Bollinger Band signals
-            if pd.notna(latest['bb_lower']) and pd.notna(latest['bb_upper']):
-                if latest['close'] <= latest['bb_lower']:
+            if bb_lower is not None and bb_upper is not None:
+                if close <= bb_lower:
                     signals.append(("BB Oversold", 1))
-                elif latest['close'] >= latest['bb_upper']:
+                elif close >= bb_upper:
                     signals.append(("BB Overbought", -1))
             
             # Volume confirmation
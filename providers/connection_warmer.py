@@ -0,0 +1,176 @@
+"""
+Keep connections to the hot upstream hosts open before and between calls.
+
+The first request to each upstream after a boot -- and after every quiet spell longer
+than the keepalive expiry -- paid for a DNS lookup, a TCP connect and a TLS
+handshake before it could send anything: a few hundred milliseconds to BtcTurk or
+Coinbase, more to İş Yatırım and FRED. That is the latency users notice, because it
+lands on the first call they make.
+
+A ConnectionWarmer sends a HEAD request to each hot host:
+
+- once at boot, as the "connections" warmup step, so the pools (and the DNS cache,
+  providers/dns_cache.py) are filled before the machine reports ready;
+- then every KEEPALIVE_INTERVAL seconds, shorter than the pools' keepalive expiry,
+  to each host whose upstream has had no other traffic since the last round. A
+  host that is in use stays warm on its own and is left alone.
+
+The requests go through the same shared client the provider uses
+(providers/http_client.py), so they land in the pool the next real call draws from,
+behind the same circuit breaker and bulkhead: an upstream whose circuit is open is
+not pinged. A failed ping is counted and otherwise ignored. Per-host counters are on
+/health.
+
+    KEEPALIVE_HOSTS="https://api.btcturk.com/,https://www.isyatirim.com.tr/"
+    KEEPALIVE_INTERVAL=25     # seconds; 0 turns the refresh off
+"""
+import asyncio
+import logging
+import os
+import time
+from typing import Any, Callable, Dict, Optional
+from urllib.parse import urlsplit
+
+from providers.bulkhead import upstream_for_host
+from providers.http_client import shared_http_client
+from providers.upstream_http import DEFAULT_KEEPALIVE_EXPIRY, request_count
+
+logger = logging.getLogger(__name__)
+
+# Base URL -> whether its provider's client verifies certificates. BorsaApiClient's
+# client (BtcTurk, Coinbase, KAP, Mynet) does not; İş Yatırım's and FRED's do.
+HOT_HOSTS: Dict[str, bool] = {
+    "https://api.btcturk.com/": False,
+    "https://graph-api.btcturk.com/": False,
+    "https://api.coinbase.com/": False,
+    "https://www.kap.org.tr/": False,
+    "https://finans.mynet.com/": False,
+    "https://www.isyatirim.com.tr/": True,
+    "https://fred.stlouisfed.org/": True,
+}
+
+# Under the pools' keepalive expiry, so a refreshed connection never expires idle.
+DEFAULT_INTERVAL = DEFAULT_KEEPALIVE_EXPIRY - 5
+PING_TIMEOUT = 5.0
+
+
+def _upstream(url: str) -> str:
+    return upstream_for_host(urlsplit(url).hostname or "")
+
+
+class _HostStatus:
+    __slots__ = ("warmed", "skipped", "failed", "last_ms", "last_error", "_seen")
+
+    def __init__(self):
+        self.warmed = self.skipped = self.failed = 0
+        self.last_ms: Optional[float] = None
+        self.last_error: Optional[str] = None
+        self._seen = -1    # the upstream's request count after our last ping
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            name: getattr(self, name)
+            for name in ("warmed", "skipped", "failed", "last_ms", "last_error")
+            if getattr(self, name) is not None
+        }
+
+
+class ConnectionWarmer:
+    """Opens, and keeps open, pooled connections to a set of hosts."""
+
+    def __init__(
+        self,
+        hosts: Dict[str, bool],
+        interval: float = DEFAULT_INTERVAL,
+        client_for: Callable[..., Any] = shared_http_client,
+    ):
+        self.hosts = dict(hosts)
+        self.interval = interval
+        self._client_for = client_for
+        self._status = {url: _HostStatus() for url in self.hosts}
+        self._task: Optional[asyncio.Task] = None
+        self.rounds = 0
+
+    @classmethod
+    def from_env(cls) -> "ConnectionWarmer":
+        hosts = HOT_HOSTS
+        raw = os.getenv("KEEPALIVE_HOSTS", "").strip()
+        if raw:
+            urls = [u.strip() for u in raw.split(",") if u.strip()]
+            hosts = {url: HOT_HOSTS.get(url, True) for url in urls}
+
+        interval = DEFAULT_INTERVAL
+        raw = os.getenv("KEEPALIVE_INTERVAL", "").strip()
+        if raw:
+            try:
+                interval = max(0.0, float(raw))
+            except ValueError:
+                logger.warning(f"KEEPALIVE_INTERVAL '{raw}' is not a number; using {interval}")
+        return cls(hosts, interval=interval)
+
+    async def _ping(self, url: str) -> None:
+        status = self._status[url]
+        started = time.monotonic()
+        try:
+            await self._client_for(verify=self.hosts[url]).request(
+                "HEAD", url, timeout=PING_TIMEOUT
+            )
+        except Exception as exc:
+            status.failed += 1
+            status.last_error = str(exc) or type(exc).__name__
+            logger.debug(f"Keepalive ping to {url} failed: {status.last_error}")
+        else:
+            status.warmed += 1
+            status.last_error = None
+        status.last_ms = round(1000 * (time.monotonic() - started), 1)
+
+    def _mark_seen(self) -> None:
+        # After the round, so our own pings -- to this host or another of its
+        # upstream's -- do not count as traffic next time.
+        for url, status in self._status.items():
+            status._seen = request_count(_upstream(url))
+
+    async def warm(self) -> None:
+        """Open a connection to every host; the warmup step."""
+        await asyncio.gather(*(self._ping(url) for url in self.hosts))
+        self._mark_seen()
+
+    async def refresh(self) -> None:
+        """Ping each host whose upstream has been idle since the last ping."""
+        self.rounds += 1
+        idle = []
+        for url, status in self._status.items():
+            if request_count(_upstream(url)) != status._seen:
+                status.skipped += 1
+            else:
+                idle.append(url)
+        await asyncio.gather(*(self._ping(url) for url in idle))
+        self._mark_seen()
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.refresh()
+            except Exception:
+                logger.exception("Keepalive refresh failed")
+
+    def start(self) -> None:
+        """Start refreshing in the background. Safe to call more than once."""
+        if self.interval <= 0 or not self.hosts or self._task is not None:
+            return
+        self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            "interval_s": self.interval,
+            "running": self._task is not None and not self._task.done(),
+            "rounds": self.rounds,
+            "hosts": {url: s.stats() for url, s in self._status.items()},
+        }
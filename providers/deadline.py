@@ -0,0 +1,206 @@
+"""
+Per-call deadlines, carried from the tool call down to every upstream request.
+
+A get_financial_ratios(ratio_set="comprehensive") chains valuation, Buffett, core
+health and advanced metrics -- dozens of upstream calls, most of them one after the
+other, each with its own timeout: 10 seconds per İş Yatırım financial group, 30 for
+TCMB, 60 on BorsaApiClient's shared client. Nothing added them up. The MCP clients
+give up after a minute or so; the server did not, and went on fetching statements
+for an answer nobody would read, holding slots the next caller needed.
+
+Each tool call now runs under a deadline (DeadlineMiddleware), kept in a context
+variable so it follows the call into tasks, gathers and pool threads:
+
+- UpstreamTransport shrinks each HTTP request's timeouts to the time that is left,
+  and does not send one at all once it is gone;
+- run_blocking does not start a call after the deadline, and stops waiting for one
+  when it passes -- the thread finishes on its own, the caller moves on;
+- call_with_retry does not back off past it.
+
+What runs out of time raises DeadlineExceededError. The multi-symbol fan-outs and
+get_financial_ratios already turn a failed part into a warning, so a call that runs
+out of time returns what it has, with warnings for the rest, instead of hanging
+until the client hangs up. The error is never retried and never counts against an
+upstream's circuit: running out of time says nothing about the upstream's health.
+The middleware gives the tool DEADLINE_GRACE seconds past the deadline to assemble
+that answer, then gives up on it.
+
+Deadlines per tool, in seconds, without a deploy:
+
+    TOOL_DEADLINES="get_financial_ratios=60,default=30"
+"""
+import asyncio
+import contextlib
+import contextvars
+import logging
+import os
+import time
+from typing import Any, Awaitable, Dict, Iterator, Optional, TypeVar
+
+from fastmcp.exceptions import ToolError
+from fastmcp.server.middleware import Middleware
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+DEFAULT_DEADLINE = 45.0
+
+# The tools that chain many upstream calls get longer.
+TOOL_DEADLINES: Dict[str, float] = {
+    "get_financial_ratios": 60.0,
+    "get_financial_statements": 60.0,
+    "screen_funds": 60.0,
+    "compare_assets": 60.0,
+    "get_sector_comparison": 60.0,
+}
+
+# Time to build a partial answer after the deadline has passed.
+DEADLINE_GRACE = 2.0
+
+_deadline: contextvars.ContextVar[Optional[float]] = contextvars.ContextVar(
+    "borsa_deadline", default=None
+)
+
+
+class DeadlineExceededError(Exception):
+    """The call's deadline passed before this part of it could finish."""
+
+
+def remaining() -> Optional[float]:
+    """Seconds left on the current deadline; None when there is none."""
+    deadline = _deadline.get()
+    if deadline is None:
+        return None
+    return max(0.0, deadline - time.monotonic())
+
+
+def expired() -> bool:
+    left = remaining()
+    return left is not None and left <= 0
+
+
+def check(what: str = "call") -> None:
+    """Raise DeadlineExceededError if the deadline has already passed."""
+    if expired():
+        raise DeadlineExceededError(f"Deadline exceeded before {what} could start")
+
+
+def bounded_timeout(timeout: Optional[float]) -> Optional[float]:
+    """`timeout`, shrunk to the time left on the deadline."""
+    left = remaining()
+    if left is None:
+        return timeout
+    return left if timeout is None else min(timeout, left)
+
+
+@contextlib.contextmanager
+def deadline_scope(seconds: Optional[float]) -> Iterator[None]:
+    """Run the body under a deadline `seconds` from now, or an earlier enclosing one."""
+    if seconds is None:
+        yield
+        return
+    deadline = time.monotonic() + seconds
+    current = _deadline.get()
+    token = _deadline.set(deadline if current is None else min(current, deadline))
+    try:
+        yield
+    finally:
+        _deadline.reset(token)
+
+
+@contextlib.contextmanager
+def no_deadline() -> Iterator[None]:
+    """Run the body with no deadline at all.
+
+    For work that outlives the call that started it -- a load shared with other
+    callers, a background refresh: a task copies the deadline of the context it is
+    created in, and one caller's deadline must not cut short what others wait on.
+    """
+    token = _deadline.set(None)
+    try:
+        yield
+    finally:
+        _deadline.reset(token)
+
+
+async def within_deadline(aw: Awaitable[T], what: str = "call") -> T:
+    """Await `aw`, giving up with DeadlineExceededError when the deadline passes."""
+    left = remaining()
+    if left is None:
+        return await aw
+    if left <= 0:
+        if asyncio.iscoroutine(aw):
+            aw.close()
+        raise DeadlineExceededError(f"Deadline exceeded before {what} could start")
+    try:
+        return await asyncio.wait_for(aw, left)
+    except asyncio.TimeoutError:
+        raise DeadlineExceededError(f"Deadline exceeded while waiting for {what}") from None
+
+
+def _parse_overrides(raw: str) -> Dict[str, float]:
+    overrides: Dict[str, float] = {}
+    for item in raw.split(","):
+        name, _, value = item.partition("=")
+        if not name.strip():
+            continue
+        try:
+            overrides[name.strip()] = float(value)
+        except ValueError:
+            logger.warning(f"TOOL_DEADLINES: ignoring '{item.strip()}'")
+    return overrides
+
+
+class DeadlineMiddleware(Middleware):
+    """Puts every tool call under its tool's deadline."""
+
+    def __init__(
+        self,
+        deadlines: Optional[Dict[str, float]] = None,
+        default: float = DEFAULT_DEADLINE,
+        grace: float = DEADLINE_GRACE,
+    ):
+        self.deadlines = dict(TOOL_DEADLINES if deadlines is None else deadlines)
+        self.default = default
+        self.grace = grace
+        self.exceeded = 0
+        self.abandoned = 0
+
+    @classmethod
+    def from_env(cls) -> "DeadlineMiddleware":
+        overrides = _parse_overrides(os.getenv("TOOL_DEADLINES", ""))
+        default = overrides.pop("default", DEFAULT_DEADLINE)
+        return cls({**TOOL_DEADLINES, **overrides}, default=default)
+
+    def deadline_for(self, tool_name: str) -> Optional[float]:
+        seconds = self.deadlines.get(tool_name, self.default)
+        return seconds if seconds and seconds > 0 else None
+
+    async def on_call_tool(self, context, call_next):
+        tool_name = context.message.name
+        seconds = self.deadline_for(tool_name)
+        if seconds is None:
+            return await call_next(context=context)
+
+        with deadline_scope(seconds):
+            started = time.monotonic()
+            try:
+                result = await asyncio.wait_for(call_next(context=context), seconds + self.grace)
+            except asyncio.TimeoutError:
+                self.abandoned += 1
+                raise ToolError(
+                    f"{tool_name} failed: deadline of {seconds:.0f}s exceeded | Try: narrow "
+                    f"the query (fewer symbols, a shorter period or a smaller ratio set)."
+                ) from None
+            if time.monotonic() - started > seconds:
+                self.exceeded += 1
+            return result
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "default_s": self.default,
+            "per_tool_s": self.deadlines,
+            "exceeded": self.exceeded,
+            "abandoned": self.abandoned,
+        }
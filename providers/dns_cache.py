@@ -0,0 +1,181 @@
+"""
+A DNS cache for the upstream connection pools.
+
+httpcore resolves the host every time it opens a connection, through getaddrinfo on
+a worker thread. With keepalive that is once per connection, but connections go cold
+between bursts -- every provider call after a quiet spell started with a lookup, and
+on a machine whose resolver is slow, or briefly down, that lookup was the slowest part
+of the request, or the reason it failed.
+
+CachingResolverBackend wraps httpcore's network backend in every pool UpstreamTransport
+creates (providers/upstream_http.py). It resolves a host once per DNS_CACHE_TTL and
+connects to the cached addresses, trying each in turn. When a lookup fails and an
+expired answer is at hand, the expired answer is used -- the upstream's address
+rarely changes in the minutes the resolver is unreachable. When no cached address
+accepts a connection, the entry is dropped so the next attempt resolves afresh.
+
+TLS is unaffected: httpcore sends the original host name for SNI and certificate
+checks, whatever address the connection went to. Counters are on /health
+(`dns_cache_stats()`).
+
+    DNS_CACHE_TTL=300     # seconds; 0 turns the cache off
+"""
+import asyncio
+import ipaddress
+import logging
+import os
+import socket
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+import httpcore
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TTL = 300.0
+
+Resolver = Callable[[str, int], Awaitable[List[str]]]
+
+
+def dns_cache_ttl() -> float:
+    raw = os.getenv("DNS_CACHE_TTL", "").strip()
+    if not raw:
+        return DEFAULT_TTL
+    try:
+        return max(0.0, float(raw))
+    except ValueError:
+        logger.warning(f"DNS_CACHE_TTL '{raw}' is not a number; using {DEFAULT_TTL}")
+        return DEFAULT_TTL
+
+
+async def _getaddrinfo(host: str, port: int) -> List[str]:
+    infos = await asyncio.get_running_loop().getaddrinfo(host, port, type=socket.SOCK_STREAM)
+    addresses: List[str] = []
+    for _, _, _, _, sockaddr in infos:
+        if sockaddr[0] not in addresses:
+            addresses.append(sockaddr[0])
+    return addresses
+
+
+def _is_literal(host: str) -> bool:
+    try:
+        ipaddress.ip_address(host)
+        return True
+    except ValueError:
+        return host == "localhost"
+
+
+class DnsCache:
+    """Resolved addresses per (host, port), kept for `ttl` seconds."""
+
+    def __init__(self, ttl: float = DEFAULT_TTL, resolve: Resolver = _getaddrinfo):
+        self.ttl = ttl
+        self._resolve = resolve
+        self._entries: Dict[Tuple[str, int], Tuple[List[str], float]] = {}
+
+        self.hits = 0
+        self.misses = 0
+        self.failures = 0
+        self.stale_served = 0
+        self.invalidated = 0
+
+    async def addresses(self, host: str, port: int, timeout: Optional[float] = None) -> List[str]:
+        key = (host, port)
+        entry = self._entries.get(key)
+        if entry is not None and entry[1] > time.monotonic():
+            self.hits += 1
+            return entry[0]
+
+        self.misses += 1
+        try:
+            addresses = await asyncio.wait_for(self._resolve(host, port), timeout)
+            if not addresses:
+                raise OSError(f"no addresses for {host}")
+        except Exception as exc:
+            self.failures += 1
+            if entry is not None:
+                self.stale_served += 1
+                logger.warning(f"DNS lookup for {host} failed ({exc}); using the cached answer")
+                return entry[0]
+            if isinstance(exc, asyncio.TimeoutError):
+                raise httpcore.ConnectTimeout(f"DNS lookup for {host} timed out") from None
+            raise httpcore.ConnectError(f"DNS lookup for {host} failed: {exc}") from exc
+        self._entries[key] = (addresses, time.monotonic() + self.ttl)
+        return addresses
+
+    def invalidate(self, host: str, port: int) -> None:
+        if self._entries.pop((host, port), None) is not None:
+            self.invalidated += 1
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "ttl_s": self.ttl,
+            "hosts": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "failures": self.failures,
+            "stale_served": self.stale_served,
+            "invalidated": self.invalidated,
+        }
+
+
+class CachingResolverBackend(httpcore.AsyncNetworkBackend):
+    """An httpcore network backend that connects to cached addresses."""
+
+    def __init__(self, backend: httpcore.AsyncNetworkBackend, cache: "DnsCache"):
+        self._backend = backend
+        self._cache = cache
+
+    async def connect_tcp(
+        self,
+        host: str,
+        port: int,
+        timeout: Optional[float] = None,
+        local_address: Optional[str] = None,
+        socket_options=None,
+    ) -> httpcore.AsyncNetworkStream:
+        if _is_literal(host):
+            return await self._backend.connect_tcp(
+                host, port, timeout=timeout, local_address=local_address,
+                socket_options=socket_options,
+            )
+        error: Optional[Exception] = None
+        for address in await self._cache.addresses(host, port, timeout):
+            try:
+                return await self._backend.connect_tcp(
+                    address, port, timeout=timeout, local_address=local_address,
+                    socket_options=socket_options,
+                )
+            except (httpcore.ConnectError, httpcore.ConnectTimeout) as exc:
+                error = exc
+        # None of them answered: the next attempt looks the host up again.
+        self._cache.invalidate(host, port)
+        if error is None:
+            raise httpcore.ConnectError(f"no addresses for {host}")
+        raise error
+
+    async def connect_unix_socket(self, path: str, timeout=None, socket_options=None):
+        return await self._backend.connect_unix_socket(
+            path, timeout=timeout, socket_options=socket_options
+        )
+
+    async def sleep(self, seconds: float) -> None:
+        await self._backend.sleep(seconds)
+
+
+_cache: Optional[DnsCache] = None
+
+
+def dns_cache() -> Optional[DnsCache]:
+    """The process's DNS cache; None when DNS_CACHE_TTL is 0."""
+    global _cache
+    if _cache is None:
+        ttl = dns_cache_ttl()
+        if ttl <= 0:
+            return None
+        _cache = DnsCache(ttl)
+    return _cache
+
+
+def dns_cache_stats() -> Optional[Dict[str, Any]]:
+    return _cache.stats() if _cache is not None else None
@@ -13,6 +13,8 @@ from models import (
     DovizcomVarligi, DovizcomOHLCVarligi
 )
 from .dovizcom_auth import DovizcomAuthManager
+from .cache import CacheNamespace
+from .ttl_policy import DataKind, ttl_for
 
 logger = logging.getLogger(__name__)
 
@@ -56,8 +58,10 @@ class DovizcomProvider:
     
     def __init__(self, client: httpx.AsyncClient):
         self._http_client = client
-        self._cache: Dict[str, Dict] = {}
-        self._last_fetch_times: Dict[str, float] = {}
+        self._cache = CacheNamespace(
+            "dovizcom.current", ttl=self.CACHE_DURATION,
+            max_entries=len(self.SUPPORTED_ASSETS),
+        )
         self._auth_manager = DovizcomAuthManager(client)
     
     async def _get_request_headers(self, asset: str) -> Dict[str, str]:
@@ -169,10 +173,8 @@ class DovizcomProvider:
             
             # Check cache
             cache_key = f"current_{asset}"
-            current_time = time.time()
-            if (cache_key in self._cache and 
-                (current_time - self._last_fetch_times.get(cache_key, 0)) < self.CACHE_DURATION):
-                cached_data = self._cache[cache_key]
+            cached_data = self._cache.get(cache_key)
+            if cached_data is not None:
                 return DovizcomGuncelSonucu(
                     varlik_adi=self.SUPPORTED_ASSETS.get(asset, asset),
                     guncel_deger=cached_data.get('close'),
@@ -212,9 +214,12 @@ class DovizcomProvider:
                 else:
                     latest = archive_data[0]  # Most recent data point
             
-            # Cache the result
-            self._cache[cache_key] = latest
-            self._last_fetch_times[cache_key] = current_time
+            # Cache the result. Weekday quotes keep the minute TTL; over the weekend
+            # doviz.com stands still, so there is nothing to refetch until Monday.
+            self._cache.set(
+                cache_key, latest,
+                ttl=max(self.CACHE_DURATION, ttl_for("fx", DataKind.QUOTE)),
+            )
             
             # Convert timestamp to datetime if it's a number
             update_date = latest.get('update_date')
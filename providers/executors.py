@@ -0,0 +1,235 @@
+"""
+Named thread pools, one per upstream, for the blocking libraries we call.
+
+borsapy, yfinance and TEFAS's client are synchronous: every property on a Ticker, a
+Fund or an FX object may be a network round trip. Many of the `async def` methods
+that wrap them touched those properties inline -- `ticker.fast_info`, `ticker.info`,
+`ticker.history()`, `ticker.balance_sheet` -- which ran the request on the event loop
+itself and froze every other MCP session on the process until Yahoo answered. The
+places that did use an executor used the loop's default one, shared by everything,
+so a Yahoo stall could still take every worker thread away from TEFAS.
+
+Each upstream gets its own bounded ThreadPoolExecutor, created on first use, with
+counters for queue depth, wait time and failures (`executor_stats()`, on /health).
+A slow upstream fills its own pool and queues behind it; the others carry on.
+
+Two ways in:
+
+    await run_blocking("yahoo", ticker.history, period="1mo")
+
+    @blocking("borsapy")
+    def get_hizli_bilgi(self, ticker_kodu): ...   # now awaitable, runs in the pool
+
+The caller's context variables travel with the call into the worker thread. Calls
+wait for a slot in the upstream's bulkhead (providers/bulkhead.py) before they reach
+the pool, so a burst is queued -- or refused -- there, with its own counters, instead of
+piling up unbounded in the pool's work queue. The slot is held until the pool's
+future is done, not until the caller stops waiting: a call abandoned at its deadline
+keeps its thread busy, and keeps its slot with it. Before that, the upstream's circuit
+breaker (providers/circuit_breaker.py) refuses the call outright while it is open,
+and the whole call is bounded by the tool call's deadline (providers/deadline.py).
+
+Local CPU work -- a payload built from a frame already downloaded, indicators over
+bars already fetched -- runs through `run_compute`, in a "compute" pool behind no
+breaker and no bulkhead. It went through `run_blocking("borsapy", ...)`, where it
+counted as a borsapy success, could be the half-open probe that closed the circuit
+without TradingView being called at all, and took bulkhead slots from real calls.
+
+Pool sizes, per upstream, without a deploy:
+
+    UPSTREAM_WORKERS="yahoo=8,borsapy=16,tefas=4,compute=4"
+"""
+import asyncio
+import contextvars
+import functools
+import logging
+import os
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional
+
+from providers import deadline
+from providers.bulkhead import bulkhead
+from providers.circuit_breaker import circuit
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_WORKERS = 4
+
+COMPUTE = "compute"
+
+# Sized to how much each upstream tolerates and how much we call it. borsapy covers
+# TradingView, doviz.com and the BIST index pages; its history calls dominate.
+UPSTREAM_WORKERS: Dict[str, int] = {
+    "borsapy": 16,
+    "yahoo": 8,
+    "tefas": 6,
+    "isyatirim": 4,
+    "evds": 4,
+    # Not an upstream: local CPU work, see run_compute.
+    COMPUTE: 4,
+}
+
+
+def _configured_workers() -> Dict[str, int]:
+    workers = dict(UPSTREAM_WORKERS)
+    for item in os.getenv("UPSTREAM_WORKERS", "").split(","):
+        name, _, raw = item.partition("=")
+        if not name.strip():
+            continue
+        try:
+            workers[name.strip()] = max(1, int(raw))
+        except ValueError:
+            logger.warning(f"UPSTREAM_WORKERS: ignoring '{item.strip()}'")
+    return workers
+
+
+class UpstreamExecutor:
+    """A bounded thread pool for one upstream, with queue and latency counters."""
+
+    def __init__(self, name: str, max_workers: int):
+        self.name = name
+        self.max_workers = max_workers
+        self._pool = ThreadPoolExecutor(max_workers, thread_name_prefix=f"upstream-{name}")
+        self._lock = threading.Lock()
+
+        self.queued = 0
+        self.active = 0
+        self.max_queued = 0
+        self.completed = 0
+        self.failed = 0
+        self.cancelled = 0
+        self._wait_total = 0.0
+        self.max_wait = 0.0
+
+    async def run(self, fn: Callable[..., Any], *args, **kwargs) -> Any:
+        return await asyncio.wrap_future(self.submit(fn, *args, **kwargs))
+
+    def submit(self, fn: Callable[..., Any], *args, **kwargs) -> Future:
+        """Queue the call with the caller's context; its future, done when it has run."""
+        submitted = time.monotonic()
+        context = contextvars.copy_context()
+
+        def call():
+            started = time.monotonic()
+            with self._lock:
+                self.queued -= 1
+                self.active += 1
+                waited = started - submitted
+                self._wait_total += waited
+                self.max_wait = max(self.max_wait, waited)
+            try:
+                return context.run(fn, *args, **kwargs)
+            except BaseException:
+                with self._lock:
+                    self.failed += 1
+                raise
+            finally:
+                with self._lock:
+                    self.active -= 1
+                    self.completed += 1
+
+        with self._lock:
+            self.queued += 1
+            self.max_queued = max(self.max_queued, self.queued)
+        future = self._pool.submit(call)
+        future.add_done_callback(self._dequeue_if_cancelled)
+        return future
+
+    def _dequeue_if_cancelled(self, future: Future) -> None:
+        # A caller that gave up before a thread picked the call up: it never ran.
+        if future.cancelled():
+            with self._lock:
+                self.queued -= 1
+                self.cancelled += 1
+
+    def shutdown(self, wait: bool = False) -> None:
+        self._pool.shutdown(wait=wait, cancel_futures=True)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            started = self.completed + self.active
+            return {
+                "workers": self.max_workers,
+                "active": self.active,
+                "queued": self.queued,
+                "max_queued": self.max_queued,
+                "completed": self.completed,
+                "failed": self.failed,
+                "cancelled": self.cancelled,
+                "avg_wait_ms": round(1000 * self._wait_total / started, 1) if started else None,
+                "max_wait_ms": round(1000 * self.max_wait, 1),
+            }
+
+
+_executors: Dict[str, UpstreamExecutor] = {}
+_executors_lock = threading.Lock()
+
+
+def executor(name: str) -> UpstreamExecutor:
+    """The pool for `name`, created on first use."""
+    pool = _executors.get(name)
+    if pool is None:
+        with _executors_lock:
+            pool = _executors.get(name)
+            if pool is None:
+                workers = _configured_workers().get(name, DEFAULT_WORKERS)
+                pool = _executors[name] = UpstreamExecutor(name, workers)
+    return pool
+
+
+async def run_blocking(upstream: str, fn: Callable[..., Any], *args, **kwargs) -> Any:
+    """Run a blocking call in `upstream`'s pool, behind its breaker and bulkhead.
+
+    Within the call's deadline, if it has one: not started once it has passed, and
+    not waited for -- in the bulkhead queue or in the pool -- beyond it.
+    """
+    what = f"{upstream} call"
+    deadline.check(what)
+
+    async def call():
+        limiter = bulkhead(upstream)
+        await limiter.acquire()
+        try:
+            future = executor(upstream).submit(fn, *args, **kwargs)
+        except BaseException:
+            limiter.release()
+            raise
+        limiter.release_when_done(future)
+        return await asyncio.wrap_future(future)
+
+    with circuit(upstream).guard():
+        return await deadline.within_deadline(call(), what)
+
+
+async def run_compute(fn: Callable[..., Any], *args, **kwargs) -> Any:
+    """Run local CPU work off the event loop, in the compute pool.
+
+    For work on data already in hand: it says nothing about any upstream's health,
+    so it is kept out of their breakers and bulkheads.
+    """
+    return await executor(COMPUTE).run(fn, *args, **kwargs)
+
+
+def blocking(upstream: str, method: Optional[Callable[..., Any]] = None):
+    """Turn a synchronous function into a coroutine function that runs in a pool."""
+    if method is None:
+        return functools.partial(blocking, upstream)
+
+    @functools.wraps(method)
+    async def wrapper(*args, **kwargs):
+        return await run_blocking(upstream, method, *args, **kwargs)
+
+    return wrapper
+
+
+def executor_stats() -> Dict[str, Dict[str, Any]]:
+    return {name: pool.stats() for name, pool in sorted(_executors.items())}
+
+
+def shutdown_executors(wait: bool = False) -> None:
+    with _executors_lock:
+        for pool in _executors.values():
+            pool.shutdown(wait=wait)
+        _executors.clear()
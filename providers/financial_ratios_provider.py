@@ -1183,30 +1183,25 @@ class FinancialRatiosProvider:
             else:
                 # BIST: Fetch latest inflation data from TCMB
                 from providers.tcmb_provider import TcmbProvider
-                import httpx
-
-                tcmb_client = httpx.AsyncClient(timeout=30.0, verify=False)
-                try:
-                    tcmb_provider = TcmbProvider(tcmb_client)
-                    inflation_result = await tcmb_provider.get_inflation_data(
-                        inflation_type='tufe',
-                        limit=1
-                    )
-
-                    if inflation_result.data and len(inflation_result.data) > 0:
-                        latest_inflation = inflation_result.data[0]
-                        inflation_percent = latest_inflation.yillik_enflasyon or 0
-                        inflation_date = latest_inflation.ay_yil
-                        inflation_source = 'TCMB (live)'
-                    else:
-                        # Fallback to default
-                        inflation_percent = 50.0  # Conservative estimate for Turkey
-                        inflation_date = 'Default'
-                        inflation_source = 'Default estimate'
-                        logger.warning(f"Could not fetch inflation data, using default {inflation_percent}%")
-
-                finally:
-                    await tcmb_client.aclose()
+                from providers.http_client import shared_http_client
+
+                tcmb_provider = TcmbProvider(shared_http_client(verify=False))
+                inflation_result = await tcmb_provider.get_inflation_data(
+                    inflation_type='tufe',
+                    limit=1
+                )
+
+                if inflation_result.data and len(inflation_result.data) > 0:
+                    latest_inflation = inflation_result.data[0]
+                    inflation_percent = latest_inflation.yillik_enflasyon or 0
+                    inflation_date = latest_inflation.ay_yil
+                    inflation_source = 'TCMB (live)'
+                else:
+                    # Fallback to default
+                    inflation_percent = 50.0  # Conservative estimate for Turkey
+                    inflation_date = 'Default'
+                    inflation_source = 'Default estimate'
+                    logger.warning(f"Could not fetch inflation data, using default {inflation_percent}%")
 
             # Calculate Real Growth using Fisher Equation approximation
             # Real Growth ≈ Nominal Growth - Inflation
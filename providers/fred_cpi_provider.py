@@ -10,11 +10,9 @@ both learned the hard way in this repo (CLAUDE.md #5, #7):
     years, so a series assembled from both yields ratios that are silently wrong.
 """
 
-import asyncio
 import csv
 import io
 import logging
-import time
 from dataclasses import dataclass, field
 from datetime import date
 from typing import Dict, List, Optional
@@ -22,6 +20,9 @@ from typing import Dict, List, Optional
 import httpx
 from borsapy.exceptions import DataNotAvailableError
 
+from providers.http_client import shared_http_client
+from providers.cache import CacheNamespace
+
 logger = logging.getLogger(__name__)
 
 
@@ -59,6 +60,7 @@ FRED_CSV_URL = "https://fred.stlouisfed.org/graph/fredgraph.csv?id={series_id}"
 
 MIN_OBSERVATIONS = 200
 CACHE_TTL_SECONDS = 6 * 3600
+REQUEST_TIMEOUT = 30.0
 
 # CPI/HICP land a few weeks after the month they cover, so in mid-July the newest
 # published month is May -- two months back and perfectly healthy. Only a longer
@@ -209,14 +211,11 @@ class FredCpiProvider:
     }
 
     def __init__(self, client: Optional[httpx.AsyncClient] = None):
-        self._client = client or httpx.AsyncClient(timeout=30.0)
-        self._cache: Dict[str, tuple] = {}          # region -> (fetched_at, IndexSeries)
-        self._locks: Dict[str, asyncio.Lock] = {}   # region -> single-flight lock
-
-    def _lock(self, region: str) -> asyncio.Lock:
-        if region not in self._locks:
-            self._locks[region] = asyncio.Lock()
-        return self._locks[region]
+        self._client = client or shared_http_client()
+        self._cache = CacheNamespace(                # region -> IndexSeries
+            "fred.index_series", ttl=CACHE_TTL_SECONDS, max_entries=len(self.SERIES),
+            shared=True, persist=True,
+        )
 
     async def get_index_series(
         self, region: str, today: Optional[date] = None
@@ -226,13 +225,7 @@ class FredCpiProvider:
                 f"Unknown region '{region}'. Supported: {sorted(self.SERIES)}."
             )
 
-        # Single-flight: a cold start with concurrent callers makes one upstream
-        # call, not N. This also protects the anonymous BLS quota (25/day/IP).
-        async with self._lock(region):
-            cached = self._cache.get(region)
-            if cached and (time.time() - cached[0]) < CACHE_TTL_SECONDS:
-                return cached[1]
-
+        async def load() -> IndexSeries:
             series = await self._fetch_primary(region)
             if series is None:
                 series = await self._fetch_fallback(region)
@@ -241,16 +234,18 @@ class FredCpiProvider:
                     f"Could not fetch a valid {region.upper()} price index from "
                     f"FRED or its fallback."
                 )
-
             self._annotate_freshness(series, today or date.today())
-            self._cache[region] = (time.time(), series)
             return series
 
+        # Single-flight: a cold start with concurrent callers makes one upstream
+        # call, not N. This also protects the anonymous BLS quota (25/day/IP).
+        return await self._cache.get_or_load(region, load)
+
     async def _fetch_primary(self, region: str) -> Optional[IndexSeries]:
         spec = self.SERIES[region]
         try:
             response = await self._client.get(
-                FRED_CSV_URL.format(series_id=spec.series_id)
+                FRED_CSV_URL.format(series_id=spec.series_id), timeout=REQUEST_TIMEOUT
             )
             response.raise_for_status()
             values = parse_fred_csv(response.text, spec.series_id)
@@ -268,7 +263,7 @@ class FredCpiProvider:
     async def _fetch_fallback(self, region: str) -> Optional[IndexSeries]:
         label, url = FALLBACK_SOURCES[region]
         try:
-            response = await self._client.get(url)
+            response = await self._client.get(url, timeout=REQUEST_TIMEOUT)
             response.raise_for_status()
             payload = response.json()
             values = (
@@ -0,0 +1,189 @@
+"""
+Hedged requests: when an attempt is slower than usual, start a second one.
+
+A BIST history call that TradingView's websocket drops does not fail fast: it waits
+for data that never comes, until borsapy gives up with "No data received", and only
+then does call_with_retry back off and try again. Those drops are most of the p99 of
+get_historical_data for BIST -- the median call answers in well under a second, the
+dropped ones take many times that before the retry even starts.
+
+With hedging on for an upstream, `hedged(upstream, attempt)` starts `attempt()`, and
+if it has not answered within the upstream's recent HEDGE_PERCENTILE latency, starts
+a second one and takes whichever succeeds first. The loser is cancelled -- its pool
+thread still finishes the request it started, the result is dropped. A failure from
+one attempt waits for the other. The delay adapts: it is the percentile of the
+last few hundred successful attempts, clamped to [MIN_DELAY, MAX_DELAY], with a fixed
+INITIAL_DELAY until there are enough samples.
+
+Every hedge is an extra upstream call, so they are capped: at most HEDGE_BUDGET_RATIO
+of recent calls may hedge (a RetryBudget of their own, see providers/retry.py). When
+the upstream is slow for everyone the budget runs out and calls simply wait, rather
+than doubling the load on a service that is already struggling.
+
+Off unless the upstream is listed; counters and the current delay are on /health.
+
+    HEDGED_UPSTREAMS=borsapy
+    HEDGE_PERCENTILE=0.9
+    HEDGE_BUDGET_RATIO=0.1
+"""
+import asyncio
+import logging
+import os
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable, Dict, Optional, TypeVar
+
+from providers.retry import RetryBudget
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+DEFAULT_PERCENTILE = 0.9
+DEFAULT_BUDGET_RATIO = 0.1
+# One hedge per ten seconds even when traffic is too thin for the ratio to allow one.
+BUDGET_RESERVE_PER_SECOND = 0.1
+INITIAL_DELAY = 1.5
+MIN_DELAY = 0.1
+MAX_DELAY = 5.0
+MIN_SAMPLES = 20
+SAMPLES = 256
+
+
+def _env_float(name: str, default: float) -> float:
+    raw = os.getenv(name, "").strip()
+    if not raw:
+        return default
+    try:
+        return float(raw)
+    except ValueError:
+        logger.warning(f"{name} '{raw}' is not a number; using {default}")
+        return default
+
+
+def hedged_upstreams() -> set:
+    return {name.strip() for name in os.getenv("HEDGED_UPSTREAMS", "").split(",") if name.strip()}
+
+
+class Hedger:
+    """Adaptive hedging for one upstream."""
+
+    def __init__(
+        self,
+        name: str,
+        enabled: bool = True,
+        percentile: float = DEFAULT_PERCENTILE,
+        budget: Optional[RetryBudget] = None,
+    ):
+        self.name = name
+        self.enabled = enabled
+        self.percentile = percentile
+        self.budget = budget or RetryBudget(
+            ratio=DEFAULT_BUDGET_RATIO, reserve_per_second=BUDGET_RESERVE_PER_SECOND
+        )
+        self._latencies: deque = deque(maxlen=SAMPLES)
+
+        self.calls = 0
+        self.hedged = 0
+        self.hedge_wins = 0
+        self.budget_denied = 0
+
+    @classmethod
+    def from_env(cls, name: str) -> "Hedger":
+        ratio = _env_float("HEDGE_BUDGET_RATIO", DEFAULT_BUDGET_RATIO)
+        return cls(
+            name,
+            enabled=name in hedged_upstreams(),
+            percentile=_env_float("HEDGE_PERCENTILE", DEFAULT_PERCENTILE),
+            budget=RetryBudget(ratio=ratio, reserve_per_second=BUDGET_RESERVE_PER_SECOND),
+        )
+
+    def _quantile(self, q: float) -> Optional[float]:
+        if not self._latencies:
+            return None
+        ordered = sorted(self._latencies)
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+    def delay(self) -> float:
+        """How long the first attempt gets before the hedge starts."""
+        if len(self._latencies) < MIN_SAMPLES:
+            return INITIAL_DELAY
+        return min(MAX_DELAY, max(MIN_DELAY, self._quantile(self.percentile)))
+
+    async def _timed(self, attempt: Callable[[], Awaitable[T]]) -> T:
+        started = time.monotonic()
+        result = await attempt()
+        self._latencies.append(time.monotonic() - started)
+        return result
+
+    async def call(self, attempt: Callable[[], Awaitable[T]]) -> T:
+        self.calls += 1
+        if not self.enabled:
+            return await self._timed(attempt)
+
+        self.budget.record_attempt()
+        first = asyncio.ensure_future(self._timed(attempt))
+        attempts = [first]
+        try:
+            done, _ = await asyncio.wait({first}, timeout=self.delay())
+            if done:
+                return first.result()
+            if not self.budget.try_retry():
+                self.budget_denied += 1
+                return await first
+
+            self.hedged += 1
+            second = asyncio.ensure_future(self._timed(attempt))
+            attempts.append(second)
+            pending = {first, second}
+            error: Optional[BaseException] = None
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if task is second:
+                            self.hedge_wins += 1
+                        return task.result()
+                    if error is None or task is first:
+                        error = task.exception()
+            raise error
+        finally:
+            # The loser, or both when the caller gave up.
+            for task in attempts:
+                task.cancel()
+
+    def stats(self) -> Dict[str, Any]:
+        def ms(value: Optional[float]) -> Optional[float]:
+            return round(1000 * value, 1) if value is not None else None
+
+        return {
+            "enabled": self.enabled,
+            "calls": self.calls,
+            "hedged": self.hedged,
+            "hedge_wins": self.hedge_wins,
+            "budget_denied": self.budget_denied,
+            "hedge_delay_ms": ms(self.delay()) if self.enabled else None,
+            "p50_ms": ms(self._quantile(0.5)),
+            "p90_ms": ms(self._quantile(0.9)),
+            "p99_ms": ms(self._quantile(0.99)),
+        }
+
+
+_hedgers: Dict[str, Hedger] = {}
+
+
+def hedger(name: str) -> Hedger:
+    """The hedger for `name`, created on first use."""
+    h = _hedgers.get(name)
+    if h is None:
+        h = _hedgers[name] = Hedger.from_env(name)
+    return h
+
+
+async def hedged(upstream: str, attempt: Callable[[], Awaitable[T]]) -> T:
+    """Await `attempt()`, hedged with a second one if `upstream` has hedging on."""
+    return await hedger(upstream).call(attempt)
+
+
+def hedging_stats() -> Dict[str, Dict[str, Any]]:
+    return {name: h.stats() for name, h in sorted(_hedgers.items())}
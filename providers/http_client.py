@@ -0,0 +1,96 @@
+"""
+The httpx clients the providers share.
+
+Each HTTP-speaking provider used to bring its own client: İş Yatırım opened a fresh
+httpx.AsyncClient for every financial group of every statement request, TEFAS's
+Takasbank list went through a synchronous requests.Session on the event loop, and
+FRED, the scanner, the economic calendar and the ratio calculator's TCMB lookup each
+built their own. A client's connections die with it, so nearly every İş Yatırım
+request paid for DNS, a TCP connect and a TLS handshake -- a large share of what a
+statement fetch took -- and none of those pools were bounded or visible.
+
+They now share two process-wide LoopBoundHttpClients, one verifying certificates and
+one not (KAP, Mynet, TCMB and Takasbank need that), from `shared_http_client()`. Each
+sends through UpstreamTransport, which keeps a connection pool per upstream with its
+own limits and keepalive, and reports how often requests had to open a connection
+(providers/upstream_http.py). Timeouts are given per request where a provider needs
+one shorter than the client's.
+"""
+import asyncio
+import threading
+from typing import Any, Dict, Tuple
+
+import httpx
+
+from providers.upstream_http import UpstreamTransport
+
+
+class LoopBoundHttpClient:
+    """An httpx.AsyncClient that follows the event loop it is used on.
+
+    BorsaApiClient is built at import time (market_router is a module-level singleton),
+    so its httpx client used to be constructed before any loop existed. httpx binds a
+    connection pool to the loop of its first request; when that loop closes, every later
+    request dies with `RuntimeError: Event loop is closed`.
+
+    Production runs one long-lived loop, so this only ever bit the test suite — except
+    for what the error *became*. The exchange providers catch their own exceptions and
+    return an empty result carrying `error_message`, and the callers only checked whether
+    the data was empty. So a dead connection reached the model as "BTCTRY has no quote",
+    which reads as "this pair does not trade". A transport failure had been laundered
+    into a false claim about the market.
+
+    One client per loop, created on first use, so the pool is always live. Each request
+    goes through its host's circuit breaker, bulkhead and connection pool
+    (providers/upstream_http.py), so KAP, Mynet, BtcTurk, Coinbase and doviz.com are
+    limited separately even though they share this client.
+    """
+
+    def __init__(self, timeout: float = 60.0, verify: bool = False):
+        self._timeout = timeout
+        self._verify = verify
+        self._clients: Dict[Any, httpx.AsyncClient] = {}
+
+    def _client_for_current_loop(self) -> httpx.AsyncClient:
+        loop = asyncio.get_running_loop()
+        client = self._clients.get(loop)
+        if client is None or client.is_closed:
+            # Clients of loops that have closed cannot be used, or closed, any more.
+            for stale in [old for old in self._clients if old.is_closed()]:
+                del self._clients[stale]
+            client = httpx.AsyncClient(
+                timeout=self._timeout,
+                transport=UpstreamTransport(verify=self._verify),
+            )
+            self._clients[loop] = client
+        return client
+
+    async def get(self, *args, **kwargs):
+        return await self._client_for_current_loop().get(*args, **kwargs)
+
+    async def post(self, *args, **kwargs):
+        return await self._client_for_current_loop().post(*args, **kwargs)
+
+    async def request(self, *args, **kwargs):
+        return await self._client_for_current_loop().request(*args, **kwargs)
+
+    async def aclose(self) -> None:
+        for client in list(self._clients.values()):
+            await client.aclose()
+        self._clients.clear()
+
+
+_shared: Dict[Tuple[float, bool], LoopBoundHttpClient] = {}
+_shared_lock = threading.Lock()
+
+
+def shared_http_client(timeout: float = 60.0, verify: bool = True) -> LoopBoundHttpClient:
+    """The process's client for `timeout` and `verify`, created on first use."""
+    key = (timeout, verify)
+    client = _shared.get(key)
+    if client is None:
+        with _shared_lock:
+            client = _shared.get(key)
+            if client is None:
+                client = _shared[key] = LoopBoundHttpClient(timeout=timeout, verify=verify)
+    return client
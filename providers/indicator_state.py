@@ -0,0 +1,331 @@
+"""
+Indicator state per (symbol, timeframe), advanced bar by bar.
+
+Every technical-analysis call recomputed each EMA, the RSI and every rolling window
+from the first bar of a six-month history -- for the same few names, over and over,
+through the trading day, when all that had changed since the previous call was a bar
+or two at the end.
+
+An IndicatorStore keeps, per key, what the indicators need to carry on from the last
+bar they saw: the EMA12/26 and MACD-signal values, Wilder's average gain and loss,
+and the last bars themselves (as many as the longest window, SMA200). A call hands
+over the bars it fetched; the store finds the last bar it committed among them,
+checks that the bars it still holds have not moved, and applies only the bars after
+it, each in constant time. The result is the one providers/indicators.py computes
+over the same bars, to rounding.
+
+The newest bar is never committed: while the session is open it is still forming,
+and the next call will bring it back changed. It is applied to a copy of the state
+for the answer and dropped. It is committed once a newer bar follows it.
+
+The state is built again from the bars at hand -- in one vectorised pass, as
+`indicators.compute` does -- when there is none yet and when carrying on would be
+wrong:
+
+- revised: a stored bar's close has moved by more than bar_store's
+  REVISION_TOLERANCE, or a bar appeared or vanished among them. A split rewrites an
+  adjusted series backwards, and EMAs carried over the old basis would be wrong.
+- gap: the bars no longer reach back to the last committed one, as after a state
+  left untouched for longer than the fetched window.
+
+The states are held in a `persist=True` CacheNamespace per source, so they survive a
+restart through providers/cache_snapshot.py. `compute` runs in the providers' pool
+threads, so the read, advance and write of a state happen under the store's lock:
+two calls for one series must not both advance the same state, and the namespace is
+locked against the snapshot dumping it meanwhile. Counters per source are on /health.
+
+    INDICATOR_STATE_MAX=512     # states kept per source
+"""
+import logging
+import os
+import threading
+import weakref
+from typing import Any, Dict, Hashable, Optional
+
+import numpy as np
+import pandas as pd
+
+from providers.bar_store import REVISION_TOLERANCE
+from providers.cache import CacheNamespace
+from providers.indicators import (
+    EMA_FAST,
+    EMA_SLOW,
+    MACD_SIGNAL,
+    RSI_PERIOD,
+    SMA_WINDOWS,
+    Indicators,
+    column,
+    ema,
+    fill_windows,
+    finite,
+    rsi_from_averages,
+    span_alpha,
+)
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_ENTRIES = 512
+# A state not used for a week is likely past the fetched window anyway.
+DEFAULT_TTL = 7 * 24 * 60 * 60
+
+# Bars held: the longest window the indicators look back over.
+WINDOW = max(SMA_WINDOWS)
+HIGH, LOW, CLOSE, VOLUME = range(4)
+
+_FAST, _SLOW, _SIGNAL = span_alpha(EMA_FAST), span_alpha(EMA_SLOW), span_alpha(MACD_SIGNAL)
+_RSI = 1.0 / RSI_PERIOD
+
+
+def state_max_entries() -> int:
+    raw = os.getenv("INDICATOR_STATE_MAX", "").strip()
+    if not raw:
+        return DEFAULT_MAX_ENTRIES
+    try:
+        return max(1, int(raw))
+    except ValueError:
+        logger.warning(f"INDICATOR_STATE_MAX '{raw}' is not a number; using {DEFAULT_MAX_ENTRIES}")
+        return DEFAULT_MAX_ENTRIES
+
+
+def _stamps(values: Any) -> np.ndarray:
+    """Bar times as int64: numbers as they are, datetimes as UTC nanoseconds."""
+    array = np.asarray(values)
+    if array.dtype.kind in "iu":
+        return array.astype(np.int64)
+    return pd.DatetimeIndex(values).as_unit("ns").asi8
+
+
+class _Rebuild(Exception):
+    """The state cannot carry on over these bars; `reason` says why."""
+
+    def __init__(self, reason: str):
+        super().__init__(reason)
+        self.reason = reason
+
+
+class IndicatorState:
+    """The running indicator values and last bars of one series."""
+
+    __slots__ = (
+        "bars", "has_volume", "fast", "slow", "macd", "signal",
+        "previous_macd", "previous_signal", "gain", "loss", "stamps", "window",
+    )
+
+    def __init__(self, has_volume: bool = True):
+        self.bars = 0
+        self.has_volume = has_volume
+        self.fast = self.slow = self.macd = self.signal = 0.0
+        self.previous_macd = self.previous_signal = 0.0
+        # The sums of the gains and losses until RSI_PERIOD moves are in; Wilder's
+        # averages after.
+        self.gain = self.loss = 0.0
+        self.stamps = np.zeros(WINDOW, dtype=np.int64)
+        self.window = np.full((4, WINDOW), np.nan)
+
+    @classmethod
+    def build(cls, stamps: np.ndarray, rows: np.ndarray, has_volume: bool) -> "IndicatorState":
+        """The state after all of `rows` (high, low, close, volume), in one pass."""
+        state = cls(has_volume)
+        n = rows.shape[1]
+        state.bars = n
+        if n == 0:
+            return state
+        close = rows[CLOSE]
+        fast, slow = ema(close, _FAST), ema(close, _SLOW)
+        macd = fast - slow
+        signal = ema(macd, _SIGNAL)
+        state.fast, state.slow = float(fast[-1]), float(slow[-1])
+        state.macd, state.signal = float(macd[-1]), float(signal[-1])
+        if n > 1:
+            state.previous_macd, state.previous_signal = float(macd[-2]), float(signal[-2])
+
+        delta = np.diff(close)
+        gains, losses = np.maximum(delta, 0.0), np.maximum(-delta, 0.0)
+        state.gain, state.loss = float(gains[:RSI_PERIOD].sum()), float(losses[:RSI_PERIOD].sum())
+        if len(delta) >= RSI_PERIOD:
+            state.gain /= RSI_PERIOD
+            state.loss /= RSI_PERIOD
+            if len(delta) > RSI_PERIOD:
+                state.gain = float(ema(gains[RSI_PERIOD:], _RSI, state.gain)[-1])
+                state.loss = float(ema(losses[RSI_PERIOD:], _RSI, state.loss)[-1])
+
+        kept = min(n, WINDOW)
+        state.stamps[WINDOW - kept:] = stamps[-kept:]
+        state.window[:, WINDOW - kept:] = rows[:, -kept:]
+        return state
+
+    def clone(self) -> "IndicatorState":
+        other = IndicatorState.__new__(IndicatorState)
+        for name in self.__slots__:
+            setattr(other, name, getattr(self, name))
+        other.stamps = self.stamps.copy()
+        other.window = self.window.copy()
+        return other
+
+    def push(self, stamp: int, high: float, low: float, close: float, volume: float) -> None:
+        """Apply one bar, after the last one."""
+        if self.bars == 0:
+            self.fast = self.slow = close
+        else:
+            delta = close - self.window[CLOSE, -1]
+            gain, loss = max(delta, 0.0), max(-delta, 0.0)
+            if self.bars <= RSI_PERIOD:
+                self.gain += gain
+                self.loss += loss
+                if self.bars == RSI_PERIOD:
+                    self.gain /= RSI_PERIOD
+                    self.loss /= RSI_PERIOD
+            else:
+                self.gain += _RSI * (gain - self.gain)
+                self.loss += _RSI * (loss - self.loss)
+            self.fast += _FAST * (close - self.fast)
+            self.slow += _SLOW * (close - self.slow)
+        self.previous_macd, self.previous_signal = self.macd, self.signal
+        self.macd = self.fast - self.slow
+        self.signal = self.macd if self.bars == 0 else self.signal + _SIGNAL * (self.macd - self.signal)
+
+        self.stamps[:-1] = self.stamps[1:]
+        self.stamps[-1] = stamp
+        self.window[:, :-1] = self.window[:, 1:]
+        self.window[:, -1] = (high, low, close, volume)
+        self.bars += 1
+
+    def advance(self, stamps: np.ndarray, rows: np.ndarray) -> int:
+        """Apply the bars after the last committed one; the number applied.
+
+        Raises _Rebuild when the bars do not carry on from this state.
+        """
+        if self.bars == 0:
+            raise _Rebuild("gap")
+        last = self.stamps[-1]
+        i = int(np.searchsorted(stamps, last))
+        if i == len(stamps) or stamps[i] != last:
+            raise _Rebuild("gap")
+        held = min(i + 1, self.bars, WINDOW)
+        if not np.array_equal(stamps[i + 1 - held:i + 1], self.stamps[WINDOW - held:]):
+            raise _Rebuild("revised")
+        stored = self.window[CLOSE, WINDOW - held:]
+        if (np.abs(rows[CLOSE, i + 1 - held:i + 1] - stored) > REVISION_TOLERANCE * np.abs(stored)).any():
+            raise _Rebuild("revised")
+        for j in range(i + 1, len(stamps)):
+            self.push(int(stamps[j]), *rows[:, j].tolist())
+        return len(stamps) - i - 1
+
+    def indicators(self) -> Indicators:
+        """Every indicator at the last applied bar."""
+        n = self.bars
+        result = Indicators(bars=n)
+        if n == 0:
+            return result
+        tail = self.window[:, WINDOW - min(n, WINDOW):]
+        fill_windows(
+            result, tail[CLOSE], tail[HIGH], tail[LOW], tail[VOLUME] if self.has_volume else None
+        )
+        if n >= EMA_FAST:
+            result.ema_12 = finite(self.fast)
+        if n >= EMA_SLOW:
+            result.ema_26 = finite(self.slow)
+            result.macd = finite(self.macd)
+            result.macd_signal = finite(self.signal)
+            result.macd_histogram = finite(self.macd - self.signal)
+            result.previous_macd = finite(self.previous_macd)
+            result.previous_macd_signal = finite(self.previous_signal)
+        if n > RSI_PERIOD:
+            result.rsi_14 = rsi_from_averages(self.gain, self.loss)
+        return result
+
+
+_stores: "weakref.WeakSet[IndicatorStore]" = weakref.WeakSet()
+
+
+class IndicatorStore:
+    """Indicator states of one source's series, keyed by (symbol, timeframe)."""
+
+    def __init__(self, source: str, max_entries: Optional[int] = None, ttl: float = DEFAULT_TTL):
+        self.source = source
+        self._states = CacheNamespace(
+            f"indicators.{source}", ttl=ttl,
+            max_entries=max_entries or state_max_entries(), persist=True,
+        )
+        self.built = 0
+        self.advanced = 0
+        self.bars_applied = 0
+        self.rebuilt: Dict[str, int] = {"revised": 0, "gap": 0}
+        self._lock = threading.Lock()
+        _stores.add(self)
+
+    def compute(
+        self,
+        key: Hashable,
+        stamps: Any,
+        close: Any,
+        high: Any = None,
+        low: Any = None,
+        volume: Any = None,
+    ) -> Indicators:
+        """Every indicator at the last of the given bars, as `indicators.compute`.
+
+        `stamps` are the bar times, oldest first: numbers, or anything
+        pd.DatetimeIndex takes.
+        """
+        stamps = _stamps(stamps)
+        close = column(close)
+        rows = np.vstack([
+            column(high) if high is not None else close,
+            column(low) if low is not None else close,
+            close,
+            column(volume) if volume is not None else np.full(len(close), np.nan),
+        ])
+        present = ~np.isnan(close)
+        if not present.all():
+            stamps, rows = stamps[present], rows[:, present]
+        if len(stamps) == 0:
+            return Indicators(bars=0)
+
+        # All but the newest bar are committed; the newest may still be forming.
+        committed_stamps, committed_rows = stamps[:-1], rows[:, :-1]
+        with self._lock:
+            stored = self._states.get(key)
+            state = None
+            if stored is not None:
+                state = stored.clone()
+                try:
+                    self.bars_applied += state.advance(committed_stamps, committed_rows)
+                    self.advanced += 1
+                except _Rebuild as exc:
+                    self.rebuilt[exc.reason] += 1
+                    logger.debug(f"Indicator state for {self.source} {key} rebuilt: {exc.reason}")
+                    state = None
+            if state is None:
+                state = IndicatorState.build(committed_stamps, committed_rows, volume is not None)
+                self.built += 1
+            self._states.set(key, state)
+
+        answer = state.clone()
+        answer.push(int(stamps[-1]), *rows[:, -1].tolist())
+        return answer.indicators()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "states": len(self._states),
+            "built": self.built,
+            "advanced": self.advanced,
+            "bars_applied": self.bars_applied,
+            "rebuilt": dict(self.rebuilt),
+        }
+
+
+def indicator_state_stats() -> Dict[str, Dict[str, Any]]:
+    """Per source: states held, and how each call was answered; for /health."""
+    stats: Dict[str, Dict[str, Any]] = {}
+    for store in list(_stores):
+        entry = stats.setdefault(store.source, {
+            "states": 0, "built": 0, "advanced": 0, "bars_applied": 0,
+            "rebuilt": {"revised": 0, "gap": 0},
+        })
+        own = store.stats()
+        for name in ("states", "built", "advanced", "bars_applied"):
+            entry[name] += own[name]
+        for reason, count in own["rebuilt"].items():
+            entry["rebuilt"][reason] += count
+    return dict(sorted(stats.items()))
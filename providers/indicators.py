@@ -0,0 +1,407 @@
+"""
+The technical-indicator engine behind every market's technical analysis.
+
+BorsapyProvider, YahooFinanceProvider, BtcTurkProvider and CoinbaseProvider each had a
+copy of the indicator maths, and the copies had drifted apart: BIST used recursive
+EMAs and the others pandas' bias-adjusted ones, Yahoo's MACD signal was an EMA of a
+single value (so it always equalled the MACD and the histogram was always 0), and the
+RSI needed 14 bars in one copy and 15 in another. The same chart gave different
+numbers depending on which market it came from. Each copy also built one pandas
+rolling/ewm object per indicator, and computed EMA12 and EMA26 twice for MACD.
+
+`compute()` takes the bars as contiguous float64 arrays and returns every indicator
+at the last bar, from one pass over them:
+
+- SMA(n) and the volume averages: the mean of the last n values;
+- EMA(12), EMA(26): recursive (y = a·x + (1 - a)·y, a = 2 / (span + 1)), started at
+  the first close; each is computed once, and MACD and its signal reuse them;
+- MACD(12, 26, 9): EMA12 - EMA26, its signal the EMA(9) of the whole MACD series;
+- RSI(14): Wilder's -- the averages seeded with the mean of the first 14 gains and
+  losses, then smoothed with a = 1/14;
+- Bollinger(20, 2): SMA20 ± 2 sample standard deviations of the last 20 closes;
+- Stochastic(14, 3): %K over the last 14 highs and lows, %D the mean of the last 3 %K.
+
+An indicator is None until there are enough bars for it, and when it is undefined
+(a flat window for the stochastic, no movement at all for the RSI). Bars without a
+close are dropped first.
+
+The EMAs are evaluated in closed form, block by block -- within a block
+y[t] = d^t · (d·y[-1] + a·Σ x[i]·d^-i), d = 1 - a -- so the recursion runs as
+NumPy cumulative sums rather than a Python loop. Blocks are short enough that d^-i
+stays far from overflow. benchmarks/indicators.py compares the engine with the
+per-indicator pandas code it replaced.
+
+`compute_matrix()` is the same calculation for a whole index at once: the members'
+bars as one series × bars matrix, each indicator one NumPy operation along the bar
+axis for every row, instead of one `compute` call per member.
+
+The providers call it through providers/indicator_state.py, which keeps the running
+values per series and applies only the bars that are new since the last call.
+"""
+import math
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+
+SMA_WINDOWS = (5, 10, 20, 50, 100, 200)
+VOLUME_WINDOWS = (10, 20, 30)
+EMA_FAST, EMA_SLOW, MACD_SIGNAL = 12, 26, 9
+RSI_PERIOD = 14
+BOLLINGER_PERIOD, BOLLINGER_WIDTH = 20, 2.0
+STOCHASTIC_PERIOD, STOCHASTIC_SMOOTHING = 14, 3
+
+# Largest d^-i a block may reach: e^50, well inside float64.
+_BLOCK_GROWTH = 50.0
+
+
+@dataclass
+class Indicators:
+    """Every indicator at the last bar; None where there is not enough data."""
+
+    bars: int
+    close: Optional[float] = None
+    previous_close: Optional[float] = None
+    sma: Dict[int, Optional[float]] = field(default_factory=dict)
+    ema_12: Optional[float] = None
+    ema_26: Optional[float] = None
+    rsi_14: Optional[float] = None
+    macd: Optional[float] = None
+    macd_signal: Optional[float] = None
+    macd_histogram: Optional[float] = None
+    # At the bar before the last, for crossover signals.
+    previous_macd: Optional[float] = None
+    previous_macd_signal: Optional[float] = None
+    bollinger_upper: Optional[float] = None
+    bollinger_middle: Optional[float] = None
+    bollinger_lower: Optional[float] = None
+    stochastic_k: Optional[float] = None
+    stochastic_d: Optional[float] = None
+    volume_avg: Dict[int, Optional[float]] = field(default_factory=dict)
+
+
+def finite(x: Any) -> Optional[float]:
+    """`x` as a float; None for NaN and infinities."""
+    x = float(x)
+    return x if math.isfinite(x) else None
+
+
+def column(values: Any) -> np.ndarray:
+    """`values` as a contiguous float64 array."""
+    return np.ascontiguousarray(np.asarray(values, dtype=np.float64))
+
+
+def ema(values: np.ndarray, alpha: float, initial: Any = None) -> np.ndarray:
+    """The recursive EMA of `values` along the last axis, every bar.
+
+    Starts at the first value, or continues from `initial` -- the EMA at the bar
+    before the first value, one per row of a matrix -- when given.
+    """
+    n = values.shape[-1]
+    out = np.empty(values.shape, dtype=np.float64)
+    if n == 0:
+        return out
+    decay = 1.0 - alpha
+    if initial is None:
+        # d·y + a·x0 = x0: the first output is the first value.
+        initial = values[..., 0]
+    if decay <= 0.0:
+        out[...] = values
+        return out
+    block = max(1, int(_BLOCK_GROWTH / -math.log(decay)))
+    powers = decay ** np.arange(min(block, n), dtype=np.float64)
+    inverse = 1.0 / powers
+    previous = np.asarray(initial, dtype=np.float64)[..., None]
+    for start in range(0, n, block):
+        chunk = values[..., start:start + block]
+        m = chunk.shape[-1]
+        out[..., start:start + m] = powers[:m] * (
+            decay * previous + alpha * np.cumsum(chunk * inverse[:m], axis=-1)
+        )
+        previous = out[..., start + m - 1:start + m]
+    return out
+
+
+def span_alpha(span: int) -> float:
+    """The EMA smoothing factor of a span."""
+    return 2.0 / (span + 1.0)
+
+
+def wilder_averages(close: np.ndarray, period: int = RSI_PERIOD) -> Optional[tuple]:
+    """Wilder's average gain and loss at the last bar; None below period + 1 bars."""
+    if len(close) <= period:
+        return None
+    delta = np.diff(close)
+    gains = np.where(delta > 0, delta, 0.0)
+    losses = np.where(delta < 0, -delta, 0.0)
+    alpha = 1.0 / period
+    gain = float(gains[:period].mean())
+    loss = float(losses[:period].mean())
+    if len(delta) > period:
+        gain = float(ema(gains[period:], alpha, gain)[-1])
+        loss = float(ema(losses[period:], alpha, loss)[-1])
+    return gain, loss
+
+
+def rsi_from_averages(gain: float, loss: float) -> Optional[float]:
+    if loss == 0.0:
+        return 100.0 if gain > 0.0 else None
+    return 100.0 - 100.0 / (1.0 + gain / loss)
+
+
+def compute(
+    close: Any,
+    high: Any = None,
+    low: Any = None,
+    volume: Any = None,
+    sma_windows: Sequence[int] = SMA_WINDOWS,
+    volume_windows: Sequence[int] = VOLUME_WINDOWS,
+) -> Indicators:
+    """Every indicator at the last of the given bars.
+
+    The columns are anything np.asarray takes -- pandas Series, lists, arrays -- of
+    equal length, oldest bar first. Without highs and lows the stochastic uses the
+    closes.
+    """
+    close = column(close)
+    columns = {
+        name: column(values)
+        for name, values in (("high", high), ("low", low), ("volume", volume))
+        if values is not None
+    }
+    present = ~np.isnan(close)
+    if not present.all():
+        close = close[present]
+        columns = {name: values[present] for name, values in columns.items()}
+    high = columns.get("high", close)
+    low = columns.get("low", close)
+
+    n = len(close)
+    result = Indicators(bars=n)
+    if n == 0:
+        return result
+    fill_windows(result, close, high, low, columns.get("volume"), sma_windows, volume_windows)
+
+    fast = ema(close, span_alpha(EMA_FAST))
+    slow = ema(close, span_alpha(EMA_SLOW))
+    if n >= EMA_FAST:
+        result.ema_12 = finite(fast[-1])
+    if n >= EMA_SLOW:
+        result.ema_26 = finite(slow[-1])
+        macd = fast - slow
+        signal = ema(macd, span_alpha(MACD_SIGNAL))
+        result.macd = finite(macd[-1])
+        result.macd_signal = finite(signal[-1])
+        result.macd_histogram = finite(macd[-1] - signal[-1])
+        result.previous_macd = finite(macd[-2])
+        result.previous_macd_signal = finite(signal[-2])
+
+    averages = wilder_averages(close)
+    if averages is not None:
+        result.rsi_14 = rsi_from_averages(*averages)
+    return result
+
+
+def fill_windows(
+    result: Indicators,
+    close: np.ndarray,
+    high: np.ndarray,
+    low: np.ndarray,
+    volume: Optional[np.ndarray],
+    sma_windows: Sequence[int] = SMA_WINDOWS,
+    volume_windows: Sequence[int] = VOLUME_WINDOWS,
+) -> None:
+    """Sets the indicators that only look at the last bars: prices, SMAs, Bollinger,
+    stochastic and volume averages.
+
+    The arrays need only be as long as the longest window; an indicator whose window
+    is longer than the arrays is None.
+    """
+    # The windows are short: plain Python over the tail beats a NumPy call per mean.
+    longest = max([*sma_windows, BOLLINGER_PERIOD, STOCHASTIC_PERIOD + STOCHASTIC_SMOOTHING])
+    close = close[-longest:].tolist()
+    n = len(close)
+    result.close = finite(close[-1])
+    result.previous_close = finite(close[-2]) if n > 1 else result.close
+
+    for window in sma_windows:
+        result.sma[window] = finite(sum(close[-window:]) / window) if n >= window else None
+
+    if volume is not None:
+        volume = volume[-max(volume_windows):].tolist()
+        for window in volume_windows:
+            result.volume_avg[window] = (
+                finite(sum(volume[-window:]) / window) if len(volume) >= window else None
+            )
+
+    if n >= BOLLINGER_PERIOD:
+        window = close[-BOLLINGER_PERIOD:]
+        middle = sum(window) / BOLLINGER_PERIOD
+        variance = sum((x - middle) ** 2 for x in window) / (BOLLINGER_PERIOD - 1)
+        width = BOLLINGER_WIDTH * math.sqrt(variance)
+        result.bollinger_middle = finite(middle)
+        result.bollinger_upper = finite(middle + width)
+        result.bollinger_lower = finite(middle - width)
+
+    if n >= STOCHASTIC_PERIOD:
+        high = high[-n:].tolist()
+        low = low[-n:].tolist()
+        # %K at each of the last three bars that have a full window.
+        count = min(STOCHASTIC_SMOOTHING, n - STOCHASTIC_PERIOD + 1)
+        k = []
+        for end in range(n - count + 1, n + 1):
+            lowest = min(low[end - STOCHASTIC_PERIOD:end])
+            highest = max(high[end - STOCHASTIC_PERIOD:end])
+            spread = highest - lowest
+            k.append(100.0 * (close[end - 1] - lowest) / spread if spread else math.nan)
+        result.stochastic_k = finite(k[-1])
+        if count == STOCHASTIC_SMOOTHING:
+            result.stochastic_d = finite(sum(k) / STOCHASTIC_SMOOTHING)
+
+
+def compute_matrix(
+    close: Sequence[Any],
+    high: Optional[Sequence[Any]] = None,
+    low: Optional[Sequence[Any]] = None,
+    volume: Optional[Sequence[Any]] = None,
+    sma_windows: Sequence[int] = SMA_WINDOWS,
+    volume_windows: Sequence[int] = VOLUME_WINDOWS,
+) -> List[Indicators]:
+    """`compute` for many series at once, in one pass over a series × bars matrix.
+
+    Each argument is a list with one column per series (an entry of `volume` may be
+    None); the result is in the same order. The series need not be the same length:
+    after bars without a close are dropped, each is right-aligned on its last bar and
+    padded on the left with its first close. An EMA started on a constant stays at
+    that constant, so the padding leaves the EMAs and the MACD as they would be
+    without it; the RSI is seeded at each series' own first bars, and a window
+    longer than a series is None for it, as in `compute`.
+    """
+    count = len(close)
+    bars = np.zeros(count, dtype=np.int64)
+    series = []
+    for i in range(count):
+        c = column(close[i])
+        columns = [
+            column(values[i]) if values is not None and values[i] is not None else None
+            for values in (high, low, volume)
+        ]
+        present = ~np.isnan(c)
+        if not present.all():
+            c = c[present]
+            columns = [x[present] if x is not None else None for x in columns]
+        bars[i] = len(c)
+        series.append((c, *columns))
+
+    results = [Indicators(bars=int(b)) for b in bars]
+    n = int(bars.max()) if count else 0
+    if n == 0:
+        return results
+
+    # Rows of the matrix; an empty series is a row of zeros nobody reads.
+    prices = np.zeros((3, count, n))
+    volumes = np.full((count, n), np.nan)
+    has_volume = np.zeros(count, dtype=bool)
+    for i, (c, h, lo, v) in enumerate(series):
+        b = bars[i]
+        if b == 0:
+            continue
+        for row, values in enumerate((c, h if h is not None else c, lo if lo is not None else c)):
+            prices[row, i, n - b:] = values
+            prices[row, i, :n - b] = c[0]
+        if v is not None:
+            volumes[i, n - b:] = v
+            has_volume[i] = True
+    close, high, low = prices
+
+    values: Dict[Any, np.ndarray] = {"close": close[:, -1], "previous_close": close[:, -min(n, 2)]}
+    for window in sma_windows:
+        if n >= window:
+            values["sma", window] = close[:, -window:].mean(axis=1)
+    for window in volume_windows:
+        if n >= window:
+            values["volume", window] = volumes[:, -window:].mean(axis=1)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        if n >= BOLLINGER_PERIOD:
+            tail = close[:, -BOLLINGER_PERIOD:]
+            middle = tail.mean(axis=1)
+            width = BOLLINGER_WIDTH * tail.std(axis=1, ddof=1)
+            values["bollinger"] = middle, middle + width, middle - width
+
+        if n >= STOCHASTIC_PERIOD:
+            # %K at each of the last (up to) three bars that have a full window.
+            span = min(n, STOCHASTIC_PERIOD + STOCHASTIC_SMOOTHING - 1)
+            windows = np.lib.stride_tricks.sliding_window_view
+            lowest = windows(low[:, -span:], STOCHASTIC_PERIOD, axis=1).min(axis=2)
+            highest = windows(high[:, -span:], STOCHASTIC_PERIOD, axis=1).max(axis=2)
+            spread = highest - lowest
+            k = 100.0 * (close[:, n - lowest.shape[1]:] - lowest) / spread
+            k[spread == 0] = np.nan
+            values["stochastic"] = k[:, -1], k[:, -STOCHASTIC_SMOOTHING:].mean(axis=1)
+
+        fast = ema(close, span_alpha(EMA_FAST))
+        slow = ema(close, span_alpha(EMA_SLOW))
+        macd = fast - slow
+        signal = ema(macd, span_alpha(MACD_SIGNAL))
+        values["ema"] = fast[:, -1], slow[:, -1]
+        values["macd"] = macd[:, -1], signal[:, -1], macd[:, -min(n, 2)], signal[:, -min(n, 2)]
+
+        if n > RSI_PERIOD:
+            # Seeded with the mean of each series' own first RSI_PERIOD moves; the
+            # moves before the seed are set to it, so the smoothing leaves it alone.
+            delta = np.diff(close, axis=1)
+            first = np.clip(n - bars, 0, n - 1)
+            seed_end = np.minimum(first + RSI_PERIOD, n - 1)
+            ahead = np.arange(n - 1) < seed_end[:, None]
+            averages = []
+            for moves in (np.maximum(delta, 0.0), np.maximum(-delta, 0.0)):
+                total = np.concatenate([np.zeros((count, 1)), np.cumsum(moves, axis=1)], axis=1)
+                rows = np.arange(count)
+                seed = (total[rows, seed_end] - total[rows, first]) / RSI_PERIOD
+                moves = np.where(ahead, seed[:, None], moves)
+                averages.append(ema(moves, 1.0 / RSI_PERIOD, seed)[:, -1])
+            values["rsi"] = averages
+
+    table = {
+        name: [x.tolist() for x in value] if isinstance(value, (tuple, list)) else value.tolist()
+        for name, value in values.items()
+    }
+    for i, result in enumerate(results):
+        b = result.bars
+        if b == 0:
+            continue
+        result.close = finite(table["close"][i])
+        result.previous_close = finite(table["previous_close"][i])
+        for window in sma_windows:
+            result.sma[window] = finite(table["sma", window][i]) if b >= window else None
+        if has_volume[i]:
+            for window in volume_windows:
+                result.volume_avg[window] = (
+                    finite(table["volume", window][i]) if b >= window else None
+                )
+        if b >= BOLLINGER_PERIOD:
+            middle, upper, lower = table["bollinger"]
+            result.bollinger_middle = finite(middle[i])
+            result.bollinger_upper = finite(upper[i])
+            result.bollinger_lower = finite(lower[i])
+        if b >= STOCHASTIC_PERIOD:
+            k, d = table["stochastic"]
+            result.stochastic_k = finite(k[i])
+            if b >= STOCHASTIC_PERIOD + STOCHASTIC_SMOOTHING - 1:
+                result.stochastic_d = finite(d[i])
+        fast, slow = table["ema"]
+        if b >= EMA_FAST:
+            result.ema_12 = finite(fast[i])
+        if b >= EMA_SLOW:
+            macd, signal, previous_macd, previous_signal = table["macd"]
+            result.ema_26 = finite(slow[i])
+            result.macd = finite(macd[i])
+            result.macd_signal = finite(signal[i])
+            result.macd_histogram = finite(macd[i] - signal[i])
+            result.previous_macd = finite(previous_macd[i])
+            result.previous_macd_signal = finite(previous_signal[i])
+        if b > RSI_PERIOD:
+            gain, loss = table["rsi"]
+            result.rsi_14 = rsi_from_averages(gain[i], loss[i])
+    return results
@@ -0,0 +1,219 @@
+"""
+Bar windows per (symbol, timeframe) for technical analysis, refreshed from the tail.
+
+get_technical_analysis took a `timeframe` and ignored it for BIST and US: both
+providers always fetched daily bars -- BIST with period="6ay", which borsapy does not
+know and silently answers with its 30-bar default, so SMA50 and SMA200 were never
+there either -- and the tool added a warning saying so. Traders asking for an hourly
+or a 15-minute setup got daily numbers.
+
+A timeframe now names the bars to fetch. BORSAPY_TIMEFRAMES and YAHOO_TIMEFRAMES give,
+per timeframe, the upstream interval, the period that brings well over 200 bars (so
+SMA200 is there), and the shorter period a refresh fetches. borsapy sizes a request
+in bars (days × 510 session minutes / interval), Yahoo in calendar time within its
+intraday limits (1m: 7 days, up to 30m: 60 days). Yahoo has no 4-hour bars: its
+hourly window is folded into 4-hour bars per session (`aggregate_bars`), so 1h and
+4h share one window.
+
+An IntradayBarCache holds the last window per (symbol, interval) for
+ttl_for(market, INTRADAY_BAR) -- a minute while the session is open, until the next
+open after the close -- and daily and weekly windows for DAILY_BAR. An expired window
+is not fetched again whole: the refresh period is fetched and spliced on. The stored
+bars before the tail's first one are kept, the tail's bars replace the rest -- the
+last stored bar was still forming -- and the window keeps its length. A tail that
+does not reach back into the window, or that moves a closed bar's close by more than
+bar_store's REVISION_TOLERANCE, has the whole window fetched instead. The counters
+are on /health.
+
+    INTRADAY_BAR_CACHE_MAX=256     # windows kept per source
+"""
+import logging
+import os
+import weakref
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional
+
+import numpy as np
+import pandas as pd
+
+from providers.bar_store import REVISION_TOLERANCE
+from providers.cache import CacheNamespace
+from providers.ttl_policy import INTRADAY_BAR_TTL_OPEN, DataKind, ttl_for
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_ENTRIES = 256
+
+
+@dataclass(frozen=True)
+class BarSpec:
+    """How one source fetches one timeframe."""
+
+    interval: str           # the upstream's interval
+    period: str             # the whole window
+    refresh: str            # the tail fetched when the window has expired
+    fold_hours: int = 0     # fold the interval's bars into bars this many hours long
+
+    @property
+    def kind(self) -> DataKind:
+        return DataKind.DAILY_BAR if self.interval in ("1d", "1wk") else DataKind.INTRADAY_BAR
+
+
+# Keyed by the tool's timeframe values.
+BORSAPY_TIMEFRAMES: Dict[str, BarSpec] = {
+    "1m": BarSpec("1m", "1d", "1d"),          # 510 bars
+    "5m": BarSpec("5m", "5d", "1d"),          # 510
+    "15m": BarSpec("15m", "1mo", "1d"),       # 1020
+    "30m": BarSpec("30m", "1mo", "1d"),       # 510
+    "1h": BarSpec("1h", "3mo", "5d"),         # 765
+    "4h": BarSpec("4h", "6mo", "1mo"),        # 382
+    "1d": BarSpec("1d", "1y", "1mo"),         # 365
+    "1W": BarSpec("1wk", "5y", "3mo"),        # 260
+}
+
+YAHOO_TIMEFRAMES: Dict[str, BarSpec] = {
+    "1m": BarSpec("1m", "5d", "1d"),          # ~1950 bars
+    "5m": BarSpec("5m", "1mo", "1d"),         # ~1640
+    "15m": BarSpec("15m", "1mo", "5d"),       # ~550
+    "30m": BarSpec("30m", "1mo", "5d"),       # ~270
+    "1h": BarSpec("60m", "6mo", "5d"),        # ~880
+    "4h": BarSpec("60m", "6mo", "5d", fold_hours=4),   # ~250
+    "1d": BarSpec("1d", "1y", "1mo"),         # ~250
+    "1W": BarSpec("1wk", "5y", "3mo"),        # ~260
+}
+
+
+def cache_max_entries() -> int:
+    raw = os.getenv("INTRADAY_BAR_CACHE_MAX", "").strip()
+    if not raw:
+        return DEFAULT_MAX_ENTRIES
+    try:
+        return max(1, int(raw))
+    except ValueError:
+        logger.warning(f"INTRADAY_BAR_CACHE_MAX '{raw}' is not a number; using {DEFAULT_MAX_ENTRIES}")
+        return DEFAULT_MAX_ENTRIES
+
+
+def aggregate_bars(frame: pd.DataFrame, hours: int) -> pd.DataFrame:
+    """`frame`'s bars folded into bars `hours` long, counted from each session's first bar.
+
+    A session shorter than a multiple of `hours` ends on a shorter bar, as upstream
+    charts draw it (US: 09:30-13:30, then 13:30-16:00).
+    """
+    if frame.empty:
+        return frame
+    index = pd.DatetimeIndex(frame.index)
+    stamps = index.as_unit("ns").asi8
+    days = index.normalize().as_unit("ns").asi8
+    # Each bar's session open: the first bar of its day.
+    first_of_day = np.r_[True, days[1:] != days[:-1]]
+    opens = np.maximum.accumulate(np.where(first_of_day, stamps, stamps[0]))
+    width = hours * 3_600 * 10**9
+    bucket = opens + (stamps - opens) // width * width
+    starts = np.flatnonzero(np.r_[True, bucket[1:] != bucket[:-1]])
+    ends = np.r_[starts[1:], len(stamps)] - 1
+    return pd.DataFrame(
+        {
+            "Open": frame["Open"].to_numpy()[starts],
+            "High": np.maximum.reduceat(frame["High"].to_numpy(), starts),
+            "Low": np.minimum.reduceat(frame["Low"].to_numpy(), starts),
+            "Close": frame["Close"].to_numpy()[ends],
+            "Volume": np.add.reduceat(frame["Volume"].to_numpy(), starts),
+        },
+        index=index[starts],
+    )
+
+
+class _Refetch(Exception):
+    """The tail cannot be spliced onto the window; `reason` says why."""
+
+    def __init__(self, reason: str):
+        super().__init__(reason)
+        self.reason = reason
+
+
+def _splice(window: pd.DataFrame, tail: pd.DataFrame) -> pd.DataFrame:
+    """`window` with `tail` laid over its end, at the window's length."""
+    first, last = tail.index[0], window.index[-1]
+    if first > last:
+        raise _Refetch("gap")
+    # Every stored bar the tail covers, but the last, had closed when it was stored.
+    closed = window.index[(window.index >= first) & (window.index < last)]
+    if not closed.isin(tail.index).all():
+        raise _Refetch("revised")
+    stored = window.loc[closed, "Close"].to_numpy()
+    fresh = tail.loc[closed, "Close"].to_numpy()
+    if (np.abs(fresh - stored) > REVISION_TOLERANCE * np.abs(stored)).any():
+        raise _Refetch("revised")
+    merged = pd.concat([window[window.index < first], tail])
+    return merged.iloc[-len(window):]
+
+
+_caches: "weakref.WeakSet[IntradayBarCache]" = weakref.WeakSet()
+
+
+class IntradayBarCache:
+    """One source's bar windows, keyed by (symbol, interval)."""
+
+    def __init__(self, source: str, max_entries: Optional[int] = None):
+        self.source = source
+        self._windows = CacheNamespace(
+            f"bars.{source}", ttl=INTRADAY_BAR_TTL_OPEN,
+            max_entries=max_entries or cache_max_entries(),
+        )
+        self.full_fetches = 0
+        self.tail_fetches = 0
+        self.refetched: Dict[str, int] = {"revised": 0, "gap": 0}
+        _caches.add(self)
+
+    async def window(
+        self,
+        key: Hashable,
+        market: str,
+        spec: BarSpec,
+        fetch: Callable[[str], Awaitable[pd.DataFrame]],
+    ) -> pd.DataFrame:
+        """The window for `key`, oldest bar first; `fetch(period)` asks upstream."""
+        async def load() -> pd.DataFrame:
+            stored = self._windows.get_stale(key)
+            if stored is not None:
+                tail = await fetch(spec.refresh)
+                self.tail_fetches += 1
+                if tail is not None and not tail.empty:
+                    try:
+                        return _splice(stored, tail)
+                    except _Refetch as exc:
+                        self.refetched[exc.reason] += 1
+                        logger.debug(f"Bar window {self.source} {key} refetched: {exc.reason}")
+            frame = await fetch(spec.period)
+            self.full_fetches += 1
+            return frame
+
+        return await self._windows.get_or_load(
+            key, load, ttl=ttl_for(market, spec.kind),
+            cache_if=lambda frame: frame is not None and not frame.empty,
+        )
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "windows": len(self._windows),
+            "full_fetches": self.full_fetches,
+            "tail_fetches": self.tail_fetches,
+            "refetched": dict(self.refetched),
+        }
+
+
+def intraday_bar_stats() -> Dict[str, Dict[str, Any]]:
+    """Per source: windows held, and how expired ones were refreshed; for /health."""
+    stats: Dict[str, Dict[str, Any]] = {}
+    for cache in list(_caches):
+        entry = stats.setdefault(cache.source, {
+            "windows": 0, "full_fetches": 0, "tail_fetches": 0,
+            "refetched": {"revised": 0, "gap": 0},
+        })
+        own = cache.stats()
+        for name in ("windows", "full_fetches", "tail_fetches"):
+            entry[name] += own[name]
+        for reason, count in own["refetched"].items():
+            entry["refetched"][reason] += count
+    return dict(sorted(stats.items()))
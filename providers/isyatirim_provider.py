@@ -7,9 +7,16 @@ import asyncio
 import httpx
 import logging
 import time
-from typing import Dict, Any, List, Optional
+from typing import Dict, Any, List, Optional, Tuple
 from datetime import datetime
 
+from providers.bulkhead import BulkheadFullError
+from providers.circuit_breaker import CircuitOpenError
+from providers.deadline import DeadlineExceededError
+from providers.http_client import shared_http_client
+from providers.cache import CacheNamespace, stale_warning
+from providers.ttl_policy import DataKind, ttl_for
+
 logger = logging.getLogger(__name__)
 
 
@@ -139,13 +146,25 @@ class IsYatirimProvider:
         "  Amortisman & İtfa Payları": "Reconciled Depreciation",
     }
 
+    # Per request, on the shared client (providers/http_client.py)
+    TIMEOUT = 10.0
+
     # Cache configuration
-    CACHE_TTL_SECONDS = 300  # 5 minutes cache for financial data
+    CACHE_TTL_SECONDS = 300  # in-session default; ttl_policy sets the real expiry
+    CACHE_MAX_ENTRIES = 512  # (ticker, period) pairs; one entry holds all 3 statements
+    # Past this, an expired entry is refetched in line rather than served stale.
+    CACHE_MAX_STALE_SECONDS = 24 * 60 * 60
 
     def __init__(self):
-        # In-memory cache with TTL
-        self._cache = {}  # {cache_key: (data, timestamp)}
-        logger.info("Initialized İş Yatırım Provider with TTL cache (5 min)")
+        # Bounded LRU with single-flight: balance, income and cash flow for one ticker
+        # arrive as three concurrent calls and must share one upstream fetch.
+        self._cache = CacheNamespace(
+            "isyatirim.statements",
+            ttl=self.CACHE_TTL_SECONDS,
+            max_entries=self.CACHE_MAX_ENTRIES,
+            shared=True, persist=True,
+        )
+        logger.info("Initialized İş Yatırım Provider with session-aware TTL cache")
 
     def _get_cache_key(self, ticker_kodu: str, period_type: str) -> str:
         """
@@ -161,40 +180,6 @@ class IsYatirimProvider:
         """
         return f"{ticker_kodu.upper()}:{period_type}"
 
-    def _get_from_cache(self, cache_key: str) -> Optional[Dict[str, Any]]:
-        """
-        Retrieve data from cache if it exists and hasn't expired.
-
-        Args:
-            cache_key: Cache key to lookup
-
-        Returns:
-            Cached data if valid, None if expired or not found
-        """
-        if cache_key in self._cache:
-            data, timestamp = self._cache[cache_key]
-            age = time.time() - timestamp
-
-            if age < self.CACHE_TTL_SECONDS:
-                logger.info(f"Cache HIT: {cache_key} (age: {age:.1f}s)")
-                return data
-            else:
-                logger.info(f"Cache EXPIRED: {cache_key} (age: {age:.1f}s)")
-                del self._cache[cache_key]
-
-        return None
-
-    def _set_cache(self, cache_key: str, data: Dict[str, Any]) -> None:
-        """
-        Store data in cache with current timestamp.
-
-        Args:
-            cache_key: Cache key
-            data: Data to cache
-        """
-        self._cache[cache_key] = (data, time.time())
-        logger.info(f"Cache SET: {cache_key} (total cached: {len(self._cache)})")
-
     async def get_bilanco(self, ticker_kodu: str, period_type: str) -> Dict[str, Any]:
         """
         Fetches balance sheet from İş Yatırım.
@@ -208,12 +193,12 @@ class IsYatirimProvider:
         """
         try:
             cache_key = self._get_cache_key(ticker_kodu, period_type)
-            raw_data = await self._fetch_all_statements(ticker_kodu, period_type, cache_key)
+            raw_data, age = await self._fetch_all_statements(ticker_kodu, period_type, cache_key)
 
             if raw_data.get("error"):
                 return {"error": raw_data["error"], "tablo": []}
 
-            return self._extract_balance_sheet(raw_data)
+            return self._with_freshness(self._extract_balance_sheet(raw_data), ticker_kodu, age)
 
         except Exception as e:
             logger.error(f"Error fetching balance sheet for {ticker_kodu}: {e}")
@@ -232,12 +217,12 @@ class IsYatirimProvider:
         """
         try:
             cache_key = self._get_cache_key(ticker_kodu, period_type)
-            raw_data = await self._fetch_all_statements(ticker_kodu, period_type, cache_key)
+            raw_data, age = await self._fetch_all_statements(ticker_kodu, period_type, cache_key)
 
             if raw_data.get("error"):
                 return {"error": raw_data["error"], "tablo": []}
 
-            return self._extract_income_statement(raw_data)
+            return self._with_freshness(self._extract_income_statement(raw_data), ticker_kodu, age)
 
         except Exception as e:
             logger.error(f"Error fetching income statement for {ticker_kodu}: {e}")
@@ -256,12 +241,12 @@ class IsYatirimProvider:
         """
         try:
             cache_key = self._get_cache_key(ticker_kodu, period_type)
-            raw_data = await self._fetch_all_statements(ticker_kodu, period_type, cache_key)
+            raw_data, age = await self._fetch_all_statements(ticker_kodu, period_type, cache_key)
 
             if raw_data.get("error"):
                 return {"error": raw_data["error"], "tablo": []}
 
-            return self._extract_cash_flow(raw_data)
+            return self._with_freshness(self._extract_cash_flow(raw_data), ticker_kodu, age)
 
         except Exception as e:
             logger.error(f"Error fetching cash flow for {ticker_kodu}: {e}")
@@ -272,63 +257,87 @@ class IsYatirimProvider:
         ticker_kodu: str,
         period_type: str,
         cache_key: Optional[str] = None
-    ) -> Dict[str, Any]:
+    ) -> Tuple[Dict[str, Any], Optional[float]]:
         """
         Fetches all financial statements from İş Yatırım API.
         Tries multiple financial groups (XI_29 for industrial, UFRS for banks).
 
         Returns:
-            Raw API response with all statements, or error dict
+            (raw API response or error dict, age in seconds if served stale)
         """
-        # Check cache first if cache_key provided
         if cache_key:
-            cached_data = self._get_from_cache(cache_key)
-            if cached_data is not None:
-                return cached_data
+            # The endpoint takes seconds and sometimes times out; an expired entry is
+            # served while it refetches. An error dict is a failed fetch, not data:
+            # never hold it for the TTL.
+            return await self._cache.get_or_revalidate(
+                cache_key,
+                lambda: self._fetch_all_statements_uncached(ticker_kodu, period_type),
+                max_stale=self.CACHE_MAX_STALE_SECONDS,
+                ttl=ttl_for("bist", DataKind.STATEMENTS),
+                cache_if=lambda result: not result.get("error"),
+            )
+        return await self._fetch_all_statements_uncached(ticker_kodu, period_type), None
+
+    @staticmethod
+    def _with_freshness(
+        statement: Dict[str, Any], ticker_kodu: str, age: Optional[float]
+    ) -> Dict[str, Any]:
+        if age is not None:
+            statement.setdefault("warnings", []).append(
+                stale_warning(f"İş Yatırım statements for {ticker_kodu.upper()}", age)
+            )
+        return statement
 
+    async def _fetch_all_statements_uncached(
+        self,
+        ticker_kodu: str,
+        period_type: str,
+    ) -> Dict[str, Any]:
+        """One pass over FINANCIAL_GROUPS, straight to the API."""
         # Try each financial group until one returns data
         for financial_group in self.FINANCIAL_GROUPS:
             try:
                 params = self._build_params(ticker_kodu, financial_group, period_type)
 
-                async with httpx.AsyncClient(timeout=10.0) as client:
-                    response = await client.get(
-                        self.BASE_URL,
-                        params=params,
-                        headers=self.HEADERS
-                    )
-
-                    if response.status_code != 200:
-                        logger.warning(f"HTTP {response.status_code} for {ticker_kodu} with {financial_group}")
-                        continue
+                client = shared_http_client()
+                response = await client.get(
+                    self.BASE_URL,
+                    params=params,
+                    headers=self.HEADERS,
+                    timeout=self.TIMEOUT,
+                )
 
-                    data = response.json()
+                if response.status_code != 200:
+                    logger.warning(f"HTTP {response.status_code} for {ticker_kodu} with {financial_group}")
+                    continue
 
-                    if not data.get("ok"):
-                        logger.warning(f"API returned ok=false for {ticker_kodu} with {financial_group}")
-                        continue
+                data = response.json()
 
-                    items = data.get("value", [])
+                if not data.get("ok"):
+                    logger.warning(f"API returned ok=false for {ticker_kodu} with {financial_group}")
+                    continue
 
-                    if len(items) == 0:
-                        logger.info(f"No data for {ticker_kodu} with {financial_group}, trying next group")
-                        continue
+                items = data.get("value", [])
 
-                    # Success! Prepare data with metadata
-                    logger.info(f"Fetched {len(items)} items for {ticker_kodu} using {financial_group}")
-                    result = {
-                        "items": items,
-                        "financial_group": financial_group,
-                        "params": params,
-                        "error": None
-                    }
+                if len(items) == 0:
+                    logger.info(f"No data for {ticker_kodu} with {financial_group}, trying next group")
+                    continue
 
-                    # Cache successful result
-                    if cache_key:
-                        self._set_cache(cache_key, result)
+                # Success! Prepare data with metadata
+                logger.info(f"Fetched {len(items)} items for {ticker_kodu} using {financial_group}")
+                result = {
+                    "items": items,
+                    "financial_group": financial_group,
+                    "params": params,
+                    "error": None
+                }
 
-                    return result
+                return result
 
+            except (BulkheadFullError, CircuitOpenError, DeadlineExceededError):
+                # Refused or out of time: nothing learned about the company, and
+                # "no financial data available" would say there was.
+                raise
             except httpx.TimeoutException:
                 logger.warning(f"Timeout for {ticker_kodu} with {financial_group}")
                 continue
@@ -640,54 +649,55 @@ class IsYatirimProvider:
         try:
             params = {"endeks": ticker_kodu.upper()}
 
-            async with httpx.AsyncClient(timeout=10.0) as client:
-                response = await client.get(
-                    self.ONE_ENDEKS_URL,
-                    params=params,
-                    headers=self.HEADERS
-                )
-
-                if response.status_code != 200:
-                    logger.warning(f"OneEndeks HTTP {response.status_code} for {ticker_kodu}")
-                    return {"error": f"HTTP {response.status_code}"}
-
-                data = response.json()
-
-                # API returns a list with one item per ticker
-                if isinstance(data, list) and len(data) > 0:
-                    value = data[0]
-                elif isinstance(data, dict) and data.get("ok"):
-                    value = data.get("value", {})
-                else:
-                    logger.warning(f"OneEndeks empty response for {ticker_kodu}")
-                    return {"error": f"No data for {ticker_kodu}"}
+            client = shared_http_client()
+            response = await client.get(
+                self.ONE_ENDEKS_URL,
+                params=params,
+                headers=self.HEADERS,
+                timeout=self.TIMEOUT,
+            )
+
+            if response.status_code != 200:
+                logger.warning(f"OneEndeks HTTP {response.status_code} for {ticker_kodu}")
+                return {"error": f"HTTP {response.status_code}"}
+
+            data = response.json()
+
+            # API returns a list with one item per ticker
+            if isinstance(data, list) and len(data) > 0:
+                value = data[0]
+            elif isinstance(data, dict) and data.get("ok"):
+                value = data.get("value", {})
+            else:
+                logger.warning(f"OneEndeks empty response for {ticker_kodu}")
+                return {"error": f"No data for {ticker_kodu}"}
 
-                if not value:
-                    return {"error": f"No data for {ticker_kodu}"}
+            if not value:
+                return {"error": f"No data for {ticker_kodu}"}
 
-                # Extract key fields
-                last_price = self._safe_float(value.get("last"))
-                day_close = self._safe_float(value.get("dayClose"))
-                # Fallback to dayClose when last is 0 or None (market closed)
-                effective_price = last_price if last_price and last_price > 0 else day_close
+            # Extract key fields
+            last_price = self._safe_float(value.get("last"))
+            day_close = self._safe_float(value.get("dayClose"))
+            # Fallback to dayClose when last is 0 or None (market closed)
+            effective_price = last_price if last_price and last_price > 0 else day_close
 
-                result = {
-                    "ticker_kodu": ticker_kodu.upper(),
-                    "last": effective_price,  # Use effective price (last or dayClose fallback)
-                    "raw_last": last_price,  # Keep original for debugging
-                    "equity": self._safe_float(value.get("equity")),  # Özkaynaklar (Book Value)
-                    "netProceeds": self._safe_float(value.get("netProceeds")),  # Net Kar (TTM)
-                    "capital": self._safe_float(value.get("capital")),  # Ödenmiş Sermaye
-                    "volume": self._safe_float(value.get("volume")),  # Trading volume
-                    "low": self._safe_float(value.get("low")),  # Day low
-                    "high": self._safe_float(value.get("high")),  # Day high
-                    "dayClose": day_close,  # Previous close (base price)
-                    "symbol": value.get("symbol"),  # Symbol for verification
-                    "timestamp": datetime.now().isoformat()
-                }
+            result = {
+                "ticker_kodu": ticker_kodu.upper(),
+                "last": effective_price,  # Use effective price (last or dayClose fallback)
+                "raw_last": last_price,  # Keep original for debugging
+                "equity": self._safe_float(value.get("equity")),  # Özkaynaklar (Book Value)
+                "netProceeds": self._safe_float(value.get("netProceeds")),  # Net Kar (TTM)
+                "capital": self._safe_float(value.get("capital")),  # Ödenmiş Sermaye
+                "volume": self._safe_float(value.get("volume")),  # Trading volume
+                "low": self._safe_float(value.get("low")),  # Day low
+                "high": self._safe_float(value.get("high")),  # Day high
+                "dayClose": day_close,  # Previous close (base price)
+                "symbol": value.get("symbol"),  # Symbol for verification
+                "timestamp": datetime.now().isoformat()
+            }
 
-                logger.info(f"OneEndeks fetched for {ticker_kodu}: price={result['last']}, equity={result['equity']}")
-                return result
+            logger.info(f"OneEndeks fetched for {ticker_kodu}: price={result['last']}, equity={result['equity']}")
+            return result
 
         except httpx.TimeoutException:
             logger.warning(f"OneEndeks timeout for {ticker_kodu}")
@@ -1090,32 +1100,33 @@ class IsYatirimProvider:
                 "sektorKodu": ""
             }
 
-            async with httpx.AsyncClient(timeout=10.0) as client:
-                response = await client.post(
-                    url,
-                    json=payload,
-                    headers={
-                        **self.HEADERS,
-                        'Content-Type': 'application/json; charset=UTF-8'
-                    }
-                )
-
-                if response.status_code != 200:
-                    logger.warning(f"GetSermayeArttirimlari HTTP {response.status_code} for {ticker_kodu}")
-                    return []
-
-                data = response.json()
-
-                # API returns {"d": "JSON_STRING"}
-                import json
-                raw_data = data.get("d", "[]")
-                if isinstance(raw_data, str):
-                    items = json.loads(raw_data)
-                else:
-                    items = raw_data
+            client = shared_http_client()
+            response = await client.post(
+                url,
+                json=payload,
+                headers={
+                    **self.HEADERS,
+                    'Content-Type': 'application/json; charset=UTF-8'
+                },
+                timeout=self.TIMEOUT,
+            )
+
+            if response.status_code != 200:
+                logger.warning(f"GetSermayeArttirimlari HTTP {response.status_code} for {ticker_kodu}")
+                return []
+
+            data = response.json()
+
+            # API returns {"d": "JSON_STRING"}
+            import json
+            raw_data = data.get("d", "[]")
+            if isinstance(raw_data, str):
+                items = json.loads(raw_data)
+            else:
+                items = raw_data
 
-                logger.info(f"Fetched {len(items)} corporate actions for {ticker_kodu}")
-                return items
+            logger.info(f"Fetched {len(items)} corporate actions for {ticker_kodu}")
+            return items
 
         except httpx.TimeoutException:
             logger.warning(f"GetSermayeArttirimlari timeout for {ticker_kodu}")
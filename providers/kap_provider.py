@@ -5,10 +5,7 @@ Public Disclosure Platform (KAP), including fetching and searching companies.
 """
 import httpx
 import logging
-import time
-import io
 import re
-import pandas as pd
 from typing import List, Optional, Dict, Any
 from models import (
     SirketInfo, KatilimFinansUygunlukBilgisi, KatilimFinansUygunlukSonucu,
@@ -16,6 +13,10 @@ from models import (
 )
 from bs4 import BeautifulSoup
 
+from providers.cache import CacheNamespace
+from providers.parsers import company_rows_from_excel, company_rows_from_pdf
+from providers.process_pool import run_parser
+
 logger = logging.getLogger(__name__)
 
 class KAPProvider:
@@ -24,11 +25,16 @@ class KAPProvider:
     INDICES_PDF_URL = "https://www.kap.org.tr/tr/api/company/indices/pdf/endeksler"
     INDICES_EXCEL_URL = "https://www.kap.org.tr/tr/api/company/indices/excel"
     CACHE_DURATION = 24 * 60 * 60
+    # The company list changes a few times a month; a week-old copy is still served
+    # while the Excel refetches. Older than that, the caller waits for the download.
+    CACHE_MAX_STALE = 7 * 24 * 60 * 60
 
     def __init__(self, client: httpx.AsyncClient):
         self._http_client = client
-        self._company_list: List[SirketInfo] = []
-        self._last_fetch_time: float = 0
+        self._company_list = CacheNamespace(
+            "kap.company_list", ttl=self.CACHE_DURATION, max_entries=1,
+            shared=True, persist=True,
+        )
         self._indices_list: List[EndeksBilgisi] = []
         self._last_indices_fetch_time: float = 0
 
@@ -45,28 +51,13 @@ class KAPProvider:
             response = await self._http_client.get(self.EXCEL_URL, headers=headers)
             response.raise_for_status()
             
-            # Read Excel data using pandas
-            df = pd.read_excel(io.BytesIO(response.content))
-            
-            all_companies = []
-            for _, row in df.iterrows():
-                # Get values from Excel columns (assuming first 3 columns are ticker, name, city)
-                if len(row) >= 3:
-                    ticker_field = str(row.iloc[0]).strip() if pd.notna(row.iloc[0]) else ""
-                    name = str(row.iloc[1]).strip() if pd.notna(row.iloc[1]) else ""
-                    city = str(row.iloc[2]).strip() if pd.notna(row.iloc[2]) else ""
-                    
-                    # Skip header rows or empty rows
-                    if ticker_field and name and ticker_field != "BIST KODU":
-                        # Handle multiple tickers separated by comma (e.g., "GARAN, TGB" or "ISATR, ISBTR, ISCTR")
-                        # Create separate entries for each ticker code
-                        if ',' in ticker_field:
-                            tickers = [t.strip() for t in ticker_field.split(',')]
-                            for ticker in tickers:
-                                if ticker:  # Skip empty strings
-                                    all_companies.append(SirketInfo(sirket_adi=name, ticker_kodu=ticker, sehir=city))
-                        else:
-                            all_companies.append(SirketInfo(sirket_adi=name, ticker_kodu=ticker_field, sehir=city))
+            # Parsing the Excel is CPU-bound pandas work; it runs in the parse pool so
+            # it does not hold the event loop. See providers/process_pool.py.
+            rows = await run_parser(company_rows_from_excel, response.content)
+            all_companies = [
+                SirketInfo(sirket_adi=name, ticker_kodu=ticker, sehir=city)
+                for ticker, name, city in rows
+            ]
             
             logger.info(f"Successfully fetched {len(all_companies)} companies from KAP Excel.")
             return all_companies
@@ -80,21 +71,13 @@ class KAPProvider:
     async def _fetch_company_data_from_pdf(self) -> Optional[List[SirketInfo]]:
         """Fallback method using PDF if Excel fails."""
         try:
-            import pdfplumber
             response = await self._http_client.get(self.PDF_URL)
             response.raise_for_status()
-            all_companies = []
-            with pdfplumber.open(io.BytesIO(response.content)) as pdf:
-                for page in pdf.pages:
-                    for table in page.extract_tables():
-                        for row in table:
-                            if not row or len(row) < 3 or row[0] is None or "BIST KODU" in row[0]:
-                                continue
-                            ticker = (row[0] or "").strip()
-                            name = (row[1] or "").strip()
-                            city = (row[2] or "").strip()
-                            if ticker and name:
-                                all_companies.append(SirketInfo(sirket_adi=name, ticker_kodu=ticker, sehir=city))
+            rows = await run_parser(company_rows_from_pdf, response.content)
+            all_companies = [
+                SirketInfo(sirket_adi=name, ticker_kodu=ticker, sehir=city)
+                for ticker, name, city in rows
+            ]
             logger.info(f"Successfully fetched {len(all_companies)} companies from KAP PDF.")
             return all_companies
         except Exception:
@@ -102,13 +85,15 @@ class KAPProvider:
             return None
 
     async def get_all_companies(self) -> List[SirketInfo]:
-        current_time = time.time()
-        if not self._company_list or (current_time - self._last_fetch_time) > self.CACHE_DURATION:
-            companies = await self._fetch_company_data()
-            if companies:
-                self._company_list = companies
-                self._last_fetch_time = current_time
-        return self._company_list
+        # The Excel download is slow, so an expired list is served while it refreshes
+        # in the background. A failed refresh keeps serving the last good list rather
+        # than an empty one, which would read as "BIST has no companies".
+        companies, age = await self._company_list.get_or_revalidate(
+            "all", self._fetch_company_data, max_stale=self.CACHE_MAX_STALE, cache_if=bool
+        )
+        if age is not None:
+            logger.info(f"KAP company list served from cache, {age / 3600:.1f}h old; refreshing")
+        return companies or self._company_list.get_stale("all", [])
     
     def _normalize_text(self, text: str) -> str:
         tr_map = str.maketrans("İıÖöÜüŞşÇçĞğ", "iioouussccgg")
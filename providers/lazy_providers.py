@@ -0,0 +1,137 @@
+"""
+Providers built on first use, with what each one cost to build.
+
+BorsaApiClient's constructor built all seventeen providers, and the client is built
+at import time (market_router is a module-level singleton). Importing the server
+therefore imported yfinance, borsapy, pdfplumber, markitdown, yfscreen and pandas
+and opened their sessions before the first request -- about a second and a thousand
+modules on every cold start, and the memory that goes with them on every worker,
+though most workers only ever serve a few of the tools. Nothing said which provider
+cost what.
+
+Each provider is now a `lazy_provider` on the client:
+
+    @lazy_provider
+    def kap_provider(self):
+        from providers.kap_provider import KAPProvider
+        return KAPProvider(self._http_client)
+
+The method runs the first time the attribute is read, its result is stored on the
+instance, and every later read is a plain attribute lookup. A provider that needs
+another one (the Buffett analyzer, the ratio calculator) reads it, and so builds it,
+from its own factory. Building is serialised by one lock, so two threads reading the
+same provider at once get the same object. Assigning the attribute (a test's mock)
+replaces the provider without building it.
+
+Every build is measured: wall time, the modules it imported and the change in the
+process's resident memory -- exclusive of the providers it built along the way, so
+the Buffett analyzer is not charged for Yahoo. RSS deltas are approximate (the
+allocator keeps what it frees), but the first build of each provider, which pays for
+its imports, shows clearly. `provider_stats()`, on /health, lists them with the
+providers declared but never built.
+"""
+import logging
+import os
+import sys
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+_lock = threading.RLock()
+_declared: Dict[str, str] = {}    # provider -> owning class
+_builds: Dict[str, Dict[str, Any]] = {}
+# One [seconds, rss bytes, modules] per build in progress, for its nested builds to
+# add themselves to.
+_nested: List[List[float]] = []
+
+
+def _rss_bytes() -> Optional[int]:
+    """The process's current resident set size; None where /proc is not available."""
+    try:
+        with open("/proc/self/statm") as statm:
+            return int(statm.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError, AttributeError):
+        return None
+
+
+def _measured_build(name: str, factory: Callable[[], Any]) -> Any:
+    modules_before = len(sys.modules)
+    rss_before = _rss_bytes()
+    started = time.perf_counter()
+    _nested.append([0.0, 0, 0])
+    try:
+        provider = factory()
+    finally:
+        inner_seconds, inner_rss, inner_modules = _nested.pop()
+    seconds = time.perf_counter() - started
+    modules = len(sys.modules) - modules_before
+    rss_after = _rss_bytes()
+    rss = rss_after - rss_before if rss_before is not None and rss_after is not None else 0
+    if _nested:
+        _nested[-1][0] += seconds
+        _nested[-1][1] += rss
+        _nested[-1][2] += modules
+
+    record = _builds.get(name)
+    if record is None:
+        record = _builds[name] = {
+            "first_build_ms": round(1000 * (seconds - inner_seconds), 1),
+            "modules_imported": modules - inner_modules,
+            "rss_delta_kb": round((rss - inner_rss) / 1024) if rss_before is not None else None,
+            "builds": 0,
+        }
+        logger.debug(
+            f"Built {name} in {record['first_build_ms']}ms "
+            f"({record['modules_imported']} modules imported)"
+        )
+    record["builds"] += 1
+    return provider
+
+
+class lazy_provider:
+    """A provider attribute built by the decorated method on first read."""
+
+    def __init__(self, factory: Callable[[Any], Any]):
+        self.factory = factory
+        self.name = factory.__name__
+        self.__doc__ = factory.__doc__
+
+    def __set_name__(self, owner, name: str) -> None:
+        self.name = name
+        _declared[name] = owner.__name__
+
+    def __get__(self, instance, owner=None):
+        if instance is None:
+            return self
+        with _lock:
+            # Another thread may have built it while we waited for the lock.
+            if self.name not in instance.__dict__:
+                instance.__dict__[self.name] = _measured_build(
+                    self.name, lambda: self.factory(instance)
+                )
+        return instance.__dict__[self.name]
+
+
+def built_providers(instance: Any) -> List[str]:
+    """The lazy providers `instance` has built (or been given) so far."""
+    cls = type(instance)
+    return sorted(
+        name for name in vars(instance)
+        if isinstance(getattr(cls, name, None), lazy_provider)
+    )
+
+
+def provider_stats() -> Dict[str, Any]:
+    with _lock:
+        builds = {name: dict(record) for name, record in sorted(_builds.items())}
+    rss = _rss_bytes()
+    return {
+        "declared": len(_declared),
+        "built": len(builds),
+        "not_built": sorted(set(_declared) - set(builds)),
+        "build_ms_total": round(sum(b["first_build_ms"] for b in builds.values()), 1),
+        "rss_kb": round(rss / 1024) if rss is not None else None,
+        "providers": builds,
+    }
@@ -6,12 +6,21 @@ Uses BorsaApiClient as the underlying service layer.
 NOTE: This module returns raw dicts, not Pydantic models, to avoid validation overhead.
 """
 import asyncio
+import copy
 from datetime import datetime, timedelta
-from typing import Any, Dict, List, Optional, Tuple, Union
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple, Union
 import logging
 
 from borsapy.exceptions import DataNotAvailableError
 
+from providers.bulkhead import bounded_gather
+from providers.cache import CacheNamespace, stale_warning
+from providers.coalescing import Coalescer, coalesced
+from providers.executors import run_blocking, run_compute
+from providers.negative_cache import (
+    NegativeCache, NoDataInWindowError, SymbolNotFoundError, miss_error, remembers_misses,
+)
+from providers.ttl_policy import DataKind, ttl_for
 from models.unified_base import (
     MarketType, StatementType, PeriodType, DataType, RatioSetType, ExchangeType
 )
@@ -61,10 +70,74 @@ def parse_tcmb_number(value: Optional[str]) -> Optional[float]:
 class MarketRouter:
     """Routes unified tool requests to appropriate market-specific providers."""
 
+    # Index composition is rebalanced quarterly; a day is plenty fresh.
+    INDEX_MEMBERS_TTL = 24 * 60 * 60
+    # TEFAS fund info is served stale while it refetches, but never a NAV this far
+    # past its expiry: by then the caller waits for today's.
+    FUND_INFO_MAX_STALE = 6 * 60 * 60
+
     def __init__(self):
         """Initialize the market router with borsa_client as the underlying service layer."""
         from borsa_client import BorsaApiClient
         self._client = BorsaApiClient()
+        self._index_members = CacheNamespace(
+            "router.index_members", ttl=self.INDEX_MEMBERS_TTL, max_entries=64,
+            shared=True, persist=True,
+        )
+        # Concurrent identical calls -- a burst of sessions on one ticker -- share
+        # a single upstream round trip. See providers/coalescing.py.
+        self._coalescer = Coalescer("router")
+        # Unknown symbols and empty windows, remembered briefly and across tools so a
+        # guessed ticker costs one upstream round trip. See negative_cache.py.
+        self._misses = NegativeCache()
+        # These and the index memberships are shared across replicas when a cache
+        # backend is configured; see providers/cache_backend.py.
+        # Both expire with the market's session, not on a flat clock: a quote is
+        # seconds-fresh while BIST trades and good until the next open after the
+        # close; a NAV is good until TEFAS publishes again. See ttl_policy.
+        self._quotes = CacheNamespace(
+            "router.quotes", ttl=ttl_for("bist", DataKind.QUOTE), max_entries=512,
+            shared=True,
+        )
+        self._fund_series = CacheNamespace(
+            "router.fund_series", ttl=ttl_for("fund", DataKind.FUND_NAV), max_entries=256,
+            shared=True, persist=True,
+        )
+        self._fund_info = CacheNamespace(
+            "router.fund_info", ttl=ttl_for("fund", DataKind.FUND_NAV), max_entries=256,
+            shared=True, persist=True,
+        )
+
+    def _resolver(self):
+        from providers.asset_resolver import AssetResolver
+        if not hasattr(self, "_asset_resolver"):
+            self._asset_resolver = AssetResolver(self._client)
+        return self._asset_resolver
+
+    def warmup_steps(self) -> Dict[str, Callable[[], Awaitable[Any]]]:
+        """The reference data first calls would otherwise wait on, for providers/warmup.py.
+
+        The resolver loads the TEFAS/Takasbank fund list and the KAP company list; the
+        KAP step shares that download through the KAP cache's single-flight.
+        """
+        async def sector_indices():
+            codes = self._SECTOR_INDICES + ["XU100"]
+            await asyncio.gather(*(self._index_components(code) for code in codes))
+
+        async def scanner_fields():
+            self._client.scanner_provider.warm()
+
+        return {
+            # Read in the step, so building the KAP provider is part of warmup too.
+            "kap_companies": lambda: self._client.kap_provider.get_all_companies(),
+            "asset_resolver": self._resolver().warm,
+            "sector_indices": sector_indices,
+            "scanner_fields": scanner_fields,
+        }
+
+    def miss_stats(self) -> Dict[str, Any]:
+        """Negative-cache counters, for /health."""
+        return self._misses.stats()
 
     # --- Helper Methods ---
 
@@ -196,6 +269,8 @@ class MarketRouter:
 
     # --- Company Profile ---
 
+    @remembers_misses
+    @coalesced
     async def get_profile(
         self,
         symbol: Union[str, List[str]],
@@ -311,12 +386,36 @@ class MarketRouter:
 
     # --- Quick Info ---
 
+    @remembers_misses
+    @coalesced
     async def get_quick_info(
         self,
         symbols: Union[str, List[str]],
         market: MarketType
     ) -> Dict[str, Any]:
-        """Get quick info for single or multiple symbols. Returns raw dict."""
+        """Get quick info for single or multiple symbols. Returns raw dict.
+
+        Cached for as long as the market's session says a quote stays true. Only a
+        complete answer is kept: a symbol that failed is retried on the next call.
+        """
+        key = (
+            getattr(market, "value", market),
+            tuple(symbols) if isinstance(symbols, list) else symbols,
+        )
+        result = await self._quotes.get_or_load(
+            key,
+            lambda: self._get_quick_info_uncached(symbols, market),
+            ttl=ttl_for(market, DataKind.QUOTE),
+            cache_if=lambda r: r["data"] is not None and not r["metadata"]["failed_count"],
+        )
+        # The server decorates results in place; the cached copy must stay clean.
+        return copy.deepcopy(result)
+
+    async def _get_quick_info_uncached(
+        self,
+        symbols: Union[str, List[str]],
+        market: MarketType
+    ) -> Dict[str, Any]:
         is_multi = isinstance(symbols, list)
         symbol_list = symbols if is_multi else [symbols]
         source = "unknown"
@@ -446,6 +545,8 @@ class MarketRouter:
 
     # --- Historical Data ---
 
+    @remembers_misses
+    @coalesced
     async def get_historical_data(
         self,
         symbol: str,
@@ -476,6 +577,9 @@ class MarketRouter:
 
         bar_interval = None
         raw_count = None
+        # An upstream failure that a branch swallowed. With one, an empty series is
+        # "the fetch failed", not "there is no data" -- and must not be remembered.
+        upstream_error = None
 
         if market == MarketType.FUND:
             # The schema promised fund history and the router refused it. The series
@@ -533,9 +637,10 @@ class MarketRouter:
             )
             # get_finansal_veri reports upstream failures as {"error": ...}. Falling
             # through would return an empty-but-successful payload, which reads as
-            # "this ticker has no price history".
+            # "this ticker has no price history". `miss` says whether the failure
+            # was a definitive one (unknown ticker, empty window) or a transport drop.
             if result and result.get("error"):
-                raise RuntimeError(result["error"])
+                raise miss_error(result.get("miss"), result["error"])
             if result and result.get("optimizasyon_uygulandı"):
                 raw_count = result.get("ham_veri_sayisi")
             if result and result.get("data"):
@@ -566,6 +671,8 @@ class MarketRouter:
                 end_date=end_date,
                 auto_adjust=False,
             )
+            if result and result.get("error"):
+                upstream_error = result["error"]
             if result and result.get("optimizasyon_uygulandı"):
                 raw_count = result.get("ham_veri_sayisi")
             if result and result.get("data_points"):
@@ -592,6 +699,7 @@ class MarketRouter:
                 from_time=int(win_start.timestamp()) if win_start else None,
                 to_time=int(win_end.timestamp()) if win_end else None,
             )
+            upstream_error = getattr(result, "error_message", None)
             if result and result.ohlc_data:
                 for dp in result.ohlc_data:
                     data_points.append({
@@ -632,6 +740,7 @@ class MarketRouter:
                 end=str(int(win_end.timestamp())) if win_end else None,
                 granularity=self._coinbase_granularity(interval),
             )
+            upstream_error = getattr(result, "error_message", None)
             if result and result.candles:
                 for dp in result.candles:
                     data_points.append({
@@ -673,6 +782,7 @@ class MarketRouter:
                         })
             except Exception as e:
                 logger.warning(f"FX historical data error for {symbol}: {e}")
+                upstream_error = e
 
         # Forwarding the window to the provider is not enough: BtcTurk's graph API is
         # handed from/to and still answers with a superset (a 07-01..07-10 request came
@@ -690,9 +800,10 @@ class MarketRouter:
                 f"{start_date or 'start'}..{end_date or 'now'}"
                 if (start_date or end_date) else (period or "default period")
             )
-            raise DataNotAvailableError(
-                f"No historical data for '{symbol}' ({market.value}) over {window}"
-            )
+            message = f"No historical data for '{symbol}' ({market.value}) over {window}"
+            if upstream_error:
+                raise DataNotAvailableError(f"{message}: {upstream_error}")
+            raise NoDataInWindowError(message)
 
         result_dict = {
             "metadata": self._create_metadata(market, symbol, source),
@@ -833,6 +944,8 @@ class MarketRouter:
 
     # --- Technical Analysis ---
 
+    @remembers_misses
+    @coalesced
     async def get_technical_analysis(
         self,
         symbol: str,
@@ -850,7 +963,7 @@ class MarketRouter:
         if market == MarketType.BIST:
             source = "yfinance"
             ticker = self._get_ticker_with_suffix(symbol, market)
-            result = await self._client.get_teknik_analiz_yfinance(ticker)
+            result = await self._client.get_teknik_analiz_yfinance(ticker, timeframe)
             if result:
                 if result.get("fiyat_analizi"):
                     current_price = result["fiyat_analizi"].get("guncel_fiyat")
@@ -890,7 +1003,7 @@ class MarketRouter:
 
         elif market == MarketType.US:
             source = "yfinance"
-            result = await self._client.get_us_technical_analysis(symbol)
+            result = await self._client.get_us_technical_analysis(symbol, timeframe)
             if result and result.get("indicators"):
                 ind = result["indicators"]
                 current_price = result.get("current_price")
@@ -1010,6 +1123,8 @@ class MarketRouter:
 
     # --- Pivot Points ---
 
+    @remembers_misses
+    @coalesced
     async def get_pivot_points(
         self,
         symbol: str,
@@ -1195,13 +1310,14 @@ class MarketRouter:
             "upside_potential": upside
         }
 
+    @remembers_misses
+    @coalesced
     async def get_analyst_data(
         self,
         symbols: Union[str, List[str]],
         market: MarketType
     ) -> Dict[str, Any]:
         """Get analyst ratings and recommendations. Returns raw dict."""
-        import asyncio
         is_multi = isinstance(symbols, list)
         symbol_list = symbols if is_multi else [symbols]
         source = "yfinance"
@@ -1215,7 +1331,7 @@ class MarketRouter:
 
         # Multi-ticker: fetch all in parallel
         tasks = [self._get_analyst_single(s, market) for s in symbol_list]
-        results = await asyncio.gather(*tasks, return_exceptions=True)
+        results = await bounded_gather(tasks, return_exceptions=True)
 
         data = []
         for i, r in enumerate(results):
@@ -1243,10 +1359,14 @@ class MarketRouter:
         fetch_one,
         warnings: Optional[List[str]] = None
     ) -> Dict[str, Any]:
-        """Run a per-symbol fetch in parallel and build the multi-ticker envelope."""
+        """Run a per-symbol fetch in parallel and build the multi-ticker envelope.
+
+        At most FANOUT_LIMIT symbols are in flight per call: the upstream's bulkhead
+        bounds everyone together, this keeps one long symbol list from filling its queue.
+        """
         warnings = warnings if warnings is not None else []
-        results = await asyncio.gather(
-            *(fetch_one(s) for s in symbol_list), return_exceptions=True
+        results = await bounded_gather(
+            (fetch_one(s) for s in symbol_list), return_exceptions=True
         )
         data = []
         for sym, r in zip(symbol_list, results):
@@ -1332,6 +1452,8 @@ class MarketRouter:
             "stock_splits": stock_splits
         }
 
+    @remembers_misses
+    @coalesced
     async def get_dividends(
         self,
         symbols: Union[str, List[str]],
@@ -1451,6 +1573,8 @@ class MarketRouter:
             "growth_estimates": growth_estimates
         }
 
+    @remembers_misses
+    @coalesced
     async def get_earnings(
         self,
         symbols: Union[str, List[str]],
@@ -1502,6 +1626,7 @@ class MarketRouter:
             for stmt_name, fetch_func in types_to_fetch:
                 try:
                     result = await fetch_func(symbol, period_str, last_n)
+                    warnings.extend((result or {}).get("warnings", []))
                     if result and result.get("tablo"):
                         tablo = result["tablo"]
                         periods_list = []
@@ -1560,6 +1685,8 @@ class MarketRouter:
             "warnings": warnings
         }
 
+    @remembers_misses
+    @coalesced
     async def get_financial_statements(
         self,
         symbols: Union[str, List[str]],
@@ -1598,6 +1725,8 @@ class MarketRouter:
 
     # --- Financial Ratios ---
 
+    @remembers_misses
+    @coalesced
     async def get_financial_ratios(
         self,
         symbol: str,
@@ -2015,6 +2144,7 @@ class MarketRouter:
 
     # --- Crypto Market ---
 
+    @coalesced
     async def get_crypto_market(
         self,
         symbol: str,
@@ -2183,6 +2313,7 @@ class MarketRouter:
 
     # --- FX Data ---
 
+    @coalesced
     async def get_fx_data(
         self,
         symbols: Optional[List[str]] = None,
@@ -2236,8 +2367,8 @@ class MarketRouter:
             if symbols:
                 # Fetch all symbols concurrently instead of serially; each
                 # get_dovizcom_guncel_kur is an independent network round-trip.
-                results = await asyncio.gather(
-                    *(self._client.get_dovizcom_guncel_kur(sym) for sym in symbols),
+                results = await bounded_gather(
+                    (self._client.get_dovizcom_guncel_kur(sym) for sym in symbols),
                     return_exceptions=True
                 )
                 for sym, result in zip(symbols, results):
@@ -2359,6 +2490,140 @@ class MarketRouter:
 
         return await self._fan_out_multi(symbols, market, "mixed", one)
 
+    # --- Index-wide Technical Analysis ---
+
+    # "Which XU100 names are oversold and above their SMA200" took ten symbols per
+    # get_technical_analysis call and a full answer per symbol. An index scan reads
+    # every member's daily bars through the bar store, computes the indicators for all
+    # of them in one pass (indicators.compute_matrix), and answers one row per member.
+
+    # Rank keys, and whether the lowest value ranks first.
+    _INDEX_TA_RANKS = {
+        "rsi_14": True,
+        "stochastic_k": True,
+        "change_pct": False,
+        "macd_histogram": False,
+        "vs_sma50_pct": False,
+        "vs_sma200_pct": False,
+    }
+
+    # Screens a row must pass; a row without the indicator a screen needs fails it.
+    _INDEX_TA_SCREENS = {
+        "oversold": ("rsi_14", lambda v: v < 30),
+        "overbought": ("rsi_14", lambda v: v > 70),
+        "above_sma50": ("vs_sma50_pct", lambda v: v > 0),
+        "below_sma50": ("vs_sma50_pct", lambda v: v < 0),
+        "above_sma200": ("vs_sma200_pct", lambda v: v > 0),
+        "below_sma200": ("vs_sma200_pct", lambda v: v < 0),
+        "macd_bullish": ("macd_histogram", lambda v: v > 0),
+        "macd_bearish": ("macd_histogram", lambda v: v < 0),
+    }
+
+    @staticmethod
+    def _index_ta_row(symbol: str, ind) -> Dict[str, Any]:
+        """One member's line of the index table."""
+        def pct(level: Optional[float]) -> Optional[float]:
+            if ind.close is None or not level:
+                return None
+            return (ind.close / level - 1.0) * 100.0
+
+        rsi = ind.rsi_14
+        return {
+            "symbol": symbol,
+            "close": ind.close,
+            "change_pct": pct(ind.previous_close),
+            "rsi_14": rsi,
+            "rsi_signal": (
+                None if rsi is None
+                else "oversold" if rsi < 30 else "overbought" if rsi > 70 else "neutral"
+            ),
+            "macd_histogram": ind.macd_histogram,
+            "stochastic_k": ind.stochastic_k,
+            "vs_sma50_pct": pct(ind.sma.get(50)),
+            "vs_sma200_pct": pct(ind.sma.get(200)),
+        }
+
+    async def get_index_technical_analysis(
+        self,
+        index_code: str,
+        rank_by: str = "rsi_14",
+        screens: Optional[List[str]] = None,
+    ) -> Dict[str, Any]:
+        """Daily indicators for every member of a BIST index, as one ranked table."""
+        from providers.indicators import compute_matrix
+
+        index_code = index_code.upper().strip()
+        if rank_by not in self._INDEX_TA_RANKS:
+            raise ValueError(
+                f"rank_by must be one of {', '.join(self._INDEX_TA_RANKS)}; got '{rank_by}'"
+            )
+        screens = list(screens or [])
+        unknown = [s for s in screens if s not in self._INDEX_TA_SCREENS]
+        if unknown:
+            raise ValueError(
+                f"Unknown screen(s) {', '.join(unknown)}; "
+                f"available: {', '.join(self._INDEX_TA_SCREENS)}"
+            )
+
+        members = await self._index_components(index_code)
+        if not members:
+            raise ValueError(f"No members found for BIST index '{index_code}'")
+
+        fetched = await self._client.get_bist_daily_bars(members)
+        frames = fetched["bars"]
+        symbols = [s for s in members if s in frames]
+
+        def compute():
+            return compute_matrix(
+                [frames[s]["Close"].to_numpy() for s in symbols],
+                [frames[s]["High"].to_numpy() for s in symbols],
+                [frames[s]["Low"].to_numpy() for s in symbols],
+                [frames[s]["Volume"].to_numpy() for s in symbols],
+            )
+
+        # Local CPU work on bars already fetched: not a borsapy call.
+        results = await run_compute(compute) if symbols else []
+        rows = [self._index_ta_row(s, ind) for s, ind in zip(symbols, results)]
+        for screen in screens:
+            field, passes = self._INDEX_TA_SCREENS[screen]
+            rows = [r for r in rows if r[field] is not None and passes(r[field])]
+
+        ascending = self._INDEX_TA_RANKS[rank_by]
+        ranked = sorted(
+            (r for r in rows if r[rank_by] is not None),
+            key=lambda r: r[rank_by], reverse=not ascending,
+        )
+        ranked += [r for r in rows if r[rank_by] is None]
+
+        warnings = []
+        if fetched["failed"]:
+            warnings.append(
+                f"No bars for {len(fetched['failed'])} member(s): "
+                f"{', '.join(sorted(fetched['failed']))}"
+            )
+        short = sum(1 for ind in results if ind.sma.get(200) is None)
+        if short and (rank_by == "vs_sma200_pct" or any("sma200" in s for s in screens)):
+            warnings.append(
+                f"{short} member(s) have fewer than 200 daily bars and no SMA200; "
+                "they are excluded by SMA200 screens and ranked last."
+            )
+
+        return {
+            "metadata": self._create_metadata(
+                MarketType.BIST, index_code, "borsapy",
+                successful=len(symbols), failed=len(fetched["failed"]),
+            ),
+            "index": index_code,
+            "timeframe": "1d",
+            "rank_by": rank_by,
+            "screens": screens,
+            "member_count": len(members),
+            "analyzed_count": len(symbols),
+            "match_count": len(ranked),
+            "rows": ranked,
+            "warnings": warnings,
+        }
+
     async def get_financial_ratios_multi(
         self,
         symbols: List[str],
@@ -2412,6 +2677,8 @@ class MarketRouter:
         raw.pop("metadata", None)
         return raw
 
+    @remembers_misses
+    @coalesced
     async def get_quote(
         self,
         symbol: Union[str, List[str]],
@@ -2476,7 +2743,6 @@ class MarketRouter:
         The whole reason this exists: answering "ASELS mi altın mı?" took six tool
         calls and left the currency conversion and the window alignment to the model.
         """
-        from providers.asset_resolver import AssetResolver
         from providers.compare import AssetWindow, compute_comparison
 
         end_date = end_date or datetime.now().strftime("%Y-%m-%d")
@@ -2485,10 +2751,8 @@ class MarketRouter:
                 f"start_date ({start_date}) must be before end_date ({end_date})"
             )
 
-        if not hasattr(self, "_asset_resolver"):
-            self._asset_resolver = AssetResolver(self._client)
-
-        refs = [await self._asset_resolver.resolve(a) for a in assets]
+        resolver = self._resolver()
+        refs = [await resolver.resolve(a) for a in assets]
 
         # USDTRY is fetched over the same padded windows and read at each asset's own
         # endpoint dates, so a fund converting a day earlier than a stock uses the rate
@@ -2552,27 +2816,37 @@ class MarketRouter:
         """
         import borsapy as bp
 
-        fund = bp.Fund(symbol.upper())
-        hist = await asyncio.get_running_loop().run_in_executor(
-            None, lambda: fund.history(start=start_date, end=end_date)
-        )
-        if hist is None or len(hist) == 0:
-            raise DataNotAvailableError(
-                f"No NAV history for fund '{symbol}' between "
-                f"{start_date or 'start'} and {end_date or 'now'}"
+        async def load() -> Dict[str, Any]:
+            fund = bp.Fund(symbol.upper())
+            hist = await run_blocking(
+                "tefas", lambda: fund.history(start=start_date, end=end_date)
             )
+            if hist is None or len(hist) == 0:
+                raise NoDataInWindowError(
+                    f"No NAV history for fund '{symbol}' between "
+                    f"{start_date or 'start'} and {end_date or 'now'}"
+                )
 
-        rows = [
-            {"published_date": idx.strftime("%Y-%m-%d"), "close": float(row["Price"])}
-            for idx, row in hist.iterrows()
-        ]
-        return {
-            "symbol": symbol.upper(),
-            "currency": "TRY",
-            "source": "tefas",
-            "data": rows,
-        }
+            rows = [
+                {"published_date": idx.strftime("%Y-%m-%d"), "close": float(row["Price"])}
+                for idx, row in hist.iterrows()
+            ]
+            return {
+                "symbol": symbol.upper(),
+                "currency": "TRY",
+                "source": "tefas",
+                "data": rows,
+            }
 
+        # A NAV series only changes when TEFAS publishes; hold it until then.
+        return await self._fund_series.get_or_load(
+            (symbol.upper(), start_date, end_date),
+            load,
+            ttl=ttl_for("fund", DataKind.FUND_NAV),
+        )
+
+    @remembers_misses(market="fund")
+    @coalesced
     async def get_fund_data(
         self,
         symbol: str,
@@ -2601,16 +2875,33 @@ class MarketRouter:
         recent_prices = None
         warnings = []
 
-        loop = asyncio.get_event_loop()
+        metadata_warnings = []
+        unknown_fund = (
+            f"No data for fund: {symbol.upper()}. The code may be delisted or "
+            f"misspelled - use search_symbol(market='fund') to find valid codes."
+        )
+
         try:
-            fund = await loop.run_in_executor(None, bp.Fund, symbol.upper())
-            info = await loop.run_in_executor(None, lambda: fund.info)
+            fund = await run_blocking("tefas", bp.Fund, symbol.upper())
+            # TEFAS's info call is the slow one, and the one that times out: an
+            # expired copy is served at once while it refreshes in the background.
+            try:
+                info, age = await self._fund_info.get_or_revalidate(
+                    symbol.upper(),
+                    lambda: run_blocking("tefas", lambda: fund.info),
+                    max_stale=self.FUND_INFO_MAX_STALE,
+                    ttl=ttl_for("fund", DataKind.FUND_NAV),
+                    cache_if=bool,
+                )
+            except DataNotAvailableError as e:
+                # borsapy raises this when TEFAS answers with no such fund -- a
+                # definitive miss, unlike the APIError a failed request becomes.
+                raise SymbolNotFoundError(unknown_fund) from e
+            if age is not None:
+                metadata_warnings.append(stale_warning(f"TEFAS info for {symbol.upper()}", age))
 
             if not info:
-                raise ValueError(
-                    f"No data for fund: {symbol.upper()}. The code may be delisted or "
-                    f"misspelled - use search_symbol(market='fund') to find valid codes."
-                )
+                raise SymbolNotFoundError(unknown_fund)
 
             if info:
                 # Calculate weekly return from history if not provided
@@ -2618,7 +2909,7 @@ class MarketRouter:
                 if weekly_return is None:
                     try:
                         week_start = (datetime.now() - timedelta(days=7)).strftime('%Y-%m-%d')
-                        hist = await loop.run_in_executor(None, lambda: fund.history(start=week_start))
+                        hist = await run_blocking("tefas", lambda: fund.history(start=week_start))
                         if hist is not None and len(hist) >= 2:
                             first_price = hist['Price'].iloc[0]
                             last_price = hist['Price'].iloc[-1]
@@ -2632,7 +2923,7 @@ class MarketRouter:
                 # from a rounded percentage.
                 if start_date:
                     try:
-                        hist = await loop.run_in_executor(None, lambda: fund.history(start=start_date, end=end_date))
+                        hist = await run_blocking("tefas", lambda: fund.history(start=start_date, end=end_date))
                         if hist is not None and len(hist) >= 1:
                             first_price = float(hist['Price'].iloc[0])
                             last_price = float(hist['Price'].iloc[-1])
@@ -2662,7 +2953,7 @@ class MarketRouter:
                 # price, recent_prices[1] the prior trading day, and so on.
                 try:
                     rp_start = (datetime.now() - timedelta(days=16)).strftime('%Y-%m-%d')
-                    rp_hist = await loop.run_in_executor(None, lambda: fund.history(start=rp_start))
+                    rp_hist = await run_blocking("tefas", lambda: fund.history(start=rp_start))
                     if rp_hist is not None and len(rp_hist) >= 1:
                         recent_rows = []
                         for date_idx, price in rp_hist['Price'].items():
@@ -2740,7 +3031,9 @@ class MarketRouter:
             raise
 
         result = {
-            "metadata": self._create_metadata(MarketType.FUND, symbol, source),
+            "metadata": self._create_metadata(
+                MarketType.FUND, symbol, source, warnings=metadata_warnings
+            ),
             "fund": fund_info,
             "portfolio": portfolio,
             "performance_history": performance,
@@ -2753,6 +3046,8 @@ class MarketRouter:
 
     # --- Index Data ---
 
+    @remembers_misses
+    @coalesced
     async def get_index_data(
         self,
         code: str,
@@ -2770,11 +3065,10 @@ class MarketRouter:
             # to answer without a price at all.
             source = "borsapy"
             import borsapy as bp
-            loop = asyncio.get_event_loop()
             idx_code = code.upper().strip()
 
-            index_obj = await loop.run_in_executor(None, bp.Index, idx_code)
-            info = await loop.run_in_executor(None, lambda: index_obj.info)
+            index_obj = await run_blocking("borsapy", bp.Index, idx_code)
+            info = await run_blocking("borsapy", lambda: index_obj.info)
 
             if not info:
                 raise ValueError(
@@ -2797,7 +3091,7 @@ class MarketRouter:
             }
 
             if include_components:
-                symbols = await loop.run_in_executor(None, lambda: index_obj.component_symbols)
+                symbols = await run_blocking("borsapy", lambda: index_obj.component_symbols)
 
                 # Enrich with company names from KAP's cached list (borsapy returns
                 # bare tickers). Names are a nicety; a KAP miss must not drop the row.
@@ -2848,25 +3142,32 @@ class MarketRouter:
     ]
     _MAX_PEERS = 24
 
-    async def _bist_sector_peers(self, target: str) -> tuple:
-        """Resolve a BIST ticker to its sector index and that index's other members."""
+    async def _index_components(self, index_code: str) -> List[str]:
+        """One BIST index's member tickers, cached per index.
+
+        An index that fails to load answers [] for this call but is not cached, so a
+        transient borsapy failure cannot hide a whole sector for the day.
+        """
         import borsapy as bp
-        loop = asyncio.get_event_loop()
 
-        if not getattr(self, "_sector_membership", None):
-            def load(ix):
-                try:
-                    return ix, list(bp.Index(ix).component_symbols or [])
-                except Exception as e:
-                    logger.warning(f"Could not load components for {ix}: {e}")
-                    return ix, []
+        async def load() -> List[str]:
+            try:
+                return await run_blocking(
+                    "borsapy", lambda: list(bp.Index(index_code).component_symbols or [])
+                )
+            except Exception as e:
+                logger.warning(f"Could not load components for {index_code}: {e}")
+                return []
 
-            pairs = await asyncio.gather(
-                *(loop.run_in_executor(None, load, ix) for ix in self._SECTOR_INDICES)
-            )
-            self._sector_membership = dict(pairs)
+        return await self._index_members.get_or_load(index_code, load, cache_if=bool)
+
+    async def _bist_sector_peers(self, target: str) -> tuple:
+        """Resolve a BIST ticker to its sector index and that index's other members."""
+        members = await bounded_gather(
+            self._index_components(ix) for ix in self._SECTOR_INDICES
+        )
+        membership = dict(zip(self._SECTOR_INDICES, members))
 
-        membership = self._sector_membership
         sector_index = next(
             (ix for ix in self._SECTOR_INDICES if target in membership.get(ix, [])),
             None
@@ -2879,17 +3180,10 @@ class MarketRouter:
         # Broad indices (XUSIN has 246 members) would be neither useful nor cheap to
         # price, so narrow them to the liquid BIST-100 names before capping.
         if len(peers) > self._MAX_PEERS:
-            try:
-                xu100 = set(
-                    await loop.run_in_executor(
-                        None, lambda: bp.Index("XU100").component_symbols or []
-                    )
-                )
-                liquid = [s for s in peers if s in xu100]
-                if liquid:
-                    peers = liquid
-            except Exception as e:
-                logger.warning(f"Could not narrow peers by XU100: {e}")
+            xu100 = set(await self._index_components("XU100"))
+            liquid = [s for s in peers if s in xu100]
+            if liquid:
+                peers = liquid
 
         return peers[: self._MAX_PEERS], sector_index
 
@@ -2903,10 +3197,9 @@ class MarketRouter:
     async def _fetch_bist_metrics(self, symbols: List[str]) -> Dict[str, Dict[str, Any]]:
         """Fetch valuation metrics for BIST tickers via one bulk screener call."""
         import borsapy as bp
-        loop = asyncio.get_event_loop()
 
-        df = await loop.run_in_executor(
-            None,
+        df = await run_blocking(
+            "borsapy",
             lambda: bp.screen_stocks(pe_min=0, pb_min=0, market_cap_min=0)
         )
         if df is None or df.empty:
@@ -2927,6 +3220,7 @@ class MarketRouter:
             }
         return metrics
 
+    @coalesced
     async def get_sector_comparison(
         self,
         symbol: str,
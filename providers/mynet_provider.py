@@ -5,19 +5,19 @@ including scraping URLs, real-time data, and financial statements.
 """
 import httpx
 import logging
-import time
 import re
 import json
-import io
 from datetime import datetime, timedelta
 from bs4 import BeautifulSoup
 from typing import List, Optional, Dict, Any
-from markitdown import MarkItDown
 from models import (
     SirketGenelBilgileri, Istirak, Ortak, Yonetici, 
     PiyasaDegeri, BilancoKalemi, MevcutDonem, KarZararKalemi,
     FinansalVeriNoktasi, ZamanAraligiEnum, EndeksBilgisi
 )
+from providers.cache import CacheNamespace
+from providers.parsers import kap_detail_markdown
+from providers.process_pool import run_parser
 
 logger = logging.getLogger(__name__)
 
@@ -27,9 +27,9 @@ class MynetProvider:
 
     def __init__(self, client: httpx.AsyncClient):
         self._http_client = client
-        self._ticker_to_url: Dict[str, str] = {}
-        self._last_fetch_time: float = 0
-        self._markitdown = MarkItDown()
+        self._ticker_to_url = CacheNamespace(
+            "mynet.url_map", ttl=self.CACHE_DURATION, max_entries=1, persist=True
+        )
         
     async def _fetch_ticker_urls(self) -> Optional[Dict[str, str]]:
         try:
@@ -53,19 +53,10 @@ class MynetProvider:
             return None
 
     async def get_url_map(self) -> Dict[str, str]:
-        current_time = time.time()
-        
-        # Type safety check to prevent the error
-        if not isinstance(self._last_fetch_time, (int, float)):
-            logger.warning(f"_last_fetch_time has wrong type: {type(self._last_fetch_time)}, resetting to 0")
-            self._last_fetch_time = 0
-        
-        if not self._ticker_to_url or (current_time - self._last_fetch_time) > self.CACHE_DURATION:
-            url_map = await self._fetch_ticker_urls()
-            if url_map:
-                self._ticker_to_url = url_map
-                self._last_fetch_time = current_time
-        return self._ticker_to_url
+        url_map = await self._ticker_to_url.get_or_load(
+            "all", self._fetch_ticker_urls, cache_if=bool
+        )
+        return url_map or self._ticker_to_url.get_stale("all", {})
 
     def _clean_and_convert_value(self, value_str: str) -> Any:
         if not isinstance(value_str, str):
@@ -173,29 +164,14 @@ class MynetProvider:
         try:
             response = await self._http_client.get(haber_url)
             response.raise_for_status()
-            soup = BeautifulSoup(response.content, 'lxml')
-            
-            # Find KAP detail container
-            kap_detail = soup.select_one("div.card.kap-detail-news-page")
-            if not kap_detail:
+            # Parsing and MarkItDown's conversion are CPU-bound; a long disclosure
+            # held the event loop for all of it. They run in the parse pool.
+            detail = await run_parser(kap_detail_markdown, response.content)
+            if detail is None:
                 return {"error": "KAP detail content not found on the page."}
-            
-            # Extract title
-            title_tag = kap_detail.select_one("h1")
-            title = title_tag.get_text(strip=True) if title_tag else "Başlık Bulunamadı"
-            
-            # Extract page header (document type)
-            page_header = kap_detail.select_one("div.page-header")
-            doc_type = page_header.get_text(strip=True) if page_header else ""
-            
-            # Use MarkItDown to convert HTML to markdown
-            kap_detail_html = str(kap_detail)
-            html_bytes = kap_detail_html.encode('utf-8')
-            html_stream = io.BytesIO(html_bytes)
-            markdown_result = self._markitdown.convert_stream(html_stream, file_extension=".html")
-            
-            # Clean up and enhance the markdown content
-            markdown_content = markdown_result.text_content if hasattr(markdown_result, 'text_content') else str(markdown_result)
+            title = detail["title"]
+            doc_type = detail["doc_type"]
+            markdown_content = detail["markdown"]
             
             # Add custom header and document type if MarkItDown didn't capture them well
             if title and title not in markdown_content[:200]:
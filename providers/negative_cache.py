@@ -0,0 +1,162 @@
+"""
+Negative caching: remember for a few minutes that a symbol does not exist.
+
+An LLM that guesses a ticker -- `GARANT`, `THYA`, a fund code off by a letter -- pays
+a full upstream round trip to learn that, and for BIST history three of them, because
+_history_with_retry retried the miss as if it were a dropped websocket. Then it asks
+again, often through a different tool, and pays again.
+
+Two kinds of miss are remembered, each only when the failure is definitive:
+
+- SymbolNotFoundError: the symbol does not exist in that market. Remembered per
+  (market, symbol) and shared by every tool, so a get_quote on a ticker that
+  get_historical_data just failed on answers at once.
+- NoDataInWindowError: the symbol may exist, but this exact call has nothing to
+  return. Remembered per call: another window may well have data.
+
+Everything else -- timeouts, rate limits, a websocket that said nothing, and the plain
+DataNotAvailableError that parts of the router still raise after swallowing an
+upstream exception -- is transient or ambiguous, and is never cached. Both types
+subclass DataNotAvailableError, so existing handlers and error messages are unchanged.
+"""
+import functools
+import inspect
+import logging
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional, Tuple
+
+from borsapy.exceptions import BorsapyError, DataNotAvailableError, TickerNotFoundError
+
+from providers.cache import CacheNamespace
+from providers.coalescing import _Unhashable, _normalize
+
+logger = logging.getLogger(__name__)
+
+# A new listing or a fund launched this morning should not stay unknown for long.
+UNKNOWN_SYMBOL_TTL = 10 * 60
+# Today's bar can land in a window that was empty a moment ago.
+EMPTY_WINDOW_TTL = 2 * 60
+
+SYMBOL = "symbol"
+WINDOW = "window"
+
+# What TradingView says, inside borsapy's APIError, when it cannot resolve a symbol.
+_UNKNOWN_SYMBOL_MARKERS = ("invalid symbol", "unknown symbol")
+
+
+class SymbolNotFoundError(DataNotAvailableError):
+    """The symbol does not exist in the market it was asked for."""
+
+
+class NoDataInWindowError(DataNotAvailableError):
+    """The upstream answered, definitively, with nothing for this call."""
+
+
+def classify_miss(error: BaseException) -> Optional[str]:
+    """SYMBOL or WINDOW for a definitive miss; None for anything worth retrying."""
+    if isinstance(error, (SymbolNotFoundError, TickerNotFoundError)):
+        return SYMBOL
+    if isinstance(error, NoDataInWindowError):
+        return WINDOW
+    if isinstance(error, BorsapyError):
+        text = str(error).lower()
+        if any(marker in text for marker in _UNKNOWN_SYMBOL_MARKERS):
+            return SYMBOL
+    return None
+
+
+def miss_error(kind: Optional[str], message: str) -> Exception:
+    """The exception for a provider's `{"error": ..., "miss": kind}` result."""
+    if kind == SYMBOL:
+        return SymbolNotFoundError(message)
+    if kind == WINDOW:
+        return NoDataInWindowError(message)
+    return RuntimeError(message)
+
+
+class NegativeCache:
+    """Short-lived memory of definitive misses, by symbol and by call."""
+
+    def __init__(self, name: str = "router.negative", max_entries: int = 1024):
+        self._entries = CacheNamespace(name, ttl=EMPTY_WINDOW_TTL, max_entries=max_entries)
+        self.symbol_hits = 0
+        self.window_hits = 0
+
+    def check(self, symbol_key: Optional[Hashable], call_key: Hashable) -> None:
+        """Raise the remembered miss for this symbol or this call, if there is one."""
+        if symbol_key is not None:
+            message = self._entries.get((SYMBOL, symbol_key))
+            if message is not None:
+                self.symbol_hits += 1
+                raise SymbolNotFoundError(message)
+        message = self._entries.get((WINDOW, call_key))
+        if message is not None:
+            self.window_hits += 1
+            raise NoDataInWindowError(message)
+
+    def record(
+        self, symbol_key: Optional[Hashable], call_key: Hashable, error: BaseException
+    ) -> None:
+        kind = classify_miss(error)
+        if kind == SYMBOL and symbol_key is not None:
+            self._entries.set((SYMBOL, symbol_key), str(error), ttl=UNKNOWN_SYMBOL_TTL)
+            logger.info(f"Remembering unknown symbol {symbol_key} for {UNKNOWN_SYMBOL_TTL}s")
+        elif kind is not None:
+            self._entries.set((WINDOW, call_key), str(error), ttl=EMPTY_WINDOW_TTL)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "size": len(self._entries),
+            "symbol_hits": self.symbol_hits,
+            "window_hits": self.window_hits,
+        }
+
+
+def remembers_misses(
+    method: Optional[Callable[..., Awaitable[Any]]] = None,
+    *,
+    market: Optional[str] = None,
+):
+    """Answer definitive misses from `self._misses` instead of going upstream.
+
+    The call's `symbol` (or `symbols`, or `code`) and `market` arguments make the
+    symbol key; a method without a market argument names one with `market=`. A list
+    of symbols has no single symbol to remember, so only its exact call is.
+    """
+    if method is None:
+        return functools.partial(remembers_misses, market=market)
+
+    signature = inspect.signature(method)
+
+    def keys(args, kwargs) -> Tuple[Optional[Hashable], Hashable]:
+        bound = signature.bind(None, *args, **kwargs)
+        bound.apply_defaults()
+        arguments = list(bound.arguments.items())[1:]
+        call_key = (method.__name__,) + tuple(_normalize(value) for _, value in arguments)
+
+        named = dict(arguments)
+        symbol = next(
+            (named[name] for name in ("symbol", "symbols", "code") if name in named), None
+        )
+        venue = _normalize(named.get("market", market))
+        if isinstance(symbol, str) and venue is not None:
+            return (venue, symbol.strip().upper()), call_key
+        return None, call_key
+
+    @functools.wraps(method)
+    async def wrapper(self, *args, **kwargs):
+        misses: Optional[NegativeCache] = getattr(self, "_misses", None)
+        if misses is None:
+            return await method(self, *args, **kwargs)
+        try:
+            symbol_key, call_key = keys(args, kwargs)
+        except (TypeError, _Unhashable):
+            return await method(self, *args, **kwargs)
+
+        misses.check(symbol_key, call_key)
+        try:
+            return await method(self, *args, **kwargs)
+        except Exception as e:
+            misses.record(symbol_key, call_key, e)
+            raise
+
+    return wrapper
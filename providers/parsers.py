@@ -0,0 +1,103 @@
+"""
+The CPU-bound document parsers, as plain functions for the parse pool.
+
+Each one takes the downloaded bytes and returns only builtins -- tuples, dicts and
+strings -- so that the call and its result cross the process boundary cheaply and
+without importing the models on either side of it. The callers build their models
+from the result. See providers/process_pool.py.
+
+Heavy libraries are imported inside the functions: a pool worker pays for pandas,
+pdfplumber or markitdown once, when it first parses that kind of document, and the
+server process not at all.
+"""
+import io
+from typing import Dict, List, Optional, Tuple
+
+# (ticker, company name, city)
+CompanyRow = Tuple[str, str, str]
+
+_markitdown = None
+
+
+def company_rows_from_excel(content: bytes) -> List[CompanyRow]:
+    """The companies in KAP's company list Excel, one row per ticker."""
+    import pandas as pd
+
+    df = pd.read_excel(io.BytesIO(content))
+    rows: List[CompanyRow] = []
+    for values in df.itertuples(index=False, name=None):
+        # The first three columns are ticker, name and city.
+        if len(values) < 3:
+            continue
+        ticker_field, name, city = (
+            str(v).strip() if pd.notna(v) else "" for v in values[:3]
+        )
+        # Skip header rows or empty rows
+        if not ticker_field or not name or ticker_field == "BIST KODU":
+            continue
+        # Several tickers for one company, e.g. "GARAN, TGB" or "ISATR, ISBTR, ISCTR":
+        # one entry for each.
+        for ticker in ticker_field.split(","):
+            ticker = ticker.strip()
+            if ticker:
+                rows.append((ticker, name, city))
+    return rows
+
+
+def company_rows_from_pdf(content: bytes) -> List[CompanyRow]:
+    """The companies in KAP's company list PDF, the fallback for the Excel."""
+    import pdfplumber
+
+    rows: List[CompanyRow] = []
+    with pdfplumber.open(io.BytesIO(content)) as pdf:
+        for page in pdf.pages:
+            for table in page.extract_tables():
+                for row in table:
+                    if not row or len(row) < 3 or row[0] is None or "BIST KODU" in row[0]:
+                        continue
+                    ticker = (row[0] or "").strip()
+                    name = (row[1] or "").strip()
+                    city = (row[2] or "").strip()
+                    if ticker and name:
+                        rows.append((ticker, name, city))
+    return rows
+
+
+def fund_rows_from_takasbank_excel(content: bytes) -> List[Dict[str, str]]:
+    """The funds in Takasbank's TEFAS fund list Excel, as fon_kodu/fon_adi dicts."""
+    import pandas as pd
+
+    df = pd.read_excel(io.BytesIO(content))
+    return [
+        {"fon_kodu": str(code).strip(), "fon_adi": str(name).strip()}
+        for code, name in zip(df["Fon Kodu"], df["Fon Adı"])
+    ]
+
+
+def kap_detail_markdown(html: bytes) -> Optional[Dict[str, str]]:
+    """Title, document type and markdown of a Mynet KAP disclosure page.
+
+    None when the page has no KAP detail container.
+    """
+    global _markitdown
+    from bs4 import BeautifulSoup
+    from markitdown import MarkItDown
+
+    soup = BeautifulSoup(html, "lxml")
+    kap_detail = soup.select_one("div.card.kap-detail-news-page")
+    if not kap_detail:
+        return None
+
+    title_tag = kap_detail.select_one("h1")
+    page_header = kap_detail.select_one("div.page-header")
+
+    if _markitdown is None:
+        _markitdown = MarkItDown()
+    result = _markitdown.convert_stream(
+        io.BytesIO(str(kap_detail).encode("utf-8")), file_extension=".html"
+    )
+    return {
+        "title": title_tag.get_text(strip=True) if title_tag else "Başlık Bulunamadı",
+        "doc_type": page_header.get_text(strip=True) if page_header else "",
+        "markdown": result.text_content if hasattr(result, "text_content") else str(result),
+    }
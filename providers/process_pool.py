@@ -0,0 +1,209 @@
+"""
+A shared process pool for the parsers that hold the GIL.
+
+Three hot paths are pure CPU once their download has arrived: pandas reading KAP's
+company list Excel, pdfplumber extracting the tables of its PDF fallback, and
+MarkItDown converting a Mynet KAP disclosure to markdown. All three ran on the event
+loop. A long disclosure took the loop for as long as the conversion took, and every
+other MCP session on the process waited -- quotes, health checks, everything. A
+thread would not have helped: the work holds the GIL, so the loop would still have
+had to wait for it.
+
+`run_parser(fn, *args)` runs one of the functions in providers/parsers.py in a
+worker process. The parsers take bytes and return builtins, so nothing but the
+document and a list of tuples crosses the process boundary. Details:
+
+- one pool for the whole process, started on first use (the KAP company list is a
+  warmup step, so that is usually during warmup), with the forkserver start method:
+  workers are forked from a clean server process, not from this one with its
+  threads and event loop;
+- PARSE_WORKERS processes (default 1: our machines have one shared CPU, and the
+  point is to get the work off the loop, not to parallelise it), each replaced after
+  MAX_TASKS_PER_CHILD parses so pdfplumber's leaks do not accumulate;
+- calls wait their turn in a bulkhead of PARSE_QUEUE, and are bounded by the tool
+  call's deadline like any upstream call. A parse abandoned at the deadline keeps
+  running in its worker, so it keeps its bulkhead slot until it finishes;
+- a worker that dies (the OOM killer, a crash in a C extension) fails the calls it
+  had and the pool is rebuilt for the next one.
+
+PARSE_POOL=thread runs the parsers in a thread pool instead, for platforms without
+a working process pool; it is also the fallback when one cannot be started. Calls,
+failures, restarts and run times per parser are on /health (`parse_pool_stats()`).
+
+    PARSE_POOL=process
+    PARSE_WORKERS=1
+"""
+import asyncio
+import logging
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Callable, Dict, Optional
+
+from providers import deadline
+from providers.bulkhead import Bulkhead
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_WORKERS = 1
+PARSE_QUEUE = 32
+MAX_TASKS_PER_CHILD = 100
+
+
+def _env_workers() -> int:
+    raw = os.getenv("PARSE_WORKERS", "").strip()
+    if not raw:
+        return DEFAULT_WORKERS
+    try:
+        return max(1, int(raw))
+    except ValueError:
+        logger.warning(f"PARSE_WORKERS '{raw}' is not a number; using {DEFAULT_WORKERS}")
+        return DEFAULT_WORKERS
+
+
+class _ParserCounters:
+    __slots__ = ("calls", "runs", "failed", "_run_total", "max_run")
+
+    def __init__(self):
+        self.calls = self.runs = self.failed = 0
+        self._run_total = self.max_run = 0.0
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "calls": self.calls,
+            "failed": self.failed,
+            "avg_run_ms": round(1000 * self._run_total / self.runs, 1) if self.runs else None,
+            "max_run_ms": round(1000 * self.max_run, 1),
+        }
+
+
+class ParsePool:
+    """A process pool (or, failing that, a thread pool) for CPU-bound parsers."""
+
+    def __init__(self, workers: int = DEFAULT_WORKERS, mode: str = "process"):
+        self.workers = workers
+        self.mode = mode
+        self._bulkhead = Bulkhead("parse", workers, PARSE_QUEUE)
+        self._pool: Optional[Executor] = None
+        self._lock = threading.Lock()
+        self._parsers: Dict[str, _ParserCounters] = {}
+        self.restarts = 0
+
+    @classmethod
+    def from_env(cls) -> "ParsePool":
+        mode = os.getenv("PARSE_POOL", "process").strip().lower() or "process"
+        if mode not in ("process", "thread"):
+            logger.warning(f"PARSE_POOL '{mode}' is not 'process' or 'thread'; using process")
+            mode = "process"
+        return cls(_env_workers(), mode)
+
+    def _executor(self) -> Executor:
+        with self._lock:
+            if self._pool is None:
+                self._pool = self._start()
+            return self._pool
+
+    def _start(self) -> Executor:
+        if self.mode == "process":
+            try:
+                context = multiprocessing.get_context("forkserver")
+                context.set_forkserver_preload(["providers.parsers"])
+                return ProcessPoolExecutor(
+                    self.workers, mp_context=context, max_tasks_per_child=MAX_TASKS_PER_CHILD
+                )
+            except (OSError, ValueError, ImportError, NotImplementedError) as exc:
+                logger.warning(f"Parse pool: no process pool here ({exc}); using threads")
+                self.mode = "thread"
+        return ThreadPoolExecutor(self.workers, thread_name_prefix="parse")
+
+    def _discard(self, pool: Executor) -> None:
+        with self._lock:
+            if self._pool is pool:
+                self._pool = None
+                self.restarts += 1
+        pool.shutdown(wait=False, cancel_futures=True)
+
+    async def run(self, fn: Callable[..., Any], *args) -> Any:
+        what = f"parser {fn.__name__}"
+        deadline.check(what)
+        counters = self._parsers.get(fn.__name__)
+        if counters is None:
+            counters = self._parsers[fn.__name__] = _ParserCounters()
+        counters.calls += 1
+
+        async def call():
+            await self._bulkhead.acquire()
+            try:
+                pool = self._executor()
+                future = pool.submit(fn, *args)
+            except BaseException:
+                self._bulkhead.release()
+                raise
+            self._bulkhead.release_when_done(future)
+            started = time.monotonic()
+            try:
+                return await asyncio.wrap_future(future)
+            except BrokenProcessPool:
+                logger.warning(f"Parse pool: a worker died during {fn.__name__}; restarting")
+                self._discard(pool)
+                raise
+            finally:
+                elapsed = time.monotonic() - started
+                counters.runs += 1
+                counters._run_total += elapsed
+                counters.max_run = max(counters.max_run, elapsed)
+
+        try:
+            return await deadline.within_deadline(call(), what)
+        except Exception:
+            counters.failed += 1
+            raise
+
+    def shutdown(self, wait: bool = False) -> None:
+        with self._lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown(wait=wait, cancel_futures=True)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "mode": self.mode,
+            "workers": self.workers,
+            "started": self._pool is not None,
+            "active": self._bulkhead.active,
+            "queued": self._bulkhead.queued,
+            "rejected": self._bulkhead.rejected,
+            "restarts": self.restarts,
+            "parsers": {name: c.stats() for name, c in sorted(self._parsers.items())},
+        }
+
+
+_parse_pool: Optional[ParsePool] = None
+_parse_pool_lock = threading.Lock()
+
+
+def parse_pool() -> ParsePool:
+    """The process's parse pool, configured from the environment on first use."""
+    global _parse_pool
+    if _parse_pool is None:
+        with _parse_pool_lock:
+            if _parse_pool is None:
+                _parse_pool = ParsePool.from_env()
+    return _parse_pool
+
+
+async def run_parser(fn: Callable[..., Any], *args) -> Any:
+    """Run `fn(*args)` in the parse pool. `fn` and its arguments must pickle."""
+    return await parse_pool().run(fn, *args)
+
+
+def parse_pool_stats() -> Dict[str, Any]:
+    return parse_pool().stats() if _parse_pool is not None else {"started": False}
+
+
+def shutdown_parse_pool(wait: bool = False) -> None:
+    if _parse_pool is not None:
+        _parse_pool.shutdown(wait=wait)
@@ -0,0 +1,355 @@
+"""
+Retries with backoff, per upstream, each under its own retry budget.
+
+The only retry loop we had was BorsapyProvider._history_with_retry: three attempts
+with `time.sleep(0.5 * attempt)` between them. The sleep held a borsapy pool thread
+for the whole backoff -- before the pools, the event loop itself -- and the fixed
+delays meant every caller that lost the same websocket drop came back at the same
+instant. It retried whatever was not a definitive miss, including errors that fail
+the same way every time, and nothing limited how many retries ran at once: when
+TradingView really was down, every history call made three calls upstream, tripling
+the load on a service that was already failing.
+
+`call_with_retry(upstream, attempt)` awaits `attempt()` under the upstream's
+RetryPolicy:
+
+- backoff is exponential with jitter, and spent in `asyncio.sleep`, so it holds
+  neither a thread nor a bulkhead slot;
+- `is_retryable` decides what a retry can fix: transport errors, timeouts, 429 and
+  5xx answers, and borsapy's "No data received" websocket drop. Definitive misses
+  (negative_cache.classify_miss), bad arguments, a full bulkhead, an open circuit
+  and a passed deadline are raised at once, and no backoff is started that would
+  end after the call's deadline;
+- every retry draws from its upstream's RetryBudget. It allows a retry for each few
+  first attempts in the last ten seconds (BUDGET_RATIO), plus a small per-second
+  reserve so a quiet process can still retry. During an outage the budget runs dry
+  and calls fail after their first attempt instead of multiplying the traffic.
+
+The budget used to be one for every upstream, at 0.2 retries per first attempt. The
+TradingView websocket drops about half of borsapy's history requests in normal
+operation, which over three attempts is 0.5 + 0.25 = 0.75 retries per call: under
+load borsapy drained the shared budget by itself, most dropped BIST history calls
+failed after one attempt where they used to get three, and Yahoo, TEFAS and İş
+Yatırım had no retries left either. Each upstream now has its own budget, and
+borsapy's ratio (UPSTREAM_BUDGET_RATIOS) sits above its normal drop rate, so only
+an outage, not a normal day, runs it dry.
+
+Per-upstream counters and budgets are reported by `retry_stats()`, on /health.
+
+    RETRY_ATTEMPTS="borsapy=3,yahoo=2"         # attempts per call, including the first
+    RETRY_BUDGET_RATIO="0.2,borsapy=1.2"       # retries per first attempt: default, per upstream
+"""
+import asyncio
+import logging
+import os
+import random
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple, TypeVar
+
+import httpx
+from borsapy.exceptions import (
+    APIError, AuthenticationError, InvalidIntervalError, InvalidPeriodError, RateLimitError,
+)
+
+from providers.bulkhead import BulkheadFullError
+from providers import deadline
+from providers.circuit_breaker import CircuitOpenError, retried_call
+from providers.deadline import DeadlineExceededError
+from providers.negative_cache import classify_miss
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+BUDGET_RATIO = 0.2
+BUDGET_RESERVE_PER_SECOND = 1.0
+BUDGET_WINDOW_SECONDS = 10
+
+RETRYABLE_STATUS = {429, 500, 502, 503, 504}
+
+# What the libraries say, in plain exceptions, when the connection rather than the
+# request was the problem.
+_TRANSIENT_MARKERS = (
+    "no data received", "timed out", "timeout", "connection", "websocket",
+    "temporarily unavailable", "reset by peer", "remote end closed",
+)
+
+
+@dataclass(frozen=True)
+class RetryPolicy:
+    """How often and how patiently to retry one upstream."""
+
+    attempts: int = 2
+    base_delay: float = 0.25
+    max_delay: float = 4.0
+    # Each delay is drawn from [delay * (1 - jitter), delay].
+    jitter: float = 0.5
+
+    def delay(self, retry: int) -> float:
+        """The pause before retry number `retry` (1 for the first retry)."""
+        delay = min(self.max_delay, self.base_delay * 2 ** (retry - 1))
+        return delay * (1 - self.jitter * random.random())
+
+
+# The TradingView websocket drops about half its history requests, so borsapy gets a
+# third attempt; the others get one retry.
+UPSTREAM_POLICIES: Dict[str, RetryPolicy] = {
+    "borsapy": RetryPolicy(attempts=3, base_delay=0.25, max_delay=2.0),
+    "yahoo": RetryPolicy(attempts=2, base_delay=0.5),
+    "tefas": RetryPolicy(attempts=2, base_delay=0.5),
+    "isyatirim": RetryPolicy(attempts=2, base_delay=1.0),
+}
+
+
+# Upstreams whose normal failure rate needs more retries than BUDGET_RATIO allows.
+# borsapy needs 0.75 per call at its ~50% websocket drop rate; 1.2 leaves room for a
+# bad hour, and still caps an outage at 2.2x the traffic instead of 3x.
+UPSTREAM_BUDGET_RATIOS: Dict[str, float] = {
+    "borsapy": 1.2,
+}
+
+
+def _configured_budget_ratios() -> Tuple[float, Dict[str, float]]:
+    """RETRY_BUDGET_RATIO: a bare number sets the default, `name=ratio` one upstream."""
+    default, ratios = BUDGET_RATIO, dict(UPSTREAM_BUDGET_RATIOS)
+    for item in os.getenv("RETRY_BUDGET_RATIO", "").split(","):
+        name, sep, raw = item.rpartition("=")
+        name, raw = name.strip(), raw.strip()
+        if not raw:
+            continue
+        try:
+            ratio = max(0.0, float(raw))
+        except ValueError:
+            logger.warning(f"RETRY_BUDGET_RATIO: ignoring '{item.strip()}'")
+            continue
+        if sep and name:
+            ratios[name] = ratio
+        else:
+            default = ratio
+    return default, ratios
+
+
+def _configured_policies() -> Dict[str, RetryPolicy]:
+    policies = dict(UPSTREAM_POLICIES)
+    for item in os.getenv("RETRY_ATTEMPTS", "").split(","):
+        name, _, raw = item.partition("=")
+        name = name.strip()
+        if not name:
+            continue
+        try:
+            base = policies.get(name, RetryPolicy())
+            policies[name] = RetryPolicy(
+                attempts=max(1, int(raw)), base_delay=base.base_delay,
+                max_delay=base.max_delay, jitter=base.jitter,
+            )
+        except ValueError:
+            logger.warning(f"RETRY_ATTEMPTS: ignoring '{item.strip()}'")
+    return policies
+
+
+def policy_for(upstream: str) -> RetryPolicy:
+    return _configured_policies().get(upstream, RetryPolicy())
+
+
+def is_retryable(error: BaseException) -> bool:
+    """Whether another attempt could plausibly succeed where this one failed."""
+    if classify_miss(error) or isinstance(
+        error, (BulkheadFullError, CircuitOpenError, DeadlineExceededError)
+    ):
+        return False
+    if isinstance(error, (InvalidPeriodError, InvalidIntervalError, AuthenticationError)):
+        return False
+    if isinstance(error, RateLimitError):
+        return True
+    if isinstance(error, httpx.HTTPStatusError):
+        return error.response.status_code in RETRYABLE_STATUS
+    if isinstance(error, (httpx.TransportError, ConnectionError, TimeoutError)):
+        return True
+    if isinstance(error, APIError) and error.status_code is not None:
+        return error.status_code in RETRYABLE_STATUS
+    if isinstance(error, (ValueError, TypeError, KeyError, AttributeError)):
+        return False
+    text = str(error).lower()
+    return any(marker in text for marker in _TRANSIENT_MARKERS)
+
+
+class RetryBudget:
+    """Retries allowed as a fraction of recent first attempts, plus a small reserve.
+
+    Counted in one-second buckets over a sliding window. Thread-safe, so a budget
+    can be shared (hedging keeps one per process).
+    """
+
+    def __init__(
+        self,
+        ratio: float = BUDGET_RATIO,
+        reserve_per_second: float = BUDGET_RESERVE_PER_SECOND,
+        window: int = BUDGET_WINDOW_SECONDS,
+    ):
+        self.ratio = ratio
+        self.reserve_per_second = reserve_per_second
+        self.window = window
+        self._buckets: deque = deque()    # [second, first attempts, retries]
+        self._lock = threading.Lock()
+        self.denied = 0
+
+    @classmethod
+    def for_upstream(cls, upstream: str) -> "RetryBudget":
+        default, ratios = _configured_budget_ratios()
+        return cls(ratio=ratios.get(upstream, default))
+
+    def _bucket(self) -> list:
+        now = int(time.monotonic())
+        while self._buckets and self._buckets[0][0] <= now - self.window:
+            self._buckets.popleft()
+        if not self._buckets or self._buckets[-1][0] != now:
+            self._buckets.append([now, 0, 0])
+        return self._buckets[-1]
+
+    def _totals(self):
+        return (sum(b[1] for b in self._buckets), sum(b[2] for b in self._buckets))
+
+    def record_attempt(self) -> None:
+        with self._lock:
+            self._bucket()[1] += 1
+
+    def try_retry(self) -> bool:
+        """Take one retry from the budget, or say there is none left."""
+        with self._lock:
+            bucket = self._bucket()
+            attempts, retries = self._totals()
+            allowed = self.ratio * attempts + self.reserve_per_second * self.window
+            if retries + 1 > allowed:
+                self.denied += 1
+                return False
+            bucket[2] += 1
+            return True
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            self._bucket()
+            attempts, retries = self._totals()
+        return {
+            "ratio": self.ratio,
+            "window_seconds": self.window,
+            "first_attempts": attempts,
+            "retries": retries,
+            "denied": self.denied,
+        }
+
+
+class _RetryCounters:
+    __slots__ = (
+        "calls", "retries", "recovered", "exhausted", "not_retryable", "budget_denied",
+        "out_of_time",
+    )
+
+    def __init__(self):
+        self.calls = self.retries = self.recovered = 0
+        self.exhausted = self.not_retryable = self.budget_denied = self.out_of_time = 0
+
+    def stats(self) -> Dict[str, int]:
+        return {name: getattr(self, name) for name in self.__slots__}
+
+
+_budgets: Dict[str, RetryBudget] = {}
+_counters: Dict[str, _RetryCounters] = {}
+
+
+def retry_budget(upstream: str) -> RetryBudget:
+    """`upstream`'s budget, created at its configured ratio on first use."""
+    budget = _budgets.get(upstream)
+    if budget is None:
+        budget = _budgets[upstream] = RetryBudget.for_upstream(upstream)
+    return budget
+
+
+def set_retry_budget(upstream: str, budget: Optional[RetryBudget]) -> None:
+    """Replace `upstream`'s budget; None starts it afresh on next use (tests)."""
+    if budget is None:
+        _budgets.pop(upstream, None)
+    else:
+        _budgets[upstream] = budget
+
+
+def reset_retry_budgets() -> None:
+    """Start every upstream's budget afresh (tests)."""
+    _budgets.clear()
+
+
+def _counters_for(upstream: str) -> _RetryCounters:
+    counters = _counters.get(upstream)
+    if counters is None:
+        counters = _counters[upstream] = _RetryCounters()
+    return counters
+
+
+async def call_with_retry(
+    upstream: str,
+    attempt: Callable[[], Awaitable[T]],
+    *,
+    policy: Optional[RetryPolicy] = None,
+    label: str = "",
+) -> T:
+    """Await `attempt()`, retrying what is retryable under `upstream`'s policy.
+
+    `attempt` is called afresh for each try. The last error is raised unchanged.
+    The upstream's circuit breaker sees the whole call as one outcome.
+    """
+    with retried_call():
+        return await _call_with_retry(upstream, attempt, policy, label)
+
+
+async def _call_with_retry(
+    upstream: str,
+    attempt: Callable[[], Awaitable[T]],
+    policy: Optional[RetryPolicy],
+    label: str,
+) -> T:
+    policy = policy or policy_for(upstream)
+    counters = _counters_for(upstream)
+    counters.calls += 1
+    budget = retry_budget(upstream)
+    budget.record_attempt()
+
+    number = 0
+    while True:
+        number += 1
+        try:
+            result = await attempt()
+        except Exception as exc:
+            if not is_retryable(exc):
+                counters.not_retryable += 1
+                raise
+            if number == policy.attempts:
+                counters.exhausted += 1
+                raise
+            delay = policy.delay(number)
+            left = deadline.remaining()
+            if left is not None and left <= delay:
+                counters.out_of_time += 1
+                raise
+            if not budget.try_retry():
+                counters.budget_denied += 1
+                logger.warning(f"{upstream} {label}: retry budget exhausted; not retrying: {exc}")
+                raise
+            counters.retries += 1
+            logger.warning(
+                f"{upstream} {label}: attempt {number}/{policy.attempts} failed: {exc}. "
+                f"Retrying in {delay:.2f}s."
+            )
+            await asyncio.sleep(delay)
+            continue
+        if number > 1:
+            counters.recovered += 1
+        return result
+
+
+def retry_stats() -> Dict[str, Any]:
+    return {
+        "budgets": {name: b.stats() for name, b in sorted(_budgets.items())},
+        "upstreams": {name: c.stats() for name, c in sorted(_counters.items())},
+    }
@@ -13,6 +13,7 @@ import re
 from models.tcmb_models import (
     TcmbEnflasyonSonucu, EnflasyonVerisi, EnflasyonHesaplamaSonucu
 )
+from providers.cache import CacheNamespace
 
 logger = logging.getLogger(__name__)
 
@@ -30,8 +31,10 @@ class TcmbProvider:
     
     def __init__(self, client: httpx.AsyncClient):
         self._http_client = client
-        self._cache: Dict[str, Dict] = {}
-        self._last_fetch_times: Dict[str, float] = {}
+        self._cache = CacheNamespace(
+            "tcmb.inflation", ttl=self.CACHE_DURATION,
+            max_entries=len(self.INFLATION_URLS), shared=True, persist=True,
+        )
     
     def _get_request_headers(self) -> Dict[str, str]:
         """Get appropriate headers for TCMB website requests."""
@@ -235,27 +238,15 @@ class TcmbProvider:
                     error_message=f"Unsupported inflation type: {inflation_type}. Supported types: {list(self.INFLATION_URLS.keys())}"
                 )
             
-            # Check cache first
-            cache_key = f"inflation_{inflation_type}"
-            current_time = datetime.now().timestamp()
-            
-            if (cache_key in self._cache and 
-                (current_time - self._last_fetch_times.get(cache_key, 0)) < self.CACHE_DURATION):
-                
-                logger.info(f"Using cached data for {inflation_type}")
-                cached_data = self._cache[cache_key]
-            else:
-                # Fetch fresh data
+            async def fetch_fresh():
                 url = self.BASE_URL + self.INFLATION_URLS[inflation_type]
                 logger.info(f"Fetching fresh inflation data from: {url}")
-                
                 html_content = await self._fetch_page_content(url)
-                raw_data = self._parse_inflation_table(html_content)
-                
-                # Cache the data
-                self._cache[cache_key] = raw_data
-                self._last_fetch_times[cache_key] = current_time
-                cached_data = raw_data
+                return self._parse_inflation_table(html_content)
+
+            cached_data = await self._cache.get_or_load(
+                f"inflation_{inflation_type}", fetch_fresh
+            )
             
             # Filter by date range
             filtered_data = self._filter_by_date_range(cached_data, start_date, end_date)
@@ -3,15 +3,19 @@ TEFAS (Türkiye Elektronik Fon Alım Satım Platformu) provider for Turkish mutu
 Provides comprehensive fund data, performance metrics, and screening capabilities.
 """
 
-import requests
 from datetime import datetime, timedelta
 import pandas as pd
 from typing import List, Dict, Any, Optional
 import logging
 from zoneinfo import ZoneInfo
-import os
 import borsapy as bp
 
+from providers.cache import CacheNamespace
+from providers.executors import run_blocking
+from providers.http_client import shared_http_client
+from providers.parsers import fund_rows_from_takasbank_excel
+from providers.process_pool import run_parser
+
 logger = logging.getLogger(__name__)
 
 class TefasProvider:
@@ -21,64 +25,47 @@ class TefasProvider:
         self.base_url = "https://www.tefas.gov.tr"
         self.api_url = f"{self.base_url}/api"
         self.takasbank_url = "https://www.takasbank.com.tr/plugins/ExcelExportTefasFundsTradingInvestmentPlatform?language=tr"
-        self.session = requests.Session()
-        # Disable SSL verification to avoid certificate issues
-        self.session.verify = False
-        self.session.headers.update({
+        # The process's shared client; SSL verification disabled to avoid certificate
+        # issues. See providers/http_client.py.
+        self._http_client = shared_http_client(verify=False)
+        self.headers = {
             'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36',
             'Accept': 'application/json, text/plain, */*',
             'Accept-Language': 'tr-TR,tr;q=0.9',
             'Referer': 'https://www.tefas.gov.tr/'
-        })
+        }
         self.turkey_tz = ZoneInfo("Europe/Istanbul")
-        self._fund_list_cache = None
-        self._fund_list_cache_time = None
         self._cache_duration = 3600  # 1 hour cache
+        self._fund_list_cache = CacheNamespace(
+            "tefas.fund_list", ttl=self._cache_duration, max_entries=1, persist=True
+        )
     
-    def _get_takasbank_fund_list(self) -> List[Dict[str, str]]:
+    async def _get_takasbank_fund_list(self) -> List[Dict[str, str]]:
         """
         Get complete fund list from Takasbank Excel file.
         Returns list of dicts with 'fon_kodu' and 'fon_adi'.
         """
         try:
             # Check cache first
-            if self._fund_list_cache and self._fund_list_cache_time:
-                elapsed = datetime.now() - self._fund_list_cache_time
-                if elapsed.total_seconds() < self._cache_duration:
-                    logger.info("Using cached Takasbank fund list")
-                    return self._fund_list_cache
+            cached = self._fund_list_cache.get("takasbank")
+            if cached:
+                logger.info("Using cached Takasbank fund list")
+                return cached
             
             logger.info("Fetching fresh fund list from Takasbank")
             
             # Download Excel file
-            response = self.session.get(self.takasbank_url, timeout=10)
+            response = await self._http_client.get(
+                self.takasbank_url, headers=self.headers, timeout=10
+            )
             response.raise_for_status()
             
-            # Save to temp file
-            temp_file = '/tmp/takasbank_funds.xlsx'
-            with open(temp_file, 'wb') as f:
-                f.write(response.content)
-            
-            # Read Excel with pandas
-            df = pd.read_excel(temp_file)
-            
-            # Convert to list of dicts
-            fund_list = []
-            for _, row in df.iterrows():
-                fund_list.append({
-                    'fon_kodu': str(row['Fon Kodu']).strip(),
-                    'fon_adi': str(row['Fon Adı']).strip()
-                })
+            # Parsing the Excel is CPU-bound; it runs in the parse pool.
+            fund_list = await run_parser(fund_rows_from_takasbank_excel, response.content)
             
             # Update cache
-            self._fund_list_cache = fund_list
-            self._fund_list_cache_time = datetime.now()
-            
-            # Clean up temp file
-            try:
-                os.remove(temp_file)
-            except OSError:
-                pass
+            if fund_list:
+                self._fund_list_cache.set("takasbank", fund_list)
             
             logger.info(f"Successfully loaded {len(fund_list)} funds from Takasbank")
             return fund_list
@@ -119,14 +106,14 @@ class TefasProvider:
             checks.append(bool(info.get(key)))
         return round(sum(1 for c in checks if c) / len(checks), 2) if checks else 0.0
 
-    def search_funds_takasbank(self, search_term: str, limit: int = 20) -> Dict[str, Any]:
+    async def search_funds_takasbank(self, search_term: str, limit: int = 20) -> Dict[str, Any]:
         """
         Search for funds using Takasbank Excel data.
         More comprehensive and accurate than TEFAS API search.
         """
         try:
             # Get fund list
-            all_funds = self._get_takasbank_fund_list()
+            all_funds = await self._get_takasbank_fund_list()
             
             if not all_funds:
                 return {
@@ -221,11 +208,8 @@ class TefasProvider:
             Dictionary with advanced search results including performance data
         """
         try:
-            import asyncio
-            # borsapy.search_funds is sync, run in executor
-            results = await asyncio.get_event_loop().run_in_executor(
-                None, lambda: bp.search_funds(search_term, limit=limit)
-            )
+            # borsapy.search_funds is sync, run in the TEFAS pool
+            results = await run_blocking("tefas", bp.search_funds, search_term, limit=limit)
 
             matching_funds = []
             for fund in results:
@@ -298,7 +282,7 @@ class TefasProvider:
             return await self.search_funds_advanced(search_term, limit, "YAT", getattr(self, '_current_fund_category', 'all'))
         
         # Fallback to Takasbank for basic search if specified
-        return self.search_funds_takasbank(search_term, limit)
+        return await self.search_funds_takasbank(search_term, limit)
     
     def get_fund_detail(self, fund_code: str, include_price_history: bool = False) -> Dict[str, Any]:
         """
@@ -0,0 +1,276 @@
+"""
+Response caching for tool calls: per-tool TTLs over canonical argument keys.
+
+The server used FastMCP's ResponseCachingMiddleware with one setting for three tools
+(search_symbol, get_profile, get_index_data) at a flat hour. Every other read-only tool
+went upstream on every call, and the key was the raw argument JSON -- so
+`["GARAN","AKBNK"]` and `["akbnk","garan"]`, or a call that spelled out a default and
+one that left it off, were four different requests. Most of our traffic is an LLM
+repeating itself with trivially different spellings.
+
+ToolResponseCache keeps the middleware's storage and list caching and replaces its
+tool-call path:
+
+- Every tool annotated `idempotentHint` is cached, plus any tool named in the TTL table.
+- The key is canonical: schema defaults filled in, symbols upper-cased and symbol lists
+  sorted. FX symbols keep their case (`gram-altin` is the asset's real name), and a
+  list never collapses into a single string, because the two return different shapes.
+- A TTL is either seconds or `session:<kind>`, which asks ttl_policy for the call's
+  own market -- a BIST quote is seconds-fresh in the session and good until the open
+  after it. A call with an intraday `timeframe` (get_technical_analysis on 15m bars)
+  is held for INTRADAY_BAR rather than DAILY_BAR. 0 disables caching for a tool.
+- Only a whole answer is kept. A result with warnings, a failed symbol or a
+  "from cache, ... old" note -- a multi-symbol call with a symbol down, İş Yatırım or
+  TEFAS served stale, a partial answer after the deadline -- was held for the full
+  TTL, up to days after a close, and replayed to everyone. `shape` reports each
+  payload through `note_result`, and a degraded one is not stored: the next call
+  tries again, as get_quick_info's own cache already did.
+
+Operators tune it without a deploy:
+
+    TOOL_CACHE_ENABLED=false                 # switch tool-call caching off
+    TOOL_CACHE_CONFIG=/etc/borsa/cache.json  # {"default_ttl": 300, "ttls": {...}}
+    TOOL_CACHE_TTLS="get_quote=30,get_news=0,get_profile=session:statements"
+
+The env TTLs are applied over the file, which is applied over DEFAULT_TOOL_TTLS.
+"""
+import contextvars
+import json
+import logging
+import os
+from typing import Any, Dict, Optional, Union
+
+from fastmcp.server.middleware.caching import (
+    CachableToolResult, CallToolSettings, ResponseCachingMiddleware,
+)
+
+from providers.ttl_policy import DataKind, ttl_for
+
+logger = logging.getLogger(__name__)
+
+TtlSpec = Union[int, float, str]
+
+DEFAULT_TTL = 300
+
+DEFAULT_TOOL_TTLS: Dict[str, TtlSpec] = {
+    # Not idempotentHint, but cached since before this module existed.
+    "search_symbol": 3600,
+    "get_profile": 3600,
+    "get_index_data": 3600,
+    # Prices follow the market's session.
+    "get_quote": "session:quote",
+    "get_historical_data": "session:daily_bar",
+    "get_technical_analysis": "session:daily_bar",
+    "get_financial_ratios": "session:daily_bar",
+    # Filings land on KAP during and after the session, never at weekends.
+    "get_financial_statements": "session:statements",
+    "get_earnings": "session:statements",
+    "get_corporate_actions": "session:statements",
+    "get_analyst_data": 3600,
+    "get_bond_yields": 900,
+    "get_macro_data": 3600,
+    "get_evds_data": 3600,
+}
+
+SYMBOL_ARGUMENTS = frozenset({"symbol", "symbols"})
+
+
+class _CallNote:
+    """What the tool boundary saw of the payload it rendered."""
+
+    def __init__(self):
+        self.degraded = False
+
+
+_call_note: contextvars.ContextVar[Optional[_CallNote]] = contextvars.ContextVar(
+    "tool_cache_call_note", default=None
+)
+
+
+def is_degraded(payload: Any) -> bool:
+    """True when any part of a payload carries warnings or a failed count."""
+    if isinstance(payload, dict):
+        if payload.get("warnings") or payload.get("failed_count"):
+            return True
+        return any(is_degraded(value) for value in payload.values())
+    if isinstance(payload, list):
+        return any(is_degraded(item) for item in payload if isinstance(item, (dict, list)))
+    return False
+
+
+def note_result(payload: Any) -> None:
+    """Tell the cache a tool's payload; a degraded one keeps its result out."""
+    note = _call_note.get()
+    if note is not None and is_degraded(payload):
+        note.degraded = True
+
+
+def parse_ttl_overrides(raw: str) -> Dict[str, TtlSpec]:
+    """Parse `tool=ttl,tool=ttl`; a malformed entry is logged and skipped."""
+    overrides: Dict[str, TtlSpec] = {}
+    for item in filter(None, (part.strip() for part in raw.split(","))):
+        name, sep, value = item.partition("=")
+        if not sep or not name.strip() or not value.strip():
+            logger.warning(f"TOOL_CACHE_TTLS: ignoring malformed entry '{item}'")
+            continue
+        value = value.strip()
+        try:
+            overrides[name.strip()] = float(value) if "." in value else int(value)
+        except ValueError:
+            overrides[name.strip()] = value
+    return overrides
+
+
+def load_cache_config() -> Dict[str, Any]:
+    """The effective configuration: defaults, then the config file, then the env."""
+    config: Dict[str, Any] = {
+        "enabled": True,
+        "default_ttl": DEFAULT_TTL,
+        "ttls": dict(DEFAULT_TOOL_TTLS),
+    }
+
+    path = os.getenv("TOOL_CACHE_CONFIG", "").strip()
+    if path:
+        try:
+            with open(path, encoding="utf-8") as f:
+                from_file = json.load(f)
+            config["enabled"] = bool(from_file.get("enabled", config["enabled"]))
+            config["default_ttl"] = from_file.get("default_ttl", config["default_ttl"])
+            config["ttls"].update(from_file.get("ttls", {}))
+        except (OSError, ValueError, AttributeError) as e:
+            # A bad file must not stop the server from starting; say so loudly.
+            logger.error(f"TOOL_CACHE_CONFIG {path} unreadable ({e}); using defaults")
+
+    enabled = os.getenv("TOOL_CACHE_ENABLED", "").strip().lower()
+    if enabled:
+        config["enabled"] = enabled not in ("0", "false", "no", "off")
+    config["ttls"].update(parse_ttl_overrides(os.getenv("TOOL_CACHE_TTLS", "")))
+    return config
+
+
+def _canonical_symbol(value: Any, keep_case: bool) -> Any:
+    if isinstance(value, str):
+        value = value.strip()
+        return value if keep_case else value.upper()
+    if isinstance(value, list):
+        return sorted(_canonical_symbol(v, keep_case) for v in value)
+    return value
+
+
+def canonical_arguments(
+    arguments: Optional[Dict[str, Any]],
+    parameters: Optional[Dict[str, Any]] = None,
+) -> Dict[str, Any]:
+    """Arguments with schema defaults filled in and symbols normalized."""
+    canonical: Dict[str, Any] = {}
+    for name, spec in ((parameters or {}).get("properties") or {}).items():
+        if "default" in spec:
+            canonical[name] = spec["default"]
+    canonical.update(arguments or {})
+
+    keep_case = canonical.get("market") == "fx"
+    for name in SYMBOL_ARGUMENTS & canonical.keys():
+        canonical[name] = _canonical_symbol(canonical[name], keep_case)
+    return canonical
+
+
+def cache_key(tool_name: str, arguments: Dict[str, Any]) -> str:
+    return f"{tool_name}:{json.dumps(arguments, sort_keys=True, default=str)}"
+
+
+def resolve_ttl(spec: TtlSpec, arguments: Dict[str, Any]) -> float:
+    """Seconds to keep a result; `session:<kind>` asks the call's market's session."""
+    if isinstance(spec, str):
+        kind = spec.partition("session:")[2]
+        if kind == DataKind.DAILY_BAR.value and arguments.get("timeframe") not in (None, "1d", "1W"):
+            kind = DataKind.INTRADAY_BAR.value
+        try:
+            return ttl_for(arguments.get("market") or "bist", DataKind(kind))
+        except ValueError:
+            logger.warning(f"Unknown TTL spec '{spec}'; using {DEFAULT_TTL}s")
+            return DEFAULT_TTL
+    return float(spec)
+
+
+class ToolResponseCache(ResponseCachingMiddleware):
+    """ResponseCachingMiddleware with per-tool TTLs and canonical keys."""
+
+    def __init__(self, config: Optional[Dict[str, Any]] = None, **kwargs):
+        self.config = config or load_cache_config()
+        super().__init__(
+            call_tool_settings=CallToolSettings(enabled=self.config["enabled"]),
+            **kwargs,
+        )
+        self._tool_specs: Dict[str, Optional[Dict[str, Any]]] = {}
+        self.hits = 0
+        self.misses = 0
+        self.degraded = 0
+
+    async def _tool_spec(self, context, tool_name: str) -> Optional[Dict[str, Any]]:
+        """The tool's parameter schema and TTL spec, or None if it is not cached."""
+        if tool_name in self._tool_specs:
+            return self._tool_specs[tool_name]
+
+        parameters, idempotent = None, False
+        server = getattr(context.fastmcp_context, "fastmcp", None)
+        if server is not None:
+            try:
+                tool = await server.get_tool(tool_name)
+                parameters = tool.parameters
+                idempotent = bool(tool.annotations and tool.annotations.idempotentHint)
+            except Exception as e:
+                logger.debug(f"Tool cache: no schema for {tool_name}: {e}")
+
+        ttls = self.config["ttls"]
+        spec = ttls.get(tool_name, self.config["default_ttl"] if idempotent else None)
+        if spec in (None, 0, "0"):
+            entry = None
+        else:
+            entry = {"parameters": parameters, "ttl": spec}
+        self._tool_specs[tool_name] = entry
+        return entry
+
+    async def on_call_tool(self, context, call_next):
+        tool_name = context.message.name
+        if not self.config["enabled"]:
+            return await call_next(context=context)
+
+        spec = await self._tool_spec(context, tool_name)
+        if spec is None:
+            return await call_next(context=context)
+
+        arguments = canonical_arguments(context.message.arguments, spec["parameters"])
+        key = cache_key(tool_name, arguments)
+
+        if cached := await self._call_tool_cache.get(key=key):
+            self.hits += 1
+            return cached.unwrap()
+        self.misses += 1
+
+        note = _CallNote()
+        token = _call_note.set(note)
+        try:
+            tool_result = await call_next(context=context)
+        finally:
+            _call_note.reset(token)
+        cachable = CachableToolResult.wrap(value=tool_result)
+        if note.degraded:
+            self.degraded += 1
+            return cachable.unwrap()
+        ttl = resolve_ttl(spec["ttl"], arguments)
+        if ttl > 0:
+            await self._call_tool_cache.put(key=key, value=cachable, ttl=ttl)
+        return cachable.unwrap()
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "enabled": self.config["enabled"],
+            "hits": self.hits,
+            "misses": self.misses,
+            "not_cached_degraded": self.degraded,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else None,
+            "cached_tools": sorted(
+                name for name, spec in self._tool_specs.items() if spec is not None
+            ),
+        }
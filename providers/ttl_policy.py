@@ -0,0 +1,193 @@
+"""
+How long market data stays true, per market and per kind of data.
+
+Every cache here used one flat TTL. That is wrong in both directions: a BIST quote is
+stale seconds into the session, yet once the closing auction has printed it will not
+change again until the next open -- so after hours the caches expired and refetched
+the same number all night. A TEFAS NAV changes once per publication day; crypto never
+closes at all.
+
+A MarketSession knows a market's trading hours in its own time zone. `ttl_for(market,
+kind)` turns that into an expiry for one kind of data:
+
+- QUOTE / INTRADAY_BAR: short while the session is open, until the next open once it
+  has closed.
+- DAILY_BAR: today's bar is still forming while the session is open; after the close
+  it is final until the next open.
+- FUND_NAV: until TEFAS's next publication, with a short TTL in the grace window right
+  after the usual publication time, when the new NAV may or may not be out yet.
+- STATEMENTS: KAP disclosures land during the session and in the evening after it, so
+  they refresh on every trading day and sit still over the weekend.
+
+Fixed-date public holidays are modelled; the moving ones (Ramazan and Kurban Bayramı,
+Thanksgiving, Good Friday) are not. On one of those a closed market looks open, so
+the caches fall back to the short in-session TTLs -- a few redundant fetches, never a
+stale answer.
+"""
+from dataclasses import dataclass
+from datetime import date, datetime, time, timedelta, timezone
+from enum import Enum
+from typing import FrozenSet, Optional, Tuple, Union
+from zoneinfo import ZoneInfo
+
+
+class DataKind(str, Enum):
+    QUOTE = "quote"
+    DAILY_BAR = "daily_bar"
+    INTRADAY_BAR = "intraday_bar"
+    FUND_NAV = "fund_nav"
+    STATEMENTS = "statements"
+
+
+# TTLs while a market is trading, in seconds.
+QUOTE_TTL_OPEN = 15
+INTRADAY_BAR_TTL_OPEN = 60
+DAILY_BAR_TTL_OPEN = 5 * 60
+STATEMENTS_TTL_OPEN = 5 * 60
+STATEMENTS_TTL_CLOSED = 60 * 60
+
+# TEFAS publishes the day's NAVs on trading-day mornings. Inside the grace window after
+# the usual time the new NAV may be late, so poll rather than wait a whole day.
+FUND_PUBLICATION_TIME = time(10, 0)
+FUND_PUBLICATION_GRACE = timedelta(hours=2)
+FUND_NAV_TTL_GRACE = 15 * 60
+
+# Never hold anything longer than a long weekend, whatever the calendar says.
+MAX_CLOSED_TTL = 4 * 24 * 60 * 60
+
+
+def _now() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+@dataclass(frozen=True)
+class MarketSession:
+    name: str
+    tz: str
+    open: time = time.min
+    close: time = time.max
+    trading_days: FrozenSet[int] = frozenset(range(5))     # Monday=0
+    holidays: FrozenSet[Tuple[int, int]] = frozenset()      # (month, day)
+    always_open: bool = False
+
+    @property
+    def zone(self) -> ZoneInfo:
+        return ZoneInfo(self.tz)
+
+    def local(self, now: Optional[datetime] = None) -> datetime:
+        return (now or _now()).astimezone(self.zone)
+
+    def today(self, now: Optional[datetime] = None) -> date:
+        return self.local(now).date()
+
+    def is_trading_day(self, day: date) -> bool:
+        if self.always_open:
+            return True
+        return day.weekday() in self.trading_days and (day.month, day.day) not in self.holidays
+
+    def is_open(self, now: Optional[datetime] = None) -> bool:
+        if self.always_open:
+            return True
+        local = self.local(now)
+        return self.is_trading_day(local.date()) and self.open <= local.time() < self.close
+
+    def next_open(self, now: Optional[datetime] = None) -> datetime:
+        """The next session open strictly after `now`, in the market's zone."""
+        local = self.local(now)
+        day = local.date()
+        for _ in range(15):
+            if self.is_trading_day(day):
+                candidate = datetime.combine(day, self.open, tzinfo=self.zone)
+                if candidate > local:
+                    return candidate
+            day += timedelta(days=1)
+        return local + timedelta(seconds=MAX_CLOSED_TTL)
+
+    def last_closed_date(self, now: Optional[datetime] = None) -> date:
+        """The latest day whose daily bar is final.
+
+        Today, once today's session has closed; otherwise the day before. An
+        always-open market's day closes at midnight in its zone.
+        """
+        local = self.local(now)
+        today = local.date()
+        if (not self.always_open and self.is_trading_day(today)
+                and local.time() >= self.close):
+            return today
+        return today - timedelta(days=1)
+
+    def seconds_until_open(self, now: Optional[datetime] = None) -> float:
+        local = self.local(now)
+        return (self.next_open(now) - local).total_seconds()
+
+
+_FIXED_TR_HOLIDAYS = frozenset({
+    (1, 1), (4, 23), (5, 1), (5, 19), (7, 15), (8, 30), (10, 29),
+})
+
+SESSIONS = {
+    # Opening auction from 09:40, closing auction until 18:10.
+    "bist": MarketSession(
+        "bist", "Europe/Istanbul", open=time(9, 40), close=time(18, 10),
+        holidays=_FIXED_TR_HOLIDAYS,
+    ),
+    "us": MarketSession(
+        "us", "America/New_York", open=time(9, 30), close=time(16, 0),
+        holidays=frozenset({(1, 1), (6, 19), (7, 4), (12, 25)}),
+    ),
+    "crypto": MarketSession("crypto", "UTC", always_open=True),
+    # doviz.com quotes move around the clock on weekdays and stand still at weekends.
+    "fx": MarketSession("fx", "Europe/Istanbul"),
+    # TEFAS publishes on BIST trading days.
+    "fund": MarketSession(
+        "fund", "Europe/Istanbul", open=FUND_PUBLICATION_TIME, close=time.max,
+        holidays=_FIXED_TR_HOLIDAYS,
+    ),
+}
+
+_ALIASES = {"crypto_tr": "crypto", "crypto_global": "crypto", "nyse": "us", "nasdaq": "us"}
+
+
+def session_for(market: Union[str, Enum]) -> MarketSession:
+    """The session for a market name or MarketType; unknown markets are treated as US."""
+    name = str(getattr(market, "value", market)).lower()
+    return SESSIONS.get(_ALIASES.get(name, name), SESSIONS["us"])
+
+
+def _until_open(session: MarketSession, now: Optional[datetime], floor: float) -> float:
+    return max(floor, min(session.seconds_until_open(now), MAX_CLOSED_TTL))
+
+
+def ttl_for(
+    market: Union[str, Enum],
+    kind: DataKind,
+    now: Optional[datetime] = None,
+) -> float:
+    """Seconds a `kind` of data for `market` stays valid, measured from `now`."""
+    session = session_for(market)
+
+    if kind == DataKind.FUND_NAV:
+        session = SESSIONS["fund"]
+        local = session.local(now)
+        published = datetime.combine(local.date(), session.open, tzinfo=session.zone)
+        if (session.is_trading_day(local.date())
+                and published <= local < published + FUND_PUBLICATION_GRACE):
+            return FUND_NAV_TTL_GRACE
+        return _until_open(session, now, FUND_NAV_TTL_GRACE)
+
+    if kind == DataKind.STATEMENTS:
+        session = SESSIONS["bist"] if session.always_open else session
+        if session.is_open(now):
+            return STATEMENTS_TTL_OPEN
+        if session.is_trading_day(session.today(now)):
+            return STATEMENTS_TTL_CLOSED
+        return _until_open(session, now, STATEMENTS_TTL_CLOSED)
+
+    open_ttl = {
+        DataKind.QUOTE: QUOTE_TTL_OPEN,
+        DataKind.INTRADAY_BAR: INTRADAY_BAR_TTL_OPEN,
+        DataKind.DAILY_BAR: DAILY_BAR_TTL_OPEN,
+    }[kind]
+    if session.is_open(now):
+        return open_ttl
+    return _until_open(session, now, open_ttl)
@@ -0,0 +1,259 @@
+"""
+The httpx transport every upstream HTTP client is built on.
+
+Every HTTP-speaking provider sends through a shared LoopBoundHttpClient
+(providers/http_client.py), and the per-upstream protections apply to all of them
+alike. UpstreamTransport wraps httpx's own transport and, for each request, by the
+host it is sent to (bulkhead.upstream_for_host):
+
+1. asks the upstream's circuit breaker for admission, failing at once while it is
+   open (providers/circuit_breaker.py);
+2. waits for a slot in the upstream's bulkhead (providers/bulkhead.py);
+3. sends the request, its timeouts shrunk to what is left of the tool call's
+   deadline (providers/deadline.py), and reports the outcome to the breaker: a
+   transport error or a 429/5xx answer counts against the upstream, anything else
+   for it.
+
+The bulkhead slot is held until the response headers arrive; the body is read after.
+
+Each upstream has its own connection pool, sized from its bulkhead: a slot can always
+find a connection, and one busy upstream cannot take every connection from the
+others. Connections are kept alive for HTTP_KEEPALIVE_EXPIRY seconds (httpx's
+default of 5 let them go cold between the calls of one tool). HTTP/2 is used for the
+upstreams in HTTP2_UPSTREAMS when the h2 package is installed
+(pip install 'borsa-mcp[http2]'). Host names are resolved through a DNS cache
+(providers/dns_cache.py), and the hot hosts' connections are opened ahead of the
+first call and kept from going idle (providers/connection_warmer.py).
+
+`connection_stats()`, on /health, reports per upstream the requests sent, the new
+connections they opened and the time spent opening them (TCP connect and TLS
+handshake), and how many pooled connections are open and idle.
+
+    HTTP_POOLS="isyatirim=8/4"     # max connections, optionally /max kept alive
+    HTTP_KEEPALIVE_EXPIRY=30
+    HTTP2_UPSTREAMS=isyatirim,coinbase
+"""
+import logging
+import os
+import time
+import weakref
+from typing import Any, Dict, Optional, Tuple
+
+import httpx
+
+from providers import deadline
+from providers.bulkhead import bulkhead, upstream_for_host
+from providers.circuit_breaker import FAILURE_STATUS, circuit
+from providers.dns_cache import CachingResolverBackend, dns_cache
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_KEEPALIVE_EXPIRY = 30.0
+
+_connection_events = ("connection.connect_tcp", "connection.start_tls")
+
+
+def _configured_pools() -> Dict[str, Tuple[int, int]]:
+    pools: Dict[str, Tuple[int, int]] = {}
+    for item in os.getenv("HTTP_POOLS", "").split(","):
+        name, _, raw = item.partition("=")
+        name = name.strip()
+        if not name:
+            continue
+        connections, _, keepalive = raw.partition("/")
+        try:
+            pools[name] = (
+                max(1, int(connections)),
+                max(0, int(keepalive)) if keepalive.strip() else max(1, int(connections) // 2),
+            )
+        except ValueError:
+            logger.warning(f"HTTP_POOLS: ignoring '{item.strip()}'")
+    return pools
+
+
+def pool_limits(upstream: str) -> httpx.Limits:
+    """The connection limits of `upstream`'s pool."""
+    # Twice the bulkhead's concurrency: the slot is released when the headers arrive,
+    # the connection when the body has been read.
+    concurrency = bulkhead(upstream).max_concurrent
+    max_connections, max_keepalive = _configured_pools().get(
+        upstream, (2 * concurrency, concurrency)
+    )
+    expiry = DEFAULT_KEEPALIVE_EXPIRY
+    raw = os.getenv("HTTP_KEEPALIVE_EXPIRY", "").strip()
+    if raw:
+        try:
+            expiry = max(0.0, float(raw))
+        except ValueError:
+            logger.warning(f"HTTP_KEEPALIVE_EXPIRY '{raw}' is not a number; using {expiry}")
+    return httpx.Limits(
+        max_connections=max_connections,
+        max_keepalive_connections=max_keepalive,
+        keepalive_expiry=expiry,
+    )
+
+
+def http2_enabled(upstream: str) -> bool:
+    names = {n.strip() for n in os.getenv("HTTP2_UPSTREAMS", "").split(",") if n.strip()}
+    if upstream not in names:
+        return False
+    try:
+        import h2  # noqa: F401
+    except ImportError:
+        logger.warning(
+            f"HTTP2_UPSTREAMS lists {upstream} but the h2 package is not installed: "
+            f"pip install 'borsa-mcp[http2]'"
+        )
+        return False
+    return True
+
+
+class _ConnectionCounters:
+    __slots__ = ("requests", "opened", "_setup_total")
+
+    def __init__(self):
+        self.requests = self.opened = 0
+        self._setup_total = 0.0
+
+
+_counters: Dict[str, _ConnectionCounters] = {}
+_transports: "weakref.WeakSet[UpstreamTransport]" = weakref.WeakSet()
+
+
+def _counters_for(upstream: str) -> _ConnectionCounters:
+    counters = _counters.get(upstream)
+    if counters is None:
+        counters = _counters[upstream] = _ConnectionCounters()
+    return counters
+
+
+def request_count(upstream: str) -> int:
+    """Requests sent to `upstream` so far, through any transport."""
+    counters = _counters.get(upstream)
+    return counters.requests if counters is not None else 0
+
+
+class UpstreamTransport(httpx.AsyncBaseTransport):
+    """An httpx transport behind the request host's circuit breaker and bulkhead.
+
+    One connection pool per upstream, unless `transport` is given: then every request
+    goes through it (tests pass an httpx.MockTransport).
+    """
+
+    def __init__(self, transport: Optional[httpx.AsyncBaseTransport] = None, **kwargs):
+        self._shared = transport
+        self._kwargs = kwargs
+        self._transports: Dict[str, httpx.AsyncBaseTransport] = {}
+        _transports.add(self)
+
+    def _transport_for(self, upstream: str) -> httpx.AsyncBaseTransport:
+        if self._shared is not None:
+            return self._shared
+        transport = self._transports.get(upstream)
+        if transport is None:
+            options = {"limits": pool_limits(upstream), "http2": http2_enabled(upstream)}
+            transport = self._transports[upstream] = httpx.AsyncHTTPTransport(
+                **{**options, **self._kwargs}
+            )
+            cache = dns_cache()
+            if cache is not None:
+                # httpx takes no network backend of its own; the pool's is wrapped.
+                pool = transport._pool
+                pool._network_backend = CachingResolverBackend(pool._network_backend, cache)
+        return transport
+
+    def _traced(self, request: httpx.Request, counters: _ConnectionCounters) -> None:
+        outer = request.extensions.get("trace")
+        started: Dict[str, float] = {}
+
+        async def trace(event: str, info: Dict[str, Any]) -> None:
+            name, _, phase = event.rpartition(".")
+            if name in _connection_events:
+                if phase == "started":
+                    started[name] = time.monotonic()
+                elif name in started:
+                    counters._setup_total += time.monotonic() - started.pop(name)
+                    if name == "connection.connect_tcp" and phase == "complete":
+                        counters.opened += 1
+            if outer is not None:
+                await outer(event, info)
+
+        request.extensions["trace"] = trace
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        upstream = upstream_for_host(request.url.host)
+        deadline.check(f"{upstream} request")
+        if deadline.remaining() is not None:
+            timeouts = request.extensions.get("timeout", {})
+            request.extensions["timeout"] = {
+                kind: deadline.bounded_timeout(timeouts.get(kind))
+                for kind in ("connect", "read", "write", "pool")
+            }
+        counters = _counters_for(upstream)
+        counters.requests += 1
+        self._traced(request, counters)
+        transport = self._transport_for(upstream)
+
+        async def send() -> httpx.Response:
+            async with bulkhead(upstream):
+                try:
+                    return await transport.handle_async_request(request)
+                except httpx.TimeoutException as exc:
+                    # Timed out because the deadline shrank the timeout: the call ran
+                    # out of time, the upstream did not fail.
+                    if deadline.expired():
+                        raise deadline.DeadlineExceededError(
+                            f"Deadline exceeded during {upstream} request"
+                        ) from exc
+                    raise
+
+        with circuit(upstream).guard() as outcome:
+            response = await deadline.within_deadline(send(), f"{upstream} request")
+            # Counted as a failure, returned as a response: what a 503 means is still
+            # the caller's to decide.
+            outcome.failed = response.status_code in FAILURE_STATUS
+            return response
+
+    def pools(self) -> Dict[str, Any]:
+        """The httpcore connection pools of this transport, by upstream."""
+        return {
+            name: transport._pool
+            for name, transport in self._transports.items()
+            if isinstance(transport, httpx.AsyncHTTPTransport)
+        }
+
+    async def aclose(self) -> None:
+        if self._shared is not None:
+            await self._shared.aclose()
+        for transport in list(self._transports.values()):
+            await transport.aclose()
+        self._transports.clear()
+
+
+def connection_stats() -> Dict[str, Dict[str, Any]]:
+    """Requests, connections opened and pool occupancy per upstream, for /health."""
+    occupancy: Dict[str, Dict[str, int]] = {}
+    for transport in list(_transports):
+        for name, pool in transport.pools().items():
+            entry = occupancy.setdefault(name, {"open": 0, "idle": 0, "max_connections": 0})
+            connections = [c for c in pool.connections if not c.is_closed()]
+            entry["open"] += len(connections)
+            entry["idle"] += sum(1 for c in connections if c.is_idle())
+            entry["max_connections"] += pool._max_connections
+
+    stats = {}
+    for name, counters in sorted(_counters.items()):
+        entry = occupancy.get(name, {"open": 0, "idle": 0, "max_connections": 0})
+        stats[name] = {
+            "requests": counters.requests,
+            "connections_opened": counters.opened,
+            "reuse_ratio": (
+                round(1 - counters.opened / counters.requests, 2) if counters.requests else None
+            ),
+            "avg_setup_ms": (
+                round(1000 * counters._setup_total / counters.opened, 1) if counters.opened else None
+            ),
+            **entry,
+            "in_use": entry["open"] - entry["idle"],
+        }
+    return stats
@@ -0,0 +1,161 @@
+"""
+Startup warmup: fetch the slow, shared reference data before the first call needs it.
+
+After a deploy the first callers paid for everything that is loaded once and cached:
+the KAP company Excel (download and parse), the TEFAS/Takasbank fund list, the sector
+index memberships behind sector comparison, the AssetResolver universes and the
+scanner's valid-field set. Each of those is a multi-second stall on some unlucky
+user's first tool call.
+
+A Warmup runs a set of named steps concurrently in the background at boot and keeps a
+per-step status. It is *ready* once every step has finished -- or once the timeout has
+passed, so a slow upstream cannot hold a machine out of rotation forever. A failed
+step does not block readiness: its data simply loads on first use, as it always did.
+Steps still running at the timeout keep running and report when they finish.
+
+Operators tune it without a deploy:
+
+    WARMUP_ENABLED=false                  # skip warmup; ready at once
+    WARMUP_STEPS=kap_companies,sector_indices   # only these steps
+    WARMUP_TIMEOUT=120                    # seconds before ready regardless
+"""
+import asyncio
+import logging
+import os
+import time
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TIMEOUT = 120.0
+
+StepFactory = Callable[[], Awaitable[Any]]
+
+
+@dataclass
+class StepStatus:
+    state: str = "pending"       # pending -> running -> ok | failed | cancelled
+    seconds: Optional[float] = None
+    error: Optional[str] = None
+
+
+class Warmup:
+    """Runs named warmup steps concurrently and reports readiness."""
+
+    def __init__(
+        self,
+        steps: Dict[str, StepFactory],
+        enabled: bool = True,
+        timeout: float = DEFAULT_TIMEOUT,
+    ):
+        self.steps = dict(steps)
+        self.enabled = enabled
+        self.timeout = timeout
+        self._status: Dict[str, StepStatus] = {name: StepStatus() for name in self.steps}
+        self._tasks: List[asyncio.Task] = []
+        self._runner: Optional[asyncio.Task] = None
+        self._started_at: Optional[float] = None
+        self._finished_at: Optional[float] = None
+        self.timed_out = False
+
+    @classmethod
+    def from_env(cls, steps: Dict[str, StepFactory]) -> "Warmup":
+        enabled = os.getenv("WARMUP_ENABLED", "").strip().lower() not in (
+            "0", "false", "no", "off"
+        )
+
+        selected = [s.strip() for s in os.getenv("WARMUP_STEPS", "").split(",") if s.strip()]
+        if selected:
+            unknown = sorted(set(selected) - steps.keys())
+            if unknown:
+                logger.warning(f"WARMUP_STEPS: ignoring unknown steps {unknown}")
+            steps = {name: factory for name, factory in steps.items() if name in selected}
+
+        timeout = DEFAULT_TIMEOUT
+        raw = os.getenv("WARMUP_TIMEOUT", "").strip()
+        if raw:
+            try:
+                timeout = float(raw)
+            except ValueError:
+                logger.warning(f"WARMUP_TIMEOUT '{raw}' is not a number; using {timeout}s")
+        return cls(steps, enabled=enabled, timeout=timeout)
+
+    @property
+    def ready(self) -> bool:
+        return not self.enabled or self._finished_at is not None
+
+    def start(self) -> None:
+        """Start warming in the background. Safe to call more than once."""
+        if not self.enabled or self._runner is not None:
+            return
+        self._started_at = time.monotonic()
+        self._runner = asyncio.get_running_loop().create_task(self._run())
+
+    async def wait(self) -> None:
+        """Until ready."""
+        if self._runner is not None:
+            await asyncio.shield(self._runner)
+
+    async def stop(self) -> None:
+        """Cancel whatever is still running; for shutdown."""
+        for task in [self._runner, *self._tasks]:
+            if task is not None and not task.done():
+                task.cancel()
+        await asyncio.gather(
+            *(t for t in [self._runner, *self._tasks] if t is not None),
+            return_exceptions=True,
+        )
+
+    async def _step(self, name: str, factory: StepFactory) -> None:
+        status = self._status[name]
+        status.state = "running"
+        started = time.monotonic()
+        try:
+            await factory()
+        except asyncio.CancelledError:
+            status.state = "cancelled"
+            raise
+        except Exception as e:
+            status.state = "failed"
+            status.error = str(e) or type(e).__name__
+            logger.warning(f"Warmup step {name} failed: {status.error}")
+        else:
+            status.state = "ok"
+        finally:
+            status.seconds = round(time.monotonic() - started, 3)
+
+    async def _run(self) -> None:
+        logger.info(f"Warmup: starting {', '.join(self.steps) or 'no steps'}")
+        self._tasks = [
+            asyncio.get_running_loop().create_task(self._step(name, factory))
+            for name, factory in self.steps.items()
+        ]
+        if self._tasks:
+            _, pending = await asyncio.wait(self._tasks, timeout=self.timeout)
+            self.timed_out = bool(pending)
+        self._finished_at = time.monotonic()
+
+        if self.timed_out:
+            slow = [name for name, s in self._status.items() if s.state == "running"]
+            logger.warning(
+                f"Warmup: ready after the {self.timeout:.0f}s timeout; still running: {slow}"
+            )
+        else:
+            logger.info(f"Warmup: ready in {self._finished_at - self._started_at:.1f}s")
+
+    def status(self) -> Dict[str, Any]:
+        elapsed = None
+        if self._started_at is not None:
+            end = self._finished_at or time.monotonic()
+            elapsed = round(end - self._started_at, 3)
+        return {
+            "ready": self.ready,
+            "enabled": self.enabled,
+            "seconds": elapsed,
+            "timed_out": self.timed_out,
+            "steps": {
+                name: {k: v for k, v in vars(s).items() if v is not None}
+                for name, s in self._status.items()
+            },
+        }
@@ -5,11 +5,15 @@ fetching company info, financials, and historical data.
 """
 import yfinance as yf
 import logging
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Optional
 import pandas as pd
 import datetime
 import asyncio
 
+from providers.bar_store import BarStore
+from providers.executors import blocking, run_blocking
+from providers.indicator_state import IndicatorStore
+from providers.intraday_bars import YAHOO_TIMEFRAMES, IntradayBarCache, aggregate_bars
 from models import (
     FinansalVeriNoktasi, YFinancePeriodEnum, SirketProfiliYFinance,
     AnalistTavsiyesi, AnalistFiyatHedefi, TavsiyeOzeti,
@@ -38,7 +42,9 @@ MARKET_TIMEZONES = {
 
 class YahooFinanceProvider:
     def __init__(self):
-        pass
+        self._bars = BarStore.from_env()
+        self._indicators = IndicatorStore("yahoo")
+        self._windows = IntradayBarCache("yahoo")
 
     def _get_ticker(self, ticker_kodu: str, market: str = "BIST") -> yf.Ticker:
         """
@@ -105,7 +111,8 @@ class YahooFinanceProvider:
         # Convert the DataFrame to a list of dictionaries
         return df_reset.to_dict(orient='records')
 
-    async def get_sirket_bilgileri(self, ticker_kodu: str, market: str = "BIST") -> Dict[str, Any]:
+    @blocking("yahoo")
+    def get_sirket_bilgileri(self, ticker_kodu: str, market: str = "BIST") -> Dict[str, Any]:
         """Fetches company profile information from Yahoo Finance."""
         try:
             ticker = self._get_ticker(ticker_kodu, market=market)
@@ -126,7 +133,8 @@ class YahooFinanceProvider:
             logger.exception(f"Error fetching company info from yfinance for {ticker_kodu}")
             return {"error": str(e)}
 
-    async def get_bilanco(self, ticker_kodu: str, period_type: str, market: str = "BIST") -> Dict[str, Any]:
+    @blocking("yahoo")
+    def get_bilanco(self, ticker_kodu: str, period_type: str, market: str = "BIST") -> Dict[str, Any]:
         """Fetches annual or quarterly balance sheet."""
         try:
             ticker = self._get_ticker(ticker_kodu, market=market)
@@ -137,7 +145,8 @@ class YahooFinanceProvider:
             logger.exception(f"Error fetching balance sheet from yfinance for {ticker_kodu}")
             return {"error": str(e)}
 
-    async def get_kar_zarar(self, ticker_kodu: str, period_type: str, market: str = "BIST") -> Dict[str, Any]:
+    @blocking("yahoo")
+    def get_kar_zarar(self, ticker_kodu: str, period_type: str, market: str = "BIST") -> Dict[str, Any]:
         """Fetches annual or quarterly income statement (P/L)."""
         try:
             ticker = self._get_ticker(ticker_kodu, market=market)
@@ -148,7 +157,8 @@ class YahooFinanceProvider:
             logger.exception(f"Error fetching income statement from yfinance for {ticker_kodu}")
             return {"error": str(e)}
     
-    async def get_nakit_akisi(self, ticker_kodu: str, period_type: str, market: str = "BIST") -> Dict[str, Any]:
+    @blocking("yahoo")
+    def get_nakit_akisi(self, ticker_kodu: str, period_type: str, market: str = "BIST") -> Dict[str, Any]:
         """Fetches annual or quarterly cash flow statement."""
         try:
             ticker = self._get_ticker(ticker_kodu, market=market)
@@ -159,7 +169,8 @@ class YahooFinanceProvider:
             logger.exception(f"Error fetching cash flow statement from yfinance for {ticker_kodu}")
             return {"error": str(e)}
 
-    async def get_finansal_veri(
+    @blocking("yahoo")
+    def get_finansal_veri(
         self,
         ticker_kodu: str,
         period: YFinancePeriodEnum = None,
@@ -190,28 +201,44 @@ class YahooFinanceProvider:
         """
         try:
             from token_optimizer import TokenOptimizer
-            from datetime import datetime
+            from datetime import datetime, timedelta
 
             ticker = self._get_ticker(ticker_kodu, market=market)
 
             # Determine which mode to use: date range or period
-            if start_date or end_date:
+            if start_date and end_date:
+                # A closed window goes through the bar store, which fetches only the
+                # gaps. Yahoo's `end` is exclusive and the store's inclusive, so the
+                # window the caller has always got is [start, end - 1 day].
+                def fetch(start, end):
+                    return ticker.history(
+                        start=start.isoformat(),
+                        end=(end + timedelta(days=1)).isoformat(),
+                        auto_adjust=auto_adjust,
+                    )
+
+                start_dt = datetime.strptime(start_date, "%Y-%m-%d")
+                end_dt = datetime.strptime(end_date, "%Y-%m-%d")
+                hist_df = self._bars.history(
+                    ("yfinance", f"{market.upper()}:{ticker_kodu.upper().strip()}", "1d",
+                     int(bool(auto_adjust))),
+                    start_dt.date(),
+                    (end_dt - timedelta(days=1)).date(),
+                    fetch,
+                    market=market,
+                )
+                time_frame_days = (end_dt - start_dt).days
+            elif start_date or end_date:
                 # Date range mode
                 hist_df = ticker.history(start=start_date, end=end_date,
                                          auto_adjust=auto_adjust)
 
                 # Calculate time frame for optimization based on actual date range
-                if start_date and end_date:
-                    start_dt = datetime.strptime(start_date, "%Y-%m-%d")
-                    end_dt = datetime.strptime(end_date, "%Y-%m-%d")
-                    time_frame_days = (end_dt - start_dt).days
-                elif start_date:
+                if start_date:
                     start_dt = datetime.strptime(start_date, "%Y-%m-%d")
                     time_frame_days = (datetime.now() - start_dt).days
-                elif end_date:
-                    # If only end_date, assume 1 year back
-                    time_frame_days = 365
                 else:
+                    # If only end_date, assume 1 year back
                     time_frame_days = 365
             else:
                 # Period mode (default behavior)
@@ -231,21 +258,9 @@ class YahooFinanceProvider:
             if hist_df.empty:
                 return {"veri_noktalari": []}
 
-            # Convert to list of dictionaries for optimization
-            veri_noktalari = []
-            for index, row in hist_df.iterrows():
-                veri_noktalari.append({
-                    'tarih': index.to_pydatetime(),
-                    'acilis': row['Open'],
-                    'en_yuksek': row['High'],
-                    'en_dusuk': row['Low'],
-                    'kapanis': row['Close'],
-                    'hacim': row['Volume']
-                })
-
-            # Apply token optimization
-            raw_count = len(veri_noktalari)
-            optimized_data = TokenOptimizer.optimize_ohlc_data(veri_noktalari, time_frame_days)
+            # Apply token optimization, straight from the frame's columns
+            raw_count = len(hist_df)
+            optimized_data = TokenOptimizer.optimize_ohlc_frame(hist_df, time_frame_days)
 
             # Convert optimized data back to Pydantic models
             optimized_noktalari = [
@@ -272,7 +287,8 @@ class YahooFinanceProvider:
             logger.exception(f"Error fetching historical data from yfinance for {ticker_kodu}")
             return {"error": str(e)}
     
-    async def get_analist_verileri(self, ticker_kodu: str, market: str = "BIST") -> Dict[str, Any]:
+    @blocking("yahoo")
+    def get_analist_verileri(self, ticker_kodu: str, market: str = "BIST") -> Dict[str, Any]:
         """Fetches analyst recommendations, price targets, and recommendation trends."""
         try:
             ticker = self._get_ticker(ticker_kodu, market=market)
@@ -359,7 +375,8 @@ class YahooFinanceProvider:
             logger.exception(f"Error fetching analyst data from yfinance for {ticker_kodu}")
             return {"error": str(e)}
     
-    async def get_temettu_ve_aksiyonlar(self, ticker_kodu: str, market: str = "BIST") -> Dict[str, Any]:
+    @blocking("yahoo")
+    def get_temettu_ve_aksiyonlar(self, ticker_kodu: str, market: str = "BIST") -> Dict[str, Any]:
         """Fetches dividend history and corporate actions (splits)."""
         try:
             ticker = self._get_ticker(ticker_kodu, market=market)
@@ -472,7 +489,8 @@ class YahooFinanceProvider:
                 return value
         return None
 
-    async def get_hizli_bilgi(self, ticker_kodu: str, market: str = "BIST") -> Dict[str, Any]:
+    @blocking("yahoo")
+    def get_hizli_bilgi(self, ticker_kodu: str, market: str = "BIST") -> Dict[str, Any]:
         """Fetches fast info - key metrics without heavy data processing."""
         try:
             ticker = self._get_ticker(ticker_kodu, market=market)
@@ -537,7 +555,8 @@ class YahooFinanceProvider:
             logger.exception(f"Error fetching fast info for {ticker_kodu}")
             return {"error": str(e)}
     
-    async def get_kazanc_takvimi(self, ticker_kodu: str, market: str = "BIST") -> Dict[str, Any]:
+    @blocking("yahoo")
+    def get_kazanc_takvimi(self, ticker_kodu: str, market: str = "BIST") -> Dict[str, Any]:
         """Fetches earnings calendar including upcoming and historical earnings dates."""
         try:
             ticker = self._get_ticker(ticker_kodu, market=market)
@@ -628,16 +647,44 @@ class YahooFinanceProvider:
             logger.exception(f"Error fetching earnings calendar for {ticker_kodu}")
             return {"error": str(e)}
     
-    def get_teknik_analiz(self, ticker_kodu: str, market: str = "BIST") -> Dict[str, Any]:
-        """Comprehensive technical analysis with indicators, trends, and signals."""
+    async def fetch_bars(self, ticker_kodu: str, timeframe: str = "1d", market: str = "US") -> pd.DataFrame:
+        """Bars at `timeframe` for technical analysis, oldest first.
+
+        The window comes from the bar window cache (providers/intraday_bars.py); when
+        it has expired only its tail is fetched. 4h bars are folded from the hourly
+        window.
+        """
+        spec = YAHOO_TIMEFRAMES[timeframe]
+        ticker = self._get_ticker(ticker_kodu, market=market)
+
+        async def fetch(period: str) -> pd.DataFrame:
+            return await run_blocking("yahoo", ticker.history, period=period, interval=spec.interval)
+
+        hist = await self._windows.window((ticker.ticker, spec.interval), market, spec, fetch)
+        return aggregate_bars(hist, spec.fold_hours) if spec.fold_hours else hist
+
+    def get_teknik_analiz(
+        self,
+        ticker_kodu: str,
+        market: str = "BIST",
+        timeframe: str = "1d",
+        hist: Optional[pd.DataFrame] = None,
+    ) -> Dict[str, Any]:
+        """Comprehensive technical analysis with indicators, trends, and signals.
+
+        `hist` is the `timeframe` bars when the caller already fetched them through
+        fetch_bars(); without them they are fetched here, uncached.
+        """
         try:
-            import pandas as pd
             from datetime import datetime
 
             ticker = self._get_ticker(ticker_kodu, market=market)
-            
-            # Get historical data for calculations (6 months to have enough data for 200-day SMA)
-            hist = ticker.history(period="6mo")
+
+            if hist is None:
+                spec = YAHOO_TIMEFRAMES[timeframe]
+                hist = ticker.history(period=spec.period, interval=spec.interval)
+                if spec.fold_hours:
+                    hist = aggregate_bars(hist, spec.fold_hours)
             if hist.empty:
                 return {"error": f"Historical data not available for {ticker.ticker}"}
             
@@ -679,86 +726,41 @@ class YahooFinanceProvider:
                 "yillik_dusuk_uzaklik": float((current_price - year_low) / year_low * 100)
             }
             
-            # Moving Averages
-            sma_5 = hist['Close'].rolling(window=5).mean().iloc[-1] if len(hist) >= 5 else None
-            sma_10 = hist['Close'].rolling(window=10).mean().iloc[-1] if len(hist) >= 10 else None
-            sma_20 = hist['Close'].rolling(window=20).mean().iloc[-1] if len(hist) >= 20 else None
-            sma_50 = hist['Close'].rolling(window=50).mean().iloc[-1] if len(hist) >= 50 else None
-            sma_200 = hist['Close'].rolling(window=200).mean().iloc[-1] if len(hist) >= 200 else None
-            
-            # Exponential Moving Averages
-            ema_12 = hist['Close'].ewm(span=12).mean().iloc[-1] if len(hist) >= 12 else None
-            ema_26 = hist['Close'].ewm(span=26).mean().iloc[-1] if len(hist) >= 26 else None
-            
+            ind = self._indicators.compute(
+                (ticker.ticker, timeframe), hist.index,
+                hist['Close'], hist['High'], hist['Low'], hist['Volume'],
+            )
+            sma_5, sma_10, sma_20, sma_50, sma_200 = (
+                ind.sma[5], ind.sma[10], ind.sma[20], ind.sma[50], ind.sma[200]
+            )
+            rsi_14, macd, macd_signal = ind.rsi_14, ind.macd, ind.macd_signal
+
             result["hareketli_ortalamalar"] = {
-                "sma_5": float(sma_5) if sma_5 is not None and not pd.isna(sma_5) else None,
-                "sma_10": float(sma_10) if sma_10 is not None and not pd.isna(sma_10) else None,
-                "sma_20": float(sma_20) if sma_20 is not None and not pd.isna(sma_20) else None,
-                "sma_50": float(sma_50) if sma_50 is not None and not pd.isna(sma_50) else None,
-                "sma_200": float(sma_200) if sma_200 is not None and not pd.isna(sma_200) else None,
-                "ema_12": float(ema_12) if ema_12 is not None and not pd.isna(ema_12) else None,
-                "ema_26": float(ema_26) if ema_26 is not None and not pd.isna(ema_26) else None
+                "sma_5": sma_5,
+                "sma_10": sma_10,
+                "sma_20": sma_20,
+                "sma_50": sma_50,
+                "sma_200": sma_200,
+                "ema_12": ind.ema_12,
+                "ema_26": ind.ema_26
             }
-            
-            # Technical Indicators
-            
-            # RSI calculation
-            rsi_14 = None
-            if len(hist) >= 14:
-                delta = hist['Close'].diff()
-                gain = (delta.where(delta > 0, 0)).rolling(window=14).mean()
-                loss = (-delta.where(delta < 0, 0)).rolling(window=14).mean()
-                rs = gain / loss
-                rsi = 100 - (100 / (1 + rs))
-                rsi_14 = rsi.iloc[-1]
-            
-            # MACD calculation
-            macd = None
-            macd_signal = None
-            macd_histogram = None
-            if ema_12 is not None and ema_26 is not None:
-                macd = ema_12 - ema_26
-                macd_signal_series = pd.Series([macd]).ewm(span=9).mean().iloc[-1] if not pd.isna(macd) else None
-                macd_signal = float(macd_signal_series) if macd_signal_series is not None else None
-                macd_histogram = float(macd - macd_signal) if macd_signal is not None else None
-                macd = float(macd)
-            
-            # Bollinger Bands
-            bollinger_upper = None
-            bollinger_middle = None
-            bollinger_lower = None
-            if sma_20 is not None and len(hist) >= 20:
-                std_20 = hist['Close'].rolling(window=20).std().iloc[-1]
-                bollinger_middle = sma_20
-                bollinger_upper = sma_20 + (2 * std_20)
-                bollinger_lower = sma_20 - (2 * std_20)
-            
-            # Stochastic Oscillator
-            stochastic_k = None
-            stochastic_d = None
-            if len(hist) >= 14:
-                low_14 = hist['Low'].rolling(window=14).min()
-                high_14 = hist['High'].rolling(window=14).max()
-                k_percent = 100 * ((hist['Close'] - low_14) / (high_14 - low_14))
-                stochastic_k = k_percent.iloc[-1] if not pd.isna(k_percent.iloc[-1]) else None
-                stochastic_d = k_percent.rolling(window=3).mean().iloc[-1] if len(k_percent) >= 3 else None
-            
+
             result["teknik_indiktorler"] = {
-                "rsi_14": float(rsi_14) if rsi_14 is not None and not pd.isna(rsi_14) else None,
+                "rsi_14": rsi_14,
                 "macd": macd,
                 "macd_signal": macd_signal,
-                "macd_histogram": macd_histogram,
-                "bollinger_upper": float(bollinger_upper) if bollinger_upper is not None and not pd.isna(bollinger_upper) else None,
-                "bollinger_middle": float(bollinger_middle) if bollinger_middle is not None and not pd.isna(bollinger_middle) else None,
-                "bollinger_lower": float(bollinger_lower) if bollinger_lower is not None and not pd.isna(bollinger_lower) else None,
-                "stochastic_k": float(stochastic_k) if stochastic_k is not None and not pd.isna(stochastic_k) else None,
-                "stochastic_d": float(stochastic_d) if stochastic_d is not None and not pd.isna(stochastic_d) else None
+                "macd_histogram": ind.macd_histogram,
+                "bollinger_upper": ind.bollinger_upper,
+                "bollinger_middle": ind.bollinger_middle,
+                "bollinger_lower": ind.bollinger_lower,
+                "stochastic_k": ind.stochastic_k,
+                "stochastic_d": ind.stochastic_d
             }
-            
+
             # Volume Analysis
             current_volume = int(hist['Volume'].iloc[-1])
-            avg_volume_10 = int(hist['Volume'].rolling(window=10).mean().iloc[-1]) if len(hist) >= 10 else None
-            avg_volume_30 = int(hist['Volume'].rolling(window=30).mean().iloc[-1]) if len(hist) >= 30 else None
+            avg_volume_10 = int(ind.volume_avg[10]) if ind.volume_avg[10] is not None else None
+            avg_volume_30 = int(ind.volume_avg[30]) if ind.volume_avg[30] is not None else None
             volume_ratio = current_volume / avg_volume_10 if avg_volume_10 and avg_volume_10 > 0 else None
             
             volume_trend = "normal"
@@ -1162,7 +1164,8 @@ class YahooFinanceProvider:
             logger.exception("Error in sector analysis")
             return {"error": str(e)}
     
-    async def hisse_tarama(self, kriterler: TaramaKriterleri, sirket_listesi: List[Any]) -> Dict[str, Any]:
+    @blocking("yahoo")
+    def hisse_tarama(self, kriterler: TaramaKriterleri, sirket_listesi: List[Any]) -> Dict[str, Any]:
         """
         Comprehensive stock screening with flexible criteria.
         
@@ -1521,7 +1524,8 @@ class YahooFinanceProvider:
         )
         return await self.hisse_tarama(kriterler, sirket_listesi)
 
-    async def get_pivot_points(self, ticker_kodu: str, market: str = "BIST") -> Dict[str, Any]:
+    @blocking("yahoo")
+    def get_pivot_points(self, ticker_kodu: str, market: str = "BIST") -> Dict[str, Any]:
         """
         Calculate pivot points support and resistance levels.
 
@@ -3,7 +3,6 @@ Yahoo Finance Screener Provider using yfscreen package.
 Provides async screening for US equities, ETFs, mutual funds, indices, and futures.
 """
 
-import asyncio
 import logging
 from typing import Any, Dict, List, Optional
 from datetime import datetime
@@ -12,6 +11,8 @@ from enum import Enum
 import yfscreen as yfs
 import pandas as pd
 
+from providers.executors import run_blocking
+
 logger = logging.getLogger(__name__)
 
 
@@ -451,8 +452,7 @@ class YFScreenProvider:
             Dict containing available filters by category.
         """
         try:
-            loop = asyncio.get_event_loop()
-            data_filters = await loop.run_in_executor(None, lambda: yfs.data_filters)
+            data_filters = await run_blocking("yahoo", lambda: yfs.data_filters)
 
             return {
                 "available_filters": self.AVAILABLE_FILTERS,
@@ -532,15 +532,14 @@ class YFScreenProvider:
             # Limit validation
             limit = min(limit, 250)
 
-            # Run screening in executor (yfscreen is synchronous)
-            loop = asyncio.get_event_loop()
+            # Run screening in the Yahoo pool (yfscreen is synchronous)
 
             def execute_screen():
                 query = yfs.create_query(filters)
                 payload = yfs.create_payload(security_type, query)
                 return yfs.get_data(payload)
 
-            data = await loop.run_in_executor(None, execute_screen)
+            data = await run_blocking("yahoo", execute_screen)
 
             # Process results
             total_results = len(data) if data is not None else 0
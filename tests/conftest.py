@@ -2,3 +2,12 @@ import sys
 from pathlib import Path
 
 sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import pytest  # noqa: E402
+
+
+@pytest.fixture(autouse=True)
+def _closed_circuits(monkeypatch):
+    # The live tests fail here without network; a circuit they open must not turn
+    # the next test's mocked call into a CircuitOpenError.
+    monkeypatch.setattr("providers.circuit_breaker._circuits", {})
@@ -0,0 +1,186 @@
+"""The bar store: a closed trading day is fetched once, not once per request.
+
+Every history call used to refetch its whole window. compare_assets prices two
+endpoints per asset, so the same January bars went over the TradingView websocket on
+every call. Only the part of a window that has not been seen before may go upstream
+-- and a split that revises the adjusted series must not be stitched onto old bars.
+"""
+import asyncio
+from datetime import date, datetime, timedelta
+from unittest.mock import MagicMock, patch
+from zoneinfo import ZoneInfo
+
+import pandas as pd
+
+from providers.bar_store import BarStore
+from providers.borsapy_provider import BorsapyProvider
+
+KEY = ("borsapy", "GARAN", "1d", 1)
+TZ = "Europe/Istanbul"
+
+
+class Upstream:
+    """A daily series with a bar every calendar day; records every fetched window."""
+
+    def __init__(self, scale=1.0):
+        self.calls = []
+        self.scale = scale
+
+    def __call__(self, start, end):
+        self.calls.append((start, end))
+        days = pd.date_range(start, end, freq="D")
+        closes = [self.scale * (100 + d.day) for d in days]
+        return pd.DataFrame(
+            {"Open": closes, "High": closes, "Low": closes, "Close": closes,
+             "Volume": [1000.0] * len(days)},
+            index=days.tz_localize(TZ),
+        )
+
+
+def test_a_repeated_window_is_served_without_going_upstream():
+    store = BarStore()
+    upstream = Upstream()
+
+    first = store.history(KEY, date(2026, 1, 5), date(2026, 1, 9), upstream, market="bist")
+    second = store.history(KEY, date(2026, 1, 5), date(2026, 1, 9), upstream, market="bist")
+
+    assert len(upstream.calls) == 1
+    assert list(second["Close"]) == list(first["Close"])
+    assert [d.strftime("%Y-%m-%d") for d in second.index] == [
+        "2026-01-05", "2026-01-06", "2026-01-07", "2026-01-08", "2026-01-09",
+    ]
+
+
+def test_a_wider_window_fetches_only_the_gap():
+    store = BarStore()
+    upstream = Upstream()
+    store.history(KEY, date(2026, 1, 5), date(2026, 1, 9), upstream, market="bist")
+
+    frame = store.history(KEY, date(2026, 1, 5), date(2026, 1, 20), upstream, market="bist")
+
+    assert len(frame) == 16
+    # The gap, widened back by one stored bar so a revision would show.
+    assert upstream.calls[1] == (date(2026, 1, 9), date(2026, 1, 20))
+    assert store.missing_ranges(KEY, date(2026, 1, 5), date(2026, 1, 20)) == []
+
+
+def test_today_is_covered_only_once_the_session_has_closed():
+    """Today's bar is still forming until the close; after it, it is final."""
+    today = date(2026, 7, 8)                                     # a Wednesday
+    window = (today - timedelta(days=3), today)
+
+    store = BarStore()
+    upstream = Upstream()
+    during = datetime(2026, 7, 8, 14, 0, tzinfo=ZoneInfo(TZ))
+    with patch("providers.ttl_policy._now", return_value=during):
+        store.history(KEY, *window, upstream, market="bist")
+        store.history(KEY, *window, upstream, market="bist")
+    assert len(upstream.calls) == 2
+    assert store.missing_ranges(KEY, *window) == [(today, today)]
+
+    after = datetime(2026, 7, 8, 18, 30, tzinfo=ZoneInfo(TZ))
+    with patch("providers.ttl_policy._now", return_value=after):
+        store.history(KEY, *window, upstream, market="bist")
+        store.history(KEY, *window, upstream, market="bist")
+    assert len(upstream.calls) == 3, "a closed session's bar must not be refetched all night"
+
+
+def test_a_weekend_after_the_close_is_not_refetched():
+    """Coverage stopped at Friday's close, so Saturday stayed a gap: every read over
+    it went upstream again for Friday's bar and the empty days."""
+    saturday = date(2026, 7, 11)
+    window = (saturday - timedelta(days=10), saturday)
+
+    store = BarStore()
+    upstream = Upstream()
+    noon = datetime(2026, 7, 11, 12, 0, tzinfo=ZoneInfo(TZ))
+    with patch("providers.ttl_policy._now", return_value=noon):
+        for _ in range(3):
+            store.history(KEY, *window, upstream, market="bist")
+        assert len(upstream.calls) == 1
+        assert store.missing_ranges(KEY, *window) == []
+
+    # Monday's session has not opened yet: Sunday is final, Monday is not.
+    monday = datetime(2026, 7, 13, 8, 0, tzinfo=ZoneInfo(TZ))
+    with patch("providers.ttl_policy._now", return_value=monday):
+        store.history(KEY, window[0], date(2026, 7, 13), upstream, market="bist")
+        store.history(KEY, window[0], date(2026, 7, 13), upstream, market="bist")
+    assert len(upstream.calls) == 3
+
+
+def test_a_split_revision_drops_the_stored_series_and_refetches():
+    store = BarStore()
+    store.history(KEY, date(2026, 1, 5), date(2026, 1, 9), Upstream(), market="bist")
+
+    # A 2:1 split: upstream now reports every earlier close halved.
+    split = Upstream(scale=0.5)
+    frame = store.history(KEY, date(2026, 1, 5), date(2026, 1, 12), split, market="bist")
+
+    assert store.revisions == 1
+    assert split.calls[-1] == (date(2026, 1, 5), date(2026, 1, 12))
+    assert frame["Close"].iloc[0] == 0.5 * 105, "old-basis bars must not survive a split"
+
+
+def test_an_empty_fetch_records_no_coverage():
+    """yfinance answers some failures with an empty frame; that is not 'no bars'."""
+    store = BarStore()
+    empty = MagicMock(return_value=pd.DataFrame())
+
+    frame = store.history(KEY, date(2026, 1, 5), date(2026, 1, 9), empty, market="bist")
+
+    assert frame.empty
+    assert store.missing_ranges(KEY, date(2026, 1, 5), date(2026, 1, 9)) == [
+        (date(2026, 1, 5), date(2026, 1, 9)),
+    ]
+
+
+def test_bars_survive_a_restart_when_a_path_is_configured(tmp_path, monkeypatch):
+    monkeypatch.setenv("BAR_STORE_PATH", str(tmp_path / "bars.sqlite"))
+    BarStore.from_env().history(KEY, date(2026, 1, 5), date(2026, 1, 9), Upstream(), market="bist")
+
+    upstream = Upstream()
+    frame = BarStore.from_env().history(
+        KEY, date(2026, 1, 5), date(2026, 1, 9), upstream, market="bist"
+    )
+
+    assert upstream.calls == []
+    assert len(frame) == 5
+
+
+def test_borsapy_history_goes_upstream_once_for_a_repeated_window():
+    provider = BorsapyProvider()
+    ticker = MagicMock()
+    upstream = Upstream()
+    ticker.history = lambda start, end, adjust: upstream(
+        date.fromisoformat(start), date.fromisoformat(end)
+    )
+
+    async def twice():
+        with patch.object(provider, "_get_ticker", return_value=ticker):
+            for _ in range(2):
+                result = await provider.get_finansal_veri(
+                    "GARAN", start_date="2026-01-05", end_date="2026-01-09", adjust=True
+                )
+        return result
+
+    result = asyncio.run(twice())
+
+    assert len(upstream.calls) == 1
+    assert [str(p["tarih"])[:10] for p in result["data"]][:2] == ["2026-01-05", "2026-01-06"]
+
+
+def test_the_least_recently_read_series_is_evicted_past_the_bound():
+    store = BarStore(max_series=2)
+    upstream = Upstream()
+    keys = [("borsapy", symbol, "1d", 1) for symbol in ("GARAN", "THYAO", "ASELS")]
+    window = (date(2026, 1, 5), date(2026, 1, 9))
+
+    store.history(keys[0], *window, upstream, market="bist")
+    store.history(keys[1], *window, upstream, market="bist")
+    store.history(keys[0], *window, upstream, market="bist")    # GARAN read again
+    store.history(keys[2], *window, upstream, market="bist")    # THYAO goes
+
+    assert store.evictions == 1
+    assert store.covered_ranges(keys[1]) == [] and store._read(keys[1], *window) == []
+    assert store.missing_ranges(keys[0], *window) == []
+    assert len(upstream.calls) == 3
@@ -0,0 +1,142 @@
+"""Each upstream has its own concurrency limit and bounded queue.
+
+The one Semaphore(8) in screen_funds was the only limit anywhere: a 50-symbol request
+put 50 concurrent calls on TradingView, a burst of fund screens tripped TEFAS's rate
+limit for every other tool, and nothing capped a stalled upstream's connections.
+"""
+import asyncio
+import time
+
+import httpx
+import pytest
+
+from providers.bulkhead import (
+    Bulkhead, BulkheadFullError, _configured_limits, bounded_gather, bulkhead,
+    upstream_for_host,
+)
+from providers.executors import run_blocking
+from providers.upstream_http import UpstreamTransport
+from unified_mcp_server import classify_tool_error
+
+
+def test_calls_beyond_the_limit_wait_in_order_and_report_their_wait():
+    limiter = Bulkhead("test-order", max_concurrent=2, max_queue=10)
+    running, peak, order = [], [], []
+
+    async def call(i):
+        async with limiter:
+            running.append(i)
+            peak.append(len(running))
+            order.append(i)
+            await asyncio.sleep(0.02)
+            running.remove(i)
+
+    async def run():
+        await asyncio.gather(*(call(i) for i in range(6)))
+
+    asyncio.run(run())
+    assert max(peak) == 2
+    assert order == list(range(6))
+    stats = limiter.stats()
+    assert stats["acquired"] == 6 and stats["max_queued"] == 4
+    assert stats["max_wait_ms"] >= 30 and stats["active"] == 0
+
+
+def test_a_full_queue_refuses_at_once_with_a_retryable_error():
+    limiter = Bulkhead("test-full", max_concurrent=1, max_queue=1)
+
+    async def hold():
+        async with limiter:
+            await asyncio.sleep(0.05)
+
+    async def run():
+        tasks = [asyncio.ensure_future(hold()) for _ in range(2)]
+        await asyncio.sleep(0.01)
+        with pytest.raises(BulkheadFullError) as refused:
+            await limiter.acquire()
+        await asyncio.gather(*tasks)
+        return refused.value
+
+    error = asyncio.run(run())
+    assert limiter.stats()["rejected"] == 1
+    assert "rate limiting" in str(classify_tool_error(error, "get_quote"))
+
+
+def test_a_cancelled_waiter_gives_its_place_back():
+    limiter = Bulkhead("test-cancel", max_concurrent=1, max_queue=5)
+
+    async def run():
+        await limiter.acquire()
+        waiter = asyncio.ensure_future(limiter.acquire())
+        await asyncio.sleep(0)
+        waiter.cancel()
+        await asyncio.sleep(0)
+        limiter.release()
+        await asyncio.wait_for(limiter.acquire(), 0.1)
+        limiter.release()
+
+    asyncio.run(run())
+    assert limiter.stats()["active"] == 0 and limiter.stats()["queued"] == 0
+
+
+def test_one_saturated_upstream_does_not_slow_another():
+    async def run():
+        saturated = [
+            asyncio.ensure_future(run_blocking("test-busy-upstream", time.sleep, 0.1))
+            for _ in range(20)
+        ]
+        await asyncio.sleep(0.01)
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        await run_blocking("test-quiet-upstream", lambda: None)
+        elapsed = loop.time() - started
+        await asyncio.gather(*saturated)
+        return elapsed
+
+    assert asyncio.run(run()) < 0.05
+    assert bulkhead("test-busy-upstream").stats()["max_queued"] >= 1
+
+
+def test_http_requests_take_their_hosts_bulkhead():
+    seen = []
+
+    def handler(request):
+        seen.append(bulkhead("kap").active)
+        return httpx.Response(200, json={})
+
+    async def run():
+        transport = UpstreamTransport(httpx.MockTransport(handler))
+        async with httpx.AsyncClient(transport=transport) as client:
+            await client.get("https://www.kap.org.tr/tr/api/company")
+
+    asyncio.run(run())
+    assert seen == [1]
+    assert upstream_for_host("evds3.tcmb.gov.tr") == "evds"
+    assert upstream_for_host("www.tcmb.gov.tr") == "tcmb"
+    assert upstream_for_host("scanner.tradingview.com") == "borsapy"
+    assert upstream_for_host("example.org") == "other"
+
+
+def test_bounded_gather_caps_one_fan_out():
+    running, peak = [0], [0]
+
+    async def fetch(i):
+        running[0] += 1
+        peak[0] = max(peak[0], running[0])
+        await asyncio.sleep(0.01)
+        running[0] -= 1
+        if i == 3:
+            raise ValueError("no data")
+        return i
+
+    results = asyncio.run(bounded_gather((fetch(i) for i in range(20)), limit=4, return_exceptions=True))
+    assert peak[0] == 4
+    assert isinstance(results[3], ValueError) and results[:3] == [0, 1, 2]
+
+
+def test_limits_are_configurable(monkeypatch):
+    monkeypatch.setenv("BULKHEADS", "tefas=2/10, yahoo=3, kap=lots")
+    limits = _configured_limits()
+    assert limits["tefas"] == (2, 10)
+    assert limits["yahoo"] == (3, 128)
+    assert limits["kap"] == (4, 64)
@@ -0,0 +1,146 @@
+"""The shared cache layer: bounded, expiring, and one upstream call per cold key.
+
+Every provider used to keep its own dict. They grew without bound, and a cold key hit
+by N concurrent callers went upstream N times -- only FredCpiProvider had
+single-flight, and it got there by hand.
+"""
+import asyncio
+from unittest.mock import patch
+
+import pytest
+
+from providers.cache import CacheNamespace, cache_stats
+
+
+def test_a_fresh_entry_is_a_hit_and_an_expired_one_a_miss():
+    ns = CacheNamespace("test.expiry", ttl=10)
+    with patch("providers.cache.time.time", return_value=1000.0):
+        ns.set("k", "v")
+    with patch("providers.cache.time.time", return_value=1009.0):
+        assert ns.get("k") == "v"
+    with patch("providers.cache.time.time", return_value=1010.0):
+        assert ns.get("k") is None
+
+    assert ns.hits == 1
+    assert ns.misses == 1
+
+
+def test_an_expired_entry_is_still_available_as_stale():
+    """The KAP list degrades to the last good copy when a refresh fails."""
+    ns = CacheNamespace("test.stale", ttl=10)
+    with patch("providers.cache.time.time", return_value=1000.0):
+        ns.set("k", ["GARAN"])
+    with patch("providers.cache.time.time", return_value=5000.0):
+        assert ns.get("k") is None
+        assert ns.get_stale("k") == ["GARAN"]
+
+
+def test_the_least_recently_used_entry_is_evicted_at_capacity():
+    ns = CacheNamespace("test.lru", ttl=60, max_entries=2)
+    ns.set("a", 1)
+    ns.set("b", 2)
+    assert ns.get("a") == 1          # "b" is now the least recently used
+    ns.set("c", 3)
+
+    assert "b" not in ns
+    assert ns.get("a") == 1
+    assert ns.get("c") == 3
+    assert ns.evictions == 1
+    assert len(ns) == 2
+
+
+def test_concurrent_misses_share_one_load():
+    ns = CacheNamespace("test.single_flight", ttl=60)
+    calls = {"n": 0}
+
+    async def loader():
+        calls["n"] += 1
+        await asyncio.sleep(0.01)
+        return "value"
+
+    async def burst():
+        return await asyncio.gather(*(ns.get_or_load("k", loader) for _ in range(10)))
+
+    results = asyncio.run(burst())
+
+    assert results == ["value"] * 10
+    assert calls["n"] == 1, "a cold key under load must go upstream once, not ten times"
+    assert ns.coalesced == 9
+
+
+def test_a_failed_load_reaches_every_waiter_and_caches_nothing():
+    ns = CacheNamespace("test.failure", ttl=60)
+    calls = {"n": 0}
+
+    async def loader():
+        calls["n"] += 1
+        await asyncio.sleep(0.01)
+        raise RuntimeError("upstream down")
+
+    async def burst():
+        return await asyncio.gather(
+            *(ns.get_or_load("k", loader) for _ in range(3)), return_exceptions=True
+        )
+
+    results = asyncio.run(burst())
+
+    assert all(isinstance(r, RuntimeError) for r in results)
+    assert calls["n"] == 1
+    assert "k" not in ns
+    assert ns.load_errors == 1
+
+
+def test_cache_if_keeps_an_error_value_out_of_the_cache():
+    """İş Yatırım reports failure as {"error": ...}; caching it would serve the
+    failure back as data for the whole TTL."""
+    ns = CacheNamespace("test.cache_if", ttl=60)
+
+    async def loader():
+        return {"error": "No financial data available", "items": []}
+
+    result = asyncio.run(
+        ns.get_or_load("k", loader, cache_if=lambda r: not r.get("error"))
+    )
+
+    assert result["error"]
+    assert "k" not in ns
+
+
+def test_cache_stats_reports_live_namespaces_by_name():
+    ns = CacheNamespace("test.stats", ttl=60)
+    ns.set("k", 1)
+    ns.get("k")
+
+    stats = cache_stats()["test.stats"]
+    assert stats["size"] == 1
+    assert stats["hits"] == 1
+    assert stats["hit_rate"] == 1.0
+
+
+def test_max_entries_must_be_positive():
+    with pytest.raises(ValueError):
+        CacheNamespace("test.invalid", ttl=60, max_entries=0)
+
+
+def test_a_shared_load_is_bounded_by_each_callers_own_deadline():
+    """The load ran under the leader's deadline, so a waiter with 30 seconds to spare
+    got the leader's DeadlineExceededError after 0.1."""
+    from providers.deadline import DeadlineExceededError, deadline_scope
+
+    ns = CacheNamespace("test.shared_deadline", ttl=60)
+
+    async def loader():
+        await asyncio.sleep(0.3)
+        return "value"
+
+    async def caller(seconds):
+        with deadline_scope(seconds):
+            return await ns.get_or_load("k", loader)
+
+    async def run():
+        return await asyncio.gather(caller(0.1), caller(30), return_exceptions=True)
+
+    leader, waiter = asyncio.run(run())
+    assert isinstance(leader, DeadlineExceededError)
+    assert waiter == "value"
+    assert ns.get("k") == "value", "the load outlives the caller that started it"
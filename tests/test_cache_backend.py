@@ -0,0 +1,144 @@
+"""Provider and tool caches can live in one store shared by every replica.
+
+Each Fly machine and each worker warmed its own KAP list, statements and fund info,
+and paid its own upstream round trips for them. A shared backend -- Redis in
+production, fakeredis here -- sits behind the in-process LRU of namespaces created
+with `shared=True`, and behind the tool response cache.
+"""
+import asyncio
+from datetime import date
+
+import fakeredis
+import pytest
+from fastmcp import Client, FastMCP
+from mcp.types import ToolAnnotations
+
+from providers.cache import CacheNamespace, set_shared_backend
+from providers.cache_backend import (
+    MISSING, BackendStore, Codec, CodecError, InProcessBackend, RedisBackend,
+)
+from providers.tool_cache import ToolResponseCache
+
+
+@pytest.fixture
+def shared_redis():
+    backend = RedisBackend(client=fakeredis.aioredis.FakeRedis(), codec=Codec(b"k"))
+    set_shared_backend(backend)
+    yield backend
+    set_shared_backend(None)
+
+
+def test_the_codec_round_trips_our_types_compresses_and_checks_signatures():
+    value = {"tablo": [(f"Kalem {i}", date(2026, 6, 30), float(i)) for i in range(300)]}
+    codec = Codec(secret=b"replica-secret")
+    payload = codec.encode(value)
+
+    assert codec.decode(payload) == value
+    assert len(payload) < len(Codec(compress_above=10**9).encode(value)) / 4
+
+    with pytest.raises(CodecError):
+        Codec(secret=b"another-secret").decode(payload)
+    with pytest.raises(CodecError):
+        codec.decode(Codec().encode(value))    # unsigned, once a secret is set
+    with pytest.raises(CodecError):
+        codec.decode(b"garbage")
+
+
+def test_a_second_replica_is_served_from_the_shared_store(shared_redis):
+    calls = []
+
+    async def loader():
+        calls.append(1)
+        return [{"kod": "GARAN"}]
+
+    async def run():
+        first = CacheNamespace("test.shared.replica_a", ttl=60, shared=True)
+        second = CacheNamespace("test.shared.replica_b", ttl=60, shared=True)
+        second.name = first.name    # the same namespace, on another machine
+        assert await first.get_or_load("bist", loader) == [{"kod": "GARAN"}]
+        assert await second.get_or_load("bist", loader) == [{"kod": "GARAN"}]
+        return second
+
+    second = asyncio.run(run())
+    assert len(calls) == 1
+    assert second.shared_hits == 1 and second.loads == 0
+    assert shared_redis.stats()["hits"] == 1
+
+
+def test_a_namespace_that_is_not_shared_never_touches_the_backend(shared_redis):
+    async def run():
+        local = CacheNamespace("test.shared.local", ttl=60)
+        await local.get_or_load("k", lambda: asyncio.sleep(0, result="v"))
+
+    asyncio.run(run())
+    assert shared_redis.stats()["writes"] == 0
+
+
+def test_a_backend_outage_is_a_miss_not_a_failure():
+    class Down(InProcessBackend):
+        async def _get(self, key):
+            raise ConnectionError("redis unreachable")
+
+        async def _set(self, key, payload, ttl):
+            raise ConnectionError("redis unreachable")
+
+    backend = Down()
+    set_shared_backend(backend)
+    try:
+        async def run():
+            cache = CacheNamespace("test.shared.down", ttl=60, shared=True)
+            return await cache.get_or_load("k", lambda: asyncio.sleep(0, result="v"))
+
+        assert asyncio.run(run()) == "v"
+    finally:
+        set_shared_backend(None)
+    assert backend.stats()["errors"] == 2
+
+
+def test_in_process_entries_expire():
+    backend = InProcessBackend()
+
+    async def run():
+        await backend.store("k", "v", ttl=0.05)
+        first = await backend.load("k")
+        await asyncio.sleep(0.06)
+        return first, await backend.load("k")
+
+    assert asyncio.run(run()) == ("v", MISSING)
+
+
+def test_tool_results_are_shared_through_the_backend_store():
+    backend = RedisBackend(client=fakeredis.aioredis.FakeRedis())
+    calls = []
+
+    def server():
+        mcp = FastMCP("test")
+        mcp.add_middleware(ToolResponseCache(cache_storage=BackendStore(backend)))
+
+        @mcp.tool(annotations=ToolAnnotations(idempotentHint=True))
+        def get_quote(symbol: str) -> str:
+            calls.append(symbol)
+            return f"{symbol} 123.4"
+
+        return mcp
+
+    async def ask(mcp):
+        async with Client(mcp) as client:
+            result = await client.call_tool("get_quote", {"symbol": "GARAN"})
+            return result.content[0].text
+
+    async def run():
+        return await ask(server()), await ask(server())
+
+    assert asyncio.run(run()) == ("GARAN 123.4", "GARAN 123.4")
+    assert calls == ["GARAN"]
+
+
+def test_a_redis_url_without_a_secret_is_refused(monkeypatch):
+    from providers.cache_backend import backend_from_env
+
+    monkeypatch.setenv("CACHE_BACKEND_URL", "redis://cache.internal:6379/0")
+    monkeypatch.delenv("CACHE_BACKEND_SECRET", raising=False)
+    assert backend_from_env() is None
+    with pytest.raises(ValueError, match="secret"):
+        RedisBackend("redis://cache.internal:6379/0")
@@ -0,0 +1,80 @@
+"""Warmed caches survive a restart through a snapshot file.
+
+Every deploy started each machine cold, so the statements, fund info, KAP list and
+sector memberships were all fetched again at once -- a spike of upstream traffic that
+the caches exist to prevent.
+"""
+import asyncio
+import time
+from unittest.mock import patch
+
+from providers.cache import CacheNamespace
+from providers.cache_backend import Codec
+from providers.cache_snapshot import CacheSnapshot
+
+
+def test_entries_come_back_with_their_original_expiry(tmp_path):
+    path = str(tmp_path / "snapshot.bin")
+    before = CacheNamespace("test.snapshot.statements", ttl=3600, persist=True)
+    before.set(("GARAN", "quarterly"), {"tablo": [1, 2, 3]})
+    stored = before.dump()[0][1]
+    assert CacheSnapshot(path).save([before]) == 1
+
+    after = CacheNamespace("test.snapshot.statements", ttl=3600, persist=True)
+    assert CacheSnapshot(path).load([after]) == 1
+    assert after.get(("GARAN", "quarterly")) == {"tablo": [1, 2, 3]}
+    assert after.dump()[0][1].expires_at == stored.expires_at
+
+
+def test_only_recently_expired_entries_are_restored_and_served_stale(tmp_path):
+    path = str(tmp_path / "snapshot.bin")
+    before = CacheNamespace("test.snapshot.funds", ttl=60, persist=True)
+    before.set("AAK", "yesterday's info")
+    before.set("TTE", "last month's info")
+    before._entries["AAK"].expires_at = time.time() - 3600
+    before._entries["TTE"].expires_at = time.time() - 30 * 24 * 3600
+    CacheSnapshot(path).save([before])
+
+    after = CacheNamespace("test.snapshot.funds", ttl=60, persist=True)
+    assert CacheSnapshot(path, max_age=24 * 3600).load([after]) == 1
+
+    async def refresh():
+        return "today's info"
+
+    async def run():
+        value, age = await after.get_or_revalidate("AAK", refresh, max_stale=24 * 3600)
+        await asyncio.sleep(0)
+        return value, age
+
+    value, age = asyncio.run(run())
+    assert value == "yesterday's info" and age is not None
+    assert "TTE" not in after._entries
+
+
+def test_a_namespace_built_after_boot_is_restored_when_it_is_created(tmp_path):
+    path = str(tmp_path / "snapshot.bin")
+    before = CacheNamespace("test.snapshot.lazy", ttl=3600, persist=True)
+    before.set("XBANK", ["GARAN", "AKBNK"])
+    CacheSnapshot(path).save([before])
+    del before
+
+    snapshot = CacheSnapshot(path)
+    with patch("providers.cache_snapshot.persistent_namespaces", return_value=[]):
+        assert snapshot.load() == 0
+    lazy = CacheNamespace("test.snapshot.lazy", ttl=3600, persist=True)
+    assert lazy.get("XBANK") == ["GARAN", "AKBNK"]
+    assert snapshot.status()["restored"] == {"test.snapshot.lazy": 1}
+
+
+def test_a_corrupt_or_foreign_snapshot_means_a_cold_start(tmp_path):
+    path = tmp_path / "snapshot.bin"
+    path.write_bytes(b"not a snapshot")
+    snapshot = CacheSnapshot(str(path))
+    assert snapshot.load([CacheNamespace("test.snapshot.corrupt", ttl=60, persist=True)]) == 0
+    assert "error" in snapshot.status()
+
+    signed = CacheNamespace("test.snapshot.signed", ttl=60, persist=True)
+    signed.set("k", "v")
+    CacheSnapshot(str(path), codec=Codec(b"one-secret")).save([signed])
+    other = CacheSnapshot(str(path), codec=Codec(b"another-secret"))
+    assert other.load([CacheNamespace("test.snapshot.signed", ttl=60, persist=True)]) == 0
@@ -0,0 +1,188 @@
+"""An upstream that keeps failing is cut off quickly, and probed until it recovers.
+
+When İş Yatırım or TEFAS went down, every request still waited out its full timeout
+-- 10s per financial group, 60s on the shared client -- holding a slot and a thread
+the healthy upstreams could have used.
+"""
+import asyncio
+import time
+
+import httpx
+import pytest
+
+from providers.circuit_breaker import (
+    CLOSED, HALF_OPEN, OPEN, CircuitBreaker, CircuitOpenError, circuit,
+)
+from providers.executors import run_blocking
+from providers.upstream_http import UpstreamTransport
+from unified_mcp_server import classify_tool_error
+
+
+def _fail(breaker, n, error=ConnectionError("connection refused")):
+    for _ in range(n):
+        with pytest.raises(type(error)):
+            with breaker.guard():
+                raise error
+
+
+def test_it_opens_on_the_failure_rate_and_then_fails_fast():
+    breaker = CircuitBreaker("test-open", failure_rate=0.5, min_calls=4, open_seconds=60)
+    with breaker.guard():
+        pass
+    _fail(breaker, 2)
+    assert breaker.state == CLOSED, "too few calls to judge yet"
+    _fail(breaker, 1)
+    assert breaker.state == OPEN
+
+    with pytest.raises(CircuitOpenError) as refused:
+        with breaker.guard():
+            raise AssertionError("an open circuit must not run the call")
+    assert breaker.stats()["rejected"] == 1
+
+    message = str(classify_tool_error(refused.value, "get_financial_statements"))
+    assert "paused" in message and "next attempt in" in message
+
+
+def test_a_miss_or_a_bad_argument_is_not_an_outage():
+    breaker = CircuitBreaker("test-miss", min_calls=2)
+    _fail(breaker, 5, error=ValueError("unknown period"))
+    assert breaker.state == CLOSED and breaker.failures == 0
+
+
+def test_half_open_lets_one_probe_through_and_closes_on_success():
+    breaker = CircuitBreaker("test-probe", min_calls=2, open_seconds=0.05)
+    _fail(breaker, 2)
+    assert breaker.state == OPEN
+    time.sleep(0.06)
+    assert breaker.stats()["state"] == HALF_OPEN
+
+    probe = breaker.allow()
+    assert probe is True
+    with pytest.raises(CircuitOpenError):
+        breaker.allow()    # only one probe at a time
+    breaker.record(probe, failed=False)
+    assert breaker.state == CLOSED
+
+
+def test_a_failed_probe_reopens_for_longer():
+    breaker = CircuitBreaker("test-reopen", min_calls=2, open_seconds=0.05)
+    _fail(breaker, 2)
+    time.sleep(0.06)
+    _fail(breaker, 1)
+    assert breaker.state == OPEN
+    assert breaker.stats()["retry_in_s"] > 0.05
+
+
+def test_a_cancelled_probe_frees_the_probe_slot():
+    breaker = CircuitBreaker("test-cancel", min_calls=2, open_seconds=0.01)
+    _fail(breaker, 2)
+    time.sleep(0.02)
+    with pytest.raises(asyncio.CancelledError):
+        with breaker.guard():
+            raise asyncio.CancelledError()
+    assert breaker.allow() is True
+
+
+def test_http_5xx_answers_open_the_hosts_circuit_only():
+    def handler(request):
+        return httpx.Response(503)
+
+    async def run():
+        transport = UpstreamTransport(httpx.MockTransport(handler))
+        async with httpx.AsyncClient(transport=transport) as client:
+            for _ in range(10):
+                await client.get("https://www.isyatirim.com.tr/MaliTablo")
+            with pytest.raises(CircuitOpenError):
+                await client.get("https://www.isyatirim.com.tr/x")
+
+    asyncio.run(run())
+    assert circuit("isyatirim").state == OPEN
+    assert circuit("kap").state == CLOSED
+
+
+def test_blocking_calls_go_through_the_breaker():
+    def down():
+        raise ConnectionError("connection reset by peer")
+
+    async def run():
+        for _ in range(10):
+            with pytest.raises(ConnectionError):
+                await run_blocking("test-blocking-breaker", down)
+        started = time.monotonic()
+        with pytest.raises(CircuitOpenError):
+            await run_blocking("test-blocking-breaker", time.sleep, 5)
+        return time.monotonic() - started
+
+    assert asyncio.run(run()) < 0.1
+    assert circuit("test-blocking-breaker").stats()["state"] == OPEN
+
+
+def test_a_retried_call_is_one_outcome_not_one_per_attempt():
+    """borsapy's websocket drops about half its attempts on a normal day. Each attempt
+    counted as a failure, so its breaker opened after some ten history calls and
+    refused every borsapy call for the next 30s."""
+    import random
+
+    from borsapy.exceptions import APIError
+
+    from providers.retry import RetryBudget, RetryPolicy, call_with_retry, set_retry_budget
+
+    breaker = circuit("test-drops")
+    rng = random.Random(4)
+
+    def history():
+        if rng.random() < 0.5:
+            raise APIError("No data received for BIST:GARAN")
+        return "bars"
+
+    async def run():
+        outcomes = []
+        for _ in range(60):
+            try:
+                outcomes.append(await call_with_retry(
+                    "test-drops", lambda: run_blocking("test-drops", history),
+                    policy=RetryPolicy(attempts=3, base_delay=0.001, max_delay=0.002),
+                ))
+            except APIError:
+                outcomes.append("dropped")
+        return outcomes
+
+    set_retry_budget("test-drops", RetryBudget(ratio=1.2))    # borsapy's
+    try:
+        outcomes = asyncio.run(run())
+    finally:
+        set_retry_budget("test-drops", None)
+    assert breaker.state == CLOSED and breaker.rejected == 0
+    # One outcome per call: the calls that recovered, and those that ran out of attempts.
+    assert breaker.successes + breaker.failures == 60
+    assert breaker.failures == outcomes.count("dropped")
+
+
+def test_borsapy_opens_only_well_above_its_drop_rate(monkeypatch):
+    assert CircuitBreaker.from_env("borsapy").failure_rate == 0.75
+    assert CircuitBreaker.from_env("yahoo").failure_rate == 0.5
+    monkeypatch.setenv("CIRCUIT_FAILURE_RATE", "0.4,borsapy=0.9")
+    assert CircuitBreaker.from_env("borsapy").failure_rate == 0.9
+    assert CircuitBreaker.from_env("tefas").failure_rate == 0.4
+
+
+def test_a_refused_statement_fetch_is_not_reported_as_no_data(monkeypatch):
+    """The group loop's catch-all turned an open circuit into "No financial data
+    available", telling the caller the company had no statements."""
+    import providers.isyatirim_provider as isyatirim
+    from providers.deadline import DeadlineExceededError
+
+    for error in (CircuitOpenError("Upstream 'isyatirim' is unavailable"),
+                  DeadlineExceededError("Deadline exceeded while waiting for call")):
+        calls = []
+
+        class Client:
+            async def get(self, *args, **kwargs):
+                calls.append(args)
+                raise error
+
+        monkeypatch.setattr(isyatirim, "shared_http_client", Client)
+        result = asyncio.run(isyatirim.IsYatirimProvider().get_bilanco("GARAN", "annual"))
+
+        assert result["error"] == str(error)
+        assert len(calls) == 1, "no point asking the next financial group"
@@ -0,0 +1,169 @@
+"""Hot upstream connections are opened before the first call and kept from going cold.
+
+The first request after a boot, and after every quiet spell, paid for a DNS lookup,
+a TCP connect and a TLS handshake; a lookup that failed failed the request, even
+though the upstream's address had not changed.
+"""
+import asyncio
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import httpcore
+import pytest
+
+from providers import upstream_http
+from providers.connection_warmer import ConnectionWarmer
+from providers.dns_cache import CachingResolverBackend, DnsCache
+from providers.http_client import LoopBoundHttpClient
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"    # keep-alive
+
+    def do_HEAD(self):
+        self.send_response(200)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def log_message(self, *args):
+        pass
+
+
+def _serve():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+class _Resolver:
+    def __init__(self, answers):
+        self.answers = answers
+        self.calls = 0
+
+    async def __call__(self, host, port):
+        self.calls += 1
+        answer = self.answers.pop(0)
+        if isinstance(answer, Exception):
+            raise answer
+        return answer
+
+
+def test_lookups_are_cached_for_the_ttl():
+    resolver = _Resolver([["10.0.0.1"], ["10.0.0.2"]])
+    cache = DnsCache(ttl=0.05, resolve=resolver)
+
+    async def run():
+        first = await cache.addresses("api.btcturk.com", 443)
+        second = await cache.addresses("api.btcturk.com", 443)
+        await asyncio.sleep(0.06)
+        third = await cache.addresses("api.btcturk.com", 443)
+        return first, second, third
+
+    assert asyncio.run(run()) == (["10.0.0.1"], ["10.0.0.1"], ["10.0.0.2"])
+    assert resolver.calls == 2
+    assert cache.stats()["hits"] == 1 and cache.stats()["misses"] == 2
+
+
+def test_a_failed_lookup_serves_the_expired_answer():
+    resolver = _Resolver([["10.0.0.1"], OSError("resolver down"), OSError("resolver down")])
+    cache = DnsCache(ttl=0.0, resolve=resolver)
+
+    async def run():
+        await cache.addresses("www.kap.org.tr", 443)
+        stale = await cache.addresses("www.kap.org.tr", 443)
+        with pytest.raises(httpcore.ConnectError):
+            await cache.addresses("finans.mynet.com", 443)
+        return stale
+
+    assert asyncio.run(run()) == ["10.0.0.1"]
+    assert cache.stats()["stale_served"] == 1
+    assert cache.stats()["failures"] == 2
+
+
+def test_the_backend_tries_each_address_and_forgets_them_when_none_answer():
+    class Backend(httpcore.AsyncNetworkBackend):
+        def __init__(self, up):
+            self.up = up
+            self.tried = []
+
+        async def connect_tcp(self, host, port, timeout=None, local_address=None, socket_options=None):
+            self.tried.append(host)
+            if host not in self.up:
+                raise httpcore.ConnectError(f"{host} refused")
+            return host
+
+    cache = DnsCache(ttl=60, resolve=_Resolver([["10.0.0.1", "10.0.0.2"], ["10.0.0.3"]]))
+
+    async def run():
+        working = Backend(up={"10.0.0.2"})
+        assert await CachingResolverBackend(working, cache).connect_tcp("api.coinbase.com", 443) == "10.0.0.2"
+        assert working.tried == ["10.0.0.1", "10.0.0.2"]
+
+        down = Backend(up=set())
+        with pytest.raises(httpcore.ConnectError):
+            await CachingResolverBackend(down, cache).connect_tcp("api.coinbase.com", 443)
+        # Looked up again on the next attempt.
+        assert await cache.addresses("api.coinbase.com", 443) == ["10.0.0.3"]
+
+        # An address is connected to directly.
+        literal = Backend(up={"127.0.0.1"})
+        await CachingResolverBackend(literal, cache).connect_tcp("127.0.0.1", 80)
+        assert literal.tried == ["127.0.0.1"]
+
+    asyncio.run(run())
+    assert cache.stats()["invalidated"] == 1
+
+
+
+def test_a_lookup_with_no_addresses_is_a_connect_error():
+    cache = DnsCache(ttl=60, resolve=_Resolver([[]]))
+
+    async def run():
+        backend = CachingResolverBackend(httpcore.AsyncNetworkBackend(), cache)
+        with pytest.raises(httpcore.ConnectError, match="no addresses for api.btcturk.com"):
+            await backend.connect_tcp("api.btcturk.com", 443)
+
+    asyncio.run(run())
+
+def test_warm_opens_a_pooled_connection_and_refresh_skips_busy_upstreams():
+    server = _serve()
+    upstream_http._counters.pop("other", None)
+    client = LoopBoundHttpClient(timeout=5.0, verify=True)
+    url = f"http://127.0.0.1:{server.server_address[1]}/"
+    warmer = ConnectionWarmer({url: True}, interval=0, client_for=lambda verify: client)
+
+    async def run():
+        try:
+            await warmer.warm()
+            opened = upstream_http.connection_stats()["other"]
+            # Idle since: pinged again.
+            await warmer.refresh()
+            # Other traffic since: left alone.
+            await client.request("HEAD", url)
+            await warmer.refresh()
+            return opened, upstream_http.connection_stats()["other"]
+        finally:
+            await client.aclose()
+
+    try:
+        opened, after = asyncio.run(run())
+    finally:
+        server.shutdown()
+    assert opened["connections_opened"] == 1 and opened["idle"] == 1
+    assert after["requests"] == 3 and after["connections_opened"] == 1
+    host = warmer.status()["hosts"][url]
+    assert host["warmed"] == 2 and host["skipped"] == 1 and host["failed"] == 0
+
+
+def test_a_failed_ping_is_counted_and_swallowed():
+    class Refusing:
+        async def request(self, method, url, timeout=None):
+            raise httpcore.ConnectError("refused")
+
+    warmer = ConnectionWarmer({"https://api.btcturk.com/": False}, client_for=lambda verify: Refusing())
+    started = time.monotonic()
+    asyncio.run(warmer.warm())
+    assert time.monotonic() - started < 1
+    host = warmer.status()["hosts"]["https://api.btcturk.com/"]
+    assert host["failed"] == 1 and host["last_error"] == "refused"
@@ -0,0 +1,145 @@
+"""A tool call's deadline reaches every upstream call it makes.
+
+get_financial_ratios(ratio_set="comprehensive") chained dozens of upstream calls,
+each with its own 10-60s timeout; the client had long given up while the server
+went on fetching. Now the remaining time bounds each call, and what runs out of time
+becomes a warning in a partial answer.
+"""
+import asyncio
+import time
+
+import httpx
+import pytest
+from fastmcp import Client, FastMCP
+from fastmcp.exceptions import ToolError
+
+from providers.circuit_breaker import circuit
+from providers.deadline import (
+    DeadlineExceededError, DeadlineMiddleware, deadline_scope, remaining,
+)
+from providers.executors import run_blocking
+from providers.market_router import MarketType, market_router
+from providers.retry import RetryPolicy, call_with_retry
+from providers.upstream_http import UpstreamTransport
+
+
+def test_http_timeouts_shrink_to_the_time_left():
+    seen = {}
+
+    def handler(request):
+        seen.update(request.extensions["timeout"])
+        return httpx.Response(200)
+
+    async def run():
+        transport = UpstreamTransport(httpx.MockTransport(handler))
+        async with httpx.AsyncClient(transport=transport, timeout=60.0) as client:
+            with deadline_scope(2.0):
+                await client.get("https://www.kap.org.tr/tr/api/company")
+
+    asyncio.run(run())
+    assert 0 < seen["read"] <= 2.0 and seen["connect"] <= 2.0
+
+
+def test_a_blocking_call_is_abandoned_at_the_deadline_without_blaming_the_upstream():
+    async def run():
+        started = time.monotonic()
+        with deadline_scope(0.05):
+            with pytest.raises(DeadlineExceededError):
+                await run_blocking("test-deadline-slow", time.sleep, 0.5)
+        return time.monotonic() - started
+
+    assert asyncio.run(run()) < 0.3
+    stats = circuit("test-deadline-slow").stats()
+    assert stats["failures"] == 0 and stats["state"] == "closed"
+
+
+
+def test_an_abandoned_call_keeps_its_bulkhead_slot_until_its_thread_is_done():
+    """wait_for cancelled the awaiting coroutine and `async with bulkhead` released the
+    slot while the pool thread was still running: a few deadline hits and the bulkhead
+    no longer bounded the threads at work."""
+    from providers.bulkhead import bulkhead
+
+    limiter = bulkhead("test-deadline-slot")
+
+    async def run():
+        with deadline_scope(0.05):
+            with pytest.raises(DeadlineExceededError):
+                await run_blocking("test-deadline-slot", time.sleep, 0.3)
+        held = limiter.active
+        await asyncio.sleep(0.4)
+        return held, limiter.active
+
+    assert asyncio.run(run()) == (1, 0)
+
+def test_a_fan_out_returns_what_finished_with_warnings_for_the_rest():
+    async def fetch_one(symbol):
+        delay = 0.5 if symbol == "SLOW" else 0.0
+        await run_blocking("test-deadline-fanout", time.sleep, delay)
+        return {"symbol": symbol}
+
+    async def run():
+        with deadline_scope(0.1):
+            return await market_router._fan_out_multi(
+                ["GARAN", "SLOW", "THYAO"], MarketType.BIST, "test", fetch_one
+            )
+
+    result = asyncio.run(run())
+    assert [row["symbol"] for row in result["data"]] == ["GARAN", "THYAO"]
+    assert any("SLOW" in w and "Deadline exceeded" in w for w in result["warnings"])
+
+
+def test_retries_do_not_back_off_past_the_deadline():
+    calls = []
+
+    async def flaky():
+        calls.append(1)
+        raise ConnectionError("connection reset by peer")
+
+    async def run():
+        with deadline_scope(0.05):
+            with pytest.raises(ConnectionError):
+                await call_with_retry(
+                    "test-deadline-retry", flaky,
+                    policy=RetryPolicy(attempts=3, base_delay=1.0, jitter=0.0),
+                )
+
+    started = time.monotonic()
+    asyncio.run(run())
+    assert time.monotonic() - started < 0.5
+    assert calls == [1]
+
+
+def test_nested_scopes_keep_the_earlier_deadline():
+    with deadline_scope(1.0):
+        with deadline_scope(30.0):
+            assert remaining() <= 1.0
+    assert remaining() is None
+
+
+def test_the_middleware_puts_each_tool_under_its_deadline():
+    mcp = FastMCP("test")
+    middleware = DeadlineMiddleware(deadlines={"stuck": 0.1}, default=5.0, grace=0.1)
+    mcp.add_middleware(middleware)
+
+    @mcp.tool
+    async def stuck() -> str:
+        await asyncio.sleep(10)
+        return "never"
+
+    @mcp.tool
+    async def budget() -> float:
+        return remaining()
+
+    async def run():
+        async with Client(mcp) as client:
+            left = (await client.call_tool("budget", {})).data
+            started = time.monotonic()
+            with pytest.raises(ToolError, match="deadline"):
+                await client.call_tool("stuck", {})
+            return left, time.monotonic() - started
+
+    left, elapsed = asyncio.run(run())
+    assert 4.0 < left <= 5.0
+    assert elapsed < 1.0
+    assert middleware.stats()["abandoned"] == 1
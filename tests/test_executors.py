@@ -0,0 +1,116 @@
+"""Blocking library calls run in per-upstream pools, never on the event loop.
+
+BorsapyProvider.get_hizli_bilgi and the yfinance statement methods read network-backed
+properties inline inside `async def`, so one slow Yahoo call froze every other MCP
+session on the process.
+"""
+import asyncio
+import contextvars
+import threading
+import time
+from types import SimpleNamespace
+from unittest.mock import MagicMock, PropertyMock, patch
+
+from providers.borsapy_provider import BorsapyProvider
+from providers.executors import UpstreamExecutor, _configured_workers, run_blocking
+
+
+def test_a_slow_blocking_call_does_not_stall_the_loop():
+    ticks = []
+
+    async def heartbeat():
+        for _ in range(5):
+            ticks.append(time.monotonic())
+            await asyncio.sleep(0.01)
+
+    async def run():
+        await asyncio.gather(run_blocking("test-slow", time.sleep, 0.2), heartbeat())
+
+    asyncio.run(run())
+    assert len(ticks) == 5
+    assert ticks[-1] - ticks[0] < 0.15, "the heartbeat waited for the blocking call"
+
+
+def test_a_full_pool_queues_its_own_calls_only():
+    slow = UpstreamExecutor("test-saturated", max_workers=1)
+    other = UpstreamExecutor("test-other", max_workers=1)
+
+    async def run():
+        queued = [asyncio.ensure_future(slow.run(time.sleep, 0.1)) for _ in range(3)]
+        await asyncio.sleep(0.02)
+        started = time.monotonic()
+        await other.run(lambda: None)
+        elapsed = time.monotonic() - started
+        await asyncio.gather(*queued)
+        return elapsed
+
+    assert asyncio.run(run()) < 0.05
+    stats = slow.stats()
+    assert stats["max_queued"] >= 2 and stats["completed"] == 3
+    assert stats["max_wait_ms"] >= 150
+
+
+def test_provider_properties_are_read_in_the_borsapy_pool():
+    threads = []
+
+    def fast_info():
+        threads.append(threading.current_thread().name)
+        return SimpleNamespace(last_price=100.0)
+
+    ticker = MagicMock()
+    type(ticker).fast_info = PropertyMock(side_effect=fast_info)
+    ticker.info = {"longName": "Garanti BBVA"}
+
+    provider = BorsapyProvider()
+    with patch.object(provider, "_get_ticker", return_value=ticker):
+        result = asyncio.run(provider.get_hizli_bilgi("GARAN"))
+
+    assert result["hizli_bilgi"].long_name == "Garanti BBVA"
+    assert threads and threads[0].startswith("upstream-borsapy")
+
+
+def test_context_variables_follow_the_call_into_the_pool():
+    request_id = contextvars.ContextVar("request_id", default=None)
+
+    async def run():
+        request_id.set("req-42")
+        return await run_blocking("test-context", request_id.get)
+
+    assert asyncio.run(run()) == "req-42"
+
+
+def test_pool_sizes_are_configurable(monkeypatch):
+    monkeypatch.setenv("UPSTREAM_WORKERS", "yahoo=2, tefas=nonsense,kap=3")
+    workers = _configured_workers()
+    assert workers["yahoo"] == 2 and workers["kap"] == 3
+    assert workers["tefas"] == 6
+
+
+def test_formatting_a_downloaded_history_is_not_a_borsapy_call(monkeypatch):
+    """The payload was built in the borsapy pool, behind its breaker: it counted as a
+    borsapy success, and with the circuit open a frame already in hand was refused."""
+    import numpy as np
+    import pandas as pd
+
+    from providers.circuit_breaker import CircuitBreaker, _circuits
+
+    breaker = CircuitBreaker("borsapy")
+    breaker._trip(60)
+    monkeypatch.setitem(_circuits, "borsapy", breaker)
+
+    index = pd.bdate_range("2026-06-01", periods=20, tz="Europe/Istanbul")
+    close = np.linspace(10, 12, 20)
+    df = pd.DataFrame(
+        {"Open": close, "High": close + 1, "Low": close - 1, "Close": close, "Volume": 1000},
+        index=index,
+    )
+    provider = BorsapyProvider()
+
+    async def history(ticker, ticker_kodu, **kwargs):
+        return df
+
+    monkeypatch.setattr(provider, "_history_with_retry", history)
+    result = asyncio.run(provider.get_finansal_veri("GARAN", period="1mo"))
+
+    assert "error" not in result and result["toplam_veri"] == 20
+    assert breaker.rejected == 0 and breaker.successes == 0
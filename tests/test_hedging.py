@@ -0,0 +1,116 @@
+"""A BIST history attempt that stalls is raced by a second one.
+
+A dropped TradingView websocket does not fail fast: it waits for data that never
+comes, and only then did the retry start. Those stalls were most of the p99 of
+get_historical_data for BIST.
+"""
+import asyncio
+import time
+from unittest.mock import MagicMock, patch
+
+import pandas as pd
+
+from providers.borsapy_provider import BorsapyProvider
+from providers.hedging import INITIAL_DELAY, MIN_SAMPLES, Hedger
+from providers.retry import RetryBudget
+
+
+def _attempts(delays, results=None):
+    """An attempt factory whose n-th call sleeps delays[n] and returns n."""
+    started = []
+
+    async def attempt():
+        n = len(started)
+        started.append(time.monotonic())
+        await asyncio.sleep(delays[n])
+        outcome = (results or {}).get(n, n)
+        if isinstance(outcome, Exception):
+            raise outcome
+        return outcome
+
+    return attempt, started
+
+
+def _trained(delay=0.01, **kwargs):
+    h = Hedger("test", **kwargs)
+    h._latencies.extend([delay] * MIN_SAMPLES)
+    return h
+
+
+def test_a_stalled_attempt_is_raced_and_the_faster_one_wins():
+    h = _trained()
+    attempt, started = _attempts([1.0, 0.01])
+
+    t0 = time.monotonic()
+    assert asyncio.run(h.call(attempt)) == 1
+    assert time.monotonic() - t0 < 0.3
+    assert len(started) == 2 and h.hedged == 1 and h.hedge_wins == 1
+
+
+def test_a_prompt_answer_is_not_hedged():
+    h = _trained(delay=0.2)
+    attempt, started = _attempts([0.01, 0.01])
+    assert asyncio.run(h.call(attempt)) == 0
+    assert len(started) == 1 and h.hedged == 0
+
+
+def test_the_delay_follows_recent_latency():
+    h = Hedger("test-adaptive")
+    assert h.delay() == INITIAL_DELAY
+    h._latencies.extend([0.2] * 90 + [3.0] * 10)
+    assert 0.2 <= h.delay() <= 3.0
+    assert h.stats()["p99_ms"] == 3000.0
+
+
+def test_a_failure_waits_for_the_other_attempt():
+    h = _trained()
+    # Hedged at MIN_DELAY (0.1s); the first fails at 0.2s, the hedge answers at 0.3s.
+    attempt, _ = _attempts([0.2, 0.2], results={0: RuntimeError("No data received")})
+    assert asyncio.run(h.call(attempt)) == 1
+
+
+def test_the_budget_caps_extra_load():
+    h = _trained(budget=RetryBudget(ratio=0.1, reserve_per_second=0.1, window=10))
+
+    async def run():
+        for _ in range(20):
+            attempt, _ = _attempts([0.15, 0.01])
+            await h.call(attempt)
+
+    asyncio.run(run())
+    # 0.1 x 20 calls, plus one from the reserve. (The slow first attempts that were
+    # not hedged also raise the delay, so later calls stop asking.)
+    assert h.hedged <= 3 and h.budget_denied >= 1
+
+
+def test_history_is_hedged_when_enabled(monkeypatch):
+    monkeypatch.setenv("HEDGED_UPSTREAMS", "borsapy")
+    monkeypatch.setattr("providers.hedging._hedgers", {})
+    frame = pd.DataFrame(
+        {"Open": [1.0], "High": [1.0], "Low": [1.0], "Close": [1.0], "Volume": [1]},
+        index=pd.to_datetime(["2026-07-10"]),
+    )
+    calls = []
+
+    def history(**kwargs):
+        calls.append(1)
+        if len(calls) == 1:
+            time.sleep(0.5)    # the stalled websocket
+        return frame
+
+    from providers.hedging import hedger
+    h = hedger("borsapy")
+    h._latencies.extend([0.01] * MIN_SAMPLES)
+    h.budget = RetryBudget(ratio=1.0)
+
+    ticker = MagicMock()
+    ticker.history = history
+    provider = BorsapyProvider()
+    with patch.object(provider, "_get_ticker", return_value=ticker):
+        t0 = time.monotonic()
+        result = asyncio.run(provider.get_finansal_veri("GARAN", period="1mo"))
+        elapsed = time.monotonic() - t0
+
+    assert "error" not in result
+    assert len(calls) == 2 and elapsed < 0.4
+    assert h.stats()["hedge_wins"] == 1
@@ -0,0 +1,114 @@
+"""Providers share pooled connections instead of opening one per request.
+
+İş Yatırım opened a new httpx.AsyncClient for every financial group it tried, so
+each statement request paid for a TCP connect and a TLS handshake; TEFAS's
+Takasbank list used a synchronous requests.Session on the event loop; FRED and the
+others built clients of their own. None of it was bounded per host or visible.
+"""
+import asyncio
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import httpx
+
+from providers import upstream_http
+from providers.http_client import LoopBoundHttpClient, shared_http_client
+from providers.upstream_http import UpstreamTransport, connection_stats, pool_limits
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"    # keep-alive
+
+    def do_GET(self):
+        body = b"ok"
+        self.send_response(200)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def _serve():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def test_sequential_requests_reuse_one_connection():
+    server = _serve()
+    upstream_http._counters.pop("other", None)
+    client = LoopBoundHttpClient(timeout=5.0, verify=True)
+    url = f"http://127.0.0.1:{server.server_address[1]}/"
+
+    async def run():
+        try:
+            for _ in range(5):
+                response = await client.get(url)
+                assert response.text == "ok"
+            return connection_stats()["other"]
+        finally:
+            await client.aclose()
+
+    try:
+        stats = asyncio.run(run())
+    finally:
+        server.shutdown()
+    assert stats["requests"] == 5
+    assert stats["connections_opened"] == 1
+    assert stats["reuse_ratio"] == 0.8
+    assert stats["open"] == 1 and stats["idle"] == 1
+
+
+def test_each_upstream_gets_its_own_pool_sized_from_its_bulkhead(monkeypatch):
+    monkeypatch.setenv("HTTP_POOLS", "fred=3/1")
+    transport = UpstreamTransport()
+    kap, tefas = transport._transport_for("kap"), transport._transport_for("tefas")
+    assert kap is not tefas
+    assert transport._transport_for("kap") is kap
+
+    limits = pool_limits("kap")    # kap's bulkhead admits 4 at once
+    assert (limits.max_connections, limits.max_keepalive_connections) == (8, 4)
+    assert limits.keepalive_expiry == upstream_http.DEFAULT_KEEPALIVE_EXPIRY
+    fred = pool_limits("fred")
+    assert (fred.max_connections, fred.max_keepalive_connections) == (3, 1)
+
+
+def test_http2_needs_the_h2_package(monkeypatch):
+    monkeypatch.setenv("HTTP2_UPSTREAMS", "isyatirim")
+    try:
+        import h2  # noqa: F401
+        installed = True
+    except ImportError:
+        installed = False
+    assert upstream_http.http2_enabled("isyatirim") is installed
+    assert upstream_http.http2_enabled("kap") is False
+
+
+def test_providers_share_the_process_client():
+    from providers.fred_cpi_provider import FredCpiProvider
+    from providers.tefas_provider import TefasProvider
+
+    assert shared_http_client() is shared_http_client()
+    assert FredCpiProvider()._client is shared_http_client()
+    assert TefasProvider()._http_client is shared_http_client(verify=False)
+    assert shared_http_client(verify=False) is not shared_http_client()
+
+
+def test_a_mock_transport_still_sees_every_request():
+    seen = []
+
+    def handler(request):
+        seen.append(request.url.host)
+        return httpx.Response(200, text="ok")
+
+    async def run():
+        async with httpx.AsyncClient(
+            transport=UpstreamTransport(httpx.MockTransport(handler))
+        ) as client:
+            await client.get("https://www.isyatirim.com.tr/x")
+            await client.get("https://api.btcturk.com/y")
+
+    asyncio.run(run())
+    assert seen == ["www.isyatirim.com.tr", "api.btcturk.com"]
@@ -0,0 +1,167 @@
+"""A whole index's technical analysis in one call.
+
+get_technical_analysis took ten symbols at most and answered each with its full
+indicator set, so "which XU100 names are oversold and above their SMA200" took a dozen
+calls. constituents=True reads every member's bars, computes the indicators in one
+pass over the members' matrix, and answers one ranked row per member.
+"""
+import asyncio
+import datetime
+from unittest.mock import AsyncMock, MagicMock
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from providers import indicators
+from providers.market_router import MarketRouter
+
+
+def _frame(closes):
+    index = pd.date_range("2025-01-01", periods=len(closes), freq="B")
+    closes = np.asarray(closes, dtype=float)
+    return pd.DataFrame(
+        {"Open": closes, "High": closes + 0.5, "Low": closes - 0.5, "Close": closes,
+         "Volume": np.full(len(closes), 1e6)},
+        index=index,
+    )
+
+
+def _trend(n, start, step, tail=()):
+    return list(start + step * np.arange(n)) + list(tail)
+
+
+def _router(frames, failed=None, members=None):
+    router = MarketRouter()
+    client = MagicMock()
+    client.get_bist_daily_bars = AsyncMock(return_value={"bars": frames, "failed": failed or {}})
+    router._client = client
+    router._index_components = AsyncMock(return_value=members or [*frames, *(failed or {})])
+    return router
+
+
+# A long uptrend that has just sold off hard: oversold, still above its SMA200.
+DIP = _trend(260, 50, 0.4) + list(153 - 1.5 * np.arange(1, 11))
+# A long downtrend that keeps falling: oversold and below its SMA200.
+FALLING = _trend(270, 200, -0.5)
+# Steady climb: overbought.
+RISING = _trend(270, 20, 0.3)
+# Listed four months ago, drifting sideways: no SMA200.
+NEW = list(np.asarray(_trend(80, 10, 0.05)) + 0.2 * (-1) ** np.arange(80))
+
+
+def test_members_are_ranked_and_screened_in_one_call():
+    frames = {"DIP": _frame(DIP), "FALL": _frame(FALLING), "RISE": _frame(RISING), "NEW": _frame(NEW)}
+    router = _router(frames)
+
+    table = asyncio.run(router.get_index_technical_analysis("xu100"))
+    assert table["index"] == "XU100"
+    assert table["member_count"] == table["analyzed_count"] == 4
+    rsi = [row["rsi_14"] for row in table["rows"]]
+    assert rsi == sorted(rsi)
+    assert table["rows"][-1]["symbol"] == "RISE"
+    assert table["rows"][-1]["rsi_signal"] == "overbought"
+
+    screened = asyncio.run(router.get_index_technical_analysis(
+        "XU100", screens=["oversold", "above_sma200"]
+    ))
+    assert [row["symbol"] for row in screened["rows"]] == ["DIP"]
+    assert screened["match_count"] == 1
+    # NEW has no SMA200: the screen drops it, and says why.
+    assert any("fewer than 200" in w for w in screened["warnings"])
+    router._client.get_bist_daily_bars.assert_awaited_with(["DIP", "FALL", "RISE", "NEW"])
+
+
+def test_rows_carry_the_engine_values():
+    frames = {"DIP": _frame(DIP), "NEW": _frame(NEW)}
+    table = asyncio.run(_router(frames).get_index_technical_analysis("XU030", rank_by="vs_sma50_pct"))
+    rows = {row["symbol"]: row for row in table["rows"]}
+
+    alone = indicators.compute(frames["DIP"]["Close"], frames["DIP"]["High"],
+                               frames["DIP"]["Low"], frames["DIP"]["Volume"])
+    assert rows["DIP"]["rsi_14"] == pytest.approx(alone.rsi_14)
+    assert rows["DIP"]["macd_histogram"] == pytest.approx(alone.macd_histogram)
+    assert rows["DIP"]["vs_sma200_pct"] == pytest.approx((alone.close / alone.sma[200] - 1) * 100)
+    assert rows["NEW"]["vs_sma200_pct"] is None
+    # Ranked highest first, the member without a value last.
+    assert [row["symbol"] for row in table["rows"]] == ["NEW", "DIP"]
+
+
+def test_a_member_without_bars_is_reported_not_fatal():
+    router = _router({"RISE": _frame(RISING)}, failed={"HALT": "no bars"})
+    table = asyncio.run(router.get_index_technical_analysis("XBANK"))
+    assert [row["symbol"] for row in table["rows"]] == ["RISE"]
+    assert table["member_count"] == 2 and table["analyzed_count"] == 1
+    assert any("HALT" in w for w in table["warnings"])
+
+
+def test_unknown_screens_and_empty_indices_are_errors():
+    router = _router({"RISE": _frame(RISING)})
+    with pytest.raises(ValueError, match="Unknown screen"):
+        asyncio.run(router.get_index_technical_analysis("XU030", screens=["cheap"]))
+    router._index_components = AsyncMock(return_value=[])
+    with pytest.raises(ValueError, match="No members"):
+        asyncio.run(router.get_index_technical_analysis("XNOPE"))
+
+
+def test_member_bars_are_read_through_the_bar_store(monkeypatch):
+    from providers.borsapy_provider import BorsapyProvider
+
+    provider = BorsapyProvider()
+    calls = []
+
+    async def history(ticker, ticker_kodu, **kwargs):
+        calls.append((ticker_kodu, kwargs["start"]))
+        if ticker_kodu == "HALT":
+            raise RuntimeError("No data received for BIST:HALT")
+        end = datetime.date.fromisoformat(kwargs["end"])
+        index = pd.date_range(end=end, periods=250, freq="B", tz="Europe/Istanbul")
+        return _frame(np.linspace(10, 20, 250)).set_index(index)
+
+    monkeypatch.setattr(provider, "_history_with_retry", history)
+    fetched = asyncio.run(provider.fetch_daily_bars(["GARAN", "HALT"]))
+    assert list(fetched["bars"]) == ["GARAN"] and "HALT" in fetched["failed"]
+    assert len(fetched["bars"]["GARAN"]) > 200
+
+    # Closed days are not fetched again.
+    calls.clear()
+    asyncio.run(provider.fetch_daily_bars(["GARAN"]))
+    assert all(start > (datetime.date.today() - datetime.timedelta(days=10)).isoformat()
+               for _, start in calls)
+
+
+def test_the_indicator_pass_is_not_a_borsapy_call(monkeypatch):
+    """It ran in the borsapy pool behind its breaker: a half-open circuit closed on it
+    without TradingView being called at all."""
+    from providers.circuit_breaker import HALF_OPEN, CircuitBreaker, _circuits
+
+    breaker = CircuitBreaker("borsapy")
+    breaker._trip(0)
+    monkeypatch.setitem(_circuits, "borsapy", breaker)
+
+    table = asyncio.run(_router({"DIP": _frame(DIP)}).get_index_technical_analysis("XU030"))
+
+    assert table["analyzed_count"] == 1
+    assert breaker.stats()["state"] == HALF_OPEN and breaker.successes == 0
+
+
+def test_member_bars_end_on_the_istanbul_day(monkeypatch):
+    """date.today() followed the host's zone -- UTC in production -- so from 21:00 to
+    midnight UTC the scan asked for the Istanbul day before."""
+    from unittest.mock import patch
+
+    from providers.borsapy_provider import BorsapyProvider
+
+    provider = BorsapyProvider()
+    ends = []
+
+    async def ahistory(key, start, end, fetch, market):
+        ends.append(end)
+        return _frame(np.linspace(10, 20, 30))
+
+    monkeypatch.setattr(provider._bars, "ahistory", ahistory)
+    late_utc = datetime.datetime(2026, 7, 8, 22, 30, tzinfo=datetime.timezone.utc)
+    with patch("providers.ttl_policy._now", return_value=late_utc):
+        asyncio.run(provider.fetch_daily_bars(["GARAN"]))
+
+    assert ends == [datetime.date(2026, 7, 9)]
@@ -0,0 +1,160 @@
+"""Indicators carry on from the last bar seen instead of starting over.
+
+Every technical-analysis call recomputed every EMA, the RSI and the rolling windows
+from the first bar of six months of history, although only the last bar or two had
+changed since the previous call on the same name.
+"""
+import pickle
+
+import numpy as np
+import pytest
+
+from providers import indicators
+from providers.indicator_state import IndicatorStore, indicator_state_stats
+
+_FIELDS = (
+    "close", "ema_12", "ema_26", "rsi_14", "macd", "macd_signal", "macd_histogram",
+    "previous_macd", "previous_macd_signal", "bollinger_upper", "bollinger_lower",
+    "stochastic_k", "stochastic_d",
+)
+
+
+def _bars(n=400, seed=3):
+    rng = np.random.default_rng(seed)
+    close = 100 + np.cumsum(rng.normal(0, 1, n))
+    return {
+        "stamps": np.arange(n, dtype=np.int64) * 86_400,
+        "close": close,
+        "high": close + rng.uniform(0.1, 1, n),
+        "low": close - rng.uniform(0.1, 1, n),
+        "volume": rng.uniform(1e5, 1e6, n),
+    }
+
+
+def _until(bars, end, start=0):
+    return {name: values[start:end] for name, values in bars.items()}
+
+
+def _assert_same(got, expected):
+    assert got.bars == expected.bars
+    for name in _FIELDS:
+        a, b = getattr(got, name), getattr(expected, name)
+        assert (a is None) == (b is None), name
+        if b is not None:
+            assert a == pytest.approx(b, rel=1e-9, abs=1e-9), name
+    assert got.sma.keys() == expected.sma.keys()
+    for window, value in expected.sma.items():
+        assert got.sma[window] == pytest.approx(value) if value is not None else got.sma[window] is None
+
+
+def _compute(bars):
+    return indicators.compute(bars["close"], bars["high"], bars["low"], bars["volume"])
+
+
+def test_new_bars_are_applied_to_the_stored_state():
+    bars, store = _bars(), IndicatorStore("test-advance")
+    for end in (1, 2, 14, 15, 16, 26, 27, 150, 151, 300, 400):
+        window = _until(bars, end)
+        _assert_same(store.compute("GARAN", **window), _compute(window))
+
+    stats = store.stats()
+    assert stats["built"] == 2    # the first call, and the second: one bar, none committed
+    assert stats["advanced"] == 9
+    assert stats["bars_applied"] == 398
+
+
+def test_a_sliding_window_still_advances():
+    # Six months fetched each time: the window's first bar moves along too.
+    bars, store = _bars(), IndicatorStore("test-slide")
+    store.compute("GARAN", **_until(bars, 125))
+    got = store.compute("GARAN", **_until(bars, 130, start=5))
+    # The EMAs carry on from the first bar ever seen, so they match the whole series.
+    _assert_same(got, _compute(_until(bars, 130)))
+    assert store.stats()["advanced"] == 1
+
+
+def test_the_forming_bar_is_never_committed():
+    bars, store = _bars(), IndicatorStore("test-forming")
+    store.compute("GARAN", **_until(bars, 200))
+    # Later in the session the last bar has moved; the state must not have kept it.
+    moved = _until(bars, 200)
+    moved["close"] = moved["close"].copy()
+    moved["close"][-1] += 7.5
+    _assert_same(store.compute("GARAN", **moved), _compute(moved))
+    assert store.stats()["advanced"] == 1 and store.stats()["bars_applied"] == 0
+
+
+def test_revised_history_rebuilds_the_state():
+    bars, store = _bars(), IndicatorStore("test-revised")
+    store.compute("THYAO", **_until(bars, 200))
+    split = {**_until(bars, 201)}
+    for name in ("close", "high", "low"):
+        split[name] = split[name] / 2
+    _assert_same(store.compute("THYAO", **split), _compute(split))
+    assert store.stats()["rebuilt"] == {"revised": 1, "gap": 0}
+
+
+def test_a_window_past_the_state_rebuilds_it():
+    bars, store = _bars(), IndicatorStore("test-gap")
+    store.compute("THYAO", **_until(bars, 100))
+    later = _until(bars, 400, start=200)
+    _assert_same(store.compute("THYAO", **later), _compute(later))
+    assert store.stats()["rebuilt"] == {"revised": 0, "gap": 1}
+
+
+def test_states_are_kept_per_key_and_survive_a_snapshot():
+    bars, store = _bars(), IndicatorStore("test-keys")
+    store.compute(("GARAN", "1d"), **_until(bars, 100))
+    store.compute(("GARAN", "1h"), **_until(bars, 50))
+    assert store.stats()["states"] == 2
+    assert store._states.persist
+
+    state = store._states.get(("GARAN", "1d"))
+    restored = pickle.loads(pickle.dumps(state))
+    assert restored.bars == state.bars == 99
+    np.testing.assert_array_equal(restored.window, state.window)
+    assert indicator_state_stats()["test-keys"]["states"] == 2
+
+
+def test_datetime_bar_times_are_accepted():
+    import pandas as pd
+
+    bars, store = _bars(60), IndicatorStore("test-datetimes")
+    index = pd.date_range("2025-01-01", periods=60, freq="D", tz="Europe/Istanbul")
+    store.compute("GARAN", index[:59], bars["close"][:59])
+    got = store.compute("GARAN", index, bars["close"])
+    _assert_same(got, indicators.compute(bars["close"]))
+    assert store.stats()["advanced"] == 1
+
+
+def test_pool_threads_and_the_snapshot_share_the_store():
+    """compute runs in the upstream pool threads on the store's LRU, and the cache
+    snapshot dumps that LRU from the loop meanwhile: both used to touch the
+    OrderedDict unlocked, so a dump could die mid-iteration and two calls on one
+    key could each advance a stale state and write the other's over it."""
+    from concurrent.futures import ThreadPoolExecutor
+
+    bars, store = _bars(), IndicatorStore("test-threads")
+    done, errors = [], []
+
+    def work(worker):
+        key = ("GARAN", worker % 3)
+        for end in range(200, 400, 5):
+            _assert_same(store.compute(key, **_until(bars, end)), _compute(_until(bars, end)))
+
+    def snapshot():
+        while not done:
+            try:
+                store._states.dump()
+            except RuntimeError as exc:
+                errors.append(exc)
+
+    with ThreadPoolExecutor(max_workers=9) as pool:
+        dumper = pool.submit(snapshot)
+        for future in [pool.submit(work, worker) for worker in range(8)]:
+            future.result()
+        done.append(True)
+        dumper.result()
+
+    assert not errors
+    assert store.stats()["states"] == 3
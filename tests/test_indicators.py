@@ -0,0 +1,162 @@
+"""One indicator engine, and the same numbers from every market.
+
+Four copies of the RSI/MACD/Bollinger/SMA/EMA maths had drifted apart: BIST's EMAs
+were recursive and the others bias-adjusted, Yahoo's MACD signal was the MACD itself
+(histogram always 0), and each copy rebuilt pandas rolling objects per indicator.
+"""
+import asyncio
+import datetime
+from types import SimpleNamespace
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from providers import indicators
+
+
+def _bars(n=150, seed=7):
+    rng = np.random.default_rng(seed)
+    close = 100 + np.cumsum(rng.normal(0, 1.5, n))
+    high = close + rng.uniform(0.1, 2.0, n)
+    low = close - rng.uniform(0.1, 2.0, n)
+    volume = rng.uniform(1e5, 1e6, n)
+    return close, high, low, volume
+
+
+def _wilder_rsi(close, period=14):
+    delta = np.diff(close)
+    gains, losses = np.maximum(delta, 0), np.maximum(-delta, 0)
+    gain, loss = gains[:period].mean(), losses[:period].mean()
+    for g, l_ in zip(gains[period:], losses[period:]):
+        gain = (gain * (period - 1) + g) / period
+        loss = (loss * (period - 1) + l_) / period
+    return 100 - 100 / (1 + gain / loss)
+
+
+@pytest.mark.parametrize("span", [2, 9, 12, 26, 200])
+def test_ema_matches_the_recursive_definition(span):
+    close, *_ = _bars(2500)
+    expected = pd.Series(close).ewm(span=span, adjust=False).mean().to_numpy()
+    np.testing.assert_allclose(indicators.ema(close, 2 / (span + 1)), expected, rtol=1e-10)
+
+
+def test_every_indicator_matches_its_reference():
+    close, high, low, volume = _bars()
+    s, h, lo = pd.Series(close), pd.Series(high), pd.Series(low)
+    result = indicators.compute(close, high, low, volume)
+
+    for window in (5, 20, 50, 100):
+        assert result.sma[window] == pytest.approx(s.rolling(window).mean().iloc[-1])
+    assert result.sma[200] is None    # 150 bars
+    assert result.volume_avg[30] == pytest.approx(volume[-30:].mean())
+
+    macd = s.ewm(span=12, adjust=False).mean() - s.ewm(span=26, adjust=False).mean()
+    signal = macd.ewm(span=9, adjust=False).mean()
+    assert result.macd == pytest.approx(macd.iloc[-1])
+    assert result.macd_signal == pytest.approx(signal.iloc[-1])
+    assert result.macd_histogram == pytest.approx(macd.iloc[-1] - signal.iloc[-1])
+    assert result.previous_macd_signal == pytest.approx(signal.iloc[-2])
+
+    assert result.rsi_14 == pytest.approx(_wilder_rsi(close))
+
+    std = s.rolling(20).std().iloc[-1]
+    assert result.bollinger_upper == pytest.approx(s.rolling(20).mean().iloc[-1] + 2 * std)
+
+    k = 100 * (s - lo.rolling(14).min()) / (h.rolling(14).max() - lo.rolling(14).min())
+    assert result.stochastic_k == pytest.approx(k.iloc[-1])
+    assert result.stochastic_d == pytest.approx(k.rolling(3).mean().iloc[-1])
+
+
+def test_short_or_flat_histories_give_none_not_nan():
+    assert indicators.compute([]).close is None
+    short = indicators.compute([1.0, 2.0, 3.0])
+    assert short.rsi_14 is None and short.macd is None and short.sma[5] is None
+
+    flat = indicators.compute([10.0] * 40)
+    assert flat.rsi_14 is None and flat.stochastic_k is None
+    assert flat.macd == 0.0 and flat.bollinger_upper == 10.0
+
+    # A bar without a close is dropped, not propagated.
+    gappy = indicators.compute([1.0, float("nan")] + [float(i) for i in range(2, 40)])
+    assert gappy.bars == 39 and gappy.macd is not None
+
+
+def test_every_market_reports_the_same_indicators_for_the_same_bars(monkeypatch):
+    from providers.borsapy_provider import BorsapyProvider
+    from providers.btcturk_provider import BtcTurkProvider
+    from providers.coinbase_provider import CoinbaseProvider
+    from providers.yfinance_provider import YahooFinanceProvider
+
+    close, high, low, volume = _bars()
+    index = pd.date_range("2025-01-01", periods=len(close), freq="D")
+    hist = pd.DataFrame(
+        {"Open": close, "High": high, "Low": low, "Close": close, "Volume": volume}, index=index
+    )
+    expected = indicators.compute(close, high, low, volume)
+
+    bist = BorsapyProvider().get_teknik_analiz("GARAN", hist=hist)["teknik_indiktorler"]
+
+    yahoo = YahooFinanceProvider()
+    ticker = SimpleNamespace(ticker="AAPL", history=lambda period, interval="1d": hist, recommendations=None)
+    monkeypatch.setattr(yahoo, "_get_ticker", lambda *a, **k: ticker)
+    us = yahoo.get_teknik_analiz("AAPL", market="US")["teknik_indiktorler"]
+
+    btcturk = BtcTurkProvider(client=None)
+    klines = [
+        SimpleNamespace(timestamp=int(t.timestamp()), open=c, high=h, low=lo, close=c, volume=v)
+        for t, c, h, lo, v in zip(index, close, high, low, volume)
+    ]
+
+    async def get_kline(*args, **kwargs):
+        return SimpleNamespace(error_message=None, klines=klines)
+
+    monkeypatch.setattr(btcturk, "get_kline", get_kline)
+    tr_crypto = asyncio.run(btcturk.get_kripto_teknik_analiz("BTCTRY")).teknik_indiktorler
+
+    coinbase = CoinbaseProvider(client=None)
+    candles = [
+        SimpleNamespace(start=t.to_pydatetime().replace(tzinfo=datetime.timezone.utc),
+                        open=c, high=h, low=lo, close=c, volume=v)
+        for t, c, h, lo, v in zip(index, close, high, low, volume)
+    ]
+
+    async def get_ohlc(*args, **kwargs):
+        return SimpleNamespace(error_message=None, candles=candles)
+
+    monkeypatch.setattr(coinbase, "get_ohlc", get_ohlc)
+    global_crypto = asyncio.run(coinbase.get_coinbase_teknik_analiz("BTC-USD")).teknik_indiktorler
+
+    for name in ("rsi_14", "macd", "macd_signal", "macd_histogram"):
+        value = bist[name]
+        assert us[name] == getattr(tr_crypto, name) == getattr(global_crypto, name) == value
+        assert value == pytest.approx(getattr(expected, name))
+    assert us["bollinger_upper"] == tr_crypto.bollinger_upper == global_crypto.bollinger_upper
+    assert bist["bollinger_ust"] == pytest.approx(expected.bollinger_upper)
+    # Coinbase's bands were passed under names its model does not have, and dropped.
+    assert global_crypto.bollinger_lower == pytest.approx(expected.bollinger_lower)
+    # Yahoo's signal line used to be the MACD itself.
+    assert us["macd_histogram"] != 0
+
+
+def test_an_index_in_one_matrix_matches_each_member_alone():
+    # Members with a full year, a recent listing, a suspension gap, a flat line and
+    # one too short for anything but a close.
+    lengths = (280, 280, 120, 30, 16, 2)
+    members = [_bars(n, seed) for seed, n in enumerate(lengths)]
+    members[1][0][40] = np.nan
+    members.append((np.full(60, 10.0), None, None, None))
+    close, high, low, volume = (list(c) for c in zip(*members))
+    volume[2] = None
+
+    got = indicators.compute_matrix(close, high, low, volume)
+    for i, result in enumerate(got):
+        expected = indicators.compute(close[i], high[i], low[i], volume[i])
+        for name, value in vars(expected).items():
+            other = getattr(result, name)
+            if isinstance(value, dict):
+                assert other.keys() == value.keys(), name
+                for window, v in value.items():
+                    assert other[window] == (pytest.approx(v) if v is not None else None), (i, name)
+            else:
+                assert other == (pytest.approx(value, rel=1e-9, abs=1e-9) if value is not None else None), (i, name)
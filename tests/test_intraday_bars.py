@@ -0,0 +1,213 @@
+"""Technical analysis at the timeframe that was asked for.
+
+`timeframe` was ignored for BIST and US: both always computed on daily bars (BIST on
+borsapy's 30-bar default, as "6ay" is not a period it knows), and the tool attached
+a warning. Hourly and 15-minute setups came back as daily numbers.
+"""
+import asyncio
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, MagicMock
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from models.unified_base import MarketType
+from providers.intraday_bars import (
+    BORSAPY_TIMEFRAMES,
+    YAHOO_TIMEFRAMES,
+    BarSpec,
+    IntradayBarCache,
+    aggregate_bars,
+    intraday_bar_stats,
+)
+from providers.market_router import MarketRouter
+from providers.tool_cache import resolve_ttl
+
+SPEC = BarSpec("15m", "1mo", "1d")
+
+
+def _bars(start, n, freq="15min", base=100.0):
+    index = pd.date_range(start, periods=n, freq=freq, tz="Europe/Istanbul")
+    close = base + np.arange(n, dtype=float)
+    return pd.DataFrame(
+        {"Open": close, "High": close + 1, "Low": close - 1, "Close": close,
+         "Volume": np.full(n, 10.0)},
+        index=index,
+    )
+
+
+class _Upstream:
+    """Answers `fetch(period)` from one long series that grows as time passes."""
+
+    def __init__(self, series, end):
+        self.series, self.end, self.periods = series, end, []
+
+    async def __call__(self, period):
+        self.periods.append(period)
+        window = 40 if period == SPEC.period else 8
+        return self.series.iloc[max(0, self.end - window):self.end]
+
+
+def _expire(cache, key):
+    cache._windows._entries[key].expires_at = 0
+
+
+def test_an_expired_window_fetches_only_its_tail():
+    series = _bars("2026-03-02 09:45", 100)
+    upstream, cache = _Upstream(series, end=60), IntradayBarCache("test-tail")
+
+    first = asyncio.run(cache.window(("GARAN", "15m"), "bist", SPEC, upstream))
+    pd.testing.assert_frame_equal(first, series.iloc[20:60])
+
+    # Two bars later; the last stored bar was still forming and has moved.
+    upstream.series = series.copy()
+    upstream.series.iloc[59, upstream.series.columns.get_loc("Close")] += 0.3
+    upstream.end = 62
+    _expire(cache, ("GARAN", "15m"))
+    second = asyncio.run(cache.window(("GARAN", "15m"), "bist", SPEC, upstream))
+
+    pd.testing.assert_frame_equal(second, upstream.series.iloc[22:62])
+    assert upstream.periods == [SPEC.period, SPEC.refresh]
+    assert cache.stats()["full_fetches"] == 1 and cache.stats()["tail_fetches"] == 1
+
+    # Fresh: no upstream call at all.
+    asyncio.run(cache.window(("GARAN", "15m"), "bist", SPEC, upstream))
+    assert len(upstream.periods) == 2
+    assert intraday_bar_stats()["test-tail"]["windows"] == 1
+
+
+@pytest.mark.parametrize("reason", ["revised", "gap"])
+def test_a_tail_that_does_not_fit_refetches_the_window(reason):
+    series = _bars("2026-03-02 09:45", 100)
+    upstream, cache = _Upstream(series, end=60), IntradayBarCache(f"test-{reason}")
+    asyncio.run(cache.window("THYAO", "bist", SPEC, upstream))
+
+    if reason == "revised":
+        # A split: every close halved.
+        upstream.series = series.assign(Close=series["Close"] / 2)
+        upstream.end = 61
+    else:
+        # Untouched for longer than the tail reaches back.
+        upstream.end = 80
+    _expire(cache, "THYAO")
+    got = asyncio.run(cache.window("THYAO", "bist", SPEC, upstream))
+
+    pd.testing.assert_frame_equal(got, upstream.series.iloc[upstream.end - 40:upstream.end])
+    assert upstream.periods == [SPEC.period, SPEC.refresh, SPEC.period]
+    assert cache.stats()["refetched"][reason] == 1
+
+
+def test_hourly_bars_fold_into_four_hour_bars_per_session():
+    # Two US sessions of hourly bars: 09:30 ... 15:30.
+    days = [pd.date_range(f"2026-03-0{d} 09:30", periods=7, freq="h", tz="America/New_York")
+            for d in (2, 3)]
+    index = days[0].append(days[1])
+    close = np.arange(1.0, 15.0)
+    hourly = pd.DataFrame(
+        {"Open": close - 0.5, "High": close + 1, "Low": close - 1, "Close": close,
+         "Volume": np.ones(14)},
+        index=index,
+    )
+    four = aggregate_bars(hourly, 4)
+
+    assert [t.strftime("%d %H:%M") for t in four.index] == ["02 09:30", "02 13:30", "03 09:30", "03 13:30"]
+    assert four["Open"].tolist() == [0.5, 4.5, 7.5, 11.5]
+    assert four["Close"].tolist() == [4.0, 7.0, 11.0, 14.0]
+    assert four["High"].tolist() == [5.0, 8.0, 12.0, 15.0]
+    assert four["Low"].tolist() == [0.0, 4.0, 7.0, 11.0]
+    assert four["Volume"].tolist() == [4.0, 3.0, 4.0, 3.0]
+
+
+def test_every_timeframe_has_enough_bars_for_sma200():
+    for specs in (BORSAPY_TIMEFRAMES, YAHOO_TIMEFRAMES):
+        assert set(specs) == {"1m", "5m", "15m", "30m", "1h", "4h", "1d", "1W"}
+    # borsapy asks TradingView for days × 510 session minutes / interval bars.
+    minutes = {"1m": 1, "5m": 5, "15m": 15, "30m": 30, "1h": 60, "4h": 240}
+    days = {"1d": 1, "5d": 5, "1mo": 30, "3mo": 90, "6mo": 180}
+    for timeframe, spec in BORSAPY_TIMEFRAMES.items():
+        if timeframe in minutes:
+            assert days[spec.period] * 510 / minutes[timeframe] > 250, timeframe
+
+
+def test_bist_analysis_runs_on_the_requested_bars(monkeypatch):
+    from providers.borsapy_provider import BorsapyProvider
+
+    provider = BorsapyProvider()
+    calls = []
+
+    async def history(ticker, ticker_kodu, **kwargs):
+        calls.append(kwargs)
+        return _bars("2026-03-02 09:45", 300)
+
+    monkeypatch.setattr(provider, "_history_with_retry", history)
+    hist = asyncio.run(provider.fetch_bars("GARAN", "15m"))
+    assert calls == [{"period": "1mo", "interval": "15m", "adjust": False}]
+
+    result = provider.get_teknik_analiz("GARAN", hist, "15m")
+    assert result["hareketli_ortalamalar"]["sma_200"] is not None
+    assert provider._indicators._states.get(("GARAN", "15m")) is not None
+
+
+def test_indicators_over_fetched_bars_are_not_a_borsapy_call(monkeypatch):
+    """They were computed in the borsapy pool, behind its breaker and bulkhead."""
+    from borsa_client import BorsaApiClient
+    from providers.circuit_breaker import CircuitBreaker, _circuits
+
+    breaker = CircuitBreaker("borsapy")
+    breaker._trip(60)
+    monkeypatch.setitem(_circuits, "borsapy", breaker)
+    client = BorsaApiClient()
+    bars = _bars("2026-03-02 09:45", 300)
+    monkeypatch.setattr(client.borsapy_provider, "fetch_bars", AsyncMock(return_value=bars))
+
+    result = asyncio.run(client.get_teknik_analiz_yfinance("GARAN", "15m"))
+
+    assert "error" not in result and result["hareketli_ortalamalar"]["sma_200"] is not None
+    assert breaker.rejected == 0 and breaker.successes == 0
+
+
+def test_us_four_hour_analysis_folds_the_hourly_window(monkeypatch):
+    from providers.yfinance_provider import YahooFinanceProvider
+
+    provider = YahooFinanceProvider()
+    hourly = _bars("2026-03-02 09:30", 7 * 150, freq="h")
+    calls = []
+
+    def history(period, interval):
+        calls.append((period, interval))
+        return hourly
+
+    ticker = SimpleNamespace(ticker="AAPL", history=history)
+    monkeypatch.setattr(provider, "_get_ticker", lambda *a, **k: ticker)
+    four = asyncio.run(provider.fetch_bars("AAPL", "4h"))
+    asyncio.run(provider.fetch_bars("AAPL", "1h"))
+
+    assert calls == [("6mo", "60m")]    # one hourly window serves both
+    assert len(four) < len(hourly)
+    result = provider.get_teknik_analiz("AAPL", market="US", timeframe="4h", hist=four)
+    assert result["fiyat_analizi"]["guncel_fiyat"] == four["Close"].iloc[-1]
+
+
+def test_the_router_passes_the_timeframe_through():
+    router = MarketRouter()
+    client = MagicMock()
+    client.get_teknik_analiz_yfinance = AsyncMock(return_value={"teknik_indiktorler": {"rsi_14": 41.0}})
+    client.get_us_technical_analysis = AsyncMock(return_value={"indicators": {"rsi_14": 55.0}})
+    router._client = client
+
+    bist = asyncio.run(router.get_technical_analysis("GARAN", MarketType.BIST, "15m"))
+    us = asyncio.run(router.get_technical_analysis("AAPL", MarketType.US, "1h"))
+
+    client.get_teknik_analiz_yfinance.assert_awaited_with("GARAN.IS", "15m")
+    client.get_us_technical_analysis.assert_awaited_with("AAPL", "1h")
+    assert bist["timeframe"] == "15m" and us["timeframe"] == "1h"
+
+
+def test_intraday_answers_are_cached_for_the_intraday_ttl(monkeypatch):
+    import providers.tool_cache as tool_cache
+
+    monkeypatch.setattr(tool_cache, "ttl_for", lambda market, kind: kind.value)
+    assert resolve_ttl("session:daily_bar", {"market": "bist", "timeframe": "15m"}) == "intraday_bar"
+    assert resolve_ttl("session:daily_bar", {"market": "bist", "timeframe": "1d"}) == "daily_bar"
+    assert resolve_ttl("session:daily_bar", {"market": "us"}) == "daily_bar"
@@ -0,0 +1,77 @@
+"""BorsaApiClient builds its providers on first use, and measures each build.
+
+The constructor used to build all seventeen providers, importing yfinance, borsapy,
+pdfplumber, markitdown, yfscreen and pandas on every cold start, whether or not the
+worker ever served the tools that need them.
+"""
+import threading
+import time
+
+from borsa_client import BorsaApiClient
+from providers.lazy_providers import built_providers, lazy_provider, provider_stats
+
+
+def test_client_builds_no_provider_until_one_is_read():
+    client = BorsaApiClient()
+    assert built_providers(client) == []
+
+    kap = client.kap_provider
+    assert client.kap_provider is kap
+    assert built_providers(client) == ["kap_provider"]
+
+
+def test_dependent_provider_builds_what_it_needs_and_shares_it():
+    client = BorsaApiClient()
+    buffett = client.buffett_provider
+    assert set(built_providers(client)) == {
+        "buffett_provider", "tahvil_provider", "tcmb_provider",
+        "worldbank_provider", "yfinance_provider",
+    }
+    assert buffett.yfinance_provider is client.yfinance_provider
+
+
+def test_assigned_provider_replaces_it_without_a_build():
+    client = BorsaApiClient()
+    sentinel = object()
+    client.scanner_provider = sentinel
+    assert client.scanner_provider is sentinel
+
+
+class _Owner:
+    builds = 0
+
+    @lazy_provider
+    def slow_provider(self):
+        type(self).builds += 1
+        time.sleep(0.05)
+        return object()
+
+    @lazy_provider
+    def outer_provider(self):
+        time.sleep(0.05)
+        return (self.slow_provider, object())
+
+
+def test_concurrent_first_reads_build_once():
+    owner = _Owner()
+    _Owner.builds = 0
+    seen = []
+    threads = [
+        threading.Thread(target=lambda: seen.append(owner.slow_provider)) for _ in range(8)
+    ]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert _Owner.builds == 1
+    assert all(p is seen[0] for p in seen)
+
+
+def test_stats_charge_each_build_only_for_itself():
+    _Owner().outer_provider
+    stats = provider_stats()
+    assert {"slow_provider", "outer_provider"} <= set(stats["providers"])
+    outer = stats["providers"]["outer_provider"]
+    # 50ms of its own; the nested build's 50ms is not added to it.
+    assert 40 <= outer["first_build_ms"] < 90
+    assert stats["declared"] >= 17
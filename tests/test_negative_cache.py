@@ -0,0 +1,87 @@
+"""A guessed ticker costs one upstream round trip, not one per retry and per tool.
+
+The router went upstream every time an LLM asked about a symbol that does not exist,
+and BIST history retried the miss three times with sleeps in between. The model then
+asked again, usually through another tool.
+"""
+import asyncio
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+from borsapy.exceptions import TickerNotFoundError
+
+from models.unified_base import MarketType
+from providers.borsapy_provider import BorsapyProvider
+from providers.market_router import MarketRouter
+from providers.negative_cache import NoDataInWindowError, SymbolNotFoundError
+
+
+def _router(history_result):
+    router = MarketRouter()
+    router._client = MagicMock(get_finansal_veri=AsyncMock(return_value=history_result))
+    return router
+
+
+def test_an_unknown_symbol_is_remembered_across_tools():
+    router = _router({"error": "Ticker not found: GARANT", "miss": "symbol"})
+
+    async def run():
+        with pytest.raises(SymbolNotFoundError):
+            await router.get_historical_data("GARANT", MarketType.BIST, period="1mo")
+        with pytest.raises(SymbolNotFoundError):
+            await router.get_technical_analysis("garant", MarketType.BIST)
+        with pytest.raises(SymbolNotFoundError):
+            await router.get_quote("GARANT", MarketType.BIST)
+
+    asyncio.run(run())
+    assert router._client.get_finansal_veri.await_count == 1
+    assert router.miss_stats()["symbol_hits"] == 2
+
+
+def test_an_empty_window_is_remembered_for_that_call_only():
+    router = _router({"error": "No data found for GARAN", "miss": "window"})
+
+    async def run():
+        for _ in range(2):
+            with pytest.raises(NoDataInWindowError):
+                await router.get_historical_data(
+                    "GARAN", MarketType.BIST, start_date="2026-07-11", end_date="2026-07-12"
+                )
+        with pytest.raises(NoDataInWindowError):
+            await router.get_historical_data(
+                "GARAN", MarketType.BIST, start_date="2026-07-13", end_date="2026-07-14"
+            )
+
+    asyncio.run(run())
+    assert router._client.get_finansal_veri.await_count == 2
+
+
+def test_a_transient_failure_is_never_remembered():
+    router = _router({"error": "No data received for BIST:GARAN", "miss": None})
+
+    async def run():
+        for _ in range(2):
+            with pytest.raises(RuntimeError):
+                await router.get_historical_data("GARAN", MarketType.BIST, period="1mo")
+
+    asyncio.run(run())
+    assert router._client.get_finansal_veri.await_count == 2
+    assert router.miss_stats()["size"] == 0
+
+
+def test_history_does_not_retry_an_unknown_ticker():
+    calls = {"n": 0}
+
+    def history(**kwargs):
+        calls["n"] += 1
+        raise TickerNotFoundError("GARANT")
+
+    ticker = MagicMock()
+    ticker.history = history
+
+    provider = BorsapyProvider()
+    with patch.object(provider, "_get_ticker", return_value=ticker):
+        result = asyncio.run(provider.get_finansal_veri("GARANT", period="1mo"))
+
+    assert calls["n"] == 1
+    assert result["miss"] == "symbol"
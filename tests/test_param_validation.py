@@ -5,7 +5,6 @@ from fastmcp.exceptions import ToolError
 from providers.market_router import market_router
 from unified_mcp_server import (
     fund_flags_warning,
-    timeframe_warning,
     validate_evds_params,
     validate_screen_params,
 )
@@ -61,10 +60,3 @@ def test_fund_flags_warning_multi_fund():
     assert w is not None and "single-fund" in w
     assert fund_flags_warning(is_multi=False, include_portfolio=True, include_performance=True) is None
     assert fund_flags_warning(is_multi=True, include_portfolio=False, include_performance=False) is None
-
-
-def test_timeframe_warning_for_stock_markets():
-    w = timeframe_warning(market="bist", timeframe="1h")
-    assert w is not None and "daily" in w.lower()
-    assert timeframe_warning(market="bist", timeframe="1d") is None
-    assert timeframe_warning(market="crypto_tr", timeframe="1h") is None
@@ -0,0 +1,135 @@
+"""The CPU-bound parsers run in a process pool, off the event loop.
+
+pandas reading KAP's company Excel, pdfplumber reading its PDF fallback and
+MarkItDown converting a Mynet KAP disclosure all ran on the loop; a long disclosure
+stalled every other session on the process for as long as it took.
+"""
+import asyncio
+import io
+import os
+import time
+
+import pandas as pd
+
+from providers.parsers import company_rows_from_excel, kap_detail_markdown
+from providers.process_pool import ParsePool
+
+
+def _kap_excel() -> bytes:
+    buffer = io.BytesIO()
+    pd.DataFrame({
+        "BIST KODU": ["GARAN, TGB", "ASELS", None],
+        "ŞİRKET ADI": ["TÜRKİYE GARANTİ BANKASI A.Ş.", "ASELSAN A.Ş.", "BOŞ"],
+        "ŞEHİR": ["İSTANBUL", "ANKARA", None],
+    }).to_excel(buffer, index=False)
+    return buffer.getvalue()
+
+
+_KAP_DETAIL = b"""<html><body>
+<div class="card kap-detail-news-page">
+  <h1>Ozel Durum Aciklamasi</h1>
+  <div class="page-header">Genel</div>
+  <p>Sirketimiz <b>yeni</b> bir sozlesme imzalamistir.</p>
+</div></body></html>"""
+
+
+def test_excel_rows_split_multi_ticker_companies_and_skip_empty_rows():
+    rows = company_rows_from_excel(_kap_excel())
+    assert rows == [
+        ("GARAN", "TÜRKİYE GARANTİ BANKASI A.Ş.", "İSTANBUL"),
+        ("TGB", "TÜRKİYE GARANTİ BANKASI A.Ş.", "İSTANBUL"),
+        ("ASELS", "ASELSAN A.Ş.", "ANKARA"),
+    ]
+
+
+def test_kap_detail_is_returned_as_plain_builtins():
+    detail = kap_detail_markdown(_KAP_DETAIL)
+    assert detail["title"] == "Ozel Durum Aciklamasi"
+    assert detail["doc_type"] == "Genel"
+    assert "**yeni**" in detail["markdown"]
+    assert kap_detail_markdown(b"<html><body>nothing</body></html>") is None
+
+
+def test_parsers_run_in_another_process_and_keep_the_loop_free():
+    pool = ParsePool(workers=1, mode="process")
+
+    async def run():
+        ticks = 0
+
+        async def ticker():
+            nonlocal ticks
+            while True:
+                await asyncio.sleep(0.01)
+                ticks += 1
+
+        tick_task = asyncio.create_task(ticker())
+        try:
+            pid = await pool.run(os.getpid)
+            started = time.monotonic()
+            await pool.run(time.sleep, 0.3)
+            elapsed = time.monotonic() - started
+            rows = await pool.run(company_rows_from_excel, _kap_excel())
+        finally:
+            tick_task.cancel()
+        return pid, elapsed, ticks, rows
+
+    try:
+        pid, elapsed, ticks, rows = asyncio.run(run())
+    finally:
+        pool.shutdown(wait=True)
+    assert pid != os.getpid()
+    assert elapsed >= 0.3 and ticks >= 15, "the loop kept running while the worker slept"
+    assert [r[0] for r in rows] == ["GARAN", "TGB", "ASELS"]
+    assert pool.stats()["parsers"]["company_rows_from_excel"]["calls"] == 1
+
+
+def test_dead_worker_fails_its_call_and_the_pool_recovers():
+    pool = ParsePool(workers=1, mode="process")
+
+    async def run():
+        try:
+            await pool.run(os._exit, 1)
+        except Exception as exc:
+            died = exc
+        else:
+            died = None
+        return died, await pool.run(os.getpid)
+
+    try:
+        died, pid = asyncio.run(run())
+    finally:
+        pool.shutdown(wait=True)
+    assert died is not None
+    assert pid != os.getpid()
+    assert pool.stats()["restarts"] == 1
+
+
+def test_thread_mode_runs_the_same_parsers():
+    pool = ParsePool(workers=1, mode="thread")
+    try:
+        rows = asyncio.run(pool.run(company_rows_from_excel, _kap_excel()))
+    finally:
+        pool.shutdown(wait=True)
+    assert len(rows) == 3
+    assert pool.stats()["mode"] == "thread"
+
+
+def test_a_parse_abandoned_at_the_deadline_keeps_its_slot_until_it_finishes():
+    from providers.deadline import DeadlineExceededError, deadline_scope
+
+    pool = ParsePool(workers=1, mode="thread")
+
+    async def run():
+        with deadline_scope(0.05):
+            try:
+                await pool.run(time.sleep, 0.3)
+            except DeadlineExceededError:
+                pass
+        held = pool.stats()["active"]
+        await asyncio.sleep(0.4)
+        return held, pool.stats()["active"]
+
+    try:
+        assert asyncio.run(run()) == (1, 0)
+    finally:
+        pool.shutdown(wait=True)
@@ -0,0 +1,136 @@
+"""Concurrent identical router calls share one upstream round trip.
+
+A burst of sessions on one ticker used to cost one borsapy call each: twenty
+`get_historical_data("GARAN")` calls arriving together made twenty websocket
+handshakes for the same twenty bars.
+"""
+import asyncio
+from unittest.mock import MagicMock
+
+from models.unified_base import MarketType
+from providers.market_router import MarketRouter
+
+
+def _router_with_history(calls):
+    async def get_finansal_veri(ticker, zaman_araligi=None, start_date=None,
+                                end_date=None, adjust=True):
+        calls.append(ticker)
+        await asyncio.sleep(0.01)
+        return {"data": [{"tarih": "2026-07-08", "acilis": 1.0, "en_yuksek": 1.0,
+                          "en_dusuk": 1.0, "kapanis": 1.0, "hacim": 10}]}
+
+    router = MarketRouter()
+    client = MagicMock()
+    client.get_finansal_veri = get_finansal_veri
+    router._client = client
+    return router
+
+
+def test_a_burst_of_identical_calls_goes_upstream_once():
+    calls = []
+    router = _router_with_history(calls)
+
+    async def burst():
+        return await asyncio.gather(*(
+            router.get_historical_data(
+                "GARAN", MarketType.BIST, start_date="2026-07-01", end_date="2026-07-10"
+            )
+            for _ in range(20)
+        ))
+
+    results = asyncio.run(burst())
+
+    assert len(calls) == 1
+    assert all(r["data"] == results[0]["data"] for r in results)
+    stats = router._coalescer.stats()["operations"]["get_historical_data"]
+    assert stats == {"calls": 1, "shared_calls": 1, "waiters_saved": 19, "max_waiters": 19}
+
+
+def test_waiters_get_their_own_copy():
+    """The server appends warnings to a result in place; that must not leak."""
+    router = _router_with_history([])
+
+    async def burst():
+        return await asyncio.gather(*(
+            router.get_historical_data(
+                "GARAN", MarketType.BIST, start_date="2026-07-01", end_date="2026-07-10"
+            )
+            for _ in range(2)
+        ))
+
+    first, second = asyncio.run(burst())
+    first.setdefault("warnings", []).append("timeframe ignored")
+
+    assert "warnings" not in second
+
+
+def test_defaults_and_enums_are_part_of_the_key():
+    calls = []
+    router = _router_with_history(calls)
+
+    async def burst():
+        await asyncio.gather(
+            router.get_historical_data(
+                "GARAN", MarketType.BIST, start_date="2026-07-01", end_date="2026-07-10"
+            ),
+            router.get_historical_data(
+                symbol="GARAN", market="bist", period=None,
+                start_date="2026-07-01", end_date="2026-07-10", interval="1d",
+            ),
+            router.get_historical_data(
+                "GARAN", MarketType.BIST, start_date="2026-07-01", end_date="2026-07-09"
+            ),
+        )
+
+    asyncio.run(burst())
+
+    assert len(calls) == 2, "only the different window may make its own call"
+
+
+def test_a_failure_reaches_every_waiter_and_the_next_call_retries():
+    calls = []
+
+    async def failing(*args, **kwargs):
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return {"error": "No data received for BIST:GARAN"}
+
+    router = MarketRouter()
+    router._client = MagicMock(get_finansal_veri=failing)
+
+    async def burst():
+        return await asyncio.gather(*(
+            router.get_historical_data(
+                "GARAN", MarketType.BIST, start_date="2026-07-01", end_date="2026-07-10"
+            )
+            for _ in range(3)
+        ), return_exceptions=True)
+
+    results = asyncio.run(burst())
+    assert all(isinstance(r, RuntimeError) for r in results)
+    assert len(calls) == 1
+
+    asyncio.run(burst())
+    assert len(calls) == 2, "a failure is shared, never remembered"
+
+
+def test_a_shared_call_is_bounded_by_each_callers_own_deadline():
+    from providers.coalescing import Coalescer
+    from providers.deadline import DeadlineExceededError, deadline_scope
+
+    coalescer = Coalescer("test-deadlines")
+
+    async def factory():
+        await asyncio.sleep(0.3)
+        return {"bars": 20}
+
+    async def caller(seconds):
+        with deadline_scope(seconds):
+            return await coalescer.run("get_quote", ("GARAN",), factory)
+
+    async def run():
+        return await asyncio.gather(caller(0.1), caller(30), return_exceptions=True)
+
+    leader, waiter = asyncio.run(run())
+    assert isinstance(leader, DeadlineExceededError)
+    assert waiter == {"bars": 20}
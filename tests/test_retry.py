@@ -0,0 +1,171 @@
+"""Retries back off asynchronously, only for what a retry can fix, within a budget.
+
+_history_with_retry slept with time.sleep between attempts -- holding a pool thread,
+or the event loop itself -- retried errors that fail identically every time, and
+during a TradingView outage tripled the traffic sent to it.
+"""
+import asyncio
+import time
+from unittest.mock import MagicMock, patch
+
+import httpx
+import pytest
+from borsapy.exceptions import APIError, InvalidPeriodError, TickerNotFoundError
+
+from providers.borsapy_provider import BorsapyProvider
+from providers.bulkhead import BulkheadFullError
+from providers.retry import (
+    RetryBudget, RetryPolicy, call_with_retry, is_retryable, reset_retry_budgets,
+    retry_budget, retry_stats, set_retry_budget,
+)
+
+FAST = RetryPolicy(attempts=3, base_delay=0.01, max_delay=0.02)
+
+
+@pytest.fixture
+def budget():
+    reset_retry_budgets()
+    yield
+    reset_retry_budgets()
+
+
+def test_what_is_worth_retrying():
+    response = httpx.Response(503, request=httpx.Request("GET", "https://www.isyatirim.com.tr"))
+    assert is_retryable(httpx.HTTPStatusError("503", request=response.request, response=response))
+    assert is_retryable(httpx.ConnectTimeout("connect timed out"))
+    assert is_retryable(APIError("No data received for BIST:GARAN"))
+    assert is_retryable(APIError("Service unavailable", status_code=503))
+
+    not_found = httpx.Response(404, request=response.request)
+    assert not is_retryable(httpx.HTTPStatusError("404", request=response.request, response=not_found))
+    assert not is_retryable(TickerNotFoundError("GARANT"))
+    assert not is_retryable(InvalidPeriodError("2w"))
+    assert not is_retryable(BulkheadFullError("Upstream 'borsapy' is saturated"))
+    assert not is_retryable(KeyError("Close"))
+
+
+def test_backoff_waits_without_blocking_the_loop(budget):
+    calls, ticks = [], []
+
+    async def flaky():
+        calls.append(time.monotonic())
+        if len(calls) < 3:
+            raise ConnectionError("reset by peer")
+        return "ok"
+
+    async def heartbeat():
+        for _ in range(4):
+            ticks.append(1)
+            await asyncio.sleep(0.005)
+
+    async def run():
+        policy = RetryPolicy(attempts=3, base_delay=0.02, max_delay=0.04, jitter=0.0)
+        result, _ = await asyncio.gather(
+            call_with_retry("test-backoff", flaky, policy=policy), heartbeat()
+        )
+        return result
+
+    assert asyncio.run(run()) == "ok"
+    assert len(ticks) == 4
+    assert calls[1] - calls[0] >= 0.02 and calls[2] - calls[1] >= 0.04
+    stats = retry_stats()["upstreams"]["test-backoff"]
+    assert stats["retries"] == 2 and stats["recovered"] == 1
+
+
+def test_jitter_spreads_the_callers_out():
+    policy = RetryPolicy(base_delay=1.0, max_delay=8.0, jitter=0.5)
+    delays = {round(policy.delay(2), 3) for _ in range(20)}
+    assert len(delays) > 1
+    assert all(1.0 <= d <= 2.0 for d in delays)
+
+
+def test_a_non_retryable_error_is_raised_after_one_attempt(budget):
+    calls = []
+
+    async def unknown():
+        calls.append(1)
+        raise TickerNotFoundError("GARANT")
+
+    with pytest.raises(TickerNotFoundError):
+        asyncio.run(call_with_retry("test-miss", unknown, policy=FAST))
+    assert calls == [1]
+    assert retry_stats()["upstreams"]["test-miss"]["not_retryable"] == 1
+
+
+def test_an_outage_drains_the_budget_instead_of_multiplying_traffic():
+    set_retry_budget("test-outage", RetryBudget(ratio=0.1, reserve_per_second=0.5, window=10))
+    calls = []
+
+    async def down():
+        calls.append(1)
+        raise ConnectionError("connection refused")
+
+    async def run():
+        for _ in range(50):
+            with pytest.raises(ConnectionError):
+                await call_with_retry("test-outage", down, policy=FAST)
+
+    try:
+        asyncio.run(run())
+        stats = retry_budget("test-outage").stats()
+    finally:
+        set_retry_budget("test-outage", None)
+    # 50 calls, 3 attempts each without a budget: 150. The budget allows 5 + 5.
+    assert len(calls) <= 50 + 10
+    assert stats["denied"] > 0
+    assert retry_stats()["upstreams"]["test-outage"]["budget_denied"] > 0
+
+
+def test_bist_history_goes_through_the_borsapy_policy(budget):
+    calls = []
+
+    def history(**kwargs):
+        calls.append(1)
+        if len(calls) < 2:
+            raise APIError("No data received for BIST:GARAN")
+        import pandas as pd
+        idx = pd.to_datetime(["2026-07-09", "2026-07-10"])
+        return pd.DataFrame(
+            {"Open": [1.0, 1.1], "High": [1.2, 1.2], "Low": [0.9, 1.0],
+             "Close": [1.1, 1.15], "Volume": [10, 11]}, index=idx,
+        )
+
+    ticker = MagicMock()
+    ticker.history = history
+    provider = BorsapyProvider()
+    with patch.object(provider, "_get_ticker", return_value=ticker):
+        result = asyncio.run(provider.get_finansal_veri("GARAN", period="1mo"))
+
+    assert "error" not in result and len(result["data"]) == 2
+    assert len(calls) == 2
+    assert retry_stats()["upstreams"]["borsapy"]["recovered"] >= 1
+
+
+def test_a_noisy_upstream_keeps_its_retries_and_leaves_the_others_theirs(budget):
+    """borsapy drops about half its history calls in normal operation. On one budget
+    shared by every upstream at 0.2, that drop rate alone drained it: most dropped
+    calls got no retry, and neither did any other upstream."""
+    attempts = []
+
+    async def drops_every_other():
+        attempts.append(1)
+        if len(attempts) % 2:
+            raise APIError("No data received for BIST:GARAN")
+        return "ok"
+
+    async def run():
+        for _ in range(100):
+            await call_with_retry("borsapy", drops_every_other, policy=FAST)
+
+    asyncio.run(run())
+    stats = retry_stats()["budgets"]["borsapy"]
+    assert stats["first_attempts"] == 100 and stats["retries"] == 100
+    assert stats["denied"] == 0
+    assert retry_budget("yahoo").try_retry()
+
+
+def test_budget_ratios_are_configured_per_upstream(budget, monkeypatch):
+    monkeypatch.setenv("RETRY_BUDGET_RATIO", "0.3,tefas=0.5")
+    assert RetryBudget.for_upstream("yahoo").ratio == 0.3
+    assert RetryBudget.for_upstream("tefas").ratio == 0.5
+    assert RetryBudget.for_upstream("borsapy").ratio == 1.2
@@ -12,3 +12,11 @@ def test_server_exposes_23_tools():
 def test_compare_assets_is_exposed():
     tools = asyncio.run(app.get_tools())
     assert "compare_assets" in tools
+
+
+def test_the_response_cache_runs_inside_the_deadline():
+    """Outside it, a partial answer after the deadline was cached and replayed."""
+    from unified_mcp_server import cache_middleware, deadline_middleware
+
+    order = [id(mw) for mw in app.middleware]
+    assert order.index(id(deadline_middleware)) < order.index(id(cache_middleware))
@@ -0,0 +1,157 @@
+"""Slow upstreams serve an expired entry at once and refresh it in the background.
+
+İş Yatırım statements, TEFAS fund info and the KAP company Excel take seconds and
+sometimes time out. Whoever arrived just after the TTL used to wait for that refetch,
+which is what the tail latency of get_financial_statements and get_fund_data was made of.
+"""
+import asyncio
+from datetime import datetime
+from unittest.mock import MagicMock, patch
+from zoneinfo import ZoneInfo
+
+import pandas as pd
+
+from models.unified_base import MarketType, StatementType
+from providers.borsapy_provider import BorsapyProvider
+from providers.cache import CacheNamespace
+from providers.market_router import MarketRouter
+
+
+class Clock:
+    def __init__(self, now=1000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+def _counting_loader(values):
+    calls = []
+
+    async def loader():
+        calls.append(len(calls))
+        await asyncio.sleep(0.01)
+        value = values[min(len(calls) - 1, len(values) - 1)]
+        if isinstance(value, Exception):
+            raise value
+        return value
+
+    return loader, calls
+
+
+def test_an_expired_value_is_served_at_once_and_refreshed_once():
+    ns = CacheNamespace("test.swr", ttl=60)
+    loader, calls = _counting_loader(["v1", "v2"])
+    clock = Clock()
+
+    async def run():
+        first = await ns.get_or_revalidate("k", loader, max_stale=3600)
+        clock.now += 120
+        burst = await asyncio.gather(
+            *(ns.get_or_revalidate("k", loader, max_stale=3600) for _ in range(5))
+        )
+        await asyncio.sleep(0.05)
+        after = await ns.get_or_revalidate("k", loader, max_stale=3600)
+        return first, burst, after
+
+    with patch("providers.cache.time.time", clock):
+        first, burst, after = asyncio.run(run())
+
+    assert first == ("v1", None)
+    assert all(value == "v1" and age == 120 for value, age in burst)
+    assert len(calls) == 2, "five stale reads must start one refresh, not five"
+    assert after == ("v2", None)
+    assert ns.stale_served == 5
+    assert ns.refreshes == 1
+
+
+def test_past_max_stale_the_caller_waits_for_the_load():
+    ns = CacheNamespace("test.swr_bound", ttl=60)
+    loader, calls = _counting_loader(["v1", "v2"])
+    clock = Clock()
+
+    async def run():
+        await ns.get_or_revalidate("k", loader, max_stale=300)
+        clock.now += 60 + 301
+        return await ns.get_or_revalidate("k", loader, max_stale=300)
+
+    with patch("providers.cache.time.time", clock):
+        assert asyncio.run(run()) == ("v2", None)
+    assert ns.stale_served == 0
+
+
+def test_a_failed_refresh_keeps_the_stale_value_servable():
+    ns = CacheNamespace("test.swr_failure", ttl=60)
+    loader, calls = _counting_loader(["v1", RuntimeError("timeout")])
+    clock = Clock()
+
+    async def run():
+        await ns.get_or_revalidate("k", loader, max_stale=3600)
+        clock.now += 120
+        await ns.get_or_revalidate("k", loader, max_stale=3600)
+        await asyncio.sleep(0.05)
+        return await ns.get_or_revalidate("k", loader, max_stale=3600)
+
+    with patch("providers.cache.time.time", clock):
+        value, age = asyncio.run(run())
+
+    assert value == "v1" and age == 120
+    assert ns.load_errors == 1
+
+
+def test_a_stale_statement_is_flagged_in_metadata_warnings():
+    provider = BorsapyProvider()
+    frame = pd.DataFrame({"2025-12-31": [100.0]}, index=["Toplam Varlıklar"])
+    provider._get_financial_data = MagicMock(return_value=frame)
+
+    router = MarketRouter()
+    router._client = MagicMock(get_bilanco=provider.get_bilanco)
+    clock = Clock()
+
+    async def run():
+        fresh = await router.get_financial_statements(
+            "GARAN", MarketType.BIST, StatementType.BALANCE
+        )
+        clock.now += 600
+        stale = await router.get_financial_statements(
+            "GARAN", MarketType.BIST, StatementType.BALANCE
+        )
+        await asyncio.sleep(0.05)
+        return fresh, stale
+
+    wednesday_noon = datetime(2026, 7, 8, 12, 0, tzinfo=ZoneInfo("Europe/Istanbul"))
+    with patch("providers.cache.time.time", clock), \
+            patch("providers.ttl_policy._now", return_value=wednesday_noon):
+        fresh, stale = asyncio.run(run())
+
+    assert fresh["metadata"]["warnings"] == []
+    assert stale["statements"][0]["data"] == {"Toplam Varlıklar": [100.0]}
+    assert any("from cache" in w for w in stale["metadata"]["warnings"])
+    assert provider._get_financial_data.call_count == 2
+
+
+def test_the_background_refresh_is_not_cut_short_by_the_callers_deadline():
+    from providers.deadline import deadline_scope, within_deadline
+
+    ns = CacheNamespace("test.swr_deadline", ttl=60)
+    clock = Clock()
+
+    async def loader():
+        # An upstream call, bounded by whatever deadline it runs under.
+        await within_deadline(asyncio.sleep(0.2))
+        return f"v{clock.now}"
+
+    async def run():
+        await ns.get_or_revalidate("k", loader, max_stale=3600)
+        clock.now += 120
+        with deadline_scope(0.05):
+            served = await ns.get_or_revalidate("k", loader, max_stale=3600)
+        await asyncio.sleep(0.3)
+        return served
+
+    with patch("providers.cache.time.time", clock):
+        served = asyncio.run(run())
+
+    assert served == ("v1000.0", 120)
+    assert ns.get_stale("k") == "v1120.0"
+    assert ns.load_errors == 0
@@ -0,0 +1,91 @@
+"""Long histories bucketed without a DataFrame round trip.
+
+get_finansal_veri built a FinansalVeriNoktasi and a dict per bar with iterrows, and
+TokenOptimizer turned the dicts back into a DataFrame to resample them, then iterrows'd
+the buckets into dicts again: a 5y or max history did two round trips to return a few
+dozen bars. aggregate_ohlcv buckets the frame's columns in one NumPy pass, and these
+tests hold it to what pandas' resample answered.
+"""
+import asyncio
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from token_optimizer import TokenOptimizer, aggregate_ohlcv
+
+PANDAS = {"acilis": "first", "en_yuksek": "max", "en_dusuk": "min", "kapanis": "last", "hacim": "sum"}
+
+
+def _frame(n, tz="Europe/Istanbul", start="2021-01-04"):
+    rng = np.random.default_rng(7)
+    close = 50 + np.cumsum(rng.normal(0, 1, n))
+    index = pd.bdate_range(start, periods=n, tz=tz) + pd.Timedelta(hours=18)
+    return pd.DataFrame(
+        {"Open": close - 0.3, "High": close + 1, "Low": close - 1, "Close": close,
+         "Volume": rng.integers(1, 10**6, n)},
+        index=index,
+    )
+
+
+@pytest.mark.parametrize("freq", ["D", "W", "ME", "QE"])
+@pytest.mark.parametrize("tz", [None, "America/New_York"])
+def test_buckets_match_pandas_resample(freq, tz):
+    df = _frame(700, tz=tz).rename(columns=dict(zip(["Open", "High", "Low", "Close", "Volume"], PANDAS)))
+    df = df.astype(float)
+    # Holes a bucket must skip, not propagate.
+    df.iloc[[3, 40, 41, 300], 0] = np.nan
+    df.iloc[[10, 299, 500], 3] = np.nan
+
+    stamps = (df.index.tz_localize(None) if tz else df.index).as_unit("ns").to_numpy()
+    ends, folded = aggregate_ohlcv(stamps, {name: df[name].to_numpy() for name in PANDAS}, freq)
+
+    expected = df.resample(freq).agg(PANDAS).dropna()
+    last = df.index.to_series().resample(freq).max()
+    assert list(df.index[ends]) == [last[label] for label in expected.index]
+    for name in PANDAS:
+        np.testing.assert_allclose(folded[name], expected[name].to_numpy())
+
+
+def test_a_bucket_is_labelled_with_its_last_bar():
+    df = _frame(400, start="2025-01-02")    # ends mid-quarter
+    points = TokenOptimizer.optimize_ohlc_frame(df, 1825)
+
+    assert points[-1]["tarih"] == df.index[-1].to_pydatetime()
+    assert points[-1]["kapanis"] == df["Close"].iloc[-1]
+    assert points[0]["acilis"] == df["Open"].iloc[0]
+    assert sum(point["hacim"] for point in points) == df["Volume"].sum()
+    assert len(points) == 7
+
+
+def test_a_short_window_comes_back_bar_for_bar():
+    df = _frame(20)
+    points = TokenOptimizer.optimize_ohlc_frame(df, 28)
+
+    assert [point["tarih"] for point in points] == list(df.index.to_pydatetime())
+    assert [point["kapanis"] for point in points] == df["Close"].tolist()
+    # The dict path still agrees with the frame path.
+    assert TokenOptimizer.optimize_ohlc_data(points, 28) == points
+
+
+def test_bist_history_is_bucketed_without_iterrows(monkeypatch):
+    from providers.borsapy_provider import BorsapyProvider
+
+    provider = BorsapyProvider()
+    df = _frame(1250)
+
+    async def history(ticker, ticker_kodu, **kwargs):
+        return df
+
+    def no_iterrows(self):
+        raise AssertionError("iterrows")
+
+    monkeypatch.setattr(provider, "_history_with_retry", history)
+    monkeypatch.setattr(pd.DataFrame, "iterrows", no_iterrows)
+    result = asyncio.run(provider.get_finansal_veri("GARAN", period="5y"))
+
+    assert result["ham_veri_sayisi"] == 1250 and result["optimizasyon_uygulandı"]
+    assert result["toplam_veri"] == len(result["data"]) == 20
+    # Dated by the Istanbul day, as FinansalVeriNoktasi parsed it before.
+    last = df.index[-1]
+    assert result["data"][-1]["tarih"] == pd.Timestamp(last.date()).to_pydatetime()
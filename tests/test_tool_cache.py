@@ -0,0 +1,155 @@
+"""Tool responses are cached per tool, under canonical argument keys.
+
+The old middleware cached three tools at a flat hour and keyed on the raw argument
+JSON, so `["GARAN","AKBNK"]` and `["akbnk","garan"]` each went upstream -- and the
+LLM traffic this server sees is mostly that: the same question, respelled.
+"""
+import asyncio
+import json
+from datetime import datetime
+from unittest.mock import patch
+from zoneinfo import ZoneInfo
+
+from fastmcp import Client, FastMCP
+
+from providers.tool_cache import (
+    ToolResponseCache, canonical_arguments, is_degraded, load_cache_config, note_result,
+    parse_ttl_overrides, resolve_ttl,
+)
+
+
+def _server(config):
+    calls = []
+    app = FastMCP(name="cache-test")
+
+    @app.tool(annotations={"readOnlyHint": True, "idempotentHint": True})
+    async def get_quote(symbol: str | list[str], market: str, exchange: str | None = None) -> str:
+        calls.append(("get_quote", symbol))
+        return json.dumps({"symbol": symbol, "n": len(calls)})
+
+    @app.tool(annotations={"readOnlyHint": True})
+    async def get_news(symbol: str) -> str:
+        calls.append(("get_news", symbol))
+        return str(len(calls))
+
+    app.add_middleware(ToolResponseCache(config))
+    return app, calls
+
+
+def _config(**ttls):
+    return {"enabled": True, "default_ttl": 300, "ttls": ttls}
+
+
+def test_symbol_spelling_and_order_do_not_split_the_cache():
+    app, calls = _server(_config())
+
+    async def run():
+        async with Client(app) as client:
+            await client.call_tool("get_quote", {"symbol": ["GARAN", "AKBNK"], "market": "bist"})
+            await client.call_tool("get_quote", {"symbol": ["akbnk", " garan"], "market": "bist"})
+            await client.call_tool(
+                "get_quote", {"symbol": ["AKBNK", "GARAN"], "market": "bist", "exchange": None}
+            )
+
+    asyncio.run(run())
+    assert len(calls) == 1
+
+
+def test_a_list_and_a_single_symbol_stay_distinct():
+    """They return different shapes; one must never answer for the other."""
+    app, calls = _server(_config())
+
+    async def run():
+        async with Client(app) as client:
+            await client.call_tool("get_quote", {"symbol": "GARAN", "market": "bist"})
+            await client.call_tool("get_quote", {"symbol": ["GARAN"], "market": "bist"})
+
+    asyncio.run(run())
+    assert len(calls) == 2
+
+
+def test_only_idempotent_or_configured_tools_are_cached_and_zero_disables():
+    app, calls = _server(_config(get_quote=0))
+
+    async def run():
+        async with Client(app) as client:
+            for _ in range(2):
+                await client.call_tool("get_quote", {"symbol": "GARAN", "market": "bist"})
+                await client.call_tool("get_news", {"symbol": "GARAN"})
+
+    asyncio.run(run())
+    assert len(calls) == 4
+
+
+def test_fx_symbols_keep_their_case():
+    """`gram-altin` is the asset's name; upper-casing it is lossy."""
+    assert canonical_arguments({"symbol": "gram-altin", "market": "fx"})["symbol"] == "gram-altin"
+    assert canonical_arguments({"symbol": "garan", "market": "bist"})["symbol"] == "GARAN"
+
+
+def test_schema_defaults_are_filled_in():
+    parameters = {"properties": {"symbol": {}, "timeframe": {"default": "1d"}}}
+    assert canonical_arguments({"symbol": "GARAN"}, parameters) == canonical_arguments(
+        {"symbol": "GARAN", "timeframe": "1d"}, parameters
+    )
+
+
+def test_session_ttls_follow_the_calls_own_market():
+    evening = datetime(2026, 7, 8, 19, 0, tzinfo=ZoneInfo("Europe/Istanbul"))
+    with patch("providers.ttl_policy._now", return_value=evening):
+        bist = resolve_ttl("session:quote", {"market": "bist"})
+        crypto = resolve_ttl("session:quote", {"market": "crypto"})
+    assert bist > 60 * 60, "BIST has closed: hold until the open"
+    assert crypto <= 60, "crypto never closes"
+
+
+def test_operators_tune_it_from_a_file_and_the_env(tmp_path, monkeypatch):
+    path = tmp_path / "cache.json"
+    path.write_text(json.dumps({"default_ttl": 60, "ttls": {"get_news": 120, "get_quote": 5}}))
+    monkeypatch.setenv("TOOL_CACHE_CONFIG", str(path))
+    monkeypatch.setenv("TOOL_CACHE_TTLS", "get_quote=30, get_profile=session:statements, junk")
+
+    config = load_cache_config()
+
+    assert config["default_ttl"] == 60
+    assert config["ttls"]["get_news"] == 120
+    assert config["ttls"]["get_quote"] == 30, "the env wins over the file"
+    assert config["ttls"]["get_profile"] == "session:statements"
+
+
+def test_tool_cache_can_be_switched_off(monkeypatch):
+    monkeypatch.setenv("TOOL_CACHE_ENABLED", "false")
+    assert load_cache_config()["enabled"] is False
+    assert parse_ttl_overrides("") == {}
+
+
+def test_a_degraded_answer_is_not_cached():
+    """A symbol that failed, a stale note or a partial answer after the deadline was
+    held for the full TTL -- days, after a close -- and replayed to every caller."""
+    calls = []
+    app = FastMCP(name="cache-test")
+
+    @app.tool(annotations={"readOnlyHint": True, "idempotentHint": True})
+    async def get_quote(symbol: str | list[str], market: str) -> str:
+        calls.append(symbol)
+        payload = {"data": [symbol], "metadata": {"failed_count": len(calls) == 1, "warnings": []}}
+        note_result(payload)
+        return json.dumps(payload)
+
+    cache = ToolResponseCache(_config())
+    app.add_middleware(cache)
+
+    async def run():
+        async with Client(app) as client:
+            for _ in range(3):
+                await client.call_tool("get_quote", {"symbol": ["GARAN", "XXXX"], "market": "bist"})
+
+    asyncio.run(run())
+    assert len(calls) == 2, "the failed answer was retried, the whole one kept"
+    assert cache.stats()["not_cached_degraded"] == 1
+
+
+def test_warnings_anywhere_in_a_payload_degrade_it():
+    assert is_degraded({"statements": [{"rows": [], "warnings": ["from cache, 5h old"]}]})
+    assert is_degraded({"warnings": ["BTCUSDT: deadline exceeded"], "data": []})
+    assert not is_degraded({"data": [1, 2], "metadata": {"failed_count": 0, "warnings": []}})
@@ -0,0 +1,101 @@
+"""Cache expiry follows the market's session, not a flat clock.
+
+With one TTL for everything, a BIST quote fetched at 18:30 expired a minute later and
+was refetched, unchanged, all night -- while the same TTL was too long for a quote in
+the middle of the session.
+"""
+import asyncio
+from datetime import datetime, timedelta
+from unittest.mock import MagicMock, patch
+from zoneinfo import ZoneInfo
+
+from models.unified_base import MarketType
+from providers.market_router import MarketRouter
+from providers.ttl_policy import (
+    QUOTE_TTL_OPEN, FUND_NAV_TTL_GRACE, DataKind, SESSIONS, ttl_for,
+)
+
+IST = ZoneInfo("Europe/Istanbul")
+NY = ZoneInfo("America/New_York")
+
+
+def test_a_bist_quote_is_short_lived_in_session_and_held_until_the_open_after_it():
+    wednesday_noon = datetime(2026, 7, 8, 12, 0, tzinfo=IST)
+    wednesday_evening = datetime(2026, 7, 8, 19, 0, tzinfo=IST)
+
+    assert ttl_for(MarketType.BIST, DataKind.QUOTE, wednesday_noon) == QUOTE_TTL_OPEN
+    # 19:00 -> 09:40 the next morning.
+    assert ttl_for("bist", DataKind.QUOTE, wednesday_evening) == timedelta(
+        hours=14, minutes=40
+    ).total_seconds()
+
+
+def test_a_friday_close_holds_until_monday():
+    friday_evening = datetime(2026, 7, 10, 19, 0, tzinfo=IST)
+    monday_open = datetime(2026, 7, 13, 9, 40, tzinfo=IST)
+
+    assert ttl_for("bist", DataKind.DAILY_BAR, friday_evening) == (
+        monday_open - friday_evening
+    ).total_seconds()
+
+
+def test_fixed_holidays_are_closed():
+    """15 July is Democracy Day; BIST does not trade."""
+    holiday_noon = datetime(2026, 7, 15, 12, 0, tzinfo=IST)
+    assert not SESSIONS["bist"].is_open(holiday_noon)
+    assert ttl_for("bist", DataKind.QUOTE, holiday_noon) > QUOTE_TTL_OPEN
+
+
+def test_us_sessions_run_on_new_york_time():
+    # 15:00 in Istanbul is 08:00 in New York: BIST open, NYSE not yet.
+    moment = datetime(2026, 7, 8, 15, 0, tzinfo=IST)
+    assert SESSIONS["bist"].is_open(moment)
+    assert not SESSIONS["us"].is_open(moment)
+    assert ttl_for("us", DataKind.QUOTE, moment) == timedelta(
+        hours=1, minutes=30
+    ).total_seconds()
+
+
+def test_crypto_never_closes():
+    sunday_night = datetime(2026, 7, 12, 23, 0, tzinfo=NY)
+    assert ttl_for(MarketType.CRYPTO_TR, DataKind.QUOTE, sunday_night) == QUOTE_TTL_OPEN
+
+
+def test_a_fund_nav_is_held_until_the_next_publication_and_polled_just_after_it():
+    before_publication = datetime(2026, 7, 8, 8, 0, tzinfo=IST)
+    just_after = datetime(2026, 7, 8, 10, 30, tzinfo=IST)
+    afternoon = datetime(2026, 7, 8, 15, 0, tzinfo=IST)
+
+    assert ttl_for("fund", DataKind.FUND_NAV, before_publication) == 2 * 60 * 60
+    assert ttl_for("fund", DataKind.FUND_NAV, just_after) == FUND_NAV_TTL_GRACE
+    # 15:00 -> 10:00 the next morning.
+    assert ttl_for("fund", DataKind.FUND_NAV, afternoon) == 19 * 60 * 60
+
+
+def test_the_daily_bar_is_final_once_the_session_has_closed():
+    session = SESSIONS["bist"]
+    assert str(session.last_closed_date(datetime(2026, 7, 8, 14, 0, tzinfo=IST))) == "2026-07-07"
+    assert str(session.last_closed_date(datetime(2026, 7, 8, 18, 30, tzinfo=IST))) == "2026-07-08"
+
+
+def test_router_quotes_are_cached_for_the_session_ttl():
+    calls = []
+
+    async def get_hizli_bilgi(symbol):
+        calls.append(symbol)
+        return {"hizli_bilgi": MagicMock(symbol=symbol, long_name="Garanti", last_price=100.0)}
+
+    router = MarketRouter()
+    router._client = MagicMock(get_hizli_bilgi=get_hizli_bilgi)
+
+    async def twice():
+        first = await router.get_quick_info("GARAN", MarketType.BIST)
+        first["metadata"]["warnings"].append("decorated by the server")
+        return await router.get_quick_info("GARAN", MarketType.BIST)
+
+    evening = datetime(2026, 7, 8, 19, 0, tzinfo=IST)
+    with patch("providers.ttl_policy._now", return_value=evening):
+        second = asyncio.run(twice())
+
+    assert calls == ["GARAN"], "a closed session's quote must not be refetched"
+    assert second["metadata"]["warnings"] == [], "callers must not share one result object"
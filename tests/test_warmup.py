@@ -0,0 +1,105 @@
+"""Startup warmup runs the slow reference loads concurrently and gates readiness.
+
+The first calls after a deploy used to pay for the KAP Excel, the Takasbank fund list,
+the sector index memberships and the resolver universes -- several seconds each, on
+whichever user happened to arrive first.
+"""
+import asyncio
+import time
+from unittest.mock import MagicMock
+
+from providers.market_router import MarketRouter
+from providers.warmup import Warmup
+
+
+def _sleeper(seconds, calls, name, fail=False):
+    async def step():
+        calls.append(name)
+        await asyncio.sleep(seconds)
+        if fail:
+            raise RuntimeError(f"{name} upstream down")
+    return step
+
+
+def test_steps_run_concurrently_and_readiness_follows_them():
+    calls = []
+    warmup = Warmup({
+        "a": _sleeper(0.1, calls, "a"),
+        "b": _sleeper(0.1, calls, "b"),
+        "c": _sleeper(0.1, calls, "c"),
+    })
+
+    async def run():
+        assert not warmup.ready
+        started = time.monotonic()
+        warmup.start()
+        await warmup.wait()
+        return time.monotonic() - started
+
+    elapsed = asyncio.run(run())
+    assert warmup.ready
+    assert sorted(calls) == ["a", "b", "c"]
+    assert elapsed < 0.25, "three 0.1s steps should overlap, not queue"
+    assert {s["state"] for s in warmup.status()["steps"].values()} == {"ok"}
+
+
+def test_a_failed_step_is_reported_but_does_not_hold_readiness():
+    calls = []
+    warmup = Warmup({"kap": _sleeper(0.01, calls, "kap", fail=True), "ok": _sleeper(0, calls, "ok")})
+
+    async def run():
+        warmup.start()
+        await warmup.wait()
+
+    asyncio.run(run())
+    status = warmup.status()
+    assert status["ready"]
+    assert status["steps"]["kap"]["state"] == "failed"
+    assert "upstream down" in status["steps"]["kap"]["error"]
+
+
+def test_the_timeout_makes_the_machine_ready_while_a_slow_step_carries_on():
+    calls = []
+    warmup = Warmup({"slow": _sleeper(0.3, calls, "slow")}, timeout=0.05)
+
+    async def run():
+        warmup.start()
+        await warmup.wait()
+        ready_at_timeout = warmup.ready, warmup.status()["steps"]["slow"]["state"]
+        await asyncio.sleep(0.4)
+        return ready_at_timeout
+
+    assert asyncio.run(run()) == (True, "running")
+    assert warmup.timed_out
+    assert warmup.status()["steps"]["slow"]["state"] == "ok"
+
+
+def test_operators_choose_steps_or_switch_warmup_off(monkeypatch):
+    steps = {"kap_companies": _sleeper(0, [], "k"), "sector_indices": _sleeper(0, [], "s")}
+
+    monkeypatch.setenv("WARMUP_STEPS", "sector_indices, nonsense")
+    monkeypatch.setenv("WARMUP_TIMEOUT", "30")
+    warmup = Warmup.from_env(steps)
+    assert list(warmup.steps) == ["sector_indices"]
+    assert warmup.timeout == 30
+
+    monkeypatch.setenv("WARMUP_ENABLED", "false")
+    assert Warmup.from_env(steps).ready, "disabled warmup must never hold readiness"
+
+
+def test_the_router_warms_sector_memberships_once_for_later_peer_lookups():
+    router = MarketRouter()
+    router._client = MagicMock()
+    loaded = []
+
+    async def components(code):
+        loaded.append(code)
+        return ["GARAN", "AKBNK"] if code == "XBANK" else []
+
+    router._index_components = components
+    assert set(router.warmup_steps()) == {
+        "kap_companies", "asset_resolver", "sector_indices", "scanner_fields",
+    }
+
+    asyncio.run(router.warmup_steps()["sector_indices"]())
+    assert "XBANK" in loaded and "XU100" in loaded
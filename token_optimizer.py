@@ -1,15 +1,118 @@
 """
 Token Optimizer for MCP Server
 Optimizes data outputs to prevent context window overflow for long time frames.
+
+Long OHLC histories are bucketed by `aggregate_ohlcv`, one NumPy pass over the
+columns. optimize_ohlc_data used to build a DataFrame from the row dicts, parse the
+dates, resample, and iterrows the result back into dicts -- and get_finansal_veri
+had built those dicts with iterrows in the first place -- so every 5y or max history
+paid for two DataFrame round trips to return twenty quarterly bars. The providers
+now hand their frame's columns to `optimize_ohlc_frame`, and the row dicts are only
+built for the bars returned. The buckets are pandas' own: weeks end on Sunday,
+months and quarters on the calendar, each labelled with the last observation it
+contains. `python -m benchmarks.token_optimizer` measures the difference.
 """
 
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Mapping, Optional, Sequence, Tuple
+import numpy as np
 import pandas as pd
 from datetime import datetime
 import logging
 
 logger = logging.getLogger(__name__)
 
+# How each OHLC column folds into a bucket, Turkish and English names alike.
+OHLC_AGGREGATIONS = {
+    'acilis': 'first',
+    'en_yuksek': 'max',
+    'en_dusuk': 'min',
+    'kapanis': 'last',
+    'hacim': 'sum',
+    'open': 'first',
+    'high': 'max',
+    'low': 'min',
+    'close': 'last',
+    'volume': 'sum',
+}
+
+# A frame's columns under the names get_finansal_veri answers with.
+_FRAME_COLUMNS = {
+    'acilis': 'Open',
+    'en_yuksek': 'High',
+    'en_dusuk': 'Low',
+    'kapanis': 'Close',
+    'hacim': 'Volume',
+}
+
+
+def _bucket_ids(stamps: np.ndarray, freq: str) -> np.ndarray:
+    """The bucket of each wall-clock datetime64 stamp, as an integer that grows with time."""
+    if freq == 'D':
+        return stamps.astype('datetime64[D]').astype(np.int64)
+    if freq == 'W':
+        # 1970-01-01 was a Thursday: shifting by three days starts each week on Monday,
+        # so it ends on Sunday, as pandas' 'W' (W-SUN) does.
+        return (stamps.astype('datetime64[D]').astype(np.int64) + 3) // 7
+    months = stamps.astype('datetime64[M]').astype(np.int64)
+    if freq == 'ME':
+        return months
+    if freq == 'QE':
+        return months // 3
+    raise ValueError(f"Unsupported sampling frequency: {freq}")
+
+
+def aggregate_ohlcv(
+    stamps: np.ndarray,
+    columns: Mapping[str, np.ndarray],
+    freq: str,
+) -> Tuple[np.ndarray, Dict[str, np.ndarray]]:
+    """Fold bars into `freq` buckets ('D', 'W', 'ME', 'QE').
+
+    `stamps` are wall-clock datetime64 values in ascending order, and `columns` float
+    arrays named as in OHLC_AGGREGATIONS. Returns the position of each bucket's last
+    bar -- its label -- and the bucketed columns. NaNs are skipped as pandas skips
+    them; a bucket left with a NaN in any column is dropped, as resample().agg()
+    .dropna() drops it.
+    """
+    n = len(stamps)
+    if n == 0:
+        return np.empty(0, dtype=np.int64), {name: np.empty(0) for name in columns}
+    ids = _bucket_ids(stamps, freq)
+    starts = np.flatnonzero(np.r_[True, ids[1:] != ids[:-1]])
+    ends = np.r_[starts[1:], n] - 1
+    positions = np.arange(n)
+
+    out: Dict[str, np.ndarray] = {}
+    keep = np.ones(len(starts), dtype=bool)
+    for name, values in columns.items():
+        how = OHLC_AGGREGATIONS[name]
+        missing = np.isnan(values)
+        if how == 'max':
+            folded = np.fmax.reduceat(values, starts)
+        elif how == 'min':
+            folded = np.fmin.reduceat(values, starts)
+        elif how == 'sum':
+            folded = np.add.reduceat(np.where(missing, 0.0, values), starts)
+        else:
+            # The first (last) bar in the bucket that has a value.
+            if how == 'first':
+                pick = np.minimum.reduceat(np.where(missing, n, positions), starts)
+            else:
+                pick = np.maximum.reduceat(np.where(missing, -1, positions), starts)
+            found = (pick >= starts) & (pick <= ends)
+            folded = np.where(found, values[np.clip(pick, 0, n - 1)], np.nan)
+        keep &= ~np.isnan(folded)
+        out[name] = folded
+    return ends[keep], {name: folded[keep] for name, folded in out.items()}
+
+
+def _wall_clock(index: pd.DatetimeIndex) -> np.ndarray:
+    """The index's local date and time, which is what pandas buckets a tz-aware index by."""
+    if index.tz is not None:
+        index = index.tz_localize(None)
+    return index.as_unit('ns').to_numpy()
+
+
 class TokenOptimizer:
     """
     Optimizes financial data outputs based on time frame duration to prevent context window overflow.
@@ -78,85 +181,96 @@ class TokenOptimizer:
             return data_points
         
         try:
-            # Convert to DataFrame for easier manipulation
-            df = pd.DataFrame(data_points)
-            
-            # Ensure we have a datetime column
-            if 'tarih' in df.columns:
-                df['tarih'] = pd.to_datetime(df['tarih'])
-                df.set_index('tarih', inplace=True)
-            elif 'date' in df.columns:
-                df['date'] = pd.to_datetime(df['date'])
-                df.set_index('date', inplace=True)
-            else:
+            first = data_points[0]
+            date_col = 'tarih' if 'tarih' in first else 'date' if 'date' in first else None
+            if date_col is None:
                 logger.warning("No date column found, returning original data")
                 return data_points
-            
-            # Get sampling frequency
-            freq = TokenOptimizer.get_sampling_frequency(time_frame_days)
-            
-            # Resample OHLC data
-            ohlc_mapping = {
-                'acilis': 'first',
-                'en_yuksek': 'max',
-                'en_dusuk': 'min',
-                'kapanis': 'last',
-                'hacim': 'sum'
-            }
-            
-            # Handle different column names (Turkish and English)
-            available_mapping = {}
-            for turkish_col, agg_func in ohlc_mapping.items():
-                if turkish_col in df.columns:
-                    available_mapping[turkish_col] = agg_func
-            
-            # English column names fallback
-            english_mapping = {
-                'open': 'first',
-                'high': 'max',
-                'low': 'min',
-                'close': 'last',
-                'volume': 'sum'
-            }
-            
-            for eng_col, agg_func in english_mapping.items():
-                if eng_col in df.columns:
-                    available_mapping[eng_col] = agg_func
-            
-            if not available_mapping:
+
+            names = [name for name in OHLC_AGGREGATIONS if name in first]
+            if not names:
                 logger.warning("No OHLC columns found, returning original data")
                 return data_points
-            
-            # Resample data
-            resampled_df = df.resample(freq).agg(available_mapping).dropna()
 
-            # Relabel each bucket with the LAST OBSERVATION IT ACTUALLY CONTAINS.
-            #
-            # pandas labels a resampled bucket with its right edge, so a partial month
-            # came back stamped 2026-07-31 — three weeks into the future. A bar dated
-            # on a day that has not happened is not merely cosmetic: an endpoint lookup
-            # ("last bar on or before today") skips it, falls back to June's bar, and
-            # silently prices the window a month early.
-            bucket_last = df.index.to_series().resample(freq).max()
-            resampled_df.index = [
-                bucket_last.get(idx, idx) for idx in resampled_df.index
+            dates = pd.DatetimeIndex(pd.to_datetime([point[date_col] for point in data_points]))
+            columns = {
+                name: np.array([point.get(name) for point in data_points], dtype=float)
+                for name in names
+            }
+            order = np.argsort(_wall_clock(dates), kind='stable')
+            if (order != np.arange(len(order))).any():
+                dates = dates[order]
+                columns = {name: values[order] for name, values in columns.items()}
+
+            freq = TokenOptimizer.get_sampling_frequency(time_frame_days)
+            ends, folded = aggregate_ohlcv(_wall_clock(dates), columns, freq)
+            labels = dates[ends].to_pydatetime()
+            values = [folded[name].tolist() for name in names]
+            result = [
+                {'tarih': label, **dict(zip(names, row))}
+                for label, *row in zip(labels, *values)
             ]
 
-            # Convert back to list of dictionaries
-            result = []
-            for index, row in resampled_df.iterrows():
-                data_point = {'tarih': index.to_pydatetime() if hasattr(index, 'to_pydatetime') else index}
-                for col, value in row.items():
-                    if pd.notna(value):
-                        data_point[col] = float(value) if isinstance(value, (int, float)) else value
-                result.append(data_point)
-            
             logger.info(f"Optimized {len(data_points)} data points to {len(result)} points using {freq} sampling")
             return result
             
         except Exception as e:
             logger.error(f"Error optimizing OHLC data: {e}")
             return data_points
+
+    @staticmethod
+    def optimize_ohlc_frame(
+        frame: pd.DataFrame,
+        time_frame_days: int,
+        dates: Optional[Sequence[Any]] = None,
+    ) -> List[Dict[str, Any]]:
+        """
+        A history frame's bars as get_finansal_veri data points, optimized as
+        optimize_ohlc_data would optimize them, without building a dict per raw bar.
+        
+        Args:
+            frame: Bars indexed by timestamp, with Open/High/Low/Close[/Volume] columns
+            time_frame_days: Duration of time frame in days
+            dates: Each bar's `tarih` when returned unbucketed (default: its timestamp).
+                A bucket's `tarih` is its last bar's, parsed back into a datetime.
+            
+        Returns:
+            List[Dict]: Data points keyed tarih/acilis/en_yuksek/en_dusuk/kapanis/hacim
+        """
+        if dates is None:
+            dates = frame.index.to_pydatetime()
+        columns = {
+            name: (frame[col].to_numpy(dtype=float) if col in frame.columns
+                   else np.zeros(len(frame)))
+            for name, col in _FRAME_COLUMNS.items()
+        }
+
+        if len(frame) == 0 or not TokenOptimizer.should_optimize(frame.index, time_frame_days):
+            values = [columns[name].tolist() for name in _FRAME_COLUMNS]
+            return [
+                {'tarih': date, **dict(zip(_FRAME_COLUMNS, row))}
+                for date, *row in zip(dates, *values)
+            ]
+
+        index = pd.DatetimeIndex(frame.index)
+        stamps = _wall_clock(index)
+        if not index.is_monotonic_increasing:
+            order = np.argsort(stamps, kind='stable')
+            stamps = stamps[order]
+            dates = np.asarray(dates, dtype=object)[order]
+            columns = {name: values[order] for name, values in columns.items()}
+
+        freq = TokenOptimizer.get_sampling_frequency(time_frame_days)
+        ends, folded = aggregate_ohlcv(stamps, columns, freq)
+        labels = pd.DatetimeIndex(pd.to_datetime([dates[end] for end in ends])).to_pydatetime()
+        values = [folded[name].tolist() for name in _FRAME_COLUMNS]
+        result = [
+            {'tarih': label, **dict(zip(_FRAME_COLUMNS, row))}
+            for label, *row in zip(labels, *values)
+        ]
+
+        logger.info(f"Optimized {len(frame)} data points to {len(result)} points using {freq} sampling")
+        return result
     
     @staticmethod
     def optimize_crypto_data(data_points: List[Dict[str, Any]], time_frame_days: int) -> List[Dict[str, Any]]:
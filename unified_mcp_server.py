@@ -21,10 +21,15 @@ from typing import Annotated, Any, Dict, List, Literal, Optional, Union
 import urllib3
 from fastmcp import FastMCP
 from fastmcp.exceptions import ToolError
-from fastmcp.server.middleware.caching import ResponseCachingMiddleware, CallToolSettings
 from pydantic import Field
 
 from providers.market_router import market_router
+from providers.cache import set_shared_backend
+from providers.cache_backend import BackendStore, backend_from_env
+from providers.bulkhead import bounded_gather
+from providers.deadline import DeadlineMiddleware
+from providers.executors import run_blocking
+from providers.tool_cache import ToolResponseCache, note_result
 from providers.response_shaper import strip_nulls, cap_evds_payload, downsample_ohlcv, drop_allnull_statement_rows
 from providers.markdown_renderer import render_markdown
 from models.unified_base import (
@@ -102,21 +107,38 @@ IndexLiteral = Literal[
     "XU030", "XU100", "XBANK", "XUSIN", "XUMAL", "XUHIZ", "XUTEK",
     "XHOLD", "XGIDA", "XELKT", "XILTM", "XK100", "XK050", "XK030"
 ]
+# get_technical_analysis(constituents=True): the index table's rank keys and screens.
+IndexRankLiteral = Literal[
+    "rsi_14", "stochastic_k", "change_pct", "macd_histogram", "vs_sma50_pct", "vs_sma200_pct"
+]
+IndexScreenLiteral = Literal[
+    "oversold", "overbought", "above_sma50", "below_sma50",
+    "above_sma200", "below_sma200", "macd_bullish", "macd_bearish"
+]
 CalendarCountryLiteral = Literal["TR", "US", "EU", "DE", "GB", "JP", "CN"]
 # Only TR is served: the handler always calls BorsapyBondProvider, which is
 # Turkey-only. Offering "US" here returned Turkish yields under a US label.
 BondCountryLiteral = Literal["TR"]
 
+# --- Deadline Middleware ---
+# Every tool call runs under a per-tool deadline that reaches the provider and HTTP
+# calls it makes; what runs out of time becomes a warning, not a hang. Tunable via
+# TOOL_DEADLINES -- see providers/deadline.py. Registered first, so it wraps the
+# response cache: a partial answer is seen by the cache as the degraded result it is,
+# and one the deadline abandons never reaches it.
+deadline_middleware = DeadlineMiddleware.from_env()
+app.add_middleware(deadline_middleware)
+
 # --- Response Caching Middleware ---
-cache_middleware = ResponseCachingMiddleware(
-    call_tool_settings=CallToolSettings(
-        ttl=3600,  # 1 hour cache
-        included_tools=[
-            "search_symbol",
-            "get_profile",
-            "get_index_data",
-        ]
-    )
+# Per-tool TTLs over canonical argument keys; every idempotentHint tool is cached.
+# Tunable via TOOL_CACHE_ENABLED / TOOL_CACHE_CONFIG / TOOL_CACHE_TTLS — see
+# providers/tool_cache.py. With CACHE_BACKEND_URL set, the tool results and the
+# provider caches marked shared live in one store for every worker and replica --
+# see providers/cache_backend.py; without it, both stay in-process.
+cache_backend = backend_from_env()
+set_shared_backend(cache_backend)
+cache_middleware = ToolResponseCache(
+    **({"cache_storage": BackendStore(cache_backend)} if cache_backend else {})
 )
 app.add_middleware(cache_middleware)
 
@@ -140,9 +162,19 @@ def classify_tool_error(e: Exception, context: str) -> ToolError:
             "actions need the EVDS_API_KEY env var (free key at "
             "https://evds3.tcmb.gov.tr)."
         )
+    elif "deadline exceeded" in lower:
+        suggestion = (
+            "The request ran out of time. Narrow it -- fewer symbols, a shorter period "
+            "or a smaller ratio set -- and retry."
+        )
+    elif "circuit open" in lower:
+        suggestion = (
+            "This data source is failing right now and calls to it are paused. Retry "
+            "after the wait stated above, or use a tool backed by another source."
+        )
     elif any(t in lower for t in ("not found", "no data", "invalid ticker", "unknown symbol", "delisted")):
         suggestion = "Verify the symbol with search_symbol first, and confirm the market parameter matches it."
-    elif any(t in lower for t in ("429", "too many requests", "rate limit")):
+    elif any(t in lower for t in ("429", "too many requests", "rate limit", "bulkhead full")):
         suggestion = "The data source is rate limiting. Retry once after a short wait; if it persists, narrow the query."
     elif any(t in lower for t in ("timed out", "timeout", "connection")):
         suggestion = "Transient network issue. Retry once; if it persists, the upstream source may be down."
@@ -224,18 +256,9 @@ def fund_flags_warning(is_multi: bool, include_portfolio: bool, include_performa
     return None
 
 
-def timeframe_warning(market: str, timeframe: str) -> Optional[str]:
-    """Warning when timeframe is ignored for stock markets (always daily)."""
-    if market in ("bist", "us") and timeframe != "1d":
-        return (
-            f"timeframe='{timeframe}' is ignored for market='{market}': stock technical "
-            "analysis is computed on daily data. Timeframe applies to crypto markets only."
-        )
-    return None
-
-
 def shape(payload: Dict[str, Any]) -> str:
     """Final tool-boundary step: strip nulls, then render compact markdown."""
+    note_result(payload)
     return render_markdown(strip_nulls(payload))
 
 
@@ -496,13 +519,25 @@ async def get_technical_analysis(
         default=None
     )] = None,
     timeframe: Annotated[TimeframeLiteral, Field(
-        description="Analysis timeframe: 1d (daily), 1h (hourly), 4h, 1W (weekly)",
+        description="Bar size the indicators are computed on: 1m, 5m, 15m, 30m, 1h, 4h, 1d (daily), 1W (weekly)",
         default="1d"
     )] = "1d",
     include_pivots: Annotated[bool, Field(
         description="Also compute classic pivot points: PP, R1-R3, S1-S3, plus the nearest level and distance (bist and us only).",
         default=False
-    )] = False
+    )] = False,
+    constituents: Annotated[bool, Field(
+        description="Treat symbol as a BIST index (XU030, XU100, XBANK...) and return one ranked row per member, daily bars.",
+        default=False
+    )] = False,
+    rank_by: Annotated[IndexRankLiteral, Field(
+        description="constituents=True: column to rank by. rsi_14 and stochastic_k rank lowest first, the rest highest first.",
+        default="rsi_14"
+    )] = "rsi_14",
+    screen: Annotated[Optional[List[IndexScreenLiteral]], Field(
+        description="constituents=True: keep only members passing all of these, e.g. ['oversold', 'above_sma200'].",
+        default=None
+    )] = None
 ) -> str:
     """
     Get technical analysis with indicators and signals:
@@ -516,8 +551,28 @@ async def get_technical_analysis(
     - get_technical_analysis("GARAN", "bist") → BIST stock technicals
     - get_technical_analysis("GARAN", "bist", include_pivots=True) → with support/resistance
     - get_technical_analysis("BTCTRY", "crypto_tr") → BtcTurk crypto technicals
+    - get_technical_analysis("XU100", "bist", constituents=True, screen=["oversold", "above_sma200"])
+      → every BIST 100 member, one ranked row each
     """
     logger.info(f"get_technical_analysis: symbol='{symbol}', market='{market}'")
+    if constituents:
+        if market != "bist" or not isinstance(symbol, str):
+            raise ValueError(
+                "constituents=True takes one BIST index code as symbol, with market='bist' "
+                "(e.g. symbol='XU100')."
+            )
+        try:
+            result = await market_router.get_index_technical_analysis(symbol, rank_by, screen)
+            if timeframe != "1d":
+                result["warnings"].append(
+                    f"timeframe '{timeframe}' is not supported with constituents=True; "
+                    "the index table uses daily bars."
+                )
+            return shape(result)
+        except Exception as e:
+            logger.exception(f"Error in get_technical_analysis for index '{symbol}'")
+            raise classify_tool_error(e, "Index technical analysis") from e
+
     try:
         resolved = resolve_market(market, symbol, exchange)
         symbols = symbol if isinstance(symbol, list) else [symbol]
@@ -528,9 +583,6 @@ async def get_technical_analysis(
             ))
 
         result = await market_router.get_technical_analysis(symbols[0], resolved, timeframe)
-        warning = timeframe_warning(market, timeframe)
-        if warning:
-            result.setdefault("warnings", []).append(warning)
 
         if include_pivots:
             # Pivots are an indicator; a separate tool for them was a historical
@@ -1532,7 +1584,6 @@ async def screen_funds(
     - screen_funds(category="Para Piyasası", sort_by="weekly_return") → Money market funds by weekly return
     - screen_funds(min_return_1y=50, limit=10) → Top 10 funds with >50% yearly return
     """
-    import asyncio
     import borsapy as bp
     from datetime import datetime, timedelta
 
@@ -1540,11 +1591,10 @@ async def screen_funds(
 
     # borsapy/TEFAS calls are synchronous and network-bound; offload them so they
     # don't block the event loop and run the per-fund fan-out concurrently.
-    loop = asyncio.get_event_loop()
-    # TEFAS detail fetches go through borsapy's shared HTTP session; keep the
-    # fan-out bounded so we don't trip its rate limits (higher values cause
-    # read timeouts and dropped funds). 8 is complete and reliable in practice.
-    enrich_sema = asyncio.Semaphore(8)
+    # TEFAS detail fetches go through borsapy's shared HTTP session, so too many at
+    # once trips its rate limits (read timeouts and dropped funds). The "tefas"
+    # bulkhead bounds them across every tool call; bounded_gather keeps this screen
+    # from queueing hundreds of funds in it at once.
 
     # Return fields already present in the borsapy screen_funds dataframe. When the
     # caller sorts by one of these and applies no category filter, we can rank on
@@ -1555,13 +1605,12 @@ async def screen_funds(
         fund_code = row.get('fund_code')
         if not fund_code:
             return None
-        async with enrich_sema:
-            try:
-                fund = await loop.run_in_executor(None, bp.Fund, fund_code)
-                info = await loop.run_in_executor(None, lambda: fund.info)
-            except Exception as e:
-                logger.debug(f"Error getting fund {fund_code}: {e}")
-                return None
+        try:
+            fund = await run_blocking("tefas", bp.Fund, fund_code)
+            info = await run_blocking("tefas", lambda: fund.info)
+        except Exception as e:
+            logger.debug(f"Error getting fund {fund_code}: {e}")
+            return None
         fund_category = info.get('category', '')
         if category and category.lower() not in fund_category.lower():
             return None
@@ -1584,22 +1633,21 @@ async def screen_funds(
         fund = candidate.pop('_fund', None)
         weekly_return = None
         if fund:
-            async with enrich_sema:
-                try:
-                    start = (datetime.now() - timedelta(days=10)).strftime('%Y-%m-%d')
-                    hist = await loop.run_in_executor(None, lambda: fund.history(start=start))
-                    if hist is not None and len(hist) >= 2:
-                        first_price = hist['Price'].iloc[0]
-                        last_price = hist['Price'].iloc[-1]
-                        weekly_return = round(((last_price / first_price) - 1) * 100, 4)
-                except Exception:
-                    pass
+            try:
+                start = (datetime.now() - timedelta(days=10)).strftime('%Y-%m-%d')
+                hist = await run_blocking("tefas", lambda: fund.history(start=start))
+                if hist is not None and len(hist) >= 2:
+                    first_price = hist['Price'].iloc[0]
+                    last_price = hist['Price'].iloc[-1]
+                    weekly_return = round(((last_price / first_price) - 1) * 100, 4)
+            except Exception:
+                pass
         candidate['weekly_return'] = weekly_return
         return candidate
 
     try:
         # Get base fund list from borsapy
-        df = await loop.run_in_executor(None, lambda: bp.screen_funds(
+        df = await run_blocking("tefas", lambda: bp.screen_funds(
             fund_type=fund_type,
             min_return_1m=min_return_1m,
             min_return_1y=min_return_1y,
@@ -1624,7 +1672,7 @@ async def screen_funds(
             rows = rows[:limit * 2]
 
         # Step 1: Enrich (and category-filter) funds concurrently with bounded fan-out.
-        enriched = await asyncio.gather(*(_enrich(row) for row in rows))
+        enriched = await bounded_gather(_enrich(row) for row in rows)
         candidates = [c for c in enriched if c is not None]
 
         # Step 2: Calculate weekly return.
@@ -1638,7 +1686,7 @@ async def screen_funds(
         else:
             to_process = candidates
 
-        funds = list(await asyncio.gather(*(_weekly_return(c) for c in to_process)))
+        funds = list(await bounded_gather(_weekly_return(c) for c in to_process))
 
         # Drop any lingering fund references for candidates we didn't process.
         for c in candidates: